@@ -0,0 +1,62 @@
+"""
+Analysis Output Schema
+Pydantic models shared by the interactive, batch and tier-0 analyzers; kept
+apart from main.py so its CLI tools can start without importing pydantic
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, Field, create_model
+
+
+class RootCauseAnalysis(BaseModel):
+    """Structured output for root cause analysis"""
+    
+    test_name: str = Field(..., description="Name of the failed test")
+    error_message: str = Field(..., description="Error message from test")
+    
+    root_causes: list[str] = Field(
+        ..., 
+        description="List of likely root causes (primary to secondary)"
+    )
+    
+    severity: str = Field(
+        ..., 
+        description="Severity level: CRITICAL, HIGH, MEDIUM, LOW"
+    )
+    
+    affected_areas: list[str] = Field(
+        ..., 
+        description="Code areas/modules likely affected"
+    )
+    
+    recommended_actions: list[str] = Field(
+        ..., 
+        description="Step-by-step debugging suggestions"
+    )
+    
+    similar_issues: Optional[list[str]] = Field(
+        default=None,
+        description="References to similar past issues if applicable"
+    )
+    
+    confidence_score: float = Field(
+        ..., 
+        ge=0.0, 
+        le=1.0,
+        description="Confidence in root cause analysis (0-1)"
+    )
+
+
+# Fields the model itself answers; the analyzer fills in the rest
+ANSWER_FIELDS = ("severity", "confidence_score", "root_causes", "affected_areas", "recommended_actions")
+
+# Model-facing schema for tool-call output: the answer fields only, so the
+# model is neither asked to echo the test name and error nor invited to
+# invent similar issues. Field definitions are RootCauseAnalysis's own.
+AnalysisAnswer = create_model(
+    "AnalysisAnswer",
+    __doc__="Root cause analysis of a failed test",
+    **{name: (RootCauseAnalysis.model_fields[name].annotation, RootCauseAnalysis.model_fields[name])
+       for name in ANSWER_FIELDS},
+)
@@ -4,6 +4,7 @@ Analyzes actual test failures from your project using AI agent
 """
 
 import json
+import sys
 from datetime import datetime
 from test_analyzer_tools import ErrorPatternMatcher, TestContextAnalyzer, SeverityClassifier
 
@@ -158,5 +159,61 @@ def main():
     print(f"\n💾 Results saved to: {output_file}")
     print("\n✨ Analysis complete!")
 
+def main_batch():
+    """Nightly mode: analyze every failure through the OpenAI Batch API (resumable)"""
+    from batch_analyzer import BatchAnalyzer
+
+    failures = [
+        {"test_name": f["test_file"], "error": f["error"], "output": f"{f['details']}\n{f['context']}"}
+        for f in ACTUAL_TEST_FAILURES
+    ]
+    analyzer = BatchAnalyzer()
+    results = analyzer.run(failures)
+
+    print(f"\n✅ Analyzed: {len(results)}/{len(failures)}")
+    for fingerprint, reason in analyzer.state["errors"].items():
+        print(f"   ⚠️  {fingerprint}: {reason}")
+
+    output_file = f"ai_analysis_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w') as f:
+        json.dump({fp: r.model_dump() for fp, r in results.items()}, f, indent=2)
+    print(f"\n💾 Results saved to: {output_file}")
+
+def main_packed():
+    """Analyze the failures K per request (packed prompts), re-running rejected items alone"""
+    from packed_analyzer import PackedAnalyzer
+
+    failures = [
+        {"test_name": f["test_file"], "error": f["error"], "output": f"{f['details']}\n{f['context']}"}
+        for f in ACTUAL_TEST_FAILURES
+    ]
+    analyzer = PackedAnalyzer()
+    results = analyzer.run(failures)
+
+    stats = analyzer.stats
+    print(f"\n✅ Analyzed: {len(results)} failures in {stats['requests']} packed + {stats['solo']} solo requests "
+          f"({stats['tier0']} answered locally, {stats['reruns']} re-run alone)")
+    print(f"⚡ Throughput: {stats['failures_per_minute']:.0f} failures/minute")
+
+    output_file = f"ai_analysis_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w') as f:
+        json.dump([r.model_dump() for r in results], f, indent=2)
+    print(f"\n💾 Results saved to: {output_file}")
+
+def main_watch():
+    """Analyze failures of a running Playwright suite as they appear in test-results/"""
+    import os
+    from results_watcher import main as watch
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test-results")
+    watch([os.path.normpath(root), "--until-done"] + [a for a in sys.argv[1:] if a != "--watch"])
+
 if __name__ == "__main__":
-    main()
+    if "--watch" in sys.argv:
+        main_watch()
+    elif "--batch" in sys.argv:
+        main_batch()
+    elif "--packed" in sys.argv:
+        main_packed()
+    else:
+        main()
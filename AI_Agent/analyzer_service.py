@@ -0,0 +1,509 @@
+"""
+Analyzer Service
+A long-running analyzer for sharded CI: every shard posts its failures to one
+local service instead of starting main.py cold. The service keeps one warm
+LLM client per model and the pattern engine loaded, analyzes each failure
+once however many shards report it (failures are keyed by
+batch_analyzer.failure_fingerprint) and shares one worker pool, so LLM calls
+of all shards are paced together by the rate_limiter scheduler.
+
+HTTP API (stdlib asyncio, JSON bodies):
+    POST /failures          {"shard": "3", "failures": [{"test_name", "error", "output", "visual_diffs"}]}
+                            -> 202 {"jobs": [{"fingerprint", "status", "duplicate"}]}
+    GET  /failures/<fp>     one job, with "result" (RootCauseAnalysis) once done
+    GET  /results?shard=3   jobs, optionally of one shard or status
+    GET  /events?fingerprints=a,b | ?shard=3
+                            server-sent events, one "result" event per finished job;
+                            with fingerprints, the stream ends when all of them finished
+                            (an "unknown" event stands in for fingerprints without a job)
+    GET  /health            uptime and counters
+
+Usage:
+    python analyzer_service.py serve --port 8765
+    python analyzer_service.py submit --shard 3 ../test-results     # from a CI shard
+
+Environment:
+    ANALYZER_SERVICE_URL=http://127.0.0.1:8765   where submit posts to
+    ANALYZER_SERVICE_WORKERS=8                   failures analyzed at once
+    ANALYZER_SERVICE_TTL_SECONDS=86400           finished jobs are forgotten after this
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from batch_analyzer import failure_fingerprint
+
+DEFAULT_URL = os.getenv("ANALYZER_SERVICE_URL", "http://127.0.0.1:8765")
+DEFAULT_WORKERS = int(os.getenv("ANALYZER_SERVICE_WORKERS", "8"))
+DEFAULT_TTL = float(os.getenv("ANALYZER_SERVICE_TTL_SECONDS", "86400"))
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+HEARTBEAT_SECONDS = 15.0
+FINAL_STATUSES = ("done", "error")
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large"}
+
+
+def default_analyze(failure: Dict) -> Dict:
+    from main import analyze_test_failure
+    return analyze_test_failure(failure["test_name"], failure["error"], failure.get("output"),
+                                visual_diffs=failure.get("visual_diffs")).model_dump()
+
+
+def patterns_only_analyze(failure: Dict) -> Dict:
+    from results_watcher import patterns_only_analyze as analyze
+    return analyze(failure).model_dump()
+
+
+# ============================================================================
+# 1. JOBS
+# ============================================================================
+
+class Job:
+    """One distinct failure and everything the shards reporting it need to know"""
+
+    def __init__(self, fingerprint: str, failure: Dict):
+        self.fingerprint = fingerprint
+        self.failure = failure
+        self.status = "queued"
+        self.shards: Set[str] = set()
+        self.submissions = 0
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "test_name": self.failure["test_name"],
+            "status": self.status,
+            "shards": sorted(self.shards),
+            "submissions": self.submissions,
+            "result": self.result,
+            "error": self.error,
+            "elapsed_s": round((self.finished or time.time()) - self.created, 3),
+        }
+
+
+class AnalyzerService:
+    """
+    Job table and worker pool; all methods run on the service's event loop.
+
+    analyze(failure) runs on the pool and returns the analysis as a dict
+    (default: main.analyze_test_failure). A failure that errored is analyzed
+    again when it is submitted again; any other known fingerprint is a
+    duplicate and only records the shard.
+    """
+
+    def __init__(self,
+                 analyze: Callable[[Dict], Dict] = default_analyze,
+                 max_workers: int = DEFAULT_WORKERS,
+                 ttl: float = DEFAULT_TTL):
+        self.analyze = analyze
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+        self.stats = {"submitted": 0, "duplicates": 0, "analyzed": 0, "errors": 0}
+        self.started = time.time()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analyzer")
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def warm_up(self) -> bool:
+        """Load the pattern engine, prompt prefix and LLM clients before the first shard reports"""
+        def load():
+            import main
+            from model_router import get_router
+
+            main.analysis_prefix()
+            for model in dict.fromkeys(m for s in ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+                                       for m in get_router().models_for(s)):
+                main.create_test_analyzer_agent(model)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._pool, load)
+        except Exception as e:
+            # Analyses fall back to the pattern engine until the API is reachable
+            print(f"⚠️  LLM warm-up failed ({type(e).__name__}: {e})")
+            return False
+        return True
+
+    def submit(self, failures: List[Dict], shard: Optional[str] = None) -> List[Dict]:
+        """Queue the failures that are new; returns one {"fingerprint", "status", "duplicate"} per failure"""
+        from analyzer_telemetry import get_telemetry
+
+        telemetry = get_telemetry()
+        self._expire()
+        accepted = []
+        for failure in failures:
+            fingerprint = failure_fingerprint(failure["test_name"], failure["error"])
+            job = self.jobs.get(fingerprint)
+            duplicate = job is not None and job.status != "error"
+            if not duplicate:
+                job = Job(fingerprint, failure)
+                self.jobs[fingerprint] = job
+                task = asyncio.get_running_loop().create_task(self._run(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            job.submissions += 1
+            if shard is not None:
+                job.shards.add(str(shard))
+            self.stats["submitted"] += 1
+            self.stats["duplicates"] += duplicate
+            telemetry.incr("analyzer_service_failures_total", outcome="duplicate" if duplicate else "new")
+            accepted.append({"fingerprint": fingerprint, "status": job.status, "duplicate": duplicate})
+        return accepted
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        try:
+            job.result = await asyncio.get_running_loop().run_in_executor(self._pool, self.analyze, job.failure)
+            job.status = "done"
+            self.stats["analyzed"] += 1
+        except Exception as e:
+            job.status, job.error = "error", f"{type(e).__name__}: {e}"
+            self.stats["errors"] += 1
+        job.finished = time.time()
+        for queue in self._subscribers:
+            queue.put_nowait(job)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for fingerprint in [fp for fp, job in self.jobs.items() if job.finished and job.finished < cutoff]:
+            del self.jobs[fingerprint]
+
+    def select(self, shard: Optional[str] = None, status: Optional[str] = None,
+               fingerprints: Optional[List[str]] = None) -> List[Job]:
+        jobs = [self.jobs[fp] for fp in fingerprints if fp in self.jobs] if fingerprints else self.jobs.values()
+        return [job for job in jobs
+                if (shard is None or shard in job.shards) and (status is None or job.status == status)]
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def health(self) -> Dict:
+        pending = sum(job.status not in FINAL_STATUSES for job in self.jobs.values())
+        return {"status": "ok", "uptime_s": round(time.time() - self.started, 1), "jobs": len(self.jobs),
+                "pending": pending, **self.stats}
+
+    async def drain(self):
+        """Wait for every queued analysis"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+# ============================================================================
+# 2. HTTP
+# ============================================================================
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), urllib.parse.urlsplit(target), body
+
+
+def _head(status: int, content_type: str, extra: Optional[Dict] = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+    lines += [f"{key}: {value}" for key, value in (extra or {}).items()]
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Any):
+    body = json.dumps(payload).encode()
+    writer.write(_head(status, "application/json", {"Content-Length": len(body)}) + b"\r\n" + body)
+    await writer.drain()
+
+
+def _parse_failures(body: bytes) -> tuple:
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError:
+        raise HTTPError(400, "body is not JSON")
+    shard, failures = None, payload
+    if isinstance(payload, dict):
+        shard, failures = payload.get("shard"), payload.get("failures", [payload])
+    if not isinstance(failures, list) or not failures:
+        raise HTTPError(400, "expected a failure object or {\"failures\": [...]}")
+    for failure in failures:
+        if not isinstance(failure, dict) or not failure.get("test_name") or not failure.get("error"):
+            raise HTTPError(400, "every failure needs test_name and error")
+    return shard, [{"test_name": str(f["test_name"]), "error": str(f["error"]), "output": f.get("output"),
+                    "visual_diffs": f.get("visual_diffs") or []} for f in failures]
+
+
+class AnalyzerHTTPServer:
+    """Serves an AnalyzerService over HTTP/1.1 (one request per connection)"""
+
+    def __init__(self, service: AnalyzerService, host: str = "127.0.0.1", port: int = 8765):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await _read_request(reader)
+            if request is not None:
+                await self._route(writer, *request)
+        except HTTPError as e:
+            await _send_json(writer, e.status, {"error": str(e)})
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await _send_json(writer, 400, {"error": f"{type(e).__name__}: {e}"})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer: asyncio.StreamWriter, method: str, url: urllib.parse.SplitResult, body: bytes):
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+        if path == "/failures":
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            shard, failures = _parse_failures(body)
+            await _send_json(writer, 202, {"jobs": self.service.submit(failures, shard)})
+        elif path.startswith("/failures/"):
+            job = self.service.jobs.get(path.rsplit("/", 1)[1])
+            if job is None:
+                raise HTTPError(404, "unknown fingerprint")
+            await _send_json(writer, 200, job.to_dict())
+        elif path == "/results":
+            jobs = self.service.select(query.get("shard"), query.get("status"))
+            await _send_json(writer, 200, {"jobs": [job.to_dict() for job in jobs],
+                                           "pending": sum(job.status not in FINAL_STATUSES for job in jobs)})
+        elif path == "/events":
+            fingerprints = [fp for fp in query.get("fingerprints", "").split(",") if fp]
+            await self._stream_events(writer, query.get("shard"), fingerprints)
+        elif path == "/health":
+            await _send_json(writer, 200, self.service.health())
+        else:
+            raise HTTPError(404, f"no route for {url.path}")
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, shard: Optional[str], fingerprints: List[str]):
+        """
+        Finished jobs as SSE "result" events: those already done first, then
+        each as it finishes. Fingerprints without a job (never submitted,
+        expired, or not of this shard) get an "unknown" event right away, so
+        the stream still ends
+        """
+        queue = self.service.subscribe()
+        try:
+            writer.write(_head(200, "text/event-stream", {"Cache-Control": "no-cache"}) + b"\r\n")
+            waiting = set(fingerprints)
+            jobs = self.service.select(shard, fingerprints=fingerprints)
+            known = {job.fingerprint for job in jobs}
+            for fingerprint in dict.fromkeys(fp for fp in fingerprints if fp not in known):
+                self._write_unknown(writer, fingerprint)
+                waiting.discard(fingerprint)
+            for job in jobs:
+                if job.status in FINAL_STATUSES:
+                    self._write_event(writer, job)
+                    waiting.discard(job.fingerprint)
+            await writer.drain()
+            while not fingerprints or waiting:
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Also notices clients that went away
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    continue
+                if fingerprints and job.fingerprint not in waiting:
+                    continue
+                if shard is not None and shard not in job.shards:
+                    continue
+                self._write_event(writer, job)
+                waiting.discard(job.fingerprint)
+                await writer.drain()
+        finally:
+            self.service.unsubscribe(queue)
+
+    @staticmethod
+    def _write_event(writer: asyncio.StreamWriter, job: Job):
+        writer.write(f"id: {job.fingerprint}\nevent: result\ndata: {json.dumps(job.to_dict())}\n\n".encode())
+
+    @staticmethod
+    def _write_unknown(writer: asyncio.StreamWriter, fingerprint: str):
+        data = {"fingerprint": fingerprint, "status": "unknown", "error": "unknown fingerprint"}
+        writer.write(f"id: {fingerprint}\nevent: unknown\ndata: {json.dumps(data)}\n\n".encode())
+
+
+class BackgroundServer:
+    """Runs the service and its HTTP server on an event loop in a daemon thread (tests, embedding)"""
+
+    def __init__(self, service: Optional[AnalyzerService] = None, host: str = "127.0.0.1", port: int = 0):
+        self.service = service or AnalyzerService()
+        self.http = AnalyzerHTTPServer(self.service, host, port)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="analyzer-service", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.http.host}:{self.http.port}"
+
+    def __enter__(self) -> "BackgroundServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.http.start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.http.stop(), self.loop).result()
+        asyncio.run_coroutine_threadsafe(self.service.drain(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.service.close()
+
+
+# ============================================================================
+# 3. CLIENT
+# ============================================================================
+
+def post_failures(failures: List[Dict], shard: Optional[str] = None, base_url: str = DEFAULT_URL,
+                  timeout: float = 30) -> List[Dict]:
+    """Submit failures from a CI shard; returns the service's job list"""
+    request = urllib.request.Request(f"{base_url.rstrip('/')}/failures", method="POST",
+                                     data=json.dumps({"shard": shard, "failures": failures}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())["jobs"]
+
+
+def stream_results(fingerprints: List[str], base_url: str = DEFAULT_URL, timeout: Optional[float] = None):
+    """
+    Yield each job of fingerprints (as a dict) once it finished, reading the
+    /events stream; fingerprints the service does not know come as
+    {"fingerprint", "status": "unknown", "error"}
+    """
+    query = urllib.parse.urlencode({"fingerprints": ",".join(fingerprints)})
+    with urllib.request.urlopen(f"{base_url.rstrip('/')}/events?{query}", timeout=timeout) as response:
+        for line in response:
+            if line.startswith(b"data: "):
+                yield json.loads(line[len(b"data: "):])
+
+
+# ============================================================================
+# 4. MAIN RUNNER
+# ============================================================================
+
+async def serve(host: str, port: int, service: AnalyzerService):
+    from similar_failures import get_failure_index
+
+    http = AnalyzerHTTPServer(service, host, port)
+    await http.start()
+    print(f"🛰️  Analyzer service on http://{host}:{http.port} ({service.max_workers} workers)")
+    if service.analyze is not patterns_only_analyze and await service.warm_up():
+        print("✅ Warm: pattern engine and LLM clients loaded")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await http.stop()
+        await service.drain()
+        get_failure_index().save()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared analyzer service for sharded CI runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Run the service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=urllib.parse.urlsplit(DEFAULT_URL).port or 8765)
+    serve_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    serve_parser.add_argument("--patterns-only", action="store_true", help="Pattern analysis only, no API calls")
+    submit_parser = commands.add_parser("submit", help="Post the failures of a Playwright output directory")
+    submit_parser.add_argument("root", nargs="?", default="test-results")
+    submit_parser.add_argument("--shard", help="Shard id, e.g. $CI_NODE_INDEX")
+    submit_parser.add_argument("--url", default=DEFAULT_URL)
+    submit_parser.add_argument("--wait", action="store_true", help="Print each analysis as it finishes")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = AnalyzerService(patterns_only_analyze if args.patterns_only else default_analyze, args.workers)
+        try:
+            asyncio.run(serve(args.host, args.port, service))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+        return 0
+
+    from results_watcher import failure_from_dir, is_failure_dir, spec_files
+
+    specs = spec_files(args.root)
+    failures, unreadable = [], 0
+    for entry in sorted(os.scandir(args.root), key=lambda e: e.name):
+        if not entry.is_dir() or not is_failure_dir(entry.path):
+            continue
+        try:
+            failures.append(failure_from_dir(entry.path, specs))
+        except Exception as e:
+            # One unreadable directory must not keep the shard's other failures from the service
+            unreadable += 1
+            print(f"⚠️  Skipped {entry.name}: {type(e).__name__}: {e}")
+    if not failures:
+        print(f"❌ No readable failures in {args.root}" if unreadable else f"✅ No failures in {args.root}")
+        return 1 if unreadable else 0
+    jobs = post_failures([{k: f[k] for k in ("test_name", "error", "output", "visual_diffs")} for f in failures],
+                         args.shard, args.url)
+    duplicates = sum(job["duplicate"] for job in jobs)
+    print(f"📤 Submitted {len(jobs)} failures ({duplicates} already reported by other shards)")
+    if args.wait:
+        for job in stream_results(list(dict.fromkeys(job["fingerprint"] for job in jobs)), args.url):
+            result = job.get("result") or {}
+            print(f"🔍 {job.get('test_name', job['fingerprint'])}: [{result.get('severity', job['status'])}] "
+                  f"{(result.get('root_causes') or [job['error'] or ''])[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
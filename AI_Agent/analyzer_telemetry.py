@@ -0,0 +1,304 @@
+"""
+Analyzer Telemetry
+Dependency-free spans and metrics for the analysis pipeline, with in-process,
+JSONL and Prometheus text exporters (no collector needed)
+
+Usage:
+    telemetry = get_telemetry()
+    with telemetry.span("llm.invoke", model="gpt-4o-mini") as span:
+        response = llm.invoke(prompt)
+        span.set_attribute("tokens_out", 120)
+    telemetry.incr("analyzer_llm_tokens_total", 120, direction="output")
+    print(telemetry.stage_summary())
+
+Environment:
+    ANALYZER_TRACE_FILE=spans.jsonl     append every finished span as one JSON line
+    ANALYZER_METRICS_FILE=metrics.prom  write Prometheus text on flush()
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Latency buckets (seconds) for stage duration histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets for histograms that are not latencies: fractions in [0, 1] and small counts
+RATIO_BUCKETS = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 24, 32)
+
+STAGE_DURATION_METRIC = "analyzer_stage_duration_seconds"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("analyzer_span", default=None)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+# ============================================================================
+# SPANS
+# ============================================================================
+
+class Span:
+    """One timed pipeline stage; children started inside it share its trace_id"""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict = dict(attributes or {})
+        self.events: List[Dict] = []
+        self.status = "ok"
+        self.start_time_ns = time.time_ns()
+        self._start_ns = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        """Record a point-in-time event (e.g. a parse fallback) on this span"""
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def end(self):
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self._start_ns
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_ns": self.start_time_ns,
+            "duration_ms": (self.duration_ns or 0) / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by name and label set"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histogram_buckets: Dict[str, Tuple[float, ...]] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelSet, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[LabelSet, Dict]] = defaultdict(dict)
+
+    @staticmethod
+    def _labels(labels: Dict) -> LabelSet:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def incr(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self.counters[name][self._labels(labels)] += value
+
+    def observe(self, name: str, value: float, buckets: Optional[Tuple[float, ...]] = None, **labels):
+        """
+        Add value to a histogram. The first observation of a name fixes its
+        bucket bounds: buckets if given, else the registry's latency buckets.
+        """
+        with self._lock:
+            bounds = self.histogram_buckets.setdefault(name, buckets or self.buckets)
+            if buckets is not None and tuple(buckets) != tuple(bounds):
+                raise ValueError(f"Histogram {name} already uses buckets {bounds}")
+            series = self.histograms[name].setdefault(self._labels(labels), {
+                "buckets": [0] * len(bounds), "sum": 0.0, "count": 0,
+            })
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self.counters.get(name, {}).get(self._labels(labels), 0.0)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "counters": {name: dict(series) for name, series in self.counters.items()},
+                "histograms": {
+                    name: {labels: {**s, "buckets": list(s["buckets"])} for labels, s in series.items()}
+                    for name, series in self.histograms.items()
+                },
+                "buckets": self.buckets,
+                "histogram_buckets": dict(self.histogram_buckets),
+            }
+
+
+# ============================================================================
+# EXPORTERS
+# ============================================================================
+
+class InMemoryExporter:
+    """Keeps the most recent spans in process, for tests and summaries"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: Deque[Dict] = deque(maxlen=max_spans)
+
+    def export_span(self, span: Span):
+        self.spans.append(span.to_dict())
+
+    def finished(self, name: Optional[str] = None) -> List[Dict]:
+        return [s for s in list(self.spans) if name is None or s["name"] == name]
+
+
+class JsonlExporter:
+    """Appends one JSON line per finished span"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export_span(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class PrometheusTextExporter:
+    """Renders the metrics registry in the Prometheus text exposition format"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+
+    @staticmethod
+    def _format_labels(labels: LabelSet, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self, metrics: MetricsRegistry) -> str:
+        snapshot = metrics.snapshot()
+        lines = []
+        for name, series in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+        for name, series in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, s in sorted(series.items()):
+                for bound, count in zip(snapshot["histogram_buckets"][name], s["buckets"]):
+                    lines.append(f"{name}_bucket{self._format_labels(labels, (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {s['count']}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {s['sum']:.6f}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export_metrics(self, metrics: MetricsRegistry):
+        if self.path:
+            with open(self.path, "w") as f:
+                f.write(self.render(metrics))
+
+
+# ============================================================================
+# TELEMETRY FACADE
+# ============================================================================
+
+class Telemetry:
+    """Creates spans, records metrics and fans finished spans out to exporters"""
+
+    def __init__(self, exporters: Optional[List] = None):
+        self.metrics = MetricsRegistry()
+        self.memory = InMemoryExporter()
+        self.exporters = [self.memory] + list(exporters or [])
+
+    @classmethod
+    def from_env(cls) -> "Telemetry":
+        """Build exporters from ANALYZER_TRACE_FILE and ANALYZER_METRICS_FILE"""
+        exporters = []
+        if os.getenv("ANALYZER_TRACE_FILE"):
+            exporters.append(JsonlExporter(os.environ["ANALYZER_TRACE_FILE"]))
+        if os.getenv("ANALYZER_METRICS_FILE"):
+            exporters.append(PrometheusTextExporter(os.environ["ANALYZER_METRICS_FILE"]))
+        return cls(exporters)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a stage; exceptions mark the span as an error and propagate"""
+        span = Span(name, parent=_current_span.get(), attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self.metrics.observe(STAGE_DURATION_METRIC, span.duration_ns / 1e9, stage=name)
+            for exporter in self.exporters:
+                if hasattr(exporter, "export_span"):
+                    exporter.export_span(span)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def incr(self, name: str, value: float = 1, **labels):
+        self.metrics.incr(name, value, **labels)
+
+    def observe(self, name: str, value: float, buckets: Optional[Tuple[float, ...]] = None, **labels):
+        self.metrics.observe(name, value, buckets, **labels)
+
+    def flush(self):
+        """Push current metrics to exporters that write them (Prometheus text file)"""
+        for exporter in self.exporters:
+            if hasattr(exporter, "export_metrics"):
+                exporter.export_metrics(self.metrics)
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, total, mean and p95 milliseconds per stage from in-memory spans"""
+        durations: Dict[str, List[float]] = defaultdict(list)
+        for span in self.memory.finished():
+            durations[span["name"]].append(span["duration_ms"])
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "total_ms": sum(values),
+                "mean_ms": sum(values) / len(values),
+                "p95_ms": values[min(int(len(values) * 0.95), len(values) - 1)],
+            }
+        return dict(sorted(summary.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """Return the process-wide Telemetry, configured from the environment on first use"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry.from_env()
+        return _telemetry
+
+
+def set_telemetry(telemetry: Telemetry) -> Telemetry:
+    """Replace the process-wide Telemetry (e.g. with custom exporters)"""
+    global _telemetry
+    with _telemetry_lock:
+        _telemetry = telemetry
+    return telemetry
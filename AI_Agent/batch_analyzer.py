@@ -0,0 +1,329 @@
+"""
+Batch Failure Analysis
+Nightly mode for large failure sets: every pending prompt goes into one JSONL
+job for the OpenAI Batch API (half the price of interactive calls, no rate
+limit pressure), which is submitted, polled and parsed back into
+RootCauseAnalysis records keyed by failure fingerprint
+
+All progress is kept in a local state file, so an interrupted run picks up
+where it stopped: uploaded files are not re-uploaded, submitted batches are
+polled instead of resubmitted and analyzed failures are never sent again.
+
+Usage:
+    analyzer = BatchAnalyzer()
+    results = analyzer.run([{"test_name": "har.spec.ts", "error": "Status 500 ..."}])
+
+Environment:
+    OPENAI_API_KEY, OPENAI_BASE_URL     credentials and endpoint (default api.openai.com)
+    ANALYZER_BATCH_STATE=.batch_state.json
+    ANALYZER_BATCH_POLL_SECONDS=60
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import urllib.request
+import uuid
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+
+from analysis_schema import RootCauseAnalysis
+from deterministic_analyzer import analyze_deterministically
+from main import MAX_OUTPUT_TOKENS, analysis_prefix, build_analysis_prompt, precompute_tool_results
+from prompt_builder import DEFAULT_TOKEN_BUDGET
+from similar_failures import format_similar_issue, get_failure_index
+
+DEFAULT_STATE_PATH = os.getenv("ANALYZER_BATCH_STATE", ".batch_state.json")
+DEFAULT_POLL_SECONDS = float(os.getenv("ANALYZER_BATCH_POLL_SECONDS", "60"))
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def failure_fingerprint(test_name: str, error_message: str) -> str:
+    """Stable id for a failure: the same test failing the same way maps to one key"""
+    # Numbers (timeouts, ids, line:col) vary between runs of the same failure
+    normalized = re.sub(r"\d+", "<n>", " ".join(error_message.lower().split()))
+    return hashlib.sha256(f"{test_name}\n{normalized}".encode()).hexdigest()[:16]
+
+
+# ============================================================================
+# BATCH API CLIENT
+# ============================================================================
+
+class OpenAIBatchClient:
+    """Minimal Files + Batches client over urllib (points at a stub in tests)"""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, timeout: float = 120):
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, data: Optional[bytes] = None,
+                 content_type: str = "application/json") -> bytes:
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method, headers={
+            "Authorization": f"Bearer {self.api_key}", "Content-Type": content_type,
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def upload_file(self, path: str, purpose: str = "batch") -> str:
+        """Upload a JSONL job file and return its file id"""
+        boundary = uuid.uuid4().hex
+        with open(path, "rb") as f:
+            content = f.read()
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"purpose\"\r\n\r\n{purpose}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; "
+            f"filename=\"{os.path.basename(path)}\"\r\nContent-Type: application/jsonl\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        response = self._request("POST", "/files", body, f"multipart/form-data; boundary={boundary}")
+        return json.loads(response)["id"]
+
+    def create_batch(self, input_file_id: str, completion_window: str = "24h",
+                     metadata: Optional[Dict] = None) -> Dict:
+        body = {"input_file_id": input_file_id, "endpoint": CHAT_ENDPOINT,
+                "completion_window": completion_window, "metadata": metadata or {}}
+        return json.loads(self._request("POST", "/batches", json.dumps(body).encode()))
+
+    def retrieve_batch(self, batch_id: str) -> Dict:
+        return json.loads(self._request("GET", f"/batches/{batch_id}"))
+
+    def file_content(self, file_id: str) -> str:
+        return self._request("GET", f"/files/{file_id}/content").decode()
+
+
+# ============================================================================
+# RESUMABLE BATCH RUN
+# ============================================================================
+
+class BatchAnalyzer:
+    """
+    Analyzes failures through the Batch API, resumable from state_path.
+
+    State file layout:
+        failures  {fingerprint: {test_name, error_message, similar_issues}}
+        results   {fingerprint: RootCauseAnalysis fields}
+        errors    {fingerprint: reason}  (retried on the next run)
+        batches   [{id, input_file, input_file_id, status, custom_ids, collected}]
+    """
+
+    def __init__(self,
+                 client: Optional[OpenAIBatchClient] = None,
+                 state_path: str = DEFAULT_STATE_PATH,
+                 model: str = DEFAULT_MODEL,
+                 poll_interval: float = DEFAULT_POLL_SECONDS,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 use_tier0: bool = True):
+        self.client = client or OpenAIBatchClient()
+        self.state_path = state_path
+        self.model = model
+        self.poll_interval = poll_interval
+        self.token_budget = token_budget
+        self.use_tier0 = use_tier0
+        self.state = self._load_state()
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _load_state(self) -> Dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {"failures": {}, "results": {}, "errors": {}, "batches": []}
+
+    def save(self):
+        """Write the state atomically, so a crash never leaves a half-written file"""
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _active_ids(self) -> set:
+        return {cid for b in self.state["batches"] if not b.get("collected") for cid in b["custom_ids"]}
+
+    # ------------------------------------------------------------------
+    # Steps
+    # ------------------------------------------------------------------
+
+    def add(self, failures: List[Dict]) -> List[str]:
+        """
+        Register failures ({"test_name", "error", "output"}) and return their
+        fingerprints. Confident pattern matches are answered locally right away.
+        """
+        index = get_failure_index()
+        fingerprints = []
+        for failure in failures:
+            fingerprint = failure_fingerprint(failure["test_name"], failure["error"])
+            fingerprints.append(fingerprint)
+            if fingerprint in self.state["failures"]:
+                continue
+            neighbors = index.search(failure["test_name"], failure["error"])
+            entry = {
+                "test_name": failure["test_name"],
+                "error_message": failure["error"],
+                "test_output": failure.get("output"),
+                "neighbors": neighbors,
+                "similar_issues": [format_similar_issue(n) for n in neighbors] or None,
+            }
+            self.state["failures"][fingerprint] = entry
+            local = analyze_deterministically(failure["test_name"], failure["error"]) if self.use_tier0 else None
+            if local is not None:
+                local["similar_issues"] = entry["similar_issues"]
+                self.state["results"][fingerprint] = self._record(fingerprint, local, "tier0")
+        self.save()
+        return fingerprints
+
+    def pending(self) -> List[str]:
+        """Fingerprints with no result that are not already part of a submitted batch"""
+        active = self._active_ids()
+        return [fp for fp in self.state["failures"] if fp not in self.state["results"] and fp not in active]
+
+    def request_line(self, fingerprint: str) -> Dict:
+        failure = self.state["failures"][fingerprint]
+        # Batch requests get a single turn, so the tool results are always inlined
+        tool_results = precompute_tool_results(failure["test_name"], failure["error_message"])
+        prompt, _ = build_analysis_prompt(failure["test_name"], failure["error_message"],
+                                          failure.get("test_output"), failure.get("neighbors"),
+                                          self.token_budget, tool_results)
+        return {
+            "custom_id": fingerprint,
+            "method": "POST",
+            "url": CHAT_ENDPOINT,
+            "body": {
+                "model": self.model,
+                # Same system prefix on every line, so the provider's prompt cache covers it
+                "messages": [{"role": "system", "content": analysis_prefix()},
+                             {"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"},
+                "temperature": 0.2,
+                "max_tokens": MAX_OUTPUT_TOKENS,
+            },
+        }
+
+    def prepare(self) -> Optional[Dict]:
+        """Write every pending prompt into a new JSONL job file, or return None if nothing is pending"""
+        fingerprints = self.pending()
+        if not fingerprints:
+            return None
+        job_dir = os.path.dirname(os.path.abspath(self.state_path))
+        input_file = os.path.join(job_dir, f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.jsonl")
+        with open(input_file, "w") as f:
+            for fingerprint in fingerprints:
+                f.write(json.dumps(self.request_line(fingerprint)) + "\n")
+                self.state["errors"].pop(fingerprint, None)
+        batch = {"id": None, "input_file": input_file, "input_file_id": None,
+                 "status": "prepared", "custom_ids": fingerprints, "collected": False}
+        self.state["batches"].append(batch)
+        self.save()
+        return batch
+
+    def submit(self):
+        """Upload and create every prepared batch, saving after each step"""
+        for batch in self.state["batches"]:
+            if batch.get("collected") or batch["id"]:
+                continue
+            if not batch["input_file_id"]:
+                batch["input_file_id"] = self.client.upload_file(batch["input_file"])
+                self.save()
+            created = self.client.create_batch(batch["input_file_id"],
+                                               metadata={"source": "ppupgrade-nightly"})
+            batch["id"], batch["status"] = created["id"], created["status"]
+            self.save()
+            print(f"📤 Submitted batch {batch['id']} ({len(batch['custom_ids'])} failures)")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Poll submitted batches until all are finished; False if timeout came first"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            running = [b for b in self.state["batches"]
+                       if b["id"] and not b.get("collected") and b["status"] not in TERMINAL_STATUSES]
+            for batch in running:
+                info = self.client.retrieve_batch(batch["id"])
+                batch.update(status=info["status"], output_file_id=info.get("output_file_id"),
+                             error_file_id=info.get("error_file_id"),
+                             request_counts=info.get("request_counts"))
+            if running:
+                self.save()
+            if all(b["status"] in TERMINAL_STATUSES for b in running):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def collect(self):
+        """Parse output and error files of finished batches into results and errors"""
+        for batch in self.state["batches"]:
+            if batch.get("collected") or batch["status"] not in TERMINAL_STATUSES:
+                continue
+            for file_key in ("output_file_id", "error_file_id"):
+                if batch.get(file_key):
+                    for line in self.client.file_content(batch[file_key]).splitlines():
+                        if line.strip():
+                            self._parse_line(json.loads(line))
+            for fingerprint in batch["custom_ids"]:
+                if fingerprint not in self.state["results"]:
+                    self.state["errors"].setdefault(fingerprint, f"no result (batch {batch['status']})")
+            batch["collected"] = True
+            self.save()
+
+    def _parse_line(self, record: Dict):
+        fingerprint = record.get("custom_id")
+        if fingerprint not in self.state["failures"]:
+            return
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or (response.get("body") or {}).get("error") or {}
+            self.state["errors"][fingerprint] = f"{response.get('status_code')}: {error.get('message', error)}"
+            return
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            fields = json.loads(content)
+            fields["similar_issues"] = self.state["failures"][fingerprint]["similar_issues"]
+            self.state["results"][fingerprint] = self._record(fingerprint, fields, "batch")
+        except (KeyError, IndexError, TypeError, ValueError, ValidationError) as e:
+            self.state["errors"][fingerprint] = f"unparseable response: {e}"
+
+    def _record(self, fingerprint: str, fields: Dict, source: str) -> Dict:
+        """Validated RootCauseAnalysis fields for the state file; also indexes the failure"""
+        failure = self.state["failures"][fingerprint]
+        analysis = RootCauseAnalysis(**{
+            **{k: v for k, v in fields.items() if k in RootCauseAnalysis.model_fields},
+            "test_name": failure["test_name"],
+            "error_message": failure["error_message"],
+        })
+        get_failure_index().add(failure["test_name"], failure["error_message"], analysis.model_dump())
+        return {**analysis.model_dump(), "source": source}
+
+    # ------------------------------------------------------------------
+    # Entry point
+    # ------------------------------------------------------------------
+
+    def run(self, failures: List[Dict], timeout: Optional[float] = None) -> Dict[str, RootCauseAnalysis]:
+        """
+        Analyze failures, resuming any unfinished work from the state file.
+
+        Returns {fingerprint: RootCauseAnalysis} for the failures that have a
+        result; the others are listed in state["errors"] (or are still
+        running if timeout expired) and are retried by the next run.
+        """
+        fingerprints = self.add(failures)
+        self.prepare()
+        self.submit()
+        if self.wait(timeout):
+            self.collect()
+        get_failure_index().save()
+
+        results = {}
+        for fingerprint in fingerprints:
+            record = self.state["results"].get(fingerprint)
+            if record is not None:
+                results[fingerprint] = RootCauseAnalysis(
+                    **{k: v for k, v in record.items() if k in RootCauseAnalysis.model_fields}
+                )
+        return results
@@ -0,0 +1,170 @@
+"""
+Shared test fixtures: a scripted chat model standing in for the LLM, an in-memory failure index and
+synthetic screenshots
+"""
+
+import json
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import main
+import similar_failures
+from similar_failures import FailureIndex
+
+ANALYSIS = json.dumps({"severity": "MEDIUM", "confidence_score": 0.8, "root_causes": ["Banner pushed the table down"],
+                       "affected_areas": ["results"], "recommended_actions": ["Reserve space for the banner"]})
+SCREENSHOT_ERROR = "Error: Screenshot comparison failed: 6173 pixels (ratio 0.01 of all image pixels) are different."
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Answers the n-th call with replies[n] (the last one repeating), or with
+    respond(prompt) when given, and records what it was sent and bound to.
+
+    Replies stream in chunk_size pieces (0: one chunk), each after
+    chunk_delay seconds; a call listed in drops loses its connection after
+    that many characters. An AIMessage reply keeps its tool calls.
+    """
+
+    replies: List[Union[str, AIMessage]] = [ANALYSIS]
+    respond: Optional[Callable[[str], str]] = None
+    chunk_size: int = 0
+    chunk_delay: float = 0.0
+    drops: Dict[int, int] = {}
+    prompts: List[str] = []
+    received: List[list] = []
+    bound: list = []
+    timeouts: List[float] = []
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _answer(self, messages) -> AIMessage:
+        call = len(self.prompts)
+        self.prompts.append(messages[-1].content)
+        self.received.append(list(messages))
+        if self.respond is not None:
+            return AIMessage(content=self.respond(messages[-1].content))
+        reply = self.replies[min(call, len(self.replies) - 1)]
+        return reply if isinstance(reply, AIMessage) else AIMessage(content=reply)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        call = len(self.prompts)
+        message = self._answer(messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=message.content, tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)]))
+            return
+        text = message.content
+        size = self.chunk_size or len(text) or 1
+        for start in range(0, len(text), size):
+            if start >= self.drops.get(call, len(text)):
+                raise ConnectionError("connection reset by peer")
+            time.sleep(self.chunk_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + size]))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self._answer(messages))])
+
+    def bind_tools(self, tools, **kwargs):
+        self.bound.append([getattr(tool, "name", None) or tool.__name__ for tool in tools])
+        return self
+
+    def bind(self, **kwargs):
+        self.bound.append(None)
+        if "timeout" in kwargs:
+            self.timeouts.append(kwargs["timeout"])
+        return self
+
+
+@pytest.fixture
+def chat_model():
+    """FakeChatModel, for tests that hand the model to the analyzer themselves"""
+    return FakeChatModel
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """
+    Install FakeChatModels built from the given fields as the analyzer's models:
+    fake_model(**fields) answers for every model, fake_model(name, **fields) for that one only
+    """
+    models = {}
+
+    def create(model="gpt-4o-mini"):
+        return models[model if model in models else None], [], ""
+
+    def install(name: str = None, **fields) -> FakeChatModel:
+        models[name] = FakeChatModel(**fields)
+        monkeypatch.setattr(main, "create_test_analyzer_agent", create)
+        return models[name]
+    return install
+
+
+@pytest.fixture(autouse=True)
+def in_memory_failure_index(monkeypatch):
+    """Keep analyses from reading or writing the on-disk index of past failures"""
+    monkeypatch.setattr(similar_failures, "_index", FailureIndex(path=None))
+
+
+# ============================================================================
+# SCREENSHOTS
+# ============================================================================
+
+def render_page(height: int = 720, width: int = 1280, seed: int = 7) -> np.ndarray:
+    """A results page: header bar, lines of anti-aliased 'glyphs' and a button"""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 250, dtype=np.uint8)
+    image[:56] = (24, 48, 96)
+    for y in range(96, height - 40, 28):
+        x = 40
+        while x < width - 200:
+            w = int(rng.integers(4, 9))
+            image[y:y + 12, x:x + w] = 40
+            # Soft glyph edges, as a text renderer draws them
+            image[y:y + 12, x - 1] = 150
+            image[y:y + 12, x + w] = 150
+            x += w + int(rng.integers(2, 5)) + (12 if rng.random() < 0.2 else 0)
+    image[200:236, 1100:1240] = (30, 110, 220)
+    image[214:222, 1130:1210] = 255
+    return image
+
+
+def blend_edges(image: np.ndarray, share: float = 0.3, seed: int = 1) -> np.ndarray:
+    """Blend a share of edge pixels with their right neighbour, like a different font rasterizer would"""
+    rng = np.random.default_rng(seed)
+    gray = image.astype(np.int16).mean(axis=2)
+    ys, xs = np.nonzero(np.abs(np.diff(gray, axis=1)) > 40)
+    keep = rng.random(len(ys)) < share
+    ys, xs = ys[keep], xs[keep]
+    alpha = rng.uniform(0.3, 0.7, (len(ys), 1))
+    noisy = image.copy()
+    noisy[ys, xs] = (image[ys, xs] * (1 - alpha) + image[ys, xs + 1] * alpha).astype(np.uint8)
+    return noisy
+
+
+@pytest.fixture(scope="session")
+def make_page():
+    """Factory for synthetic results pages, make_page(height=720, width=1280, seed=7)"""
+    return render_page
+
+
+@pytest.fixture(scope="session")
+def antialias():
+    """antialias(image, share=0.3, seed=1): image as another browser's rasterizer would draw it"""
+    return blend_edges
+
+
+@pytest.fixture(scope="session")
+def screenshot_error():
+    """The error Playwright reports for a failed screenshot comparison"""
+    return SCREENSHOT_ERROR
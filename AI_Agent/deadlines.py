@@ -0,0 +1,69 @@
+"""
+Run Deadlines
+A time limit for a whole analysis run, handed down to every LLM call: the
+rate_limiter scheduler drops calls that cannot start in time and does not
+retry past it, each HTTP request gets the remaining time (capped by the
+per-call timeout) as its timeout, and a streamed answer still running at the
+deadline is closed between chunks. Failures left without a model answer get
+the deterministic pattern analysis instead.
+
+Usage:
+    deadline = Deadline(seconds=600, per_call=60)
+    results = analyze_many(failures, deadline=deadline)
+
+Environment:
+    ANALYZER_DEADLINE_SECONDS       default run deadline for main.py (unset: none)
+    ANALYZER_CALL_TIMEOUT_SECONDS   default per-call timeout (unset: none)
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run deadline passed (or the run was cancelled) before the call finished"""
+
+
+class Deadline:
+    """Absolute point in time.monotonic() by which a run must finish; None means no limit"""
+
+    def __init__(self,
+                 seconds: Optional[float] = None,
+                 per_call: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.at = clock() + seconds if seconds is not None else None
+        self.per_call = per_call
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> "Deadline":
+        seconds = os.getenv("ANALYZER_DEADLINE_SECONDS")
+        per_call = os.getenv("ANALYZER_CALL_TIMEOUT_SECONDS")
+        return cls(float(seconds) if seconds else None, float(per_call) if per_call else None)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a limit"""
+        if self._cancelled.is_set():
+            return 0.0
+        return max(self.at - self.clock(), 0.0) if self.at is not None else None
+
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    def call_timeout(self) -> Optional[float]:
+        """Timeout for one LLM request: the per-call limit, cut to the time that is left"""
+        remaining = self.remaining()
+        if remaining is None:
+            return self.per_call
+        return min(remaining, self.per_call) if self.per_call is not None else remaining
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("analysis deadline reached")
+
+    def cancel(self):
+        """Expire now: in-flight streams stop at their next chunk, queued calls are dropped"""
+        self._cancelled.set()
@@ -0,0 +1,156 @@
+"""
+Tier-0 Deterministic Analyzer
+Builds a complete root cause analysis from ErrorPatternMatcher,
+SeverityClassifier and TestContextAnalyzer without calling the LLM, when the
+pattern match is strong enough to trust; ambiguous failures escalate
+"""
+
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from test_analyzer_tools import ErrorPatternMatcher, SeverityClassifier, TestContextAnalyzer
+
+# Labeled failures (error message, correct pattern) used to calibrate match
+# strength against real precision. Includes known-ambiguous messages so that
+# weak matches are measured, not assumed.
+CALIBRATION_FAILURES: List[Tuple[str, str]] = [
+    ("Timeout waiting for element '.crypto-tab-definitions' after 30000ms", "TIMEOUT_SELECTOR"),
+    ("Timeout waiting for element with selector '.crypto-tab'", "TIMEOUT_SELECTOR"),
+    ("locator.click: Timeout 30000ms exceeded while waiting for selector '#submit'", "TIMEOUT_SELECTOR"),
+    ("Element not found: selector '.status-row' after wait", "TIMEOUT_SELECTOR"),
+    ("Status 500: Internal Server Error from /api/crypto/results", "API_500"),
+    ("API Response validation failed: Status 500 from /api/crypto/results endpoint", "API_500"),
+    ("Internal server error 500 while loading backend results", "API_500"),
+    ("Request failed with status code 500 (backend unavailable)", "API_500"),
+    ("Error: expected response status 200 but received 500", "API_500"),
+    ("AssertionError: Expected 0 violations but found 9 accessibility issues", "ASSERTION_MISMATCH"),
+    ("expect(received).toEqual(expected): expected 'Bitcoin' but actual value was 'BTC'", "ASSERTION_MISMATCH"),
+    ("AssertionError: Dropdown ARIA role missing, expected 'combobox' but got undefined", "ASSERTION_MISMATCH"),
+    ("Response schema validation failed: unable to parse field 'price'", "API_VALIDATION"),
+    ("JSON parse error in response: Unexpected token < in JSON at position 0", "API_VALIDATION"),
+    ("TypeError: Cannot read property 'click' of null", "NULL_REFERENCE"),
+    ("TypeError: Cannot read properties of undefined (reading 'map')", "NULL_REFERENCE"),
+    ("Unhandled promise rejection: async operation did not await the callback", "ASYNC_PROMISE"),
+    ("Timeout 5000ms exceeded waiting for async data load", "ASYNC_PROMISE"),
+    ("page.goto: navigation to url interrupted by another redirect", "NAVIGATION"),
+    ("Expected URL to be /dashboard but page redirected to 404 page not found", "NAVIGATION"),
+    ("Navigation timeout of 30000 ms exceeded", "NAVIGATION"),
+    ("403 Forbidden: access denied for user role viewer", "PERMISSION"),
+    ("401 Unauthorized: token expired", "PERMISSION"),
+    ("Permission denied: 403 on /api/admin/users", "PERMISSION"),
+    ("Intermittent failure, sometimes passes: race condition in timing of table refresh", "FLAKINESS"),
+    ("Color contrast ratio 3.5:1 does not meet AA standard of 4.5:1", "UNKNOWN"),
+    ("WCAG violation: Dropdown component missing required ARIA role 'combobox'", "UNKNOWN"),
+]
+
+# Answer without the LLM only when matches this strong were right at least
+# this often on the calibration set
+TARGET_PRECISION = 0.9
+
+
+def calibrate(samples: List[Tuple[str, str]] = CALIBRATION_FAILURES,
+              target_precision: float = TARGET_PRECISION) -> Dict:
+    """
+    Measure how often pattern matches of each strength are right.
+
+    Returns {"threshold": lowest strength such that it and every stronger
+    bucket reach target_precision, "confidence": {strength: precision of
+    matches of that strength}}. Confidence is Laplace-smoothed, so a
+    handful of correct samples never reports certainty, and made
+    non-decreasing in strength. These are in-sample figures; the threshold
+    is checked on held-out failures in test_deterministic_analyzer.py.
+    """
+    buckets = defaultdict(list)
+    for error_message, label in samples:
+        pattern, strength = ErrorPatternMatcher.match_strength(error_message)
+        if strength > 0:
+            buckets[strength].append(pattern == label)
+
+    threshold = None
+    for strength in sorted(buckets, reverse=True):
+        hits = buckets[strength]
+        if sum(hits) / len(hits) < target_precision:
+            break
+        threshold = strength
+
+    confidence = {}
+    best = 0.0
+    for strength in sorted(buckets):
+        hits = buckets[strength]
+        best = max(best, (sum(hits) + 1) / (len(hits) + 2))
+        confidence[strength] = round(best, 3)
+    return {"threshold": threshold, "confidence": confidence}
+
+
+_calibration: Optional[Dict] = None
+
+
+def calibration() -> Dict:
+    """Calibration on the built-in labeled set, computed once per process"""
+    global _calibration
+    if _calibration is None:
+        _calibration = calibrate()
+    return _calibration
+
+
+def strength_threshold() -> Optional[int]:
+    """ANALYZER_TIER0_MIN_STRENGTH overrides the calibrated threshold"""
+    override = os.getenv("ANALYZER_TIER0_MIN_STRENGTH")
+    return int(override) if override else calibration()["threshold"]
+
+
+def match_confidence(strength: int) -> float:
+    """Calibrated probability that a match of this strength picked the right pattern"""
+    if strength <= 0:
+        return 0.0
+    table = calibration()["confidence"]
+    known = [s for s in table if s <= strength]
+    return table[max(known)] if known else min(table.values(), default=0.0)
+
+
+def local_severity(test_name: str, error_message: str) -> str:
+    """SeverityClassifier pre-pass, e.g. to order LLM calls before the model has answered"""
+    _, pattern_config = ErrorPatternMatcher.match_pattern(error_message)
+    category = TestContextAnalyzer.analyze_context(test_name).get("category", "Unknown")
+    return SeverityClassifier.classify(error_message, category, pattern_config["severity"])
+
+
+def analyze_deterministically(test_name: str, error_message: str,
+                              force: bool = False) -> Optional[Dict]:
+    """
+    Tier-0 analysis as RootCauseAnalysis fields, or None to escalate.
+
+    With force=True a result is always returned (used as the fallback when
+    the LLM is unavailable), carrying its honest, possibly low, confidence.
+    """
+    pattern_name, strength = ErrorPatternMatcher.match_strength(error_message)
+    threshold = strength_threshold()
+    if not force and (threshold is None or strength < threshold):
+        return None
+
+    _, pattern_config = ErrorPatternMatcher.match_pattern(error_message)
+    context = TestContextAnalyzer.analyze_context(test_name)
+    severity = local_severity(test_name, error_message)
+
+    root_causes = list(pattern_config.get("root_causes", ["Unrecognized failure - review the error manually"]))
+    recommended_actions = list(pattern_config["solutions"])
+    if TestContextAnalyzer.is_flaky_test(test_name):
+        root_causes.append(f"Known flaky test ({context['flakiness']:.0%} flakiness)")
+        recommended_actions += TestContextAnalyzer.suggest_stability_fixes(test_name)[1:]
+
+    affected_areas = [context["module"]] if context.get("module") not in (None, "Unclassified") else []
+    affected_areas += context.get("related_modules", [])
+
+    return {
+        "test_name": test_name,
+        "error_message": error_message,
+        "root_causes": root_causes,
+        "severity": severity,
+        "affected_areas": affected_areas,
+        "recommended_actions": recommended_actions,
+        "similar_issues": None,
+        "confidence_score": match_confidence(strength),
+        "pattern": pattern_name,
+        "match_strength": strength,
+    }
@@ -0,0 +1,362 @@
+"""
+Fake OpenAI Server
+Localhost stand-in for the chat completions endpoint that enforces its own
+requests/tokens-per-minute limits and answers 429 (with retry-after-ms and
+x-ratelimit-* headers) when they are exceeded, plus optional random 5xx.
+Also stubs the Files and Batch endpoints: a batch completes batch_delay
+seconds after it is created
+
+Prompt caching is simulated like the provider's: the longest prompt prefix
+(1024+ tokens, in 128-token steps) already seen is reported as
+usage.prompt_tokens_details.cached_tokens, and only uncached tokens pay the
+prefill_latency (seconds per 1000 tokens) before the first token
+
+Usage:
+    with FakeOpenAIServer(rpm=600, tpm=60_000) as server:
+        ChatOpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+
+Token accounting matches estimate_request_tokens(), which clients can use
+to predict exactly what the server will charge.
+"""
+
+import email.parser
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from rate_limiter import TokenBucket
+
+DEFAULT_ANALYSIS = {
+    "severity": "HIGH",
+    "confidence_score": 0.8,
+    "root_causes": ["Element did not render before the timeout"],
+    "affected_areas": ["Crypto Platform"],
+    "recommended_actions": ["Wait for the network to be idle before asserting"],
+}
+
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+
+def estimate_request_tokens(messages: List[Dict], max_tokens: Optional[int]) -> int:
+    """Tokens charged against TPM: ~4 characters per prompt token plus max_tokens"""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return chars // 4 + 1 + (max_tokens or 0)
+
+
+class FakeOpenAIApp:
+    """Request handling without a socket: rate limits, fault injection and canned answers"""
+
+    def __init__(self,
+                 rpm: float = 600,
+                 tpm: float = 600_000,
+                 burst_seconds: float = 1.0,
+                 error_rate: float = 0.0,
+                 latency: float = 0.0,
+                 seed: int = 0,
+                 analysis: Optional[Dict] = None,
+                 batch_delay: float = 0.0,
+                 prefill_latency: float = 0.0):
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.error_rate = error_rate
+        self.latency = latency
+        self.analysis = analysis or DEFAULT_ANALYSIS
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "rate_limited": 0, "server_errors": 0}
+        self.completed_at: List[float] = []
+        self.batch_delay = batch_delay
+        self.prefill_latency = prefill_latency
+        self._cached_prefixes = set()
+        self.files: Dict[str, Dict] = {}
+        self.batches: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        return {
+            "x-ratelimit-limit-requests": str(int(self.requests.rate * 60)),
+            "x-ratelimit-remaining-requests": str(max(int(self.requests.tokens), 0)),
+            "x-ratelimit-limit-tokens": str(int(self.tokens.rate * 60)),
+            "x-ratelimit-remaining-tokens": str(max(int(self.tokens.tokens), 0)),
+        }
+
+    def admit(self, cost: int) -> Tuple[int, Dict, Dict[str, str]]:
+        """Charge one request of `cost` tokens; returns (status, error body, headers)"""
+        with self._lock:
+            self.stats["requests"] += 1
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(cost))
+            if wait > 0:
+                self.stats["rate_limited"] += 1
+                kind = "requests" if self.requests.wait_time(1) > 0 else "tokens"
+                headers = self._rate_limit_headers()
+                headers["retry-after-ms"] = str(int(wait * 1000) + 1)
+                return 429, {"error": {
+                    "message": f"Rate limit reached for {kind}. Please try again in {wait * 1000:.0f}ms.",
+                    "type": kind, "code": "rate_limit_exceeded",
+                }}, headers
+            self.requests.take(1)
+            self.tokens.take(cost)
+            headers = self._rate_limit_headers()
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats["server_errors"] += 1
+                return 500, {"error": {"message": "The server had an error", "type": "server_error"}}, headers
+            return 200, {}, headers
+
+    def cached_prompt_tokens(self, messages: List[Dict]) -> int:
+        """Tokens of the longest already-seen prompt prefix (remembering this prompt's prefixes)"""
+        text = "".join(f"{m.get('role')}\n{m.get('content') or ''}\n" for m in messages)
+        step = CACHE_STEP_TOKENS * 4
+        digest, keys = hashlib.sha256(), []
+        digest.update(text[:CACHE_MIN_TOKENS * 4 - step].encode())
+        for end in range(CACHE_MIN_TOKENS * 4, len(text) + 1, step):
+            digest.update(text[end - step:end].encode())
+            keys.append((end, digest.copy().digest()))
+        with self._lock:
+            cached = max((end for end, key in keys if key in self._cached_prefixes), default=0)
+            self._cached_prefixes.update(key for _, key in keys)
+        return cached // 4
+
+    def completion(self, body: Dict, cost: int, cached: int = 0) -> Dict:
+        content = json.dumps(self.analysis)
+        with self._lock:
+            self.stats["completed"] += 1
+            self.completed_at.append(time.monotonic())
+        return {
+            "id": f"chatcmpl-fake{self.stats['completed']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": cost - (body.get("max_tokens") or 0),
+                      "prompt_tokens_details": {"cached_tokens": cached},
+                      "completion_tokens": len(content) // 4,
+                      "total_tokens": cost - (body.get("max_tokens") or 0) + len(content) // 4},
+        }
+
+    # ------------------------------------------------------------------
+    # Files and Batch API
+    # ------------------------------------------------------------------
+
+    def upload_file(self, data: bytes, filename: str, purpose: str) -> Dict:
+        with self._lock:
+            file_id = f"file-fake{next(self._ids)}"
+            self.files[file_id] = {"id": file_id, "object": "file", "bytes": len(data), "filename": filename,
+                                   "purpose": purpose, "created_at": int(time.time()), "content": data}
+        return self.file_object(file_id)
+
+    def file_object(self, file_id: str) -> Optional[Dict]:
+        meta = self.files.get(file_id)
+        return {k: v for k, v in meta.items() if k != "content"} if meta else None
+
+    def create_batch(self, body: Dict) -> Tuple[int, Dict]:
+        if body.get("input_file_id") not in self.files:
+            return 400, {"error": {"message": "input_file_id not found", "type": "invalid_request_error"}}
+        with self._lock:
+            batch_id = f"batch_fake{next(self._ids)}"
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+                "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window"),
+                "status": "validating", "output_file_id": None, "error_file_id": None,
+                "created_at": time.time(), "completed_at": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            return 200, dict(self.batches[batch_id])
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """Batch status; the first retrieval after batch_delay runs every request in it"""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        if batch["status"] in ("validating", "in_progress"):
+            if time.time() - batch["created_at"] >= self.batch_delay:
+                self._run_batch(batch)
+            else:
+                batch["status"] = "in_progress"
+        return dict(batch)
+
+    def _run_batch(self, batch: Dict):
+        lines = self.files[batch["input_file_id"]]["content"].decode().splitlines()
+        output, errors = [], []
+        for line in filter(None, lines):
+            request = json.loads(line)
+            body = request.get("body", {})
+            record = {"id": f"batch_req_{next(self._ids)}", "custom_id": request.get("custom_id")}
+            if self.error_rate and self._random.random() < self.error_rate:
+                record["response"] = {"status_code": 500, "body": {"error": {"message": "The server had an error"}}}
+                record["error"] = None
+                errors.append(record)
+                continue
+            cost = estimate_request_tokens(body.get("messages", []), body.get("max_tokens"))
+            cached = self.cached_prompt_tokens(body.get("messages", []))
+            record["response"] = {"status_code": 200, "request_id": record["id"],
+                                  "body": self.completion(body, cost, cached)}
+            record["error"] = None
+            output.append(record)
+
+        def as_file(records: List[Dict], name: str) -> Optional[str]:
+            if not records:
+                return None
+            data = "".join(json.dumps(r) + "\n" for r in records).encode()
+            return self.upload_file(data, name, "batch_output")["id"]
+
+        batch.update(
+            status="completed", completed_at=time.time(),
+            output_file_id=as_file(output, f"{batch['id']}_output.jsonl"),
+            error_file_id=as_file(errors, f"{batch['id']}_error.jsonl"),
+            request_counts={"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)},
+        )
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOpenAI/1.0"
+
+    def _send(self, status: int, payload: Dict, headers: Dict[str, str]):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, completion: Dict, headers: Dict[str, str], include_usage: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        content = completion["choices"][0]["message"]["content"]
+        base = {k: completion[k] for k in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+        chunks = [{"index": 0, "delta": {"role": "assistant", "content": content[i:i + 24]},
+                   "finish_reason": None} for i in range(0, len(content), 24)]
+        chunks.append({"index": 0, "delta": {}, "finish_reason": "stop"})
+        events = [dict(base, choices=[choice]) for choice in chunks]
+        if include_usage:
+            events.append(dict(base, choices=[], usage=completion["usage"]))
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _not_found(self):
+        self._send(404, {"error": {"message": f"Unknown path {self.path}"}}, {})
+
+    def _upload(self, raw: bytes):
+        # multipart/form-data with a "file" part and a "purpose" field
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+        )
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+        file_part = fields["file"]
+        self._send(200, self.server.app.upload_file(
+            file_part.get_payload(decode=True), file_part.get_filename() or "upload.jsonl",
+            fields["purpose"].get_payload(decode=True).decode() if "purpose" in fields else "batch",
+        ), {})
+
+    def do_GET(self):
+        app: FakeOpenAIApp = self.server.app
+        parts = self.path.rstrip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "batches":
+            batch = app.get_batch(parts[-1])
+            return self._send(200, batch, {}) if batch else self._not_found()
+        if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content" and parts[-2] in app.files:
+            data = app.files[parts[-2]]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._not_found()
+
+    def do_POST(self):
+        app: FakeOpenAIApp = self.server.app
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        path = self.path.rstrip("/")
+        if path.endswith("/files"):
+            return self._upload(raw)
+        body = json.loads(raw or b"{}")
+        if path.endswith("/batches"):
+            status, payload = app.create_batch(body)
+            return self._send(status, payload, {})
+        if not path.endswith("/chat/completions"):
+            return self._not_found()
+
+        cost = estimate_request_tokens(body.get("messages", []), body.get("max_tokens"))
+        status, error, headers = app.admit(cost)
+        if status != 200:
+            self._send(status, error, headers)
+            return
+        cached = app.cached_prompt_tokens(body.get("messages", []))
+        prefill = app.prefill_latency * (cost - (body.get("max_tokens") or 0) - cached) / 1000
+        if app.latency or prefill:
+            time.sleep(app.latency + prefill)
+        completion = app.completion(body, cost, cached)
+        if body.get("stream"):
+            self._stream(completion, headers, (body.get("stream_options") or {}).get("include_usage", False))
+        else:
+            self._send(200, completion, headers)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer:
+    """Runs a FakeOpenAIApp on a localhost port in a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **app_options):
+        self.app = FakeOpenAIApp(**app_options)
+        self._httpd = ThreadingHTTPServer((host, port), _FakeOpenAIHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.app = self.app
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = FakeOpenAIServer(
+        port=int(os.getenv("FAKE_OPENAI_PORT", "8089")),
+        rpm=float(os.getenv("FAKE_OPENAI_RPM", "60")),
+        tpm=float(os.getenv("FAKE_OPENAI_TPM", "40000")),
+    )
+    print(f"✓ Fake OpenAI listening on {server.base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,71 +1,49 @@
 """
 Test Result Analyzer - Main Entry Point
 Uses OpenAI API with LangChain for intelligent test failure analysis
+
+LangChain, pydantic, NumPy and the analysis pipeline modules are imported
+inside the functions that use them, so the pattern tools and the CLI's
+--patterns-only mode start without them (see test_import_time.py):
+
+    python main.py --patterns-only --test crypto.results.spec.ts "Timeout waiting for '.crypto-tab'"
 """
 
+from __future__ import annotations
+
 import os
 import sys
 import json
-from typing import Optional
-from dotenv import load_dotenv
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from analysis_schema import RootCauseAnalysis
+    from deadlines import Deadline
 
-# Load environment variables
-load_dotenv()
 
-# Try to import dependencies, with helpful error messages
-try:
-    from langchain_openai import ChatOpenAI
-    from langchain.agents import Tool, initialize_agent, AgentType
-    from langchain.chains import LLMChain
-    from langchain.prompts import PromptTemplate
-    from pydantic import BaseModel, Field
-except ImportError as e:
-    print("❌ Missing dependencies. Install with:")
-    print("   pip install -r requirements.txt")
-    sys.exit(1)
+def _load_llm_stack():
+    """Import LangChain on first use, with a helpful message when it is missing"""
+    try:
+        from langchain_openai import ChatOpenAI
+        from langchain_core.tools import StructuredTool
+    except ImportError:
+        print("❌ Missing dependencies. Install with:")
+        print("   pip install -r requirements.txt")
+        raise
+    return ChatOpenAI, StructuredTool
 
 
 # ============================================================================
 # 1. STRUCTURED OUTPUT SCHEMAS
 # ============================================================================
 
-class RootCauseAnalysis(BaseModel):
-    """Structured output for root cause analysis"""
-    
-    test_name: str = Field(..., description="Name of the failed test")
-    error_message: str = Field(..., description="Error message from test")
-    
-    root_causes: list[str] = Field(
-        ..., 
-        description="List of likely root causes (primary to secondary)"
-    )
-    
-    severity: str = Field(
-        ..., 
-        description="Severity level: CRITICAL, HIGH, MEDIUM, LOW"
-    )
-    
-    affected_areas: list[str] = Field(
-        ..., 
-        description="Code areas/modules likely affected"
-    )
-    
-    recommended_actions: list[str] = Field(
-        ..., 
-        description="Step-by-step debugging suggestions"
-    )
-    
-    similar_issues: Optional[list[str]] = Field(
-        default=None,
-        description="References to similar past issues if applicable"
-    )
-    
-    confidence_score: float = Field(
-        ..., 
-        ge=0.0, 
-        le=1.0,
-        description="Confidence in root cause analysis (0-1)"
-    )
+# RootCauseAnalysis lives in analysis_schema and is loaded on first use
+# (see __getattr__ at the end of this module)
+
+# Tools-mode answers arrive as a call of this tool (analysis_schema.AnalysisAnswer)
+ANSWER_TOOL = "AnalysisAnswer"
 
 
 # ============================================================================
@@ -192,166 +170,787 @@ def suggest_debugging_steps(test_type: str, error_pattern: str) -> list[str]:
     return debugging_guides.get(key, debugging_guides["DEFAULT"])
 
 
+def precompute_tool_results(test_name: str, error_message: str) -> List[Dict]:
+    """
+    Run the deterministic tools for a failure up front, through the shared
+    tool cache, so their results are inlined into the first prompt instead of
+    costing the model a round trip to request them
+    """
+    from tool_runtime import get_tool_cache
+
+    cache = get_tool_cache()
+    calls = []
+
+    def run(name: str, func: Callable, args: Dict):
+        result, _ = cache.call(name, func, args)
+        calls.append({"name": name, "args": args, "result": result})
+        return result
+
+    patterns = run("analyze_error_pattern", analyze_error_pattern, {"error_message": error_message})
+    context = run("get_test_context", get_test_context, {"test_name": test_name})
+    run("suggest_debugging_steps", suggest_debugging_steps,
+        {"test_type": context["category"].upper(), "error_pattern": patterns["error_patterns"][0]})
+    return calls
+
+
 # ============================================================================
 # 3. LANGCHAIN AGENT SETUP
 # ============================================================================
 
-def create_test_analyzer_agent():
+# Cap on the analysis length; also what each call reserves against the TPM limit
+MAX_OUTPUT_TOKENS = 800
+
+# Prompts are laid out as a fixed prefix (system prompt, output format,
+# pattern library, examples) followed by the per-failure suffix, so the
+# provider's prompt cache (exact prefix match, 1024+ tokens) covers the
+# prefix on every call after the first. Nothing failure-specific, timestamped
+# or randomly ordered may go into the prefix.
+SYSTEM_PROMPT = """You are an expert QA Test Analyzer AI Agent. Your job is to analyze failed test results
+and provide intelligent root cause suggestions.
+
+When analyzing a test failure:
+1. The TOOL RESULTS section already holds analyze_error_pattern, get_test_context and
+   suggest_debugging_steps for this failure; do not request them again
+2. Call a tool only for information that is not there (e.g. the context of a related
+   test, or debugging steps for a second error pattern), all such calls in one turn
+3. Otherwise answer right away
+
+Provide analysis in a structured format with:
+- Root causes (primary to secondary, most likely first)
+- Severity level (CRITICAL, HIGH, MEDIUM, LOW)
+- Affected areas (code modules/functions)
+- Recommended debugging actions
+- Confidence score (0-1)
+
+Be specific, actionable, and reference the actual error and test type."""
+
+ANALYSIS_FORMAT = """Provide analysis as a single JSON object with these fields, in this order:
+{
+    "severity": "HIGH|CRITICAL|MEDIUM|LOW",
+    "confidence_score": 0.85,
+    "root_causes": ["cause1", "cause2", ...],
+    "affected_areas": ["area1", "area2"],
+    "recommended_actions": ["step1", "step2", ...]
+}"""
+
+FEW_SHOT_EXAMPLES = [
+    ("crypto.results.spec.ts",
+     "Timeout: Timeout waiting for element '.crypto-tab-definitions' after 30000ms",
+     {"severity": "HIGH", "confidence_score": 0.8,
+      "root_causes": ["Tab content renders after an async request that can exceed the timeout",
+                      "Selector '.crypto-tab-definitions' no longer matches after a UI change"],
+      "affected_areas": ["Crypto Platform results tabs"],
+      "recommended_actions": ["Wait for the results request with page.waitForResponse() before the tab",
+                              "Confirm the selector in DevTools against the current build",
+                              "Compare the trace timeline with a passing run"]}),
+    ("har.spec.ts",
+     "Status 500: Internal Server Error from /api/crypto/results",
+     {"severity": "CRITICAL", "confidence_score": 0.85,
+      "root_causes": ["Unhandled exception in the /api/crypto/results handler",
+                      "Database connection unavailable in the test environment"],
+      "affected_areas": ["Crypto results API", "Backend database access"],
+      "recommended_actions": ["Read the server log for the request's stack trace",
+                              "Check database health for the test environment",
+                              "Replay the recorded HAR request against a local backend"]}),
+    ("accessibility.spec.ts",
+     "Color contrast ratio 3.5:1 does not meet AA standard of 4.5:1",
+     {"severity": "MEDIUM", "confidence_score": 0.9,
+      "root_causes": ["Text color on the status table header is too light for its background"],
+      "affected_areas": ["Status tab table header styles"],
+      "recommended_actions": ["Darken the header text or lighten its background to reach 4.5:1",
+                              "Re-run axe on the status tab after the style change"]}),
+]
+
+_analysis_prefix: Optional[str] = None
+
+
+def analysis_prefix() -> str:
     """
-    Create and configure the Test Result Analyzer agent
+    The fixed part of every analysis prompt: system prompt, output format,
+    pattern library and examples. Built once, so it is byte-identical per process
     """
+    global _analysis_prefix
+    if _analysis_prefix is None:
+        from test_analyzer_tools import ErrorPatternMatcher
+
+        patterns = "\n".join(
+            f"- {name} ({config['severity']}): keywords {', '.join(config['keywords'])}\n"
+            f"  causes: {'; '.join(config.get('root_causes', []))}\n"
+            f"  fixes: {'; '.join(config['solutions'])}"
+            for name, config in ErrorPatternMatcher.PATTERNS.items()
+        )
+        examples = "\n\n".join(
+            f"TEST NAME: {test_name}\nERROR MESSAGE: {error}\nANALYSIS: {json.dumps(answer)}"
+            for test_name, error, answer in FEW_SHOT_EXAMPLES
+        )
+        _analysis_prefix = (f"{SYSTEM_PROMPT}\n\n{ANALYSIS_FORMAT}\n\n"
+                            f"KNOWN ERROR PATTERNS:\n{patterns}\n\nEXAMPLE ANALYSES:\n{examples}")
+    return _analysis_prefix
+
+# Model turns per analysis: tool-calling turns plus the answer. The last turn
+# is sent without tools, so the model has to answer by then
+MAX_MODEL_TURNS = int(os.getenv("ANALYZER_MAX_TURNS", "3"))
+
+
+# One agent per model for the whole process: its HTTP connection pool stays
+# warm across failures (analyze_many workers, analyzer_service)
+_agents: Dict[str, tuple] = {}
+_agents_lock = threading.Lock()
+
+
+def create_test_analyzer_agent(model: str = "gpt-4o-mini"):
+    """
+    The Test Result Analyzer agent for a model, created on first use
+    (model_router decides which model each failure gets)
+    """
+    with _agents_lock:
+        if model not in _agents:
+            _agents[model] = _build_test_analyzer_agent(model)
+        return _agents[model]
+
+
+def _build_test_analyzer_agent(model: str):
+    """Create and configure the Test Result Analyzer agent"""
     
+    from dotenv import load_dotenv
+    load_dotenv()
+    ChatOpenAI, StructuredTool = _load_llm_stack()
+
     # Initialize OpenAI LLM
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("❌ OPENAI_API_KEY not found. Set it in .env or environment.")
     
     llm = ChatOpenAI(
-        model="gpt-4o-mini",  # Use gpt-4o-mini for faster responses
+        model=model,
         temperature=0.2,  # Low temp for consistent analysis
-        api_key=api_key
+        api_key=api_key,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        max_retries=0  # 429/5xx retries are paced by the rate_limiter scheduler
     )
     
-    # Define tools for the agent
+    # Define tools for the agent (executed by tool_runtime.ToolRunner)
     tools = [
-        Tool(
-            name="analyze_error_pattern",
+        StructuredTool.from_function(
             func=analyze_error_pattern,
+            name="analyze_error_pattern",
             description="Analyzes error message to detect pattern types (TIMEOUT, SELECTOR, etc.)"
         ),
-        Tool(
-            name="get_test_context",
+        StructuredTool.from_function(
             func=get_test_context,
+            name="get_test_context",
             description="Retrieves context about a test including category, module, and history"
         ),
-        Tool(
+        StructuredTool.from_function(
+            func=suggest_debugging_steps,
             name="suggest_debugging_steps",
-            func=lambda test_type, error_pattern: json.dumps(
-                suggest_debugging_steps(test_type, error_pattern)
-            ),
-            description="Suggests debugging steps based on error type and test category"
+            description="Suggests debugging steps based on error type (test_type: FUNCTIONAL, API, "
+                        "ACCESSIBILITY, ...) and error pattern (TIMEOUT, SELECTOR, ...)"
         ),
     ]
     
-    # System prompt for the agent
-    system_prompt = """You are an expert QA Test Analyzer AI Agent. Your job is to analyze failed test results 
-and provide intelligent root cause suggestions.
-
-When analyzing a test failure:
-1. First, use analyze_error_pattern tool to categorize the error
-2. Then, use get_test_context tool to understand the test
-3. Finally, use suggest_debugging_steps tool to get recommendations
-
-Provide analysis in a structured format with:
-- Root causes (primary to secondary, most likely first)
-- Severity level (CRITICAL, HIGH, MEDIUM, LOW)
-- Affected areas (code modules/functions)
-- Recommended debugging actions
-- Confidence score (0-1)
-
-Be specific, actionable, and reference the actual error and test type."""
-    
-    return llm, tools, system_prompt
+    # Sent as the system message: byte-identical for every failure, so the
+    # provider can serve it from its prompt cache
+    return llm, tools, analysis_prefix()
 
 
 # ============================================================================
 # 4. ANALYSIS ENGINE
 # ============================================================================
 
-def analyze_test_failure(
+def output_mode() -> str:
+    """
+    "json" uses the provider's JSON mode; "tools" forces an AnalysisAnswer tool call.
+    Read on use, so ANALYZER_OUTPUT_MODE from .env (loaded with the LLM) applies
+    """
+    return os.getenv("ANALYZER_OUTPUT_MODE", "json")
+
+
+def bind_structured_output(llm, mode: Optional[str] = None, tools: Optional[List] = None):
+    """
+    Bind the LLM to emit exactly one JSON analysis object, with token usage in
+    the stream. With tools, the model may call them instead of answering
+    """
+    from analysis_schema import AnalysisAnswer
+    mode = mode or output_mode()
+    stream_options = {"include_usage": True}
+    if mode == "tools":
+        if tools:
+            return llm.bind_tools([*tools, AnalysisAnswer], tool_choice="required",
+                                  stream_options=stream_options)
+        return llm.bind_tools([AnalysisAnswer], tool_choice=ANSWER_TOOL, stream_options=stream_options)
+    if tools:
+        return llm.bind_tools(tools, response_format={"type": "json_object"}, stream_options=stream_options)
+    return llm.bind(response_format={"type": "json_object"}, stream_options=stream_options)
+
+
+def _chunk_text(chunk, call_names: Dict[int, str]) -> str:
+    """
+    JSON analysis text carried by a streamed chunk: AnalysisAnswer tool-call
+    arguments or message content. call_names tracks which tool each streamed
+    call index belongs to (only a call's first chunk carries its name)
+    """
+    tool_chunks = getattr(chunk, "tool_call_chunks", None)
+    if tool_chunks:
+        text = ""
+        for c in tool_chunks:
+            if c.get("name"):
+                call_names[c.get("index")] = c["name"]
+            if call_names.get(c.get("index")) == ANSWER_TOOL:
+                text += c.get("args") or ""
+        return text
+    return chunk.content if isinstance(chunk.content, str) else ""
+
+
+def _format_tool_call(name: str, args: Dict) -> str:
+    """name(arg=value, ...) with long string arguments shortened"""
+    shown = ", ".join(
+        f"{key}={json.dumps(value[:60] + '...' if isinstance(value, str) and len(value) > 60 else value)}"
+        for key, value in args.items()
+    )
+    return f"{name}({shown})"
+
+
+def _token_usage(response) -> dict:
+    """
+    Input/output/cached token counts from an LLM response, when the provider
+    reports them: cached tokens come from usage_metadata's input_token_details
+    (newer LangChain) or the raw prompt_tokens_details of non-streamed calls
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    cached = ((usage.get("input_token_details") or {}).get("cache_read")
+              or (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0))
+    return {
+        "input": usage.get("input_tokens", token_usage.get("prompt_tokens", 0)),
+        "output": usage.get("output_tokens", token_usage.get("completion_tokens", 0)),
+        "cached": cached or 0,
+    }
+
+
+def _local_analysis(fields: dict, on_field: Optional[Callable[[str, Any], None]] = None) -> RootCauseAnalysis:
+    """Build a RootCauseAnalysis from tier-0 fields, reporting them like a streamed answer"""
+    from analysis_schema import RootCauseAnalysis
+    result = RootCauseAnalysis(**{k: v for k, v in fields.items() if k in RootCauseAnalysis.model_fields})
+    if on_field:
+        for name in ("severity", "confidence_score", "root_causes", "affected_areas",
+                     "recommended_actions", "similar_issues"):
+            on_field(name, getattr(result, name))
+    return result
+
+
+def build_analysis_prompt(
     test_name: str,
     error_message: str,
-    test_output: Optional[str] = None
-) -> RootCauseAnalysis:
+    test_output: Optional[str] = None,
+    neighbors: Optional[List[Dict]] = None,
+    token_budget: Optional[int] = None,
+    tool_results: Optional[List[Dict]] = None
+):
     """
-    Main analysis function using LangChain agent
+    Per-failure part of the analysis prompt, sent after analysis_prefix(), and
+    the report of how its details were trimmed (token_budget defaults to
+    prompt_builder.DEFAULT_TOKEN_BUDGET). tool_results from
+    precompute_tool_results() are inlined, so the model need not call them
     """
-    
-    try:
-        llm, tools, system_prompt = create_test_analyzer_agent()
-        
-        # Create analysis prompt
-        analysis_prompt = f"""
-Analyze this test failure and provide root cause suggestions:
+    from prompt_builder import DEFAULT_TOKEN_BUDGET, build_failure_details
 
-TEST NAME: {test_name}
-ERROR MESSAGE: {error_message}
-TEST OUTPUT: {test_output if test_output else "No additional output"}
+    prompt_error, prompt_output, budget = build_failure_details(
+        error_message, test_output, budget_tokens=token_budget or DEFAULT_TOKEN_BUDGET
+    )
+    known_fixes = "\n".join(
+        f"- {n['test_name']}: {n['error_message'][:200]}\n"
+        f"  cause: {n.get('root_cause') or 'unknown'}\n  fix: {n.get('fix') or 'unknown'}"
+        for n in neighbors or []
+    )
+    known_fixes = (f"\nSIMILAR PAST FAILURES (reuse their fixes if they apply):\n{known_fixes}\n"
+                   if known_fixes else "")
+    tool_section = "\n".join(
+        f"- {_format_tool_call(call['name'], call['args'])} -> {json.dumps(call['result'])}"
+        for call in tool_results or []
+    )
+    tool_section = (f"\nTOOL RESULTS (already run for this failure):\n{tool_section}\n"
+                    if tool_section else "")
+    analysis_prompt = f"""Analyze this test failure and provide root cause suggestions:
 
-Provide analysis as JSON matching this structure:
-{{
-    "test_name": "...",
-    "error_message": "...",
-    "root_causes": ["cause1", "cause2", ...],
-    "severity": "HIGH|CRITICAL|MEDIUM|LOW",
-    "affected_areas": ["area1", "area2"],
-    "recommended_actions": ["step1", "step2", ...],
-    "similar_issues": [...],
-    "confidence_score": 0.85
-}}
+TEST NAME: {test_name}
+ERROR MESSAGE: {prompt_error}
+TEST OUTPUT: {prompt_output}
+{tool_section}{known_fixes}
+Answer with the JSON analysis object described above.
 """
-        
-        # Run LLM analysis
-        response = llm.invoke(analysis_prompt)
-        
-        # Parse response
-        response_text = response.content
-        
-        # Extract JSON from response
-        try:
-            # Try to find JSON in response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                analysis_dict = json.loads(json_str)
-            else:
-                analysis_dict = {
-                    "test_name": test_name,
-                    "error_message": error_message,
-                    "root_causes": ["Unable to parse AI response - check error details"],
-                    "severity": "MEDIUM",
-                    "affected_areas": [],
-                    "recommended_actions": ["Review error message manually"],
-                    "confidence_score": 0.3
-                }
-        except json.JSONDecodeError:
+    return analysis_prompt, budget
+
+
+class _AttemptCallbacks:
+    """
+    on_field/on_item shared by the attempts of one scheduled model call. A
+    retried attempt streams the answer again from the start: events the
+    caller already got are dropped while the retry repeats them, and if it
+    diverges (or ends short) the caller gets on_field("stream_reset",
+    {"attempt"}) followed by all of this attempt's events so far.
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None,
+                 on_item: Optional[Callable[[str, int, Any], None]] = None):
+        self._on_field, self._on_item = on_field, on_item
+        self._delivered: List[tuple] = []
+        self._events: List[tuple] = []
+        self.attempts = 0
+
+    def start_attempt(self):
+        self.attempts += 1
+        self._events = []
+
+    def on_field(self, name: str, value):
+        self._emit(("field", name, value))
+
+    def on_item(self, name: str, index: int, value):
+        self._emit(("item", name, index, value))
+
+    def _deliver(self, event: tuple):
+        self._delivered.append(event)
+        if event[0] == "field" and self._on_field:
+            self._on_field(*event[1:])
+        elif event[0] == "item" and self._on_item:
+            self._on_item(*event[1:])
+
+    def _reset(self):
+        if self._on_field:
+            self._on_field("stream_reset", {"attempt": self.attempts})
+        self._delivered = []
+        for event in self._events:
+            self._deliver(event)
+
+    def _emit(self, event: tuple):
+        self._events.append(event)
+        position = len(self._events) - 1
+        if position >= len(self._delivered):
+            self._deliver(event)
+        elif self._delivered[position] != event:
+            self._reset()
+
+    def finish(self):
+        """The last attempt completed; drop whatever an earlier one delivered beyond it"""
+        if len(self._events) < len(self._delivered):
+            self._reset()
+
+
+def _stream_turn(
+    structured_llm,
+    messages: List,
+    model_name: str,
+    turn: int,
+    severity_hint: str,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    on_item: Optional[Callable[[str, int, Any], None]] = None,
+    deadline: Optional[Deadline] = None
+):
+    """
+    One model turn, streamed through the shared scheduler: paced to the
+    RPM/TPM limits, most severe failures first, 429/5xx retried with backoff.
+    Returns (response, parser, token usage with the time to first token).
+    A retried attempt does not repeat on_field/on_item events (see
+    _AttemptCallbacks).
+
+    With a deadline, each attempt's HTTP timeout is deadline.call_timeout()
+    and the stream is closed (DeadlineExceeded) at the first chunk after it.
+    """
+    from analysis_schema import RootCauseAnalysis
+    from analyzer_telemetry import RATIO_BUCKETS, get_telemetry
+    from deadlines import DeadlineExceeded
+    from prompt_builder import default_counter
+    from rate_limiter import get_scheduler
+    from structured_output import IncrementalJSONParser
+
+    telemetry = get_telemetry()
+    with telemetry.span("llm.invoke", model=model_name, output_mode=output_mode(),
+                        priority=severity_hint, turn=turn) as span:
+        submitted_ns = time.perf_counter_ns()
+        callbacks = _AttemptCallbacks(on_field, on_item)
+
+        def stream_analysis():
+            # Runs on a scheduler thread; each attempt starts with a fresh parser
+            started_ns = time.perf_counter_ns()
+            span.set_attribute("queued_ms", (started_ns - submitted_ns) / 1e6)
+            callbacks.start_attempt()
+            parser = IncrementalJSONParser(RootCauseAnalysis, on_field=callbacks.on_field, on_item=callbacks.on_item)
+            response, call_names = None, {}
+            call_llm = structured_llm
+            if deadline is not None:
+                deadline.check()
+                if deadline.call_timeout() is not None:
+                    call_llm = structured_llm.bind(timeout=deadline.call_timeout())
+            for chunk in call_llm.stream(messages):
+                if deadline is not None and deadline.expired():
+                    # Leaving the loop closes the stream and its HTTP connection
+                    raise DeadlineExceeded("analysis deadline reached while streaming")
+                response = chunk if response is None else response + chunk
+                if "first_token_ms" not in span.attributes and (chunk.content or getattr(chunk, "tool_call_chunks", None)):
+                    span.set_attribute("first_token_ms", (time.perf_counter_ns() - started_ns) / 1e6)
+                if parser.feed(_chunk_text(chunk, call_names)) and "first_field_ms" not in span.attributes:
+                    span.set_attribute("first_field_ms", (time.perf_counter_ns() - started_ns) / 1e6)
+            return response, parser
+
+        prompt_tokens = sum(default_counter().count(str(m.content)) for m in messages)
+        response, parser = get_scheduler().run(
+            stream_analysis, tokens=prompt_tokens + MAX_OUTPUT_TOKENS, severity=severity_hint, deadline=deadline,
+        )
+        callbacks.finish()
+        span.set_attribute("attempts", callbacks.attempts)
+        tokens = _token_usage(response)
+        tokens["first_token_s"] = span.attributes.get("first_token_ms", 0.0) / 1000
+        span.set_attribute("tokens_in", tokens["input"])
+        span.set_attribute("tokens_out", tokens["output"])
+        span.set_attribute("tokens_cached", tokens["cached"])
+        span.set_attribute("cached_ratio", tokens["cached"] / tokens["input"] if tokens["input"] else 0.0)
+    telemetry.incr("analyzer_llm_calls_total")
+    telemetry.observe("analyzer_llm_first_token_seconds", tokens["first_token_s"], model=model_name)
+    if tokens["input"]:
+        telemetry.observe("analyzer_llm_cached_ratio", tokens["cached"] / tokens["input"], RATIO_BUCKETS,
+                          model=model_name)
+    telemetry.incr("analyzer_llm_tokens_total", tokens["input"], direction="input")
+    telemetry.incr("analyzer_llm_tokens_total", tokens["output"], direction="output")
+    if tokens["cached"]:
+        telemetry.incr("analyzer_cache_hits_total", tokens["cached"], cache="prompt_tokens")
+    return response, parser, tokens
+
+
+def _stream_model_analysis(
+    llm,
+    analysis_prompt: str,
+    severity_hint: str,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    on_item: Optional[Callable[[str, int, Any], None]] = None,
+    tools: Optional[List] = None,
+    system_prompt: Optional[str] = None,
+    max_turns: int = MAX_MODEL_TURNS,
+    deadline: Optional[Deadline] = None
+):
+    """
+    Run one model's analysis as a tool-calling loop, validating each answer
+    field as soon as it is complete.
+
+    Tool calls requested in a turn run concurrently and memoized (see
+    tool_runtime), then the model continues with their results; the last turn
+    is sent without tools. Returns (fields, parse fallback reason or None,
+    token usage summed over turns with the first turn's time to first token,
+    number of model turns).
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+
+    from analyzer_telemetry import COUNT_BUCKETS, get_telemetry
+    from tool_runtime import ToolRunner
+
+    telemetry = get_telemetry()
+    model_name = getattr(llm, "model_name", "unknown")
+    runner = ToolRunner({tool.name: tool.func for tool in tools}) if tools else None
+    messages = [SystemMessage(content=system_prompt)] if system_prompt else []
+    messages.append(HumanMessage(content=analysis_prompt))
+    tokens = {"input": 0, "output": 0, "cached": 0, "first_token_s": 0.0}
+
+    for turn in range(1, max_turns + 1):
+        turn_tools = tools if runner and turn < max_turns else None
+        structured_llm = bind_structured_output(llm, tools=turn_tools)
+        response, parser, turn_tokens = _stream_turn(
+            structured_llm, messages, model_name, turn, severity_hint, on_field, on_item, deadline
+        )
+        for key in ("input", "output", "cached"):
+            tokens[key] += turn_tokens[key]
+        if turn == 1:
+            tokens["first_token_s"] = turn_tokens["first_token_s"]
+        tool_calls = [call for call in getattr(response, "tool_calls", None) or []
+                      if call["name"] != ANSWER_TOOL] if turn_tools else []
+        if parser.started or not tool_calls:
+            break
+        with telemetry.span("tools", turn=turn, calls=len(tool_calls)):
+            results = runner.run(tool_calls)
+        messages.append(response)
+        messages.extend(ToolMessage(**result) for result in results)
+    telemetry.observe("analyzer_model_turns", turn, COUNT_BUCKETS, model=model_name)
+
+    # Fields were parsed while streaming; only classify what went wrong, if anything
+    with telemetry.span("extract_json", response_chars=len(parser.text)) as span:
+        fallback = None
+        analysis_dict = dict(parser.fields)
+        if not parser.started:
+            fallback = "no_json"
             analysis_dict = {
-                "test_name": test_name,
-                "error_message": error_message,
-                "root_causes": ["Parse error - using pattern analysis"],
+                "root_causes": ["Unable to parse AI response - check error details"],
                 "severity": "MEDIUM",
                 "affected_areas": [],
-                "recommended_actions": ["Check test logs manually"],
-                "confidence_score": 0.4
+                "recommended_actions": ["Review error message manually"],
+                "confidence_score": 0.3
             }
-        
-        # Create structured result
-        result = RootCauseAnalysis(
-            test_name=analysis_dict.get("test_name", test_name),
-            error_message=analysis_dict.get("error_message", error_message),
-            root_causes=analysis_dict.get("root_causes", ["Unable to determine"]),
-            severity=analysis_dict.get("severity", "MEDIUM"),
-            affected_areas=analysis_dict.get("affected_areas", []),
-            recommended_actions=analysis_dict.get("recommended_actions", []),
-            similar_issues=analysis_dict.get("similar_issues", None),
-            confidence_score=float(analysis_dict.get("confidence_score", 0.5))
-        )
-        
-        return result
-        
-    except Exception as e:
-        print(f"❌ Analysis error: {e}")
-        # Return fallback analysis
-        return RootCauseAnalysis(
-            test_name=test_name,
-            error_message=error_message,
-            root_causes=["Analysis service unavailable"],
-            severity="MEDIUM",
-            affected_areas=[],
-            recommended_actions=["Check error manually", "Review recent changes"],
-            confidence_score=0.0
-        )
+        elif not parser.complete:
+            fallback = "incomplete_json"
+            # Keep list items that streamed in before the response was cut off
+            for key, items in parser.items.items():
+                analysis_dict.setdefault(key, items)
+        elif parser.errors:
+            fallback = "invalid_fields"
+        if parser.errors:
+            span.set_attribute("field_errors", parser.errors)
+        if fallback:
+            span.add_event("parse_fallback", reason=fallback)
+            telemetry.incr("analyzer_parse_fallbacks_total", reason=fallback)
+    return analysis_dict, fallback, tokens, turn
+
+
+def analyze_test_failure(
+    test_name: str,
+    error_message: str,
+    test_output: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    on_item: Optional[Callable[[str, int, Any], None]] = None,
+    use_tier0: bool = True,
+    similar_k: int = 3,
+    deadline: Optional[Deadline] = None,
+    visual_diffs: Optional[List] = None
+) -> RootCauseAnalysis:
+    """
+    Main analysis function using LangChain agent
+
+    Failures whose pattern match clears the calibrated tier-0 threshold (see
+    deterministic_analyzer) are answered locally; only ambiguous ones reach
+    the LLM, and the same local analysis is the fallback when it fails.
+
+    The model sees the system prompt and the results of the deterministic
+    tools inlined in its first turn; further tool calls it makes run
+    concurrently and memoized across the batch (see tool_runtime), and the
+    number of model turns is recorded per route.
+
+    The model answers in JSON mode (or with an AnalysisAnswer tool call,
+    ANALYZER_OUTPUT_MODE=tools) and the stream is parsed incrementally:
+    on_field(name, value) is called for each validated field as it arrives,
+    severity first, so callers can act before the response completes.
+    on_item(name, index, value) gets list elements (root causes, actions)
+    one at a time.
+
+    error_message and test_output are fitted into token_budget tokens (see
+    prompt_builder) so huge Playwright outputs cannot blow up the call.
+    Every stage is recorded as a span (see analyzer_telemetry) together with
+    token, parse-fallback and cache-hit counters.
+
+    The cheapest model in the routing policy for the failure's severity
+    answers first; on low confidence or a failed parse the next model
+    re-analyzes it and on_field("escalated_to", {"model", "reason"}) marks
+    where its fields begin. An escalated answer that is unparseable or less
+    confident than the earlier one is discarded, signalled by
+    on_field("kept_answer", {"model", "reason"}).
+
+    similar_issues lists up to similar_k real past failures from the local
+    index (see similar_failures), never model output; their known fixes are
+    given to the model, and every analysis is added to the index.
+
+    With a deadline (see deadlines) no model call outlives it: the answer
+    that arrived in time is kept without escalating, and without any the
+    pattern analysis is returned.
+
+    visual_diffs (see visual_diff) classify the failure's screenshot pairs:
+    when all of them are rendering noise the failure is answered locally,
+    otherwise their summaries and bounding boxes are added to test_output.
+    Changes already triaged on another browser, page or run are answered
+    from the snapshot_index, and analyzed ones are added to it.
+    """
+    from analysis_schema import RootCauseAnalysis
+    from analyzer_telemetry import get_telemetry
+    from deadlines import DeadlineExceeded
+    from deterministic_analyzer import analyze_deterministically, local_severity
+    from model_router import get_router
+    from similar_failures import format_similar_issue, get_failure_index
+
+    telemetry = get_telemetry()
+
+    with telemetry.span("analyze_test_failure", test_name=test_name) as root_span:
+        # Nearest past failures, for similar_issues and as known fixes in the prompt
+        with telemetry.span("retrieve") as span:
+            index = get_failure_index()
+            neighbors = index.search(test_name, error_message, k=similar_k) if similar_k else []
+            similar_issues = [format_similar_issue(n) for n in neighbors] or None
+            span.set_attribute("index_size", len(index))
+            span.set_attribute("neighbors", len(neighbors))
+
+        # Screenshot diffs that are only rendering noise, or changes triaged before, need no model
+        if visual_diffs:
+            from snapshot_index import get_change_index
+            from visual_diff import analyze_visual_noise, as_visual_diffs
+
+            visual_diffs = as_visual_diffs(visual_diffs)
+            local = analyze_visual_noise(test_name, error_message, visual_diffs)
+            if local is not None:
+                telemetry.incr("analyzer_analyses_total", outcome="visual_noise")
+                root_span.set_attribute("severity", local["severity"])
+                local["similar_issues"] = similar_issues
+                return _local_analysis(local, on_field)
+            with telemetry.span("visual_lookup") as span:
+                local = get_change_index().lookup(test_name, error_message, visual_diffs)
+                span.set_attribute("hit", local is not None)
+            if local is not None:
+                telemetry.incr("analyzer_analyses_total", outcome="visual_known_change")
+                root_span.set_attribute("severity", local["severity"])
+                local["similar_issues"] += similar_issues or []
+                return _local_analysis(local, on_field)
+            visual_text = "\n".join(diff.to_text() for diff in visual_diffs)
+            test_output = f"{test_output}\n\n{visual_text}" if test_output else visual_text
+
+        # Tier 0: confident pattern matches are answered locally, no API call
+        if use_tier0:
+            with telemetry.span("tier0") as span:
+                local = analyze_deterministically(test_name, error_message)
+                span.set_attribute("escalated", local is None)
+            if local is not None:
+                telemetry.incr("analyzer_analyses_total", outcome="tier0")
+                root_span.set_attribute("severity", local["severity"])
+                local["similar_issues"] = similar_issues
+                index.add(test_name, error_message, local)
+                return _local_analysis(local, on_field)
+
+        try:
+            # Create analysis prompt, with the deterministic tool results inlined
+            with telemetry.span("build_prompt") as span:
+                tool_results = precompute_tool_results(test_name, error_message)
+                analysis_prompt, budget = build_analysis_prompt(
+                    test_name, error_message, test_output, neighbors, token_budget, tool_results
+                )
+                span.set_attribute("prompt_chars", len(analysis_prompt))
+                for key, value in budget.to_dict().items():
+                    span.set_attribute(f"budget.{key}", value)
+            if budget.trimmed_tokens:
+                telemetry.incr("analyzer_prompt_tokens_trimmed_total", budget.trimmed_tokens)
+                print(f"✂️  Prompt trimmed: kept {budget.kept_tokens} of {budget.original_tokens} tokens "
+                      f"({budget.duplicate_frames} duplicate frames removed)")
+
+            # Cheapest model first; escalate when the answer is not confident
+            # enough for this severity or could not be parsed (see model_router)
+            severity_hint = local_severity(test_name, error_message)
+            router = get_router()
+            models = router.models_for(severity_hint)
+            router.record_failure()
+            analysis_dict, fallback, answered_by = None, None, None
+            for attempt, model in enumerate(models):
+                try:
+                    with telemetry.span("create_agent", model=model):
+                        llm, tools, system_prompt = create_test_analyzer_agent(model)
+                    started = time.perf_counter()
+                    fields, reason, tokens, turns = _stream_model_analysis(
+                        llm, analysis_prompt, severity_hint, on_field, on_item, tools, system_prompt,
+                        deadline=deadline
+                    )
+                    router.record_call(model, severity_hint, time.perf_counter() - started, tokens, turns,
+                                      tokens["first_token_s"])
+                except Exception as e:
+                    if analysis_dict is None:
+                        raise
+                    # The stronger model failed; the cheaper answer still stands
+                    root_span.add_event("escalation_failed", model=model, error=f"{type(e).__name__}: {e}")
+                    break
+                if analysis_dict is None or router.better_answer(fields, reason, analysis_dict, fallback):
+                    analysis_dict, fallback, answered_by = fields, reason, model
+                    root_span.set_attribute("model", model)
+                else:
+                    # The stronger model did worse; the earlier answer stands
+                    root_span.add_event("escalation_discarded", model=model, fallback=reason or "")
+                    if on_field:
+                        on_field("kept_answer", {"model": answered_by, "reason": reason or "lower_confidence"})
+                escalation = router.escalation_reason(severity_hint, fields, reason)
+                if escalation is None or attempt == len(models) - 1:
+                    break
+                if deadline is not None and deadline.expired():
+                    root_span.add_event("escalation_skipped", reason="deadline")
+                    break
+                router.record_escalation(model, models[attempt + 1], escalation)
+                if on_field:
+                    on_field("escalated_to", {"model": models[attempt + 1], "reason": escalation})
+
+            # Create structured result
+            with telemetry.span("validate"):
+                result = RootCauseAnalysis(
+                    test_name=test_name,
+                    error_message=error_message,
+                    root_causes=analysis_dict.get("root_causes", ["Unable to determine"]),
+                    severity=analysis_dict.get("severity", "MEDIUM"),
+                    affected_areas=analysis_dict.get("affected_areas", []),
+                    recommended_actions=analysis_dict.get("recommended_actions", []),
+                    similar_issues=similar_issues,
+                    confidence_score=float(analysis_dict.get("confidence_score", 0.5))
+                )
+
+            telemetry.incr("analyzer_analyses_total", outcome="llm")
+            root_span.set_attribute("severity", result.severity)
+            if not fallback:
+                index.add(test_name, error_message, result.model_dump())
+                if visual_diffs:
+                    get_change_index().add(test_name, visual_diffs, result.model_dump())
+            return result
+
+        except Exception as e:
+            # A request timed out by the deadline is not an error of the service
+            if isinstance(e, DeadlineExceeded) or (deadline is not None and deadline.expired()):
+                print(f"⏰ Deadline reached; using the pattern analysis for {test_name}")
+                root_span.add_event("deadline_fallback", error=f"{type(e).__name__}: {e}")
+                telemetry.incr("analyzer_analyses_total", outcome="deadline_fallback")
+            else:
+                print(f"❌ Analysis error: {e}")
+                root_span.add_event("service_fallback", error=f"{type(e).__name__}: {e}")
+                telemetry.incr("analyzer_analyses_total", outcome="error_fallback")
+            # Fall back to the pattern analysis, whatever its confidence
+            local = analyze_deterministically(test_name, error_message, force=True)
+            local["similar_issues"] = similar_issues
+            return _local_analysis(local, on_field)
+
+
+def analyze_many(
+    failures: List[Dict],
+    max_workers: int = 16,
+    deadline: Optional[Deadline] = None
+) -> List[RootCauseAnalysis]:
+    """
+    Analyze failures concurrently ({"test_name", "error", "output"} dicts),
+    returning results in input order.
+
+    LLM calls from all workers share the rate_limiter scheduler, so CRITICAL
+    failures are answered first and the account limits are never exceeded.
+
+    With a deadline, failures are started most severe first and the call
+    returns by deadline.at whatever happens: failures that did not get a
+    model answer in time get the deterministic pattern analysis.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    from analyzer_telemetry import get_telemetry
+    from deterministic_analyzer import analyze_deterministically, local_severity
+    from rate_limiter import SEVERITY_PRIORITY
+
+    def analyze(failure: Dict) -> RootCauseAnalysis:
+        if deadline is not None and deadline.expired():
+            raise TimeoutError("not started before the deadline")
+        return analyze_test_failure(failure["test_name"], failure["error"], failure.get("output"),
+                                    deadline=deadline)
+
+    def pattern_analysis(failure: Dict) -> RootCauseAnalysis:
+        get_telemetry().incr("analyzer_analyses_total", outcome="deadline_fallback")
+        return _local_analysis(analyze_deterministically(failure["test_name"], failure["error"], force=True))
+
+    # Pool workers take failures in submission order: most severe first
+    order = sorted(range(len(failures)), key=lambda i: SEVERITY_PRIORITY.get(
+        local_severity(failures[i]["test_name"], failures[i]["error"]), 2))
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {i: pool.submit(analyze, failures[i]) for i in order}
+    remaining = deadline.remaining() if deadline is not None else None
+    wait(futures.values(), timeout=remaining)
+    # Late calls are cancelled through the deadline; never wait for them
+    pool.shutdown(wait=remaining is None, cancel_futures=True)
+
+    results = []
+    for i, failure in enumerate(failures):
+        future = futures[i]
+        if future.done() and not future.cancelled() and future.exception() is None:
+            results.append(future.result())
+        else:
+            results.append(pattern_analysis(failure))
+    return results
 
 
 # ============================================================================
@@ -389,8 +988,265 @@ def print_analysis(analysis: RootCauseAnalysis):
     print("\n" + "="*80 + "\n")
 
 
-def main():
-    """Main entry point"""
+class StreamingAnalysisPrinter:
+    """
+    Renders an analysis while it streams, in the same layout as print_analysis.
+
+    Pass on_field/on_item to analyze_test_failure, then call finish() with
+    the validated result to print whatever the stream did not (fallback
+    values, skipped fields).
+    """
+
+    LIST_SECTIONS = {
+        "root_causes": ("\n🎯 Root Causes:", "   {n}. {value}"),
+        "affected_areas": ("\n📍 Affected Areas:", "   • {value}"),
+        "recommended_actions": ("\n✅ Recommended Actions:", "   {n}. {value}"),
+        "similar_issues": ("\n🔗 Similar Issues:", "   • {value}"),
+    }
+
+    def __init__(self, test_name: str, error_message: str):
+        self.printed = set()
+        self._items = {}
+        print("\n" + "="*80)
+        print(f"🔍 TEST ANALYSIS: {test_name}")
+        print("="*80)
+        print(f"\n📌 Error: {error_message[:100]}...", flush=True)
+
+    def on_field(self, name: str, value):
+        if name == "severity":
+            print(f"\n🚨 Severity: {value}", flush=True)
+        elif name == "confidence_score":
+            print(f"📊 Confidence: {value:.0%}", flush=True)
+        elif name == "escalated_to":
+            # The cheaper model's answer was not good enough; the stronger one's follows
+            print(f"\n⤴️  Escalating to {value['model']} ({value['reason'].replace('_', ' ')})", flush=True)
+            self.printed.clear()
+            self._items.clear()
+            return
+        elif name == "kept_answer":
+            # The stronger model did worse; finish() prints the earlier answer in full
+            print(f"\n↩️  Keeping the answer of {value['model']} ({value['reason'].replace('_', ' ')})", flush=True)
+            self.printed.clear()
+            self._items.clear()
+            return
+        elif name == "stream_reset":
+            # A retried call answered differently from what was already printed
+            print(f"\n🔁 Retried (attempt {value['attempt']}); the answer restarts", flush=True)
+            self.printed.clear()
+            self._items.clear()
+            return
+        elif name in self.LIST_SECTIONS:
+            # Items already streamed; an empty list still gets its heading
+            if name not in self._items and value:
+                for i, item in enumerate(value):
+                    self.on_item(name, i, item)
+            elif name not in self._items and name != "similar_issues":
+                print(self.LIST_SECTIONS[name][0], flush=True)
+        else:
+            return
+        self.printed.add(name)
+
+    def on_item(self, name: str, index: int, value):
+        if name not in self.LIST_SECTIONS:
+            return
+        heading, line = self.LIST_SECTIONS[name]
+        if name not in self._items:
+            print(heading)
+        self._items.setdefault(name, []).append(value)
+        print(line.format(n=index + 1, value=value), flush=True)
+
+    def finish(self, analysis: RootCauseAnalysis):
+        """Print the validated values for every section the stream did not deliver"""
+        for name in ("severity", "confidence_score", "root_causes", "affected_areas",
+                     "recommended_actions", "similar_issues"):
+            if name in self.printed:
+                continue
+            value = getattr(analysis, name)
+            if name in self.LIST_SECTIONS:
+                if self._items.pop(name, None) == value:
+                    continue
+                if value:
+                    for i, item in enumerate(value):
+                        self.on_item(name, i, item)
+                elif name != "similar_issues":
+                    print(self.LIST_SECTIONS[name][0])
+            else:
+                self.on_field(name, value)
+        print("\n" + "="*80 + "\n")
+
+
+def analyze_and_print_streaming(
+    test_name: str,
+    error_message: str,
+    test_output: Optional[str] = None,
+    visual_diffs: Optional[List] = None
+) -> RootCauseAnalysis:
+    """Analyze a failure, printing each part of the analysis as soon as it is parsed"""
+    printer = StreamingAnalysisPrinter(test_name, error_message)
+    analysis = analyze_test_failure(
+        test_name=test_name,
+        error_message=error_message,
+        test_output=test_output,
+        on_field=printer.on_field,
+        on_item=printer.on_item,
+        visual_diffs=visual_diffs,
+    )
+    printer.finish(analysis)
+    return analysis
+
+
+def print_stage_timings():
+    """Print where analysis time went, slowest stage first, and flush metric exporters"""
+    from analyzer_telemetry import get_telemetry
+
+    telemetry = get_telemetry()
+    summary = telemetry.stage_summary()
+    if summary:
+        print("⏱️  Stage timings:")
+        for stage, stats in summary.items():
+            print(f"   {stage:<22} x{stats['count']:<3} total {stats['total_ms']:8.1f} ms"
+                  f"   mean {stats['mean_ms']:7.1f} ms   p95 {stats['p95_ms']:7.1f} ms")
+        print()
+    telemetry.flush()
+
+
+def print_route_summary():
+    """Print calls, latency and cost per model and the averages per analyzed failure"""
+    from model_router import get_router
+
+    summary = get_router().summary()
+    if not summary["failures"]:
+        return
+    print("🧭 Model routes:")
+    for model, route in summary["routes"].items():
+        print(f"   {model:<14} x{route['calls']:<3} mean {route['latency_s'] / route['calls'] * 1000:7.0f} ms"
+              f"   first token {route['first_token_ms']:5.0f} ms   cached {route['cached_ratio']:4.0%}"
+              f"   {route['turns'] / route['calls']:.2f} turns   ${route['cost_usd']:.4f}")
+    escalations = ", ".join(f"{reason} x{count}" for reason, count in summary["escalations"].items())
+    print(f"   per failure: {summary['latency_per_failure_s'] * 1000:.0f} ms, "
+          f"{summary['turns_per_failure']:.2f} model turns, "
+          f"${summary['cost_per_failure_usd']:.5f}   escalations: {escalations or 'none'}\n")
+
+
+def triage_patterns(test_name: str, error_message: str) -> dict:
+    """
+    Offline pre-triage from the three pattern tools alone: no LLM, and no
+    LangChain, pydantic or NumPy import
+    """
+    patterns = analyze_error_pattern(error_message)
+    context = get_test_context(test_name)
+    primary = patterns["error_patterns"][0]
+    return {
+        "test_name": test_name,
+        "error_message": error_message,
+        **patterns,
+        "context": context,
+        "debugging_steps": suggest_debugging_steps(context["category"].upper(), primary),
+    }
+
+
+def print_triage(triage: dict):
+    """Pretty print a triage_patterns() result"""
+    print(f"🔍 {triage['test_name']}: {triage['error_message'][:100]}")
+    print(f"   Patterns: {', '.join(triage['error_patterns'])}")
+    context = triage["context"]
+    print(f"   Module: {context['module']} ({context['category']}, {context['flakiness_history']})")
+    for step in triage["debugging_steps"]:
+        print(f"   {step}")
+    for diff in triage.get("visual_diffs", []):
+        print(f"   🖼️  {diff['kind']}: {diff['changed_ratio']:.2%} of pixels changed"
+              + (" (rendering noise only)" if diff["kind"] in ("identical", "anti_aliasing_noise") else ""))
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point.
+
+    Without an error message, analyzes the built-in example failures. With
+    --patterns-only (alias --offline) only the pattern tools run, for CI
+    pre-triage in well under 100 ms.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="AI-powered root cause analysis for failed tests")
+    parser.add_argument("error", nargs="?", help="Error message of the failed test")
+    parser.add_argument("--test", default="unknown.spec.ts", help="Test file name (for test context)")
+    parser.add_argument("--output", help="File with the test output")
+    parser.add_argument("--trace", help="Playwright trace.zip of the failure; its summary is added to the output "
+                        "and its error is used when no error message is given")
+    parser.add_argument("--screenshots", nargs=2, metavar=("EXPECTED", "ACTUAL"),
+                        help="Baseline and actual PNG of a failed screenshot assertion; rendering noise is "
+                        "answered without the model, other differences are added to the output")
+    parser.add_argument("--patterns-only", "--offline", dest="patterns_only", action="store_true",
+                        help="Run only the local pattern tools; never import LangChain or call the API")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    parser.add_argument("--deadline", type=float, help="Finish within this many seconds, falling back to the "
+                        "pattern analysis (default: ANALYZER_DEADLINE_SECONDS)")
+    parser.add_argument("--call-timeout", type=float,
+                        help="Timeout of one LLM request in seconds (default: ANALYZER_CALL_TIMEOUT_SECONDS)")
+    args = parser.parse_args(argv)
+
+    test_output = None
+    if args.output:
+        with open(args.output) as f:
+            test_output = f.read()
+    if args.trace:
+        from trace_extractor import extract_trace
+
+        summary = extract_trace(args.trace)
+        if not args.error and summary.error:
+            args.error = summary.error.splitlines()[0]
+        trace_text = summary.to_text()
+        test_output = f"{test_output}\n\n{trace_text}" if test_output else trace_text
+    visual_diffs = None
+    if args.screenshots:
+        from visual_diff import compare_screenshots
+
+        visual_diffs = [compare_screenshots(*args.screenshots)]
+        if not args.error:
+            args.error = "Screenshot comparison failed"
+
+    if args.patterns_only:
+        if not args.error:
+            parser.error("--patterns-only needs an error message")
+        triage = triage_patterns(args.test, args.error)
+        if visual_diffs:
+            triage["visual_diffs"] = [diff.to_dict() for diff in visual_diffs]
+        if args.json:
+            print(json.dumps(triage, indent=2))
+        else:
+            print_triage(triage)
+        return 0
+
+    from deadlines import Deadline
+
+    deadline = Deadline.from_env()
+    if args.deadline is not None or args.call_timeout is not None:
+        deadline = Deadline(args.deadline if args.deadline is not None else deadline.remaining(),
+                            args.call_timeout if args.call_timeout is not None else deadline.per_call)
+    if deadline.at is None and deadline.per_call is None:
+        deadline = None
+
+    if not args.error:
+        main(deadline)
+        return 0
+
+    if args.json or deadline is not None:
+        analysis = analyze_test_failure(args.test, args.error, test_output, deadline=deadline,
+                                        visual_diffs=visual_diffs)
+        if args.json:
+            print(analysis.model_dump_json(indent=2))
+        else:
+            print_analysis(analysis)
+    else:
+        analyze_and_print_streaming(args.test, args.error, test_output, visual_diffs)
+    return 0
+
+
+def main(deadline: Optional[Deadline] = None):
+    """Main entry point; with a deadline the examples are analyzed concurrently and finish by it"""
+    from similar_failures import get_failure_index
+
     print("🤖 Test Result Analyzer - AI-Powered Root Cause Detection\n")
     
     # Example: Real failures from PPUpgrade project
@@ -411,15 +1267,30 @@ def main():
     
     print("Analyzing test failures...\n")
     
-    for failure in test_failures:
-        analysis = analyze_test_failure(
-            test_name=failure["test_name"],
-            error_message=failure["error"]
-        )
-        print_analysis(analysis)
+    if deadline is not None:
+        for analysis in analyze_many(test_failures, deadline=deadline):
+            print_analysis(analysis)
+    else:
+        for failure in test_failures:
+            analyze_and_print_streaming(
+                test_name=failure["test_name"],
+                error_message=failure["error"]
+            )
     
+    get_failure_index().save()
+    print_route_summary()
+    print_stage_timings()
     print("✅ Analysis complete!")
 
 
+def __getattr__(name: str):
+    # `from main import RootCauseAnalysis` keeps working without importing
+    # pydantic when main is loaded
+    if name == "RootCauseAnalysis":
+        from analysis_schema import RootCauseAnalysis
+        return RootCauseAnalysis
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
@@ -0,0 +1,185 @@
+"""
+Multi-Model Routing
+Every failure goes to the cheapest model first; the analysis escalates to a
+stronger model only when its confidence_score is below the threshold for the
+failure's severity or the response could not be parsed. Cost and latency are
+recorded per route so the savings are measurable
+
+Environment:
+    ANALYZER_ROUTING_POLICY   JSON (inline or a file path) overriding DEFAULT_POLICY, e.g.
+                              {"CRITICAL": {"models": ["gpt-4o"], "min_confidence": 0.8}}
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from analyzer_telemetry import get_telemetry
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+# Models are tried left to right. An answer is accepted once its confidence
+# reaches min_confidence; LOW failures never pay for the stronger model.
+DEFAULT_POLICY = {
+    "CRITICAL": {"models": ["gpt-4o-mini", "gpt-4o"], "min_confidence": 0.8},
+    "HIGH": {"models": ["gpt-4o-mini", "gpt-4o"], "min_confidence": 0.7},
+    "MEDIUM": {"models": ["gpt-4o-mini", "gpt-4o"], "min_confidence": 0.5},
+    "LOW": {"models": ["gpt-4o-mini"], "min_confidence": 0.0},
+}
+
+
+@dataclass
+class RouteStats:
+    """Calls, latency and cost of one model"""
+
+    calls: int = 0
+    turns: int = 0
+    latency_s: float = 0.0
+    cost_usd: float = 0.0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    first_token_s: float = 0.0
+    first_token_calls: int = 0
+
+
+def call_cost(model: str, tokens: Dict[str, int]) -> float:
+    """USD cost of one call from its input/output/cached token counts (0 for unpriced models)"""
+    input_price, cached_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0, 0.0))
+    cached = tokens.get("cached", 0)
+    return ((tokens.get("input", 0) - cached) * input_price + cached * cached_price
+            + tokens.get("output", 0) * output_price) / 1e6
+
+
+class ModelRouter:
+    """Picks the model ladder for a severity, decides escalations and keeps per-route totals"""
+
+    def __init__(self, policy: Optional[Dict] = None):
+        self.policy = {**DEFAULT_POLICY, **(policy or {})}
+        self.routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.escalations: Dict[str, int] = defaultdict(int)
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        raw = os.getenv("ANALYZER_ROUTING_POLICY")
+        if raw and os.path.exists(raw):
+            with open(raw) as f:
+                raw = f.read()
+        return cls(json.loads(raw) if raw else None)
+
+    def _rule(self, severity: str) -> Dict:
+        return self.policy.get(severity, self.policy["MEDIUM"])
+
+    def models_for(self, severity: str) -> List[str]:
+        return list(self._rule(severity)["models"])
+
+    def escalation_reason(self, severity: str, fields: Dict, fallback: Optional[str]) -> Optional[str]:
+        """Why an answer is not good enough for this severity, or None to accept it"""
+        if fallback in ("no_json", "incomplete_json"):
+            return fallback
+        if "root_causes" not in fields:
+            return "missing_root_causes"
+        confidence = fields.get("confidence_score")
+        threshold = self._rule(severity)["min_confidence"]
+        if confidence is None or confidence < threshold:
+            return "low_confidence"
+        return None
+
+    @staticmethod
+    def better_answer(fields: Dict, fallback: Optional[str], than: Dict, than_fallback: Optional[str]) -> bool:
+        """
+        Whether an escalated answer should replace the one it was escalated
+        from: a parsed answer beats a parse fallback, then the more confident
+        one wins (ties go to the stronger, later model)
+        """
+        def rank(answer: Dict, reason: Optional[str]):
+            parsed = reason not in ("no_json", "incomplete_json") and "root_causes" in answer
+            return parsed, reason is None, answer.get("confidence_score") or 0.0
+
+        return rank(fields, fallback) >= rank(than, than_fallback)
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+
+    def record_call(self, model: str, severity: str, latency_s: float, tokens: Dict[str, int],
+                    turns: int = 1, first_token_s: Optional[float] = None) -> float:
+        """
+        Add one model analysis (turns model round trips) to the route totals
+        and telemetry; returns its cost. first_token_s is left out for calls
+        that were not streamed
+        """
+        cost = call_cost(model, tokens)
+        with self._lock:
+            route = self.routes[model]
+            route.calls += 1
+            route.turns += turns
+            route.latency_s += latency_s
+            route.cost_usd += cost
+            route.input_tokens += tokens.get("input", 0)
+            route.cached_tokens += tokens.get("cached", 0)
+            route.output_tokens += tokens.get("output", 0)
+            if first_token_s is not None:
+                route.first_token_s += first_token_s
+                route.first_token_calls += 1
+        telemetry = get_telemetry()
+        telemetry.incr("analyzer_route_calls_total", model=model, severity=severity)
+        telemetry.incr("analyzer_route_cost_usd_total", cost, model=model)
+        telemetry.observe("analyzer_route_latency_seconds", latency_s, model=model)
+        return cost
+
+    def record_escalation(self, from_model: str, to_model: str, reason: str):
+        with self._lock:
+            self.escalations[reason] += 1
+        get_telemetry().incr("analyzer_escalations_total", from_model=from_model, to_model=to_model, reason=reason)
+
+    def record_failure(self):
+        """Count one failure that reached the models (for per-failure averages)"""
+        with self._lock:
+            self.failures += 1
+
+    @staticmethod
+    def _route_summary(route: RouteStats) -> Dict:
+        return {
+            **vars(route),
+            "cached_ratio": route.cached_tokens / route.input_tokens if route.input_tokens else 0.0,
+            "first_token_ms": route.first_token_s / route.first_token_calls * 1000 if route.first_token_calls else 0.0,
+        }
+
+    def summary(self) -> Dict:
+        with self._lock:
+            total_cost = sum(r.cost_usd for r in self.routes.values())
+            total_latency = sum(r.latency_s for r in self.routes.values())
+            total_turns = sum(r.turns for r in self.routes.values())
+            return {
+                "routes": {model: self._route_summary(route) for model, route in self.routes.items()},
+                "escalations": dict(self.escalations),
+                "failures": self.failures,
+                "cost_per_failure_usd": total_cost / self.failures if self.failures else 0.0,
+                "latency_per_failure_s": total_latency / self.failures if self.failures else 0.0,
+                "turns_per_failure": total_turns / self.failures if self.failures else 0.0,
+            }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Process-wide router configured from ANALYZER_ROUTING_POLICY on first use"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter.from_env()
+        return _router
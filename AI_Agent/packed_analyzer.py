@@ -0,0 +1,282 @@
+"""
+Packed Failure Analysis
+Most failures of a run are short one-line errors, so sending each in its own
+request mostly pays for per-request latency and the repeated instructions.
+Packing mode puts K failures into one request: the instructions are sent
+once, every failure gets a stable id (F1, F2, ... by input position) and the
+model answers {"analyses": [...]} with one RootCauseAnalysis object per id.
+
+Items are validated one by one; only missing or invalid ones are re-analyzed
+alone (main.analyze_test_failure). Pack size adapts to the token budget:
+failures join a pack while its prompt plus the expected output per failure
+still fits, and failures with long details are never packed.
+
+Usage:
+    results = PackedAnalyzer().run([{"test_name": "har.spec.ts", "error": "Status 500 ..."}])
+
+Environment:
+    ANALYZER_PACK_BUDGET=8000        prompt + output tokens per packed request
+    ANALYZER_PACK_MAX_SIZE=12        failures per request
+    ANALYZER_PACK_ITEM_TOKENS=400    failures with longer details are analyzed alone
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+import main
+from analysis_schema import RootCauseAnalysis
+from analyzer_telemetry import COUNT_BUCKETS, get_telemetry
+from deterministic_analyzer import analyze_deterministically, local_severity
+from model_router import get_router
+from prompt_builder import TokenCounter, build_failure_details, default_counter
+from rate_limiter import SEVERITY_PRIORITY, get_scheduler
+from similar_failures import format_similar_issue, get_failure_index
+
+DEFAULT_PACK_BUDGET = int(os.getenv("ANALYZER_PACK_BUDGET", "8000"))
+DEFAULT_MAX_PACK_SIZE = int(os.getenv("ANALYZER_PACK_MAX_SIZE", "12"))
+DEFAULT_ITEM_TOKENS = int(os.getenv("ANALYZER_PACK_ITEM_TOKENS", "400"))
+
+# Expected answer length per failure; reserved in the pack budget and max_tokens
+OUTPUT_TOKENS_PER_ITEM = 250
+
+PACK_INSTRUCTIONS = """Analyze each of the test failures below and provide root cause suggestions.
+Analyze every failure on its own; never merge two failures into one analysis.
+
+Provide the analyses as a single JSON object, one entry per failure id, in this format:
+{
+    "analyses": [
+        {
+            "id": "F1",
+            "severity": "HIGH|CRITICAL|MEDIUM|LOW",
+            "confidence_score": 0.85,
+            "root_causes": ["cause1", "cause2", ...],
+            "affected_areas": ["area1", "area2"],
+            "recommended_actions": ["step1", "step2", ...]
+        }
+    ]
+}
+
+FAILURES:
+"""
+
+
+class PackedAnalyzer:
+    """Analyzes failures K at a time, re-running only the items a pack got wrong"""
+
+    def __init__(self,
+                 model: Optional[str] = None,
+                 token_budget: int = DEFAULT_PACK_BUDGET,
+                 max_pack_size: int = DEFAULT_MAX_PACK_SIZE,
+                 item_tokens: int = DEFAULT_ITEM_TOKENS,
+                 max_workers: int = 8,
+                 use_tier0: bool = True,
+                 counter: Optional[TokenCounter] = None):
+        self.model = model
+        self.token_budget = token_budget
+        self.max_pack_size = max_pack_size
+        self.item_tokens = item_tokens
+        self.max_workers = max_workers
+        self.use_tier0 = use_tier0
+        self.counter = counter or default_counter()
+        self.stats = {"failures": 0, "tier0": 0, "requests": 0, "packed": 0, "solo": 0, "reruns": 0,
+                      "elapsed_s": 0.0, "failures_per_minute": 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self.stats[key] += value
+
+    # ------------------------------------------------------------------
+    # Packing
+    # ------------------------------------------------------------------
+
+    def prepare(self, position: int, failure: Dict) -> Dict:
+        """Pack item for one failure: id, compact prompt text, its token count and whether it may be packed"""
+        test_name, error_message = failure["test_name"], failure["error"]
+        details_error, details_output, report = build_failure_details(
+            error_message, failure.get("output"), budget_tokens=self.item_tokens, counter=self.counter
+        )
+        tools = {call["name"]: call["result"] for call in main.precompute_tool_results(test_name, error_message)}
+        context = tools["get_test_context"]
+        neighbors = get_failure_index().search(test_name, error_message)
+        item_id = f"F{position + 1}"
+        lines = [
+            f"[{item_id}] TEST NAME: {test_name} ({context['module']}, {context['flakiness_history']})",
+            f"PATTERNS: {', '.join(tools['analyze_error_pattern']['error_patterns'])}",
+            f"ERROR MESSAGE: {details_error}",
+        ]
+        if failure.get("output"):
+            lines.append(f"TEST OUTPUT: {details_output}")
+        lines.extend(f"SIMILAR PAST FAILURE: {n['test_name']}: cause: {n.get('root_cause') or 'unknown'}; "
+                     f"fix: {n.get('fix') or 'unknown'}" for n in neighbors[:1])
+        text = "\n".join(lines)
+        return {
+            "id": item_id,
+            "position": position,
+            "test_name": test_name,
+            "error_message": error_message,
+            "test_output": failure.get("output"),
+            "severity_hint": local_severity(test_name, error_message),
+            "similar_issues": [format_similar_issue(n) for n in neighbors] or None,
+            "text": text,
+            "tokens": self.counter.count(text),
+            # Long failures would crowd out the rest of a pack; they keep their full prompt alone
+            "packable": not report.trimmed_tokens,
+        }
+
+    def plan(self, items: List[Dict]) -> List[List[Dict]]:
+        """Group items into packs, in order, while each pack's prompt and expected output fit the budget"""
+        overhead = self.counter.count(PACK_INSTRUCTIONS)
+        packs, current, used = [], [], overhead
+        for item in items:
+            if not item["packable"]:
+                packs.append([item])
+                continue
+            cost = item["tokens"] + OUTPUT_TOKENS_PER_ITEM
+            if current and (used + cost > self.token_budget or len(current) >= self.max_pack_size):
+                packs.append(current)
+                current, used = [], overhead
+            current.append(item)
+            used += cost
+        if current:
+            packs.append(current)
+        return packs
+
+    def pack_prompt(self, pack: List[Dict]) -> str:
+        return PACK_INSTRUCTIONS + "\n\n".join(item["text"] for item in pack) + "\n"
+
+    def split_response(self, text: str, pack: List[Dict]) -> Tuple[Dict[str, RootCauseAnalysis], Dict[str, str]]:
+        """Validate each analysis of a packed answer on its own: ({id: analysis}, {id: why it was rejected})"""
+        by_id = {item["id"]: item for item in pack}
+        results, rejected = {}, {}
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return {}, {item_id: "no_json" for item_id in by_id}
+        entries = data.get("analyses") if isinstance(data, dict) else data
+        for entry in entries if isinstance(entries, list) else []:
+            item = by_id.get(entry.get("id")) if isinstance(entry, dict) else None
+            if item is None or item["id"] in results:
+                continue
+            try:
+                analysis = RootCauseAnalysis(**{
+                    **{k: v for k, v in entry.items() if k in RootCauseAnalysis.model_fields},
+                    "test_name": item["test_name"],
+                    "error_message": item["error_message"],
+                    "similar_issues": item["similar_issues"],
+                })
+                if analysis.severity not in SEVERITY_PRIORITY:
+                    raise ValueError(f"unknown severity {analysis.severity!r}")
+                if not analysis.root_causes:
+                    raise ValueError("no root causes")
+            except (ValidationError, ValueError, TypeError) as e:
+                rejected[item["id"]] = f"invalid: {e}".splitlines()[0]
+                continue
+            rejected.pop(item["id"], None)
+            results[item["id"]] = analysis
+        for item_id in by_id:
+            if item_id not in results:
+                rejected.setdefault(item_id, "missing")
+        return results, rejected
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def _analyze_alone(self, item: Dict) -> RootCauseAnalysis:
+        self._count("solo")
+        return main.analyze_test_failure(item["test_name"], item["error_message"], item["test_output"],
+                                         use_tier0=False)
+
+    def _request_pack(self, pack: List[Dict]) -> Tuple[Dict[str, RootCauseAnalysis], Dict[str, str]]:
+        """One packed request through the shared scheduler, split into validated analyses"""
+        telemetry = get_telemetry()
+        router = get_router()
+        severity = min((item["severity_hint"] for item in pack), key=lambda s: SEVERITY_PRIORITY.get(s, 2))
+        model = self.model or router.models_for(severity)[0]
+        prompt = self.pack_prompt(pack)
+        max_tokens = OUTPUT_TOKENS_PER_ITEM * len(pack)
+
+        with telemetry.span("llm.invoke_packed", model=model, pack_size=len(pack), priority=severity) as span:
+            llm, _, _ = main.create_test_analyzer_agent(model)
+            packed_llm = llm.bind(response_format={"type": "json_object"}, max_tokens=max_tokens)
+            started = time.perf_counter()
+            response = get_scheduler().run(lambda: packed_llm.invoke(prompt),
+                                           tokens=self.counter.count(prompt) + max_tokens, severity=severity)
+            tokens = main._token_usage(response)
+            router.record_call(model, severity, time.perf_counter() - started, tokens)
+            span.set_attribute("tokens_in", tokens["input"])
+            span.set_attribute("tokens_out", tokens["output"])
+            results, rejected = self.split_response(response.content if isinstance(response.content, str) else "",
+                                                    pack)
+            span.set_attribute("rejected", len(rejected))
+        self._count("requests")
+        telemetry.incr("analyzer_llm_calls_total")
+        telemetry.observe("analyzer_pack_size", len(pack), COUNT_BUCKETS)
+        for reason in rejected.values():
+            telemetry.incr("analyzer_pack_items_rejected_total", reason=reason.split(":")[0])
+        return results, rejected
+
+    def run_pack(self, pack: List[Dict]) -> Dict[str, RootCauseAnalysis]:
+        """Analyses for every item of a pack; rejected items are re-analyzed alone"""
+        if len(pack) == 1:
+            return {pack[0]["id"]: self._analyze_alone(pack[0])}
+        try:
+            results, rejected = self._request_pack(pack)
+        except Exception as e:
+            print(f"⚠️  Packed request failed ({type(e).__name__}: {e}); analyzing its {len(pack)} failures alone")
+            results, rejected = {}, {item["id"]: "request_failed" for item in pack}
+        for item in pack:
+            if item["id"] in results:
+                # Re-analyzed items are counted by analyze_test_failure
+                get_router().record_failure()
+                self._count("packed")
+                get_failure_index().add(item["test_name"], item["error_message"], results[item["id"]].model_dump())
+        for item in pack:
+            if item["id"] in rejected:
+                self._count("reruns")
+                results[item["id"]] = self._analyze_alone(item)
+        return results
+
+    # ------------------------------------------------------------------
+    # Entry point
+    # ------------------------------------------------------------------
+
+    def run(self, failures: List[Dict]) -> List[RootCauseAnalysis]:
+        """
+        Analyze failures ({"test_name", "error", "output"} dicts) and return
+        their analyses in input order. Confident pattern matches are answered
+        locally; packs run concurrently through the shared rate limiter.
+        """
+        started = time.perf_counter()
+        results: List[Optional[RootCauseAnalysis]] = [None] * len(failures)
+        items = []
+        for position, failure in enumerate(failures):
+            local = analyze_deterministically(failure["test_name"], failure["error"]) if self.use_tier0 else None
+            if local is not None:
+                self._count("tier0")
+                neighbors = get_failure_index().search(failure["test_name"], failure["error"])
+                local["similar_issues"] = [format_similar_issue(n) for n in neighbors] or None
+                results[position] = main._local_analysis(local)
+                get_failure_index().add(failure["test_name"], failure["error"], local)
+            else:
+                items.append(self.prepare(position, failure))
+
+        packs = self.plan(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for pack, analyses in zip(packs, pool.map(self.run_pack, packs)):
+                for item in pack:
+                    results[item["position"]] = analyses[item["id"]]
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.stats["failures"] += len(failures)
+            self.stats["elapsed_s"] += elapsed
+            self.stats["failures_per_minute"] = self.stats["failures"] / self.stats["elapsed_s"] * 60
+        return results
@@ -0,0 +1,284 @@
+"""
+Token-Budgeted Prompt Builder
+Keeps LLM prompts bounded no matter how large the test output is, by keeping
+the most informative slices of a failure and reporting what was trimmed
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Token budget for the failure details (error message + test output)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("ANALYZER_PROMPT_BUDGET", "3000"))
+
+# Frames from the project's own test code are the most useful to the model
+PROJECT_PATH_MARKER = "PPUpgradeTests/"
+
+ERROR_LINE = re.compile(
+    r"(Error\b|error:|Exception\b|FAILED|✘|Timeout|AssertionError|expect\()", re.IGNORECASE
+)
+DIFF_LINE = re.compile(r"^\s*(Expected|Received|Actual|[-+] |- Expected|\+ Received|Call log:)")
+# JS "at fn (file:line:col)" and Python 'File "...", line N' stack frames
+FRAME_LINE = re.compile(r'^\s*(at\s+\S.*(:\d+:\d+\)?|\))\s*$|File ".+", line \d+)')
+
+TRUNCATION_MARKER = "… [{} tokens trimmed] …"
+
+# Outputs longer than this are measured from samples instead of tokenized whole
+SAMPLED_COUNT_CHARS = 200_000
+
+
+class TokenCounter:
+    """
+    Counts tokens locally.
+
+    Uses tiktoken when its encoding is available offline; otherwise estimates
+    with a word/punctuation split where long words cost one token per four
+    characters (close to cl100k for code and logs, and never undercounting
+    by much).
+    """
+
+    _WORD = re.compile(r"\w+|[^\w\s]")
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding)
+        except Exception:
+            self._encoding = None
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return sum(max(1, math.ceil(len(word) / 4)) for word in self._WORD.findall(text))
+
+    def estimate(self, text: str, sample_chars: int = 20_000) -> int:
+        """count() for normal inputs; multi-MB outputs are scaled up from three samples"""
+        if len(text) <= SAMPLED_COUNT_CHARS:
+            return self.count(text)
+        middle = len(text) // 2
+        samples = (text[:sample_chars], text[middle:middle + sample_chars], text[-sample_chars:])
+        return int(sum(self.count(sample) for sample in samples) * len(text) / (3 * sample_chars))
+
+    def truncate(self, text: str, max_tokens: int, keep_tail: bool = False) -> str:
+        """Cut text to max_tokens, keeping the head (or the head and tail), with a marker"""
+        total = self.count(text)
+        if total <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        marker = TRUNCATION_MARKER.format(total - max_tokens)
+        # Characters per token for this text, used to place cut points
+        ratio = len(text) / total
+        room = max(int((max_tokens - self.count(marker)) * ratio), 0)
+        while True:
+            if keep_tail:
+                head = text[:room // 2]
+                tail = text[len(text) - (room - room // 2):] if room > 1 else ""
+                cut = f"{head}\n{marker}\n{tail}"
+            else:
+                cut = f"{text[:room]}\n{marker}"
+            # The ratio is an average; shrink until the cut really fits
+            over = self.count(cut) - max_tokens
+            if over <= 0:
+                return cut
+            if room == 0:
+                return ""
+            room = max(room - max(int(over * ratio), 1), 0)
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def default_counter() -> TokenCounter:
+    """Shared TokenCounter; loading an encoding is too slow to repeat per call"""
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = TokenCounter()
+    return _default_counter
+
+
+@dataclass
+class PromptBudgetReport:
+    """How much of the failure details made it into the prompt"""
+
+    budget_tokens: int
+    original_tokens: int = 0
+    kept_tokens: int = 0
+    duplicate_frames: int = 0
+    dropped_frames: int = 0
+    sections: Dict[str, int] = field(default_factory=dict)
+    exact_tokens: bool = False
+
+    @property
+    def trimmed_tokens(self) -> int:
+        return max(self.original_tokens - self.kept_tokens, 0)
+
+    def to_dict(self) -> Dict:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "original_tokens": self.original_tokens,
+            "kept_tokens": self.kept_tokens,
+            "trimmed_tokens": self.trimmed_tokens,
+            "duplicate_frames": self.duplicate_frames,
+            "dropped_frames": self.dropped_frames,
+            "sections": dict(self.sections),
+            "exact_tokens": self.exact_tokens,
+        }
+
+
+# ============================================================================
+# OUTPUT SLICING
+# ============================================================================
+
+def dedupe_frames(frames: List[str]) -> Tuple[List[str], int]:
+    """Drop repeated frames (recursion, retries) keeping first occurrences in order"""
+    seen = set()
+    unique = []
+    for frame in frames:
+        key = frame.strip()
+        if key not in seen:
+            seen.add(key)
+            unique.append(frame)
+    return unique, len(frames) - len(unique)
+
+
+def select_frames(frames: List[str], limit: int) -> List[str]:
+    """
+    Keep up to limit frames, project frames first.
+
+    JS stacks list the deepest frame first and Python tracebacks last; both
+    are kept in original order so the model sees a coherent stack.
+    """
+    if len(frames) <= limit:
+        return frames
+    python_style = any(f.lstrip().startswith("File ") for f in frames)
+    ordered = list(reversed(frames)) if python_style else list(frames)
+    project = [f for f in ordered if PROJECT_PATH_MARKER in f]
+    other = [f for f in ordered if PROJECT_PATH_MARKER not in f]
+    chosen = set(id(f) for f in (project + other)[:limit])
+    return [f for f in frames if id(f) in chosen]
+
+
+def extract_sections(test_output: str, max_frames: int = 12, context_lines: int = 3) -> Dict:
+    """Split test output into first error, assertion diff, stack frames, tail and head"""
+    # One regex pass over the whole text is much faster than per-line searches
+    first_error = ""
+    for match in ERROR_LINE.finditer(test_output):
+        line_start = test_output.rfind("\n", 0, match.start()) + 1
+        line_end = test_output.find("\n", match.end())
+        if FRAME_LINE.match(test_output[line_start:line_end if line_end != -1 else None]):
+            continue
+        first_error = "\n".join(test_output[line_start:].split("\n", context_lines + 1)[:context_lines + 1])
+        break
+
+    frames, other, diff = [], [], []
+    for line in test_output.splitlines():
+        if FRAME_LINE.match(line):
+            frames.append(line)
+            continue
+        other.append(line)
+        if DIFF_LINE.match(line):
+            diff.append(line)
+
+    unique, duplicates = dedupe_frames(frames)
+    kept = select_frames(unique, max_frames)
+
+    return {
+        "first_error": first_error,
+        "assertion_diff": "\n".join(diff),
+        "stack": "\n".join(line.strip() for line in kept),
+        # Frames are already in "stack"; the tail is for the run summary
+        "tail": "\n".join(other[-10:]),
+        # Whatever budget is left goes to the start of the output
+        "head": test_output[:16_000],
+        "duplicate_frames": duplicates,
+        "dropped_frames": len(unique) - len(kept),
+    }
+
+
+# ============================================================================
+# PROMPT CONSTRUCTION
+# ============================================================================
+
+def build_failure_details(
+    error_message: str,
+    test_output: Optional[str],
+    budget_tokens: int = DEFAULT_TOKEN_BUDGET,
+    counter: Optional[TokenCounter] = None,
+) -> Tuple[str, str, PromptBudgetReport]:
+    """
+    Fit the error message and test output into budget_tokens.
+
+    Returns (error_message, test_output, report). Small inputs pass through
+    untouched; large ones keep, in priority order, the first error, the
+    assertion diff, the stack (project frames preferred, duplicates removed),
+    the last lines of output and then as much of its start as still fits.
+    """
+    counter = counter or default_counter()
+    report = PromptBudgetReport(budget_tokens=budget_tokens, exact_tokens=counter.exact)
+
+    error_tokens = counter.count(error_message)
+    output_tokens = counter.estimate(test_output or "")
+    report.original_tokens = error_tokens + output_tokens
+
+    if report.original_tokens <= budget_tokens:
+        report.kept_tokens = report.original_tokens
+        report.sections = {"error_message": error_tokens, "test_output": output_tokens}
+        return error_message, test_output or "No additional output", report
+
+    # The error message is usually short and always most relevant: allow it
+    # up to half the budget, keeping its head and tail
+    error_message = counter.truncate(error_message, budget_tokens // 2, keep_tail=True)
+    error_tokens = counter.count(error_message)
+    report.sections["error_message"] = error_tokens
+    remaining = budget_tokens - error_tokens
+
+    if not test_output:
+        report.kept_tokens = error_tokens
+        return error_message, "No additional output", report
+
+    sections = extract_sections(test_output)
+    report.duplicate_frames = sections["duplicate_frames"]
+    report.dropped_frames = sections["dropped_frames"]
+
+    parts = []
+    for name, title, keep_tail in (
+        ("first_error", "FIRST ERROR", False),
+        ("assertion_diff", "ASSERTION DIFF", False),
+        ("stack", "STACK (deduplicated)", False),
+        ("tail", "LAST LINES", True),
+        ("head", "OUTPUT START", False),
+    ):
+        text = sections[name]
+        if not text or remaining <= 0:
+            continue
+        # The blank line separating parts is part of the budget too
+        separator = "\n\n" if parts else ""
+        header = f"{separator}[{title}]\n"
+        allowance = remaining - counter.count(header)
+        if allowance <= 0:
+            break
+        text = counter.truncate(text, allowance, keep_tail=keep_tail)
+        part = header + text
+        used = counter.count(part)
+        parts.append(part)
+        report.sections[name] = used
+        remaining -= used
+
+    compact_output = "".join(parts) or counter.truncate(test_output, remaining, keep_tail=True)
+    output_tokens = counter.count(compact_output)
+    if output_tokens > budget_tokens - error_tokens:
+        # Tokens can merge differently across part boundaries
+        compact_output = counter.truncate(compact_output, budget_tokens - error_tokens)
+        output_tokens = counter.count(compact_output)
+    report.kept_tokens = error_tokens + output_tokens
+    return error_message, compact_output, report
@@ -0,0 +1,342 @@
+"""
+Rate-Limited Request Scheduler
+Client-side pacing for concurrent OpenAI calls: token buckets for requests
+and tokens per minute, a severity-ordered queue and jittered exponential
+backoff on 429/5xx, so analyses run at the account limits without failing
+
+Usage:
+    scheduler = RequestScheduler(rpm=500, tpm=200_000)
+    result = scheduler.run(lambda: llm.invoke(prompt), tokens=1200, severity="CRITICAL")
+
+Environment:
+    ANALYZER_RPM=500              requests per minute allowed by the account
+    ANALYZER_TPM=200000           tokens per minute (prompt + max output tokens)
+    ANALYZER_MAX_CONCURRENCY=8    LLM calls in flight at once
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from deadlines import Deadline, DeadlineExceeded
+
+# Lower rank is dispatched first
+SEVERITY_PRIORITY = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+# ============================================================================
+# TOKEN BUCKET
+# ============================================================================
+
+class TokenBucket:
+    """
+    Continuously refilling bucket of `rate_per_minute`, holding at most
+    `burst_seconds` worth of capacity so a cold start cannot spend a whole
+    minute's allowance at once. Not thread-safe; RequestScheduler locks it.
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)"""
+        self._refill()
+        # A request larger than the bucket could never fit; let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server reported the limit was hit"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+# ============================================================================
+# ERROR CLASSIFICATION
+# ============================================================================
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """HTTP status of an openai.APIStatusError, urllib HTTPError or similar"""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429, 5xx and connection/timeout errors are worth retrying; 4xx request errors are not"""
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import openai
+        return isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError))
+    except ImportError:
+        return False
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Server-requested delay in seconds from retry-after-ms / retry-after headers"""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+class _Job:
+    __slots__ = ("fn", "tokens", "priority", "seq", "future", "attempts", "not_before", "deadline")
+
+    def __init__(self, fn, tokens, priority, seq, deadline=None):
+        self.fn = fn
+        self.deadline: Optional[Deadline] = deadline
+        self.tokens = tokens
+        self.priority = priority
+        self.seq = seq
+        self.future: Future = Future()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class RequestScheduler:
+    """
+    Runs callables under RPM/TPM limits with at most max_concurrency in flight.
+
+    One dispatcher thread always starts the most severe ready job (FIFO
+    within a severity) as soon as both buckets allow it. Failed calls that
+    are retryable go back in the queue after full-jitter exponential backoff
+    (or the server's retry-after); a 429 also pauses all dispatching and
+    empties the buckets, since the server's view of usage is authoritative.
+
+    A job submitted with a Deadline is dropped with DeadlineExceeded if it
+    has not started when the deadline passes, and is not retried when the
+    backoff would end past it.
+
+    Steady-state pacing is exactly rpm/tpm; keep burst_seconds a little
+    below the provider's enforcement window so requests bunched up by
+    network jitter still fit.
+    """
+
+    def __init__(self,
+                 rpm: float = 500,
+                 tpm: float = 200_000,
+                 max_concurrency: int = 8,
+                 max_retries: int = 6,
+                 base_delay: float = 0.5,
+                 max_delay: float = 30.0,
+                 burst_seconds: float = 10.0,
+                 seed: Optional[int] = None):
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random(seed)
+        self._cond = threading.Condition()
+        self._queue: List[_Job] = []
+        self._seq = 0
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._closed = False
+        self._dispatcher: Optional[threading.Thread] = None
+        self.stats: Dict[str, float] = {
+            "submitted": 0, "completed": 0, "failed": 0, "retries": 0,
+            "rate_limited": 0, "server_errors": 0, "expired": 0, "throttle_wait_s": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "RequestScheduler":
+        return cls(
+            rpm=float(os.getenv("ANALYZER_RPM", "500")),
+            tpm=float(os.getenv("ANALYZER_TPM", "200000")),
+            max_concurrency=int(os.getenv("ANALYZER_MAX_CONCURRENCY", "8")),
+        )
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, fn: Callable[[], object], tokens: int = 0, severity: str = "MEDIUM",
+               deadline: Optional[Deadline] = None) -> Future:
+        """Queue fn; tokens is the estimated prompt + max output tokens it will consume"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is shut down")
+            job = _Job(fn, tokens, SEVERITY_PRIORITY.get(severity, 2), self._seq, deadline)
+            self._seq += 1
+            self._queue.append(job)
+            self.stats["submitted"] += 1
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="rate-limiter", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify_all()
+        return job.future
+
+    def run(self, fn: Callable[[], object], tokens: int = 0, severity: str = "MEDIUM",
+            deadline: Optional[Deadline] = None):
+        """submit() and wait for the result; the last error is raised if retries run out"""
+        return self.submit(fn, tokens, severity, deadline).result()
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work; with wait=True, finish everything already queued first"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait and self._dispatcher is not None:
+            self._dispatcher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    # ------------------------------------------------------------------
+    # Dispatching
+    # ------------------------------------------------------------------
+
+    def _expire_jobs(self) -> Optional[float]:
+        """Fail queued jobs whose deadline passed; returns the seconds until the next one expires"""
+        next_expiry = None
+        for job in list(self._queue):
+            remaining = job.deadline.remaining() if job.deadline else None
+            if remaining == 0.0:
+                self._queue.remove(job)
+                self.stats["expired"] += 1
+                job.future.set_exception(DeadlineExceeded("deadline reached before the call could start"))
+            elif remaining is not None:
+                next_expiry = remaining if next_expiry is None else min(next_expiry, remaining)
+        return next_expiry
+
+    def _next_job(self, now: float) -> Optional[_Job]:
+        ready = [job for job in self._queue if job.not_before <= now]
+        return min(ready, key=lambda job: (job.priority, job.seq)) if ready else None
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                next_expiry = self._expire_jobs()
+                if self._closed and not self._queue and self._in_flight == 0:
+                    return
+                now = time.monotonic()
+                job = self._next_job(now) if self._in_flight < self.max_concurrency else None
+                if job is None:
+                    # Sleep until a job becomes ready or expires, a slot frees up or new work arrives
+                    pending = [j.not_before - now for j in self._queue if j.not_before > now]
+                    if next_expiry is not None:
+                        pending.append(next_expiry)
+                    self._cond.wait(timeout=min(pending) if pending else None)
+                    continue
+
+                wait = max(self._cooldown_until - now,
+                           self.requests.wait_time(1),
+                           self.tokens.wait_time(job.tokens))
+                if wait > 0:
+                    # Re-evaluated after waking, so a more severe job that arrives meanwhile goes first
+                    self._cond.wait(timeout=min(wait, next_expiry) if next_expiry is not None else wait)
+                    self.stats["throttle_wait_s"] += time.monotonic() - now
+                    continue
+
+                self.requests.take(1)
+                self.tokens.take(job.tokens)
+                self._queue.remove(job)
+                self._in_flight += 1
+                job.attempts += 1
+                threading.Thread(target=self._execute, args=(job,), daemon=True).start()
+
+    def _execute(self, job: _Job):
+        try:
+            result = job.fn()
+        except BaseException as exc:
+            self._handle_failure(job, exc)
+        else:
+            job.future.set_result(result)
+            with self._cond:
+                self.stats["completed"] += 1
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2**(attempt-1))]"""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _fail(self, job: _Job, exc: BaseException):
+        job.future.set_exception(exc)
+        with self._cond:
+            self.stats["failed"] += 1
+
+    def _handle_failure(self, job: _Job, exc: BaseException):
+        status = error_status(exc)
+        if not is_retryable(exc) or isinstance(exc, DeadlineExceeded) or job.attempts > self.max_retries:
+            return self._fail(job, exc)
+
+        delay = self.backoff_delay(job.attempts)
+        server_delay = retry_after(exc)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        remaining = job.deadline.remaining() if job.deadline else None
+        if remaining is not None and delay >= remaining:
+            # A retry that could only start after the deadline is not worth queueing
+            return self._fail(job, exc)
+        with self._cond:
+            self.stats["retries"] += 1
+            now = time.monotonic()
+            if status == 429:
+                self.stats["rate_limited"] += 1
+                self._cooldown_until = max(self._cooldown_until, now + delay)
+                self.requests.drain()
+                self.tokens.drain()
+            elif status is not None and status >= 500:
+                self.stats["server_errors"] += 1
+            job.not_before = now + delay
+            self._queue.append(job)
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Process-wide scheduler configured from the environment, shared by all analyses"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler.from_env()
+        return _scheduler
@@ -0,0 +1,495 @@
+"""
+Watch Mode
+Analyzes failures while the Playwright run is still in progress: the watcher
+follows test-results/ and, as soon as a failure directory (test-failed-1.png,
+trace.zip, error-context.md) stops changing, hands it to a worker pool, so the
+triage is ready when the run ends instead of after it.
+
+Changes come from inotify (Linux, through ctypes; no extra dependency) or,
+elsewhere, from polling directory listings. Partial writes are debounced: a
+directory is analyzed once nothing in it changed for `debounce` seconds and
+its trace.zip, if any, is a complete archive.
+
+Usage:
+    python results_watcher.py ../test-results            # until Ctrl+C
+    python results_watcher.py ../test-results --until-done --patterns-only
+
+Environment:
+    ANALYZER_WATCH_DEBOUNCE_SECONDS=2    quiet period before a failure is analyzed
+    ANALYZER_WATCH_POLL_SECONDS=1        polling interval without inotify
+    ANALYZER_WATCH_WORKERS=4             failures analyzed at once
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from glob import escape, glob
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from test_analyzer_tools import TestContextAnalyzer
+from trace_extractor import extract_trace
+
+DEFAULT_DEBOUNCE = float(os.getenv("ANALYZER_WATCH_DEBOUNCE_SECONDS", "2"))
+DEFAULT_POLL_INTERVAL = float(os.getenv("ANALYZER_WATCH_POLL_SECONDS", "1"))
+DEFAULT_WORKERS = int(os.getenv("ANALYZER_WATCH_WORKERS", "4"))
+
+# Files Playwright writes only for a failed test
+FAILURE_MARKERS = ("test-failed-*.png", "trace.zip", "error-context.md", "*-actual.png")
+# Written by Playwright to test-results/ when the run is over
+RUN_FINISHED_MARKER = ".last-run.json"
+
+# ============================================================================
+# 1. FAILURE DIRECTORIES
+# ============================================================================
+
+def _sanitize(text: str) -> str:
+    """Playwright's output directory naming: every run of other characters becomes '-'"""
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-")
+
+
+def spec_files(root: str) -> List[str]:
+    """Spec file names the directory names are matched against (known tests and the repo's specs)"""
+    names = set(TestContextAnalyzer.TEST_DATABASE)
+    project = os.path.dirname(os.path.abspath(root))
+    names.update(os.path.basename(p) for p in glob(os.path.join(project, "PPUpgradeTests", "**", "*.spec.ts"),
+                                                   recursive=True))
+    return sorted(names)
+
+
+def spec_for_dir(dir_name: str, specs: List[str]) -> Optional[str]:
+    """Spec file a failure directory belongs to: the longest spec name at a '-' boundary of the name"""
+    best = None
+    for spec in specs:
+        stem = _sanitize(spec[:-len(".spec.ts")] if spec.endswith(".spec.ts") else spec)
+        if re.search(rf"(^|-){re.escape(stem)}-", dir_name) and (best is None or len(spec) > len(best)):
+            best = spec
+    return best
+
+
+def is_failure_dir(path: str) -> bool:
+    # Test titles may contain [ ] which glob would read as a character class
+    return any(glob(os.path.join(escape(path), marker)) for marker in FAILURE_MARKERS)
+
+
+def is_complete(path: str) -> bool:
+    """A failure directory whose trace.zip (if any) has been written in full"""
+    trace = os.path.join(path, "trace.zip")
+    return not os.path.exists(trace) or zipfile.is_zipfile(trace)
+
+
+def _error_from_context(text: str) -> Optional[str]:
+    """The fenced block under '# Error details' of an error-context.md"""
+    match = re.search(r"^#+\s*Error details\s*\n+```[^\n]*\n(.*?)```", text, re.MULTILINE | re.DOTALL)
+    return match.group(1).strip() if match else None
+
+
+def failure_from_dir(path: str, specs: Optional[List[str]] = None) -> Dict:
+    """
+    Failure record ({"test_name", "error", "output", "dir", "artifacts",
+    "visual_diffs"}) for one Playwright output directory: the error comes
+    from error-context.md, else from the trace, else only the artifacts are
+    known. The trace summary (see trace_extractor) is added to the output,
+    and failed screenshot assertions are classified (see visual_diff).
+    """
+    name = os.path.basename(os.path.normpath(path))
+    artifacts = sorted(os.listdir(path))
+    error, output = None, None
+    context_file = os.path.join(path, "error-context.md")
+    if os.path.exists(context_file):
+        with open(context_file, encoding="utf-8", errors="replace") as f:
+            output = f.read()
+        error = _error_from_context(output)
+    if "trace.zip" in artifacts:
+        summary = extract_trace(os.path.join(path, "trace.zip"))
+        if error is None and summary.error:
+            error = summary.error.splitlines()[0]
+        trace_text = summary.to_text()
+        if trace_text:
+            output = f"{output}\n\n{trace_text}" if output else trace_text
+    visual_diffs = []
+    if any(artifact.endswith("-actual.png") for artifact in artifacts):
+        from visual_diff import diff_result_dir
+
+        visual_diffs = [diff.to_dict() for diff in diff_result_dir(path)]
+    if error is None:
+        # Named after the directory, so distinct tests never share a fingerprint
+        error = f"{name} failed without recorded error details (artifacts: {', '.join(artifacts)})"
+    return {
+        "test_name": spec_for_dir(name, specs if specs is not None else spec_files(os.path.dirname(path))) or name,
+        "error": error,
+        "output": output,
+        "dir": path,
+        "artifacts": artifacts,
+        "visual_diffs": visual_diffs,
+    }
+
+
+# ============================================================================
+# 2. CHANGE SOURCES
+# ============================================================================
+
+class PollingSource:
+    """Reports failure directories whose listing (names, sizes, mtimes) changed since the last scan"""
+
+    def __init__(self, root: str, interval: float = DEFAULT_POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self._snapshot: Dict[str, tuple] = {}
+
+    def _scan(self) -> Dict[str, tuple]:
+        snapshot = {}
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return {}
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                files = tuple(sorted((f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in os.scandir(entry.path)))
+            except FileNotFoundError:
+                continue
+            snapshot[entry.path] = files
+        return snapshot
+
+    def wait(self, timeout: float) -> Set[str]:
+        """Changed directories (vanished ones included) after at most timeout seconds"""
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {path for path, files in snapshot.items() if self._snapshot.get(path) != files}
+        changed.update(set(self._snapshot) - set(snapshot))
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifySource:
+    """inotify watches on the root and every directory in it; raises OSError where inotify is unavailable"""
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is Linux-only")
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        self._add_watch(root)
+        self._initial = {entry.path for entry in os.scandir(root) if entry.is_dir()}
+        for path in self._initial:
+            self._add_watch(path)
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if path == self.root:
+                raise OSError(error, f"inotify_add_watch failed for {path}")
+            return
+        self._dirs[wd] = path
+
+    def _rescan(self) -> Set[str]:
+        paths = {entry.path for entry in os.scandir(self.root) if entry.is_dir()}
+        for path in paths - set(self._dirs.values()):
+            self._add_watch(path)
+        return paths
+
+    def wait(self, timeout: float) -> Set[str]:
+        changed, self._initial = self._initial, set()
+        if changed:
+            return changed
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            name = data[offset + self._EVENT.size:offset + self._EVENT.size + length].rstrip(b"\0")
+            offset += self._EVENT.size + length
+            if mask & self.IN_Q_OVERFLOW:
+                changed.update(self._rescan())
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None:
+                continue
+            if parent == self.root:
+                if mask & self.IN_ISDIR and name:
+                    path = os.path.join(self.root, os.fsdecode(name))
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        # Files written before the watch existed are picked up by the debounce check
+                        self._add_watch(path)
+                    changed.add(path)
+            elif mask & self.IN_DELETE_SELF:
+                del self._dirs[wd]
+                changed.add(parent)
+            else:
+                changed.add(parent)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def change_source(root: str, poll_interval: float = DEFAULT_POLL_INTERVAL, use_inotify: bool = True):
+    """inotify where available, directory polling otherwise"""
+    if use_inotify:
+        try:
+            return InotifySource(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingSource(root, poll_interval)
+
+
+# ============================================================================
+# 3. WATCHER
+# ============================================================================
+
+def default_analyze(failure: Dict):
+    from main import analyze_test_failure
+    return analyze_test_failure(failure["test_name"], failure["error"], failure["output"],
+                                visual_diffs=failure.get("visual_diffs"))
+
+
+def patterns_only_analyze(failure: Dict):
+    from deterministic_analyzer import analyze_deterministically
+    from main import _local_analysis
+    if failure.get("visual_diffs"):
+        from snapshot_index import get_change_index
+        from visual_diff import analyze_visual_noise
+
+        local = (analyze_visual_noise(failure["test_name"], failure["error"], failure["visual_diffs"])
+                 or get_change_index().lookup(failure["test_name"], failure["error"], failure["visual_diffs"]))
+        if local is not None:
+            return _local_analysis(local)
+    return _local_analysis(analyze_deterministically(failure["test_name"], failure["error"], force=True))
+
+
+class ResultsWatcher:
+    """
+    Analyzes each failure directory of a results folder once, as soon as it
+    has been fully written.
+
+    analyze(failure) runs on the worker pool with a failure_from_dir()
+    record; on_result(failure, analysis) is called from the worker when it
+    returns. Directories deleted in between (Playwright empties test-results
+    at the start of a run) are analyzed again when they reappear.
+    """
+
+    def __init__(self,
+                 root: str = "test-results",
+                 analyze: Callable[[Dict], Any] = default_analyze,
+                 on_result: Optional[Callable[[Dict, Any], None]] = None,
+                 debounce: float = DEFAULT_DEBOUNCE,
+                 max_workers: int = DEFAULT_WORKERS,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: bool = True):
+        self.root = root
+        self.analyze = analyze
+        self.on_result = on_result
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.specs = spec_files(root)
+        self.results: Dict[str, Any] = {}
+        self.stats = {"analyzed": 0, "errors": 0, "latency_s": 0.0}
+        self.source = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="watch")
+        self._futures = []
+        self._pending: Dict[str, float] = {}
+        self._done: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "ResultsWatcher":
+        os.makedirs(self.root, exist_ok=True)
+        self.source = change_source(self.root, self.poll_interval, self.use_inotify)
+        # Failures already on disk are analyzed like new ones
+        now = time.monotonic()
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                self._pending[entry.path] = now
+        self._thread = threading.Thread(target=self._loop, name="results-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, flush: bool = True):
+        """Stop watching; with flush=True, analyze what is still debouncing and wait for every analysis"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if flush:
+            for path in list(self._pending):
+                self._submit_if_ready(path)
+        self._pending.clear()
+        self._pool.shutdown(wait=flush)
+        if self.source is not None:
+            self.source.close()
+
+    def __enter__(self) -> "ResultsWatcher":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if isinstance(self.source, InotifySource) else "polling"
+
+    # ------------------------------------------------------------------
+    # Debouncing
+    # ------------------------------------------------------------------
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = [t + self.debounce - now for t in self._pending.values()]
+            timeout = max(min(due + [self.poll_interval]), 0.01)
+            changed = self.source.wait(timeout)
+            now = time.monotonic()
+            for path in changed:
+                if not os.path.isdir(path):
+                    # Deleted: a new run may write the same directory again
+                    self._pending.pop(path, None)
+                    with self._lock:
+                        self._done.discard(path)
+                elif path not in self._done:
+                    self._pending[path] = now
+            for path, changed_at in list(self._pending.items()):
+                if now - changed_at >= self.debounce:
+                    del self._pending[path]
+                    self._submit_if_ready(path)
+
+    def _submit_if_ready(self, path: str):
+        # Not a failure (yet): the next change to the directory brings it back
+        if path in self._done or not os.path.isdir(path) or not is_failure_dir(path) or not is_complete(path):
+            return
+        with self._lock:
+            self._done.add(path)
+        self._futures.append(self._pool.submit(self._analyze, path, time.monotonic()))
+
+    def _analyze(self, path: str, ready_at: float):
+        from analyzer_telemetry import get_telemetry
+
+        telemetry = get_telemetry()
+        try:
+            # Unreadable artifacts or a directory removed since the debounce count as errors too
+            failure = failure_from_dir(path, self.specs)
+            with telemetry.span("watch.analyze", test_name=failure["test_name"]):
+                analysis = self.analyze(failure)
+        except Exception as e:
+            print(f"❌ {os.path.basename(path)}: {type(e).__name__}: {e}")
+            telemetry.incr("analyzer_watch_failures_total", outcome="error")
+            with self._lock:
+                self.stats["errors"] += 1
+            return None
+        latency = time.monotonic() - ready_at
+        telemetry.incr("analyzer_watch_failures_total", outcome="analyzed")
+        telemetry.observe("analyzer_watch_latency_seconds", latency)
+        with self._lock:
+            self.results[path] = analysis
+            self.stats["analyzed"] += 1
+            self.stats["latency_s"] += latency
+        if self.on_result:
+            self.on_result(failure, analysis)
+        return analysis
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until nothing is debouncing and every submitted analysis finished"""
+        end = time.monotonic() + timeout if timeout is not None else None
+        while self._pending or any(not f.done() for f in list(self._futures)):
+            if end is not None and time.monotonic() >= end:
+                return False
+            time.sleep(0.02)
+        return True
+
+
+# ============================================================================
+# 4. MAIN RUNNER
+# ============================================================================
+
+def run_finished(root: str, started: float) -> bool:
+    marker = os.path.join(root, RUN_FINISHED_MARKER)
+    return os.path.exists(marker) and os.path.getmtime(marker) >= started
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyze Playwright failures while the run is in progress")
+    parser.add_argument("root", nargs="?", default="test-results", help="Playwright output directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Failures analyzed at once")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help="Seconds without changes before a failure is analyzed")
+    parser.add_argument("--poll", action="store_true", help="Poll the directory instead of using inotify")
+    parser.add_argument("--patterns-only", action="store_true", help="Pattern analysis only, no API calls")
+    parser.add_argument("--until-done", action="store_true",
+                        help=f"Exit when Playwright writes {RUN_FINISHED_MARKER} (the run is over)")
+    args = parser.parse_args(argv)
+
+    def on_result(failure: Dict, analysis):
+        print(f"🔍 {failure['test_name']}: [{analysis.severity}] {analysis.root_causes[0] if analysis.root_causes else ''}")
+
+    watcher = ResultsWatcher(args.root, patterns_only_analyze if args.patterns_only else default_analyze,
+                             on_result, debounce=args.debounce, max_workers=args.workers,
+                             use_inotify=not args.poll)
+    started = time.time()
+    watcher.start()
+    print(f"👀 Watching {args.root} ({watcher.backend}, {args.workers} workers)")
+    try:
+        while not (args.until_done and run_finished(args.root, started)):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    watcher.stop()
+
+    stats = watcher.stats
+    average = stats["latency_s"] / stats["analyzed"] if stats["analyzed"] else 0.0
+    print(f"\n✅ Analyzed: {stats['analyzed']} failures ({stats['errors']} errors), "
+          f"{average:.1f}s average from last write to result")
+    output_file = f"ai_analysis_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump({os.path.basename(path): analysis.model_dump() for path, analysis in watcher.results.items()},
+                  f, indent=2)
+    print(f"💾 Results saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Similar Failure Retrieval
+Embeds every analyzed failure into a persisted local vector index so that
+similar_issues lists real past failures (and their fixes) instead of
+whatever the model invents
+
+Embeddings run on CPU: a sentence-transformers model when installed
+(ANALYZER_EMBEDDING_MODEL), otherwise a NumPy hashing vectorizer.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "ANALYZER_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".failure_index")
+)
+
+# Neighbors scoring below this cosine similarity are not "similar"
+DEFAULT_MIN_SCORE = 0.35
+
+_TOKEN = re.compile(r"[a-z_][a-z0-9_]+|\d{3}")
+# Volatile parts of error messages: long numbers (timeouts, ids), hex, quoted selectors' digits
+_VOLATILE = re.compile(r"0x[0-9a-f]+|\d{4,}|\d+(\.\d+)?ms")
+
+
+# ============================================================================
+# EMBEDDINGS
+# ============================================================================
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of word unigrams, bigrams and character trigrams.
+
+    Needs nothing beyond NumPy and is stable across processes (blake2b, not
+    Python's randomized hash), so persisted vectors stay valid.
+    """
+
+    name = "hashing-v1"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _VOLATILE.sub(" <num> ", text.lower())
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN.findall(self.normalize(text))
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                sign = 1.0 if digest & 1 else -1.0
+                weight = 1.0 if feature[0] == "c" else 2.0  # words count more than trigrams
+                vectors[row, (digest >> 1) % self.dim] += sign * weight
+        # Sublinear term frequency, then unit length so dot product = cosine
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """Dense CPU embeddings from a sentence-transformers model"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.name = f"st:{model_name}"
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def default_embedder():
+    """sentence-transformers model if configured and installed, else the hashing vectorizer"""
+    model_name = os.getenv("ANALYZER_EMBEDDING_MODEL")
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"⚠️  Embedding model unavailable ({e}); using hashing vectorizer")
+    return HashingEmbedder()
+
+
+# ============================================================================
+# VECTOR INDEX
+# ============================================================================
+
+class FailureIndex:
+    """
+    Flat inner-product index over unit vectors, persisted to a directory.
+
+    entries.jsonl is appended on every add (cheap, crash-safe); vectors.npy
+    is a snapshot written by save(). On load, entries missing from the
+    snapshot, or a snapshot from a different embedder, are re-embedded.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_DIR, embedder=None):
+        self.path = path
+        self.embedder = embedder or default_embedder()
+        self.entries: List[Dict] = []
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._size = 0
+        self._saved_size = 0
+        self._keys = set()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def entry_text(test_name: str, error_message: str) -> str:
+        return f"{test_name}\n{error_message}"
+
+    def _load(self):
+        entries_file = os.path.join(self.path, "entries.jsonl")
+        if not os.path.exists(entries_file):
+            return
+        with open(entries_file) as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self._keys = {(e["test_name"], e["error_message"]) for e in self.entries}
+
+        vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        meta_file = os.path.join(self.path, "vectors.json")
+        vectors_file = os.path.join(self.path, "vectors.npy")
+        if os.path.exists(meta_file) and os.path.exists(vectors_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if meta.get("embedder") == self.embedder.name:
+                vectors = np.load(vectors_file)[:len(self.entries)]
+
+        missing = self.entries[len(vectors):]
+        if missing:
+            fresh = self.embedder.embed([self.entry_text(e["test_name"], e["error_message"]) for e in missing])
+            vectors = np.vstack([vectors, fresh])
+        self._vectors = vectors
+        self._size = len(vectors)
+        self._saved_size = self._size if not missing else 0
+
+    def _ensure_capacity(self, extra: int):
+        needed = self._size + extra
+        if needed > len(self._vectors):
+            grown = np.zeros((max(needed, 2 * len(self._vectors), 64), self.embedder.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+
+    def add(self, test_name: str, error_message: str, analysis: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Index one analyzed failure; analysis supplies the root cause and fix
+        shown to later lookups. Failures already indexed are skipped (None).
+        """
+        if (test_name, error_message) in self._keys:
+            return None
+        analysis = analysis or {}
+        entry = {
+            "test_name": test_name,
+            "error_message": error_message,
+            "root_cause": (analysis.get("root_causes") or [None])[0],
+            "fix": (analysis.get("recommended_actions") or [None])[0],
+            "severity": analysis.get("severity"),
+            "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        vector = self.embedder.embed([self.entry_text(test_name, error_message)])[0]
+        with self._lock:
+            # Embedding ran unlocked; another thread may have added it meanwhile
+            if (test_name, error_message) in self._keys:
+                return None
+            self._ensure_capacity(1)
+            self._vectors[self._size] = vector
+            self._size += 1
+            self.entries.append(entry)
+            self._keys.add((test_name, error_message))
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+                with open(os.path.join(self.path, "entries.jsonl"), "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def search(self, test_name: str, error_message: str, k: int = 3,
+               min_score: float = DEFAULT_MIN_SCORE) -> List[Dict]:
+        """Return up to k past failures most similar to this one, best first"""
+        if self._size == 0:
+            return []
+        query = self.embedder.embed([self.entry_text(test_name, error_message)])[0]
+        with self._lock:
+            scores = self._vectors[:self._size] @ query
+            entries = self.entries
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(entries[i], score=float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def save(self):
+        """Snapshot vectors so the next load does not re-embed"""
+        if not self.path or self._saved_size == self._size:
+            return
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            np.save(os.path.join(self.path, "vectors.npy"), self._vectors[:self._size])
+            with open(os.path.join(self.path, "vectors.json"), "w") as f:
+                json.dump({"embedder": self.embedder.name, "count": self._size}, f)
+            self._saved_size = self._size
+
+
+def format_similar_issue(neighbor: Dict) -> str:
+    """One similar_issues line: past failure, its root cause and its fix"""
+    text = f"{neighbor['test_name']}: {neighbor['error_message'][:120]} (similarity {neighbor['score']:.2f})"
+    if neighbor.get("root_cause"):
+        text += f" - cause: {neighbor['root_cause']}"
+    if neighbor.get("fix"):
+        text += f" - fix: {neighbor['fix']}"
+    return text
+
+
+_index: Optional[FailureIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_failure_index() -> FailureIndex:
+    """Process-wide index at ANALYZER_INDEX_DIR, loaded on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FailureIndex()
+        return _index
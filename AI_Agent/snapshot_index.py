@@ -0,0 +1,396 @@
+"""
+Snapshot Index
+Perceptual-hash lookups over screenshots, so one visual change is triaged
+once: not again for the chromium/firefox/webkit copies of a page, for other
+pages that show the same broken component, or on the next run.
+
+Screenshots are reduced to 64-bit perceptual hashes (visual_diff.phash of a
+whole page, visual_diff.dhash of the changed region on each side) kept in
+BK-trees, which return every hash within a Hamming distance while visiting
+a small part of the tree.
+
+- BaselineIndex: the *-snapshots baselines by pHash. near_duplicates()
+  groups the per-browser copies of a page (and pages that are the same
+  screen), similar() finds the baselines closest to any screenshot, such as
+  a test-failed-*.png that has no baseline of its own
+- ChangeIndex: the visual changes (VisualDiff.change_hash) of analyzed
+  failures with their analysis, persisted next to the failure index.
+  lookup() answers a failure whose changes were all triaged before, and
+  group_changes() clusters one run's failures by change
+
+Usage:
+    python snapshot_index.py baselines ../PPUpgradeTests/Tests
+    python snapshot_index.py failures ../test-results [--tests ../PPUpgradeTests/Tests]
+
+Environment:
+    ANALYZER_INDEX_DIR - Where visual_changes.jsonl is kept (see similar_failures)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from glob import escape, glob
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from similar_failures import DEFAULT_INDEX_DIR
+from visual_diff import VisualDiff, as_visual_diffs, diff_result_dir, load_image, phash
+
+DEFAULT_CHANGES_FILE = os.path.join(DEFAULT_INDEX_DIR, "visual_changes.jsonl")
+
+# Same page in another browser: at most 10 of 64 pHash bits differ on the
+# PPUpgrade baselines, different pages at least 14
+BASELINE_DISTANCE = 10
+# Same change on another browser or page: at most this many of the 64 dHash
+# bits differ on each side (baseline and actual) of the changed region
+CHANGE_DISTANCE = 8
+# A flat region (one color) has a dHash of (nearly) all zeros: when both
+# sides of a change are that empty, the hash says nothing and is not indexed
+DEGENERATE_BITS = 3
+# A hash match also needs a changed region of the same size (within this
+# fraction or 16 px) and mean colors (per channel) on both sides
+SIZE_TOLERANCE = 0.25
+COLOR_TOLERANCE = 24
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# ============================================================================
+# BK-TREE
+# ============================================================================
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes under Hamming distance.
+
+    Each node keeps its children by their distance to it; by the triangle
+    inequality a query of radius r at distance d from a node only needs the
+    children at distances d - r to d + r.
+    """
+
+    def __init__(self):
+        # Nodes are [hash, items, {distance: child}]; equal hashes share a node
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key: int, item: Any):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> List[Tuple[int, Any]]:
+        """(distance, item) for every item within radius of key, closest first"""
+        found, stack = [], [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            stack.extend(child for edge, child in node[2].items() if distance - radius <= edge <= distance + radius)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+def _clusters(keys: List[int], radius: int, same: Optional[Callable[[int, int], bool]] = None) -> List[List[int]]:
+    """
+    Indexes of keys linked by chains of distances <= radius (and same(i, j)
+    when given), groups of two or more
+    """
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+    parent = list(range(len(keys)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, key in enumerate(keys):
+        for _, j in tree.search(key, radius):
+            if same is None or same(i, j):
+                parent[find(j)] = find(i)
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(keys)):
+        groups.setdefault(find(i), []).append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+# ============================================================================
+# BASELINES
+# ============================================================================
+
+class BaselineIndex:
+    """pHash of each snapshot baseline, in a BK-tree"""
+
+    def __init__(self):
+        self.tree = BKTree()
+        self.hashes: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, path: str, image=None) -> int:
+        key = phash(image if image is not None else load_image(path))
+        self.hashes[path] = key
+        self.tree.add(key, path)
+        return key
+
+    @classmethod
+    def from_tests_dir(cls, root: str) -> "BaselineIndex":
+        """Every PNG in the *-snapshots folders under root (Playwright's baseline layout)"""
+        index = cls()
+        for path in sorted(glob(os.path.join(escape(root), "**", "*-snapshots", "*.png"), recursive=True)):
+            index.add(path)
+        return index
+
+    def similar(self, image, max_distance: int = BASELINE_DISTANCE) -> List[Tuple[int, str]]:
+        """(distance, baseline path) of the baselines that look like image (an array or a pHash)"""
+        return self.tree.search(image if isinstance(image, int) else phash(image), max_distance)
+
+    def near_duplicates(self, max_distance: int = BASELINE_DISTANCE) -> List[List[str]]:
+        """Groups of baselines that are the same screen, largest first"""
+        paths = list(self.hashes)
+        groups = [sorted(paths[i] for i in group) for group in _clusters(list(self.hashes.values()), max_distance)]
+        return sorted(groups, key=lambda group: (-len(group), group))
+
+
+# ============================================================================
+# TRIAGED CHANGES
+# ============================================================================
+
+def _change_parts(change_hash: str) -> Tuple[int, int]:
+    """(baseline side, actual side) dHashes of a VisualDiff.change_hash"""
+    return int(change_hash[:16], 16), int(change_hash[16:], 16)
+
+
+def _degenerate(change_hash: str) -> bool:
+    return all(side.bit_count() <= DEGENERATE_BITS for side in _change_parts(change_hash))
+
+
+def _signature(diff: VisualDiff) -> Dict:
+    """Page hash, and what a hash match is confirmed against: changed region size and colors"""
+    if diff.boxes:
+        width = max(b["x"] + b["width"] for b in diff.boxes) - min(b["x"] for b in diff.boxes)
+        height = max(b["y"] + b["height"] for b in diff.boxes) - min(b["y"] for b in diff.boxes)
+    else:
+        width, height = diff.actual_size
+    return {"page_hash": diff.page_hash, "size": [width, height], "colors": diff.change_colors}
+
+
+def _confirmed(a: Dict, b: Dict) -> bool:
+    """
+    Two hash-matched changes are the same change: a changed region of about
+    the same size, in the same colors on both sides. A few set bits of dHash
+    (a header bar, a button on a flat background) match too easily alone
+    """
+    if not (a.get("size") and b.get("size") and a.get("colors") and b.get("colors")):
+        return False
+    sizes = all(abs(x - y) <= max(16, SIZE_TOLERANCE * max(x, y)) for x, y in zip(a["size"], b["size"]))
+    colors = all(abs(x - y) <= COLOR_TOLERANCE
+                 for side_a, side_b in zip(a["colors"], b["colors"]) for x, y in zip(side_a, side_b))
+    return sizes and colors
+
+
+def _matches(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Total distance of two change hashes when each side is within max_distance, else None"""
+    (a_expected, a_actual), (b_expected, b_actual) = _change_parts(a), _change_parts(b)
+    distances = hamming(a_expected, b_expected), hamming(a_actual, b_actual)
+    return sum(distances) if max(distances) <= max_distance else None
+
+
+class ChangeIndex:
+    """
+    Visual changes of analyzed failures and their analysis, persisted to a
+    JSONL file (appended on every add). The BK-tree is keyed by the baseline
+    side of each change hash; candidates are then checked on the actual side.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CHANGES_FILE):
+        self.path = path
+        self.entries: List[Dict] = []
+        self.tree = BKTree()
+        self._keys = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self._insert(json.loads(line))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _insert(self, entry: Dict):
+        self.entries.append(entry)
+        self._keys.add((entry["test_name"], entry.get("name"), entry["change_hash"]))
+        self.tree.add(_change_parts(entry["change_hash"])[0], entry)
+
+    def add(self, test_name: str, diffs: List, analysis: Dict) -> List[Dict]:
+        """Record the real changes of an analyzed screenshot failure; returns the new entries"""
+        added = []
+        for diff in as_visual_diffs(diffs):
+            if diff.is_noise or not diff.change_hash or _degenerate(diff.change_hash):
+                continue
+            entry = {
+                "test_name": test_name,
+                "name": diff.name,
+                "kind": diff.kind,
+                "change_hash": diff.change_hash,
+                **_signature(diff),
+                "analysis": {key: analysis.get(key) for key in (
+                    "severity", "root_causes", "affected_areas", "recommended_actions", "confidence_score")},
+                "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            with self._lock:
+                # Checked under the lock: concurrent workers may add the same failure
+                if (test_name, diff.name, diff.change_hash) in self._keys:
+                    continue
+                self._insert(entry)
+                if self.path:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a") as f:
+                        f.write(json.dumps(entry) + "\n")
+            added.append(entry)
+        return added
+
+    def find(self, diff, max_distance: int = CHANGE_DISTANCE) -> List[Dict]:
+        """Every triaged change matching diff (a VisualDiff or its dict), closest first, with its distance"""
+        diff = as_visual_diffs([diff])[0]
+        if not diff.change_hash or _degenerate(diff.change_hash):
+            return []
+        with self._lock:
+            candidates = self.tree.search(_change_parts(diff.change_hash)[0], max_distance)
+        signature = _signature(diff)
+        found = []
+        for _, entry in candidates:
+            distance = _matches(diff.change_hash, entry["change_hash"], max_distance)
+            if distance is not None and _confirmed(signature, entry):
+                found.append(dict(entry, distance=distance))
+        return sorted(found, key=lambda entry: entry["distance"])
+
+    def lookup(self, test_name: str, error_message: str, diffs: List,
+               max_distance: int = CHANGE_DISTANCE) -> Optional[Dict]:
+        """
+        RootCauseAnalysis fields from the closest triaged change when every
+        real change of this failure was triaged before, otherwise None
+        """
+        changes = [d for d in as_visual_diffs(diffs) if not d.is_noise]
+        if not changes or not self.entries:
+            return None
+        matches = []
+        for diff in changes:
+            found = self.find(diff, max_distance)
+            if not found:
+                return None
+            matches.append(found[0])
+        best = min(matches, key=lambda entry: entry["distance"])
+        analysis = best["analysis"]
+        return {
+            "test_name": test_name,
+            "error_message": error_message,
+            "root_causes": analysis.get("root_causes") or ["Unable to determine"],
+            "severity": analysis.get("severity") or "MEDIUM",
+            "affected_areas": analysis.get("affected_areas") or [],
+            "recommended_actions": analysis.get("recommended_actions") or [],
+            "similar_issues": [format_known_change(entry) for entry in matches],
+            "confidence_score": float(analysis.get("confidence_score") or 0.5),
+        }
+
+
+def format_known_change(entry: Dict) -> str:
+    """One similar_issues line for a matched triaged change"""
+    snapshot = f" ({entry['name']})" if entry.get("name") else ""
+    text = f"Same visual change as {entry['test_name']}{snapshot}, {entry['distance']} hash bits apart"
+    cause = (entry["analysis"].get("root_causes") or [None])[0]
+    return text + (f" - cause: {cause}" if cause else "")
+
+
+def group_changes(failures: List[Tuple[str, VisualDiff]],
+                  max_distance: int = CHANGE_DISTANCE) -> List[List[int]]:
+    """Indexes of (label, diff) items showing the same change, groups of two or more, largest first"""
+    indexed = [i for i, (_, diff) in enumerate(failures)
+               if diff.change_hash and not diff.is_noise and not _degenerate(diff.change_hash)]
+    hashes = [failures[i][1].change_hash for i in indexed]
+    signatures = [_signature(failures[i][1]) for i in indexed]
+    # Neighbours on the baseline side that also match on the actual side and are confirmed
+    groups = _clusters([_change_parts(h)[0] for h in hashes], max_distance,
+                       lambda i, j: (_matches(hashes[i], hashes[j], max_distance) is not None
+                                     and _confirmed(signatures[i], signatures[j])))
+    return sorted(([indexed[i] for i in group] for group in groups), key=lambda group: (-len(group), group))
+
+
+_index: Optional[ChangeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_change_index() -> ChangeIndex:
+    """Process-wide change index in ANALYZER_INDEX_DIR, loaded on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ChangeIndex()
+        return _index
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) >= 2 and argv[0] == "baselines":
+        index = BaselineIndex.from_tests_dir(argv[1])
+        groups = index.near_duplicates()
+        print(f"🖼️  {len(index)} baselines, {len(groups)} groups of near-duplicates")
+        for group in groups:
+            print(f"  - {len(group)}: " + ", ".join(os.path.basename(path) for path in group))
+        return 0
+
+    if len(argv) >= 2 and argv[0] == "failures":
+        baselines = BaselineIndex.from_tests_dir(argv[argv.index("--tests") + 1]) if "--tests" in argv else None
+        changes = get_change_index()
+        failures = []
+        for result_dir in sorted(d for d in glob(os.path.join(escape(argv[1]), "*")) if os.path.isdir(d)):
+            label = os.path.basename(result_dir)
+            failures += [(f"{label}/{diff.name}", diff) for diff in diff_result_dir(result_dir)]
+            if baselines is not None:
+                # Screenshots taken at the failure have no baseline of their own
+                for shot in sorted(glob(os.path.join(escape(result_dir), "test-failed-*.png"))):
+                    nearest = baselines.similar(load_image(shot))
+                    print(f"📷 {label}/{os.path.basename(shot)}: "
+                          + (f"looks like {os.path.basename(nearest[0][1])} ({nearest[0][0]} bits apart)"
+                             if nearest else "no similar baseline"))
+        for group in group_changes(failures):
+            print(f"🔁 Same change in {len(group)} failures: " + ", ".join(failures[i][0] for i in group))
+        for label, diff in failures:
+            known = changes.find(diff)
+            if known:
+                print(f"✅ {label}: {format_known_change(known[0])}")
+        return 0
+
+    print("Usage: python snapshot_index.py baselines <tests dir> | failures <test-results dir> [--tests <dir>]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Structured Output Parsing
+Incremental JSON parser for streamed LLM output: each top-level field of the
+analysis is validated and handed to the caller as soon as its value is
+complete, instead of slicing '{'...'}' out of the finished response
+"""
+
+import json
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+FieldCallback = Callable[[str, Any], None]
+ItemCallback = Callable[[str, int, Any], None]
+
+
+class IncrementalJSONParser:
+    """
+    Parses one JSON object fed in arbitrary chunks.
+
+    Text before the opening brace (e.g. a ```json fence) is skipped. When a
+    top-level value is complete it is decoded, validated against the
+    matching field of `model` (if given) and passed to `on_field`, so a
+    caller can act on "severity" while the rest is still streaming.
+    Elements of top-level arrays are also passed to `on_item(field, index,
+    value)` one by one, e.g. to print root causes as they are written.
+    """
+
+    def __init__(self, model: Optional[Type[BaseModel]] = None,
+                 on_field: Optional[FieldCallback] = None,
+                 on_item: Optional[ItemCallback] = None):
+        self.model = model
+        self.on_field = on_field
+        self.on_item = on_item
+        self.fields: Dict[str, Any] = {}
+        self.items: Dict[str, List[Any]] = {}
+        self.errors: Dict[str, str] = {}
+        self._adapters: Dict[str, TypeAdapter] = {}
+
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"  # start -> key -> colon -> value -> ... -> done
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        # Position inside a top-level array value, for per-item callbacks
+        self._in_array = False
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+
+    @property
+    def started(self) -> bool:
+        return self._state != "start"
+
+    @property
+    def complete(self) -> bool:
+        """True once the closing brace of the top-level object was seen"""
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (field, value) pairs it completed"""
+        if not chunk or self._state == "done":
+            return []
+        offset = len(self.text)
+        self.text += chunk
+        completed = []
+
+        for i, char in enumerate(chunk, offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        self._key = json.loads(self.text[self._key_start:i + 1])
+                        self._state = "colon"
+                continue
+
+            if self._state == "start":
+                if char == "{":
+                    self._depth = 1
+                    self._state = "key"
+                continue
+
+            if self._in_array and self._depth == 2 and self._item_start is None \
+                    and not char.isspace() and char not in ",]":
+                self._item_start = i
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._key_start = i
+                elif self._depth == 1 and self._state == "value" and self._value_start is None:
+                    self._value_start = i
+            elif char in "{[":
+                if self._depth == 1 and self._state == "value" and self._value_start is None:
+                    self._value_start = i
+                    self._in_array = char == "["
+                    self._item_start, self._item_index = None, 0
+                self._depth += 1
+            elif char in "}]":
+                if self._in_array and self._depth == 2:
+                    self._finish_item(i)
+                    self._in_array = False
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._finish_value(i))
+                    self._state = "done"
+                    break
+            elif self._in_array and self._depth == 2 and char == ",":
+                self._finish_item(i)
+            elif self._depth == 1:
+                if char == ":" and self._state == "colon":
+                    self._state = "value"
+                    self._value_start = None
+                elif char == ",":
+                    completed.extend(self._finish_value(i))
+                    self._state = "key"
+                elif self._state == "value" and self._value_start is None and not char.isspace():
+                    self._value_start = i
+        return completed
+
+    def _finish_item(self, end: int):
+        if self._item_start is None:
+            return
+        raw = self.text[self._item_start:end].strip()
+        self._item_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.items.setdefault(self._key, []).append(value)
+        if self.on_item:
+            self.on_item(self._key, self._item_index, value)
+        self._item_index += 1
+
+    def _finish_value(self, end: int) -> List[Tuple[str, Any]]:
+        if self._key is None or self._value_start is None:
+            return []
+        key, raw = self._key, self.text[self._value_start:end].strip()
+        self._key = self._value_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            self.errors[key] = f"invalid JSON: {e}"
+            return []
+
+        adapter = self._adapter(key)
+        if adapter is not None:
+            try:
+                value = adapter.validate_python(value)
+            except ValidationError as e:
+                self.errors[key] = str(e.errors()[0]["msg"])
+                return []
+
+        self.fields[key] = value
+        if self.on_field:
+            self.on_field(key, value)
+        return [(key, value)]
+
+    def _adapter(self, key: str) -> Optional[TypeAdapter]:
+        if self.model is None or key not in self.model.model_fields:
+            return None
+        if key not in self._adapters:
+            # Keep Field constraints such as ge/le on confidence_score
+            field = self.model.model_fields[key]
+            annotation = Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+            self._adapters[key] = TypeAdapter(annotation)
+        return self._adapters[key]
@@ -0,0 +1,174 @@
+"""
+Tests for the analyzer service: cross-shard de-duplication, the shared worker pool, polling and SSE results
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import analyzer_service
+from analyzer_service import AnalyzerService, BackgroundServer, post_failures, stream_results
+
+FAILURES = [
+    {"test_name": "har.spec.ts", "error": "Status 500 from /api/crypto/results"},
+    {"test_name": "auth.spec.ts", "error": "Session cookie missing after login redirect"},
+    {"test_name": "dashboard.spec.ts", "error": "Chart legend overlaps the table header"},
+]
+
+
+class CountingAnalyzer:
+    """Stands in for the LLM pipeline: records each analyzed failure, optionally slowly or failing"""
+
+    def __init__(self, delay: float = 0.0, fail_first: bool = False):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, failure):
+        with self._lock:
+            self.calls.append(failure["error"])
+            fail = self.fail_first and len(self.calls) == 1
+        time.sleep(self.delay)
+        if fail:
+            raise RuntimeError("model unavailable")
+        return {"severity": "HIGH", "root_causes": [f"cause of {failure['error']}"]}
+
+
+def get_json(url: str):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def wait_done(base_url: str, timeout: float = 5.0) -> dict:
+    end = time.monotonic() + timeout
+    while True:
+        results = get_json(f"{base_url}/results")
+        if not results["pending"] or time.monotonic() > end:
+            return results
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def analyzer():
+    return CountingAnalyzer()
+
+
+@pytest.fixture
+def server(analyzer):
+    with BackgroundServer(AnalyzerService(analyzer, max_workers=4)) as server:
+        yield server
+
+
+class TestIngestion:
+    def test_shards_reporting_the_same_failure_share_one_analysis(self, server, analyzer):
+        jobs = [post_failures(FAILURES, shard=str(shard), base_url=server.base_url) for shard in range(20)]
+
+        assert [job["duplicate"] for job in jobs[0]] == [False] * 3
+        assert all(job["duplicate"] for shard_jobs in jobs[1:] for job in shard_jobs)
+        results = wait_done(server.base_url)
+        assert sorted(analyzer.calls) == sorted(f["error"] for f in FAILURES)
+        assert all(len(job["shards"]) == 20 and job["submissions"] == 20 for job in results["jobs"])
+
+    def test_fingerprint_ignores_run_specific_numbers(self, server, analyzer):
+        post_failures([{"test_name": "crypto.results.spec.ts", "error": "Timeout 30000ms exceeded"}], "1",
+                      server.base_url)
+        jobs = post_failures([{"test_name": "crypto.results.spec.ts", "error": "Timeout 45000ms exceeded"}], "2",
+                             server.base_url)
+        assert jobs[0]["duplicate"]
+
+    def test_invalid_payloads_are_rejected(self, server):
+        for body in (b"not json", json.dumps({"failures": [{"test_name": "x.spec.ts"}]}).encode()):
+            request = urllib.request.Request(f"{server.base_url}/failures", data=body, method="POST")
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(request, timeout=10)
+            assert error.value.code == 400
+
+    def test_failed_analyses_are_retried_on_resubmission(self):
+        analyzer = CountingAnalyzer(fail_first=True)
+        with BackgroundServer(AnalyzerService(analyzer)) as server:
+            fingerprint = post_failures(FAILURES[:1], "1", server.base_url)[0]["fingerprint"]
+            assert wait_done(server.base_url)["jobs"][0]["status"] == "error"
+            assert not post_failures(FAILURES[:1], "2", server.base_url)[0]["duplicate"]
+            wait_done(server.base_url)
+            assert get_json(f"{server.base_url}/failures/{fingerprint}")["status"] == "done"
+
+
+class TestResults:
+    def test_polling_a_job_and_filtering_by_shard(self, server):
+        fingerprint = post_failures(FAILURES[:1], "7", server.base_url)[0]["fingerprint"]
+        post_failures(FAILURES[1:], "8", server.base_url)
+        wait_done(server.base_url)
+
+        job = get_json(f"{server.base_url}/failures/{fingerprint}")
+        assert job["result"]["root_causes"] == [f"cause of {FAILURES[0]['error']}"]
+        assert [j["fingerprint"] for j in get_json(f"{server.base_url}/results?shard=7")["jobs"]] == [fingerprint]
+        health = get_json(f"{server.base_url}/health")
+        assert (health["jobs"], health["analyzed"], health["pending"]) == (3, 3, 0)
+
+    def test_event_stream_delivers_each_result_and_ends(self):
+        analyzer = CountingAnalyzer(delay=0.2)
+        with BackgroundServer(AnalyzerService(analyzer, max_workers=3)) as server:
+            jobs = post_failures(FAILURES, "1", server.base_url)
+            started = time.perf_counter()
+            events = list(stream_results([job["fingerprint"] for job in jobs], server.base_url, timeout=10))
+
+        # The pool analyzes all three at once, and the stream closes after the last one
+        assert time.perf_counter() - started < 0.5
+        assert sorted(e["fingerprint"] for e in events) == sorted(job["fingerprint"] for job in jobs)
+        assert all(e["status"] == "done" for e in events)
+
+    def test_event_stream_replays_finished_jobs(self, server):
+        jobs = post_failures(FAILURES[:2], "1", server.base_url)
+        wait_done(server.base_url)
+        events = list(stream_results([job["fingerprint"] for job in jobs], server.base_url, timeout=10))
+        assert len(events) == 2
+
+    def test_event_stream_ends_for_unknown_fingerprints(self):
+        with BackgroundServer(AnalyzerService(CountingAnalyzer(delay=0.2))) as server:
+            fingerprint = post_failures(FAILURES[:1], "1", server.base_url)[0]["fingerprint"]
+            events = list(stream_results(["0123456789abcdef", fingerprint], server.base_url, timeout=10))
+            assert events[0] == {"fingerprint": "0123456789abcdef", "status": "unknown",
+                                 "error": "unknown fingerprint"}
+            assert (events[1]["fingerprint"], events[1]["status"]) == (fingerprint, "done")
+            # Jobs of another shard are unknown to this shard's stream
+            with urllib.request.urlopen(f"{server.base_url}/events?shard=2&fingerprints={fingerprint}",
+                                        timeout=10) as response:
+                assert b"event: unknown" in response.read()
+
+    def test_unknown_routes_and_fingerprints_are_404(self, server):
+        for path in ("/failures/0123456789abcdef", "/nope"):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f"{server.base_url}{path}", timeout=10)
+            assert error.value.code == 404
+
+
+class TestSubmit:
+    def test_unreadable_failure_directories_are_skipped(self, server, analyzer, tmp_path, capsys):
+        readable = tmp_path / "Tests-har-API-Test-Crypto-Results-chromium"
+        readable.mkdir()
+        (readable / "test-failed-1.png").write_bytes(b"png")
+        # Half-written screenshots: not images yet
+        unreadable = tmp_path / "Tests-visual-Results-page-chromium"
+        unreadable.mkdir()
+        for name in ("results-page-expected.png", "results-page-actual.png"):
+            (unreadable / name).write_bytes(b"\x89PNG")
+
+        assert analyzer_service.main(["submit", str(tmp_path), "--url", server.base_url]) == 0
+        out = capsys.readouterr().out
+        assert f"⚠️  Skipped {unreadable.name}" in out and "Submitted 1 failures" in out
+        wait_done(server.base_url)
+        assert len(analyzer.calls) == 1 and readable.name in analyzer.calls[0]
+
+    def test_nothing_readable_is_an_error(self, server, tmp_path, capsys):
+        unreadable = tmp_path / "Tests-visual-Results-page-chromium"
+        unreadable.mkdir()
+        for name in ("results-page-expected.png", "results-page-actual.png"):
+            (unreadable / name).write_bytes(b"\x89PNG")
+
+        assert analyzer_service.main(["submit", str(tmp_path), "--url", server.base_url]) == 1
+        assert "No readable failures" in capsys.readouterr().out
@@ -0,0 +1,206 @@
+"""
+Tests for analyzer telemetry: span nesting and trace ids, cumulative histogram buckets and the exporters
+"""
+
+import contextvars
+import json
+import re
+import threading
+
+import pytest
+
+import analyzer_telemetry
+import main
+from analyzer_telemetry import (COUNT_BUCKETS, DEFAULT_BUCKETS, RATIO_BUCKETS, STAGE_DURATION_METRIC, JsonlExporter,
+                                MetricsRegistry, PrometheusTextExporter, Telemetry)
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def samples(text: str) -> dict:
+    """{(metric name, labels text): value} from Prometheus text"""
+    parsed = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        parsed[(name, labels or "")] = float(value)
+    return parsed
+
+
+class TestSpans:
+    def test_children_share_the_trace_and_point_at_their_parent(self):
+        telemetry = Telemetry()
+        with telemetry.span("analyze", test_name="a.spec.ts") as root:
+            with telemetry.span("retrieve") as child:
+                with telemetry.span("embed") as grandchild:
+                    assert telemetry.current_span() is grandchild
+                assert telemetry.current_span() is child
+            with telemetry.span("validate") as sibling:
+                pass
+        assert telemetry.current_span() is None
+
+        assert {root.trace_id} == {child.trace_id, grandchild.trace_id, sibling.trace_id}
+        assert (root.parent_id, child.parent_id, grandchild.parent_id, sibling.parent_id) == (
+            None, root.span_id, child.span_id, root.span_id)
+        # Spans are exported as they end, innermost first
+        assert [s["name"] for s in telemetry.memory.finished()] == ["embed", "retrieve", "validate", "analyze"]
+
+    def test_separate_roots_are_separate_traces(self):
+        telemetry = Telemetry()
+        with telemetry.span("first") as first:
+            pass
+        with telemetry.span("second") as second:
+            pass
+        assert first.trace_id != second.trace_id and second.parent_id is None
+
+    def test_error_marks_the_span_and_restores_its_parent(self):
+        telemetry = Telemetry()
+        with telemetry.span("analyze") as root:
+            with pytest.raises(ValueError):
+                with telemetry.span("parse"):
+                    raise ValueError("bad JSON")
+            assert telemetry.current_span() is root
+        parse = telemetry.memory.finished("parse")[0]
+        assert parse["status"] == "error" and parse["attributes"]["error"] == "ValueError: bad JSON"
+        assert telemetry.memory.finished("analyze")[0]["status"] == "ok"
+
+    def test_threads_start_their_own_trace_unless_given_the_context(self):
+        telemetry = Telemetry()
+        seen = {}
+
+        def work(key):
+            with telemetry.span(key) as span:
+                seen[key] = span
+
+        with telemetry.span("run") as root:
+            plain = threading.Thread(target=work, args=("plain",))
+            context = contextvars.copy_context()
+            inherited = threading.Thread(target=context.run, args=(work, "inherited"))
+            for thread in (plain, inherited):
+                thread.start()
+                thread.join()
+
+        assert seen["plain"].parent_id is None and seen["plain"].trace_id != root.trace_id
+        assert (seen["inherited"].trace_id, seen["inherited"].parent_id) == (root.trace_id, root.span_id)
+
+    def test_every_stage_of_an_analysis_is_one_trace(self, monkeypatch, fake_model):
+        telemetry = Telemetry()
+        monkeypatch.setattr(analyzer_telemetry, "_telemetry", telemetry)
+        fake_model()
+        main.analyze_test_failure("dashboard.spec.ts", "Widget 3 shows the wrong label", use_tier0=False)
+
+        spans = telemetry.memory.finished()
+        root = telemetry.memory.finished("analyze_test_failure")[0]
+        assert {s["trace_id"] for s in spans} == {root["trace_id"]}
+        by_id = {s["span_id"]: s for s in spans}
+        assert all(s["parent_id"] in by_id for s in spans if s is not root)
+        assert by_id[telemetry.memory.finished("llm.invoke")[0]["parent_id"]]["name"] == "analyze_test_failure"
+        assert {"retrieve", "build_prompt", "llm.invoke", "extract_json", "validate"} <= {s["name"] for s in spans}
+
+
+class TestMetrics:
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = MetricsRegistry(buckets=(0.01, 0.1, 1.0))
+        for value in (0.005, 0.01, 0.05, 0.5, 0.7, 3.0):
+            metrics.observe("latency_seconds", value, model="m")
+        text = PrometheusTextExporter().render(metrics)
+        parsed = samples(text)
+
+        buckets = [parsed[("latency_seconds_bucket", f'model="m",le="{le}"')] for le in ("0.01", "0.1", "1", "+Inf")]
+        assert buckets == [2, 3, 5, 6]
+        assert parsed[("latency_seconds_count", 'model="m"')] == 6
+        assert parsed[("latency_seconds_sum", 'model="m"')] == pytest.approx(4.265)
+        assert "# TYPE latency_seconds histogram" in text
+
+    def test_each_histogram_keeps_its_own_buckets(self):
+        metrics = MetricsRegistry()
+        metrics.observe("latency_seconds", 0.2)
+        for ratio in (0.0, 0.3, 0.95):
+            metrics.observe("cached_ratio", ratio, RATIO_BUCKETS, model="m")
+        metrics.observe("turns", 3, COUNT_BUCKETS)
+        metrics.observe("turns", 2)
+        parsed = samples(PrometheusTextExporter().render(metrics))
+
+        les = {name: [labels.split('le="')[1][:-1] for (sample, labels) in parsed if sample == f"{name}_bucket"]
+               for name in ("latency_seconds", "cached_ratio", "turns")}
+        assert les == {"latency_seconds": [f"{b:g}" for b in DEFAULT_BUCKETS] + ["+Inf"],
+                       "cached_ratio": [f"{b:g}" for b in RATIO_BUCKETS] + ["+Inf"],
+                       "turns": [f"{b:g}" for b in COUNT_BUCKETS] + ["+Inf"]}
+        assert [parsed[("cached_ratio_bucket", f'model="m",le="{le}"')] for le in ("0", "0.25", "0.5", "1")] == [
+            1, 1, 2, 3]
+        assert parsed[("turns_bucket", 'le="2"')] == 1 and parsed[("turns_bucket", 'le="3"')] == 2
+
+    def test_buckets_cannot_change_after_the_first_observation(self):
+        metrics = MetricsRegistry()
+        metrics.observe("turns", 1, COUNT_BUCKETS)
+        with pytest.raises(ValueError, match="already uses buckets"):
+            metrics.observe("turns", 1, RATIO_BUCKETS)
+
+    def test_analysis_histograms_use_count_buckets(self, monkeypatch, fake_model):
+        telemetry = Telemetry()
+        monkeypatch.setattr(analyzer_telemetry, "_telemetry", telemetry)
+        fake_model()
+        main.analyze_test_failure("dashboard.spec.ts", "Widget 3 shows the wrong label", use_tier0=False)
+
+        buckets = telemetry.metrics.snapshot()["histogram_buckets"]
+        assert buckets["analyzer_model_turns"] == COUNT_BUCKETS
+        assert buckets[STAGE_DURATION_METRIC] == DEFAULT_BUCKETS
+
+    def test_counters_by_label_set(self):
+        metrics = MetricsRegistry()
+        metrics.incr("calls_total", model="a", severity="HIGH")
+        metrics.incr("calls_total", 2, severity="HIGH", model="a")
+        metrics.incr("calls_total", model="b", severity="LOW")
+
+        assert metrics.counter_value("calls_total", model="a", severity="HIGH") == 3
+        parsed = samples(PrometheusTextExporter().render(metrics))
+        assert parsed == {("calls_total", 'model="a",severity="HIGH"'): 3,
+                          ("calls_total", 'model="b",severity="LOW"'): 1}
+
+    def test_label_values_are_escaped(self):
+        metrics = MetricsRegistry()
+        metrics.incr("errors_total", error='say "hi"\\n')
+        assert 'errors_total{error="say \\"hi\\"\\\\n"} 1' in PrometheusTextExporter().render(metrics)
+
+    def test_span_durations_feed_the_stage_histogram(self):
+        telemetry = Telemetry()
+        for _ in range(3):
+            with telemetry.span("retrieve"):
+                pass
+        series = telemetry.metrics.snapshot()["histograms"][STAGE_DURATION_METRIC][(("stage", "retrieve"),)]
+        assert series["count"] == 3 and series["buckets"][-1] == 3
+        assert telemetry.stage_summary()["retrieve"]["count"] == 3
+
+
+class TestExporters:
+    def test_jsonl_exporter_writes_one_line_per_span(self, tmp_path):
+        path = tmp_path / "spans.jsonl"
+        telemetry = Telemetry([JsonlExporter(str(path))])
+        with telemetry.span("analyze", test_name="a.spec.ts") as root:
+            with telemetry.span("llm.invoke", model="gpt-4o-mini") as span:
+                span.set_attribute("tokens_out", 120)
+                span.add_event("parse_fallback", reason="incomplete_json")
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["name"] for line in lines] == ["llm.invoke", "analyze"]
+        child, parent = lines
+        assert child["trace_id"] == parent["trace_id"] == root.trace_id
+        assert child["parent_id"] == parent["span_id"] and parent["parent_id"] is None
+        assert child["attributes"] == {"model": "gpt-4o-mini", "tokens_out": 120}
+        assert child["events"][0]["name"] == "parse_fallback"
+        assert child["events"][0]["attributes"] == {"reason": "incomplete_json"}
+        assert child["status"] == "ok" and child["duration_ms"] >= 0 and child["start_time_ns"] > 0
+
+    def test_exporters_from_the_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("ANALYZER_TRACE_FILE", str(tmp_path / "spans.jsonl"))
+        monkeypatch.setenv("ANALYZER_METRICS_FILE", str(tmp_path / "metrics.prom"))
+        telemetry = Telemetry.from_env()
+        with telemetry.span("tier0"):
+            telemetry.incr("analyzer_analyses_total", outcome="tier0")
+        telemetry.flush()
+
+        assert json.loads((tmp_path / "spans.jsonl").read_text())["name"] == "tier0"
+        parsed = samples((tmp_path / "metrics.prom").read_text())
+        assert parsed[("analyzer_analyses_total", 'outcome="tier0"')] == 1
+        assert parsed[(f"{STAGE_DURATION_METRIC}_count", 'stage="tier0"')] == 1
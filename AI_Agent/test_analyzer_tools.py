@@ -14,6 +14,11 @@ class ErrorPatternMatcher:
         "TIMEOUT_SELECTOR": {
             "keywords": ["timeout", "selector", "element", "wait"],
             "severity": "HIGH",
+            "root_causes": [
+                "Element did not appear within the timeout (slow load or async rendering)",
+                "Selector no longer matches the DOM after a UI change",
+                "Element is inside an iframe or shadow DOM"
+            ],
             "solutions": [
                 "Increase timeout in playwright.config.ts to 90s+",
                 "Use waitForLoadState('networkidle') before interactions",
@@ -25,6 +30,11 @@ class ErrorPatternMatcher:
         "ASSERTION_MISMATCH": {
             "keywords": ["assertion", "expected", "actual", "equal", "match"],
             "severity": "MEDIUM",
+            "root_causes": [
+                "Application behavior changed and the expected value is outdated",
+                "Test data differs from what the assertion assumes",
+                "Type or formatting mismatch between actual and expected values"
+            ],
             "solutions": [
                 "Log actual vs expected values with console.log",
                 "Check for data type mismatch (string vs number)",
@@ -36,6 +46,11 @@ class ErrorPatternMatcher:
         "API_500": {
             "keywords": ["500", "internal server error", "backend"],
             "severity": "CRITICAL",
+            "root_causes": [
+                "Unhandled exception in the backend endpoint",
+                "Database or downstream service unavailable",
+                "Test data missing on the server"
+            ],
             "solutions": [
                 "Check server logs for exception traces",
                 "Verify database is accessible and not overloaded",
@@ -47,6 +62,11 @@ class ErrorPatternMatcher:
         "API_VALIDATION": {
             "keywords": ["response", "validation", "schema", "parse"],
             "severity": "MEDIUM",
+            "root_causes": [
+                "API response no longer matches the expected schema",
+                "Malformed or non-JSON response body",
+                "Null or missing fields in the response"
+            ],
             "solutions": [
                 "Verify API response structure matches schema",
                 "Check for null/undefined fields in response",
@@ -58,6 +78,11 @@ class ErrorPatternMatcher:
         "ASYNC_PROMISE": {
             "keywords": ["async", "promise", "await", "callback", "async operation"],
             "severity": "HIGH",
+            "root_causes": [
+                "Missing await on an asynchronous operation",
+                "Unhandled promise rejection",
+                "Race between parallel async operations"
+            ],
             "solutions": [
                 "Ensure all async operations have await statements",
                 "Check for unhandled promise rejections",
@@ -69,6 +94,10 @@ class ErrorPatternMatcher:
         "NULL_REFERENCE": {
             "keywords": ["cannot read property", "null", "undefined", "no property"],
             "severity": "MEDIUM",
+            "root_causes": [
+                "Property accessed on a null or undefined object",
+                "Data or DOM element not initialized before use"
+            ],
             "solutions": [
                 "Add null/undefined checks before accessing properties",
                 "Use optional chaining (?.) operator",
@@ -80,6 +109,11 @@ class ErrorPatternMatcher:
         "NAVIGATION": {
             "keywords": ["navigation", "url", "redirect", "page not found", "404"],
             "severity": "HIGH",
+            "root_causes": [
+                "Wrong base URL for the test environment",
+                "Unexpected redirect (e.g. expired session)",
+                "Page does not exist or returned 404"
+            ],
             "solutions": [
                 "Verify base URL is correct for test environment",
                 "Check if page redirects happened before assertion",
@@ -91,6 +125,11 @@ class ErrorPatternMatcher:
         "PERMISSION": {
             "keywords": ["permission", "unauthorized", "403", "401", "access denied"],
             "severity": "CRITICAL",
+            "root_causes": [
+                "Test user lacks the required role or permission",
+                "Authentication token missing or expired",
+                "Feature flag or access rule disabled for the user"
+            ],
             "solutions": [
                 "Verify test user credentials are correct",
                 "Check if user role has required permissions",
@@ -102,6 +141,11 @@ class ErrorPatternMatcher:
         "FLAKINESS": {
             "keywords": ["intermittent", "sometimes passes", "race condition", "timing"],
             "severity": "HIGH",
+            "root_causes": [
+                "Race condition between test steps and application state",
+                "Shared state between tests (insufficient isolation)",
+                "Timing-dependent waits on dynamic content"
+            ],
             "solutions": [
                 "Increase wait times for dynamic content",
                 "Ensure proper test isolation and cleanup",
@@ -139,6 +183,31 @@ class ErrorPatternMatcher:
         
         return best_match
     
+    @classmethod
+    def score_patterns(cls, error_message: str) -> List[Tuple[str, int]]:
+        """
+        Keyword match count for every pattern, best first
+        Ties keep PATTERNS order, the same winner match_pattern picks
+        """
+        error_lower = error_message.lower()
+        scores = [
+            (pattern_name, sum(1 for kw in pattern_config["keywords"] if kw in error_lower))
+            for pattern_name, pattern_config in cls.PATTERNS.items()
+        ]
+        return sorted(scores, key=lambda item: -item[1])
+
+    @classmethod
+    def match_strength(cls, error_message: str) -> Tuple[str, int]:
+        """
+        Return (best_pattern, strength) where strength is the best keyword
+        count plus its margin over the runner-up; 0 means no match
+        """
+        scores = cls.score_patterns(error_message)
+        (best, best_score), runner_up = scores[0], scores[1][1] if len(scores) > 1 else 0
+        if best_score == 0:
+            return "UNKNOWN", 0
+        return best, best_score + (best_score - runner_up)
+
     @classmethod
     def get_all_patterns(cls) -> Dict:
         """Return all available patterns"""
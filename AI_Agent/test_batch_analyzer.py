@@ -0,0 +1,119 @@
+"""
+Tests for nightly batch analysis, against the fake OpenAI Batch endpoint
+"""
+
+import json
+
+import pytest
+
+from batch_analyzer import BatchAnalyzer, OpenAIBatchClient, failure_fingerprint
+from fake_openai_server import FakeOpenAIServer
+
+# Ambiguous failures the tier-0 analyzer escalates to the model
+FAILURES = [
+    {"test_name": "accessibility.spec.ts", "error": "Color contrast ratio 3.5:1 does not meet AA standard of 4.5:1"},
+    {"test_name": "accessibility.spec.ts", "error": "WCAG violation: Dropdown missing required ARIA role 'combobox'"},
+    {"test_name": "dashboard.spec.ts", "error": "Chart legend overlaps the table header"},
+]
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+def make_analyzer(server, tmp_path, **options) -> BatchAnalyzer:
+    return BatchAnalyzer(OpenAIBatchClient(base_url=server.base_url, api_key="test"),
+                         state_path=str(tmp_path / "state.json"), poll_interval=0.05, **options)
+
+
+class TestFingerprint:
+    def test_volatile_numbers_do_not_change_the_fingerprint(self):
+        assert failure_fingerprint("a.spec.ts", "Timeout 30000ms at line 12") == \
+            failure_fingerprint("a.spec.ts", "Timeout  5000ms at line 80")
+        assert failure_fingerprint("a.spec.ts", "Timeout") != failure_fingerprint("b.spec.ts", "Timeout")
+
+
+class TestBatchRun:
+    def test_results_are_keyed_by_fingerprint(self, server, tmp_path):
+        results = make_analyzer(server, tmp_path).run(FAILURES)
+
+        assert set(results) == {failure_fingerprint(f["test_name"], f["error"]) for f in FAILURES}
+        analysis = results[failure_fingerprint(FAILURES[2]["test_name"], FAILURES[2]["error"])]
+        assert analysis.test_name == "dashboard.spec.ts"
+        assert analysis.error_message == FAILURES[2]["error"]
+        assert analysis.severity == "HIGH"
+        assert len(server.app.batches) == 1
+
+    def test_job_file_holds_one_json_mode_request_per_failure(self, server, tmp_path):
+        analyzer = make_analyzer(server, tmp_path)
+        analyzer.add(FAILURES + FAILURES[:1])
+        batch = analyzer.prepare()
+
+        with open(batch["input_file"]) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 3
+        assert {line["custom_id"] for line in lines} == set(batch["custom_ids"])
+        assert all(line["body"]["response_format"] == {"type": "json_object"} for line in lines)
+
+    def test_confident_pattern_matches_never_reach_the_batch(self, server, tmp_path):
+        confident = {"test_name": "crypto.results.spec.ts",
+                     "error": "Timeout waiting for element with selector '.crypto-tab'"}
+        results = make_analyzer(server, tmp_path).run([confident] + FAILURES[:1])
+
+        assert len(results) == 2
+        [batch] = server.app.batches.values()
+        assert batch["request_counts"]["total"] == 1
+
+    def test_second_run_sends_only_new_failures(self, server, tmp_path):
+        make_analyzer(server, tmp_path).run(FAILURES[:2])
+        results = make_analyzer(server, tmp_path).run(FAILURES)
+
+        assert len(results) == 3
+        totals = [b["request_counts"]["total"] for b in server.app.batches.values()]
+        assert totals == [2, 1]
+
+
+class TestResume:
+    def test_interrupted_run_resumes_polling_without_resubmitting(self, tmp_path):
+        with FakeOpenAIServer(batch_delay=0.3) as server:
+            first = make_analyzer(server, tmp_path)
+            assert first.run(FAILURES, timeout=0) == {}
+            assert first.state["batches"][0]["status"] in ("validating", "in_progress")
+
+            # A new process picks the same batch up from the state file
+            results = make_analyzer(server, tmp_path).run(FAILURES, timeout=5)
+
+        assert len(results) == 3
+        assert len(server.app.batches) == 1
+        assert len([f for f in server.app.files.values() if f["purpose"] == "batch"]) == 1
+
+    def test_upload_is_not_repeated_when_batch_creation_failed(self, server, tmp_path):
+        analyzer = make_analyzer(server, tmp_path)
+        analyzer.add(FAILURES)
+        analyzer.prepare()
+
+        def network_down(*args, **kwargs):
+            raise ConnectionError("network down")
+
+        analyzer.client.create_batch = network_down
+        with pytest.raises(ConnectionError):
+            analyzer.submit()
+
+        resumed = make_analyzer(server, tmp_path)
+        assert resumed.state["batches"][0]["input_file_id"]
+        assert len(resumed.run(FAILURES)) == 3
+        assert len([f for f in server.app.files.values() if f["purpose"] == "batch"]) == 1
+
+    def test_failed_requests_are_recorded_and_retried_next_run(self, tmp_path):
+        with FakeOpenAIServer(error_rate=0.5, seed=2) as server:
+            analyzer = make_analyzer(server, tmp_path)
+            results = analyzer.run(FAILURES)
+            assert 0 < len(analyzer.state["errors"]) < 3
+            assert len(results) + len(analyzer.state["errors"]) == 3
+
+            server.app.error_rate = 0.0
+            retried = make_analyzer(server, tmp_path)
+            assert len(retried.run(FAILURES)) == 3
+            assert retried.state["errors"] == {}
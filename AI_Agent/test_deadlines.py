@@ -0,0 +1,128 @@
+"""
+Tests for run deadlines: per-call timeouts, dropped and unretried calls, cancelled streams and on-time fallbacks
+"""
+
+import json
+import time
+
+import pytest
+
+import main
+import rate_limiter
+from deadlines import Deadline, DeadlineExceeded
+from rate_limiter import RequestScheduler
+
+ANALYSIS = json.dumps({"severity": "HIGH", "confidence_score": 0.9, "root_causes": ["Slow backend"],
+                       "affected_areas": ["results"], "recommended_actions": ["Check API latency"]})
+
+FAILURES = [
+    {"test_name": "dashboard.spec.ts", "error": "Widget 3 shows the wrong label"},
+    {"test_name": "auth.spec.ts", "error": "Session cookie missing after login redirect"},
+    {"test_name": "har.spec.ts", "error": "API Response validation failed: Status 500 from /api/crypto/results"},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    scheduler = RequestScheduler(max_concurrency=8)
+    monkeypatch.setattr(rate_limiter, "_scheduler", scheduler)
+    yield
+    scheduler.shutdown(wait=False)
+
+
+@pytest.fixture
+def model(fake_model):
+    """Streams ANALYSIS 8 characters at a time; tests set chunk_delay to slow it down"""
+    return fake_model(replies=[ANALYSIS], chunk_size=8)
+
+
+class TestDeadline:
+    def test_remaining_time_and_call_timeout(self):
+        clock = FakeClock()
+        deadline = Deadline(seconds=10, per_call=4, clock=clock)
+        assert deadline.call_timeout() == 4
+        clock.now = 8.0
+        assert deadline.remaining() == pytest.approx(2.0)
+        assert deadline.call_timeout() == pytest.approx(2.0)
+        clock.now = 12.0
+        assert deadline.expired() and deadline.remaining() == 0.0
+        with pytest.raises(DeadlineExceeded):
+            deadline.check()
+
+    def test_no_limit_and_cancellation(self):
+        deadline = Deadline(per_call=30)
+        assert deadline.remaining() is None and not deadline.expired()
+        deadline.cancel()
+        assert deadline.expired()
+
+
+class TestScheduler:
+    def test_queued_call_is_dropped_at_the_deadline(self):
+        scheduler = RequestScheduler(max_concurrency=1)
+        blocker = scheduler.submit(lambda: time.sleep(0.5))
+        started = time.perf_counter()
+        late = scheduler.submit(lambda: "too late", deadline=Deadline(seconds=0.1))
+        with pytest.raises(DeadlineExceeded):
+            late.result(timeout=5)
+        assert time.perf_counter() - started < 0.4
+        blocker.result(timeout=5)
+        scheduler.shutdown()
+        assert scheduler.stats["expired"] == 1
+
+    def test_no_retry_past_the_deadline(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(time.perf_counter())
+            raise ConnectionResetError()
+
+        scheduler = RequestScheduler(base_delay=5.0, max_delay=5.0, seed=1)
+        with pytest.raises(ConnectionResetError):
+            scheduler.run(flaky, deadline=Deadline(seconds=0.5))
+        scheduler.shutdown()
+        assert len(attempts) == 1
+        assert scheduler.stats["retries"] == 0
+
+
+class TestStreaming:
+    def test_stream_is_closed_at_the_deadline(self, model):
+        model.chunk_delay = 0.05
+        deadline = Deadline(seconds=0.2, per_call=10)
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            main._stream_model_analysis(model, "Analyze this", "HIGH", deadline=deadline)
+        assert time.perf_counter() - started < 0.5
+        assert model.timeouts[0] <= 0.2
+
+    def test_late_answer_falls_back_to_the_pattern_analysis(self, model):
+        model.chunk_delay = 0.05
+        result = main.analyze_test_failure(FAILURES[0]["test_name"], FAILURES[0]["error"],
+                                           deadline=Deadline(seconds=0.2))
+        assert result.error_message == FAILURES[0]["error"]
+        assert result.root_causes != ["Slow backend"]
+
+
+class TestAnalyzeMany:
+    def test_most_severe_failures_are_analyzed_first(self, model):
+        results = main.analyze_many(FAILURES, max_workers=1, deadline=Deadline(seconds=30))
+        assert [r.error_message for r in results] == [f["error"] for f in FAILURES]
+        assert [next(f["test_name"] for f in FAILURES if f["error"] in p) for p in model.prompts] == \
+            ["har.spec.ts", "auth.spec.ts", "dashboard.spec.ts"]
+
+    def test_run_finishes_on_time_with_pattern_fallbacks(self, model):
+        model.chunk_delay = 0.1
+        failures = FAILURES * 4
+        started = time.perf_counter()
+        results = main.analyze_many(failures, max_workers=4, deadline=Deadline(seconds=0.3))
+
+        assert time.perf_counter() - started < 0.6
+        assert [r.error_message for r in results] == [f["error"] for f in failures]
+        assert all(r.root_causes != ["Slow backend"] for r in results)
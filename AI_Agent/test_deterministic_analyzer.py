@@ -0,0 +1,89 @@
+"""
+Tests for the tier-0 analyzer on failures held out of its calibration set
+"""
+
+import pytest
+
+import main
+from deterministic_analyzer import (CALIBRATION_FAILURES, TARGET_PRECISION, ErrorPatternMatcher,
+                                    analyze_deterministically, calibrate, strength_threshold)
+
+# Labeled like CALIBRATION_FAILURES, but never used to calibrate
+HELD_OUT_FAILURES = [
+    ("Timeout 15000ms exceeded waiting for element '#login-button' to be visible", "TIMEOUT_SELECTOR"),
+    ("waiting for selector '.price-cell' failed: timeout 10000ms exceeded", "TIMEOUT_SELECTOR"),
+    ("GET /api/crypto/prices returned status 500 Internal Server Error", "API_500"),
+    ("Backend responded with 500 internal server error on /api/portfolio", "API_500"),
+    ("401 Unauthorized: session token expired for /api/account", "PERMISSION"),
+    ("403 Forbidden: access denied to /admin for role guest", "PERMISSION"),
+    ("AssertionError: expected 'USD' but actual value was 'EUR'", "ASSERTION_MISMATCH"),
+    ("page.goto: net::ERR_ABORTED; navigation to /settings was redirected", "NAVIGATION"),
+    ("TypeError: Cannot read properties of null (reading 'textContent')", "NULL_REFERENCE"),
+    ("expect(received).toBe(expected): expected 5 but received 4", "ASSERTION_MISMATCH"),
+    ("Failed to parse JSON response: Unexpected end of JSON input", "API_VALIDATION"),
+    # Ambiguous: the best keyword match is the wrong pattern
+    ("Timeout 30000ms exceeded while loading async chart data", "ASYNC_PROMISE"),
+    ("Error: 500 status while waiting for selector '.row'", "API_500"),
+    ("Widget 3 shows the wrong label", "UNKNOWN"),
+]
+
+
+def strength(error_message: str) -> int:
+    return ErrorPatternMatcher.match_strength(error_message)[1]
+
+
+@pytest.fixture(autouse=True)
+def calibrated_threshold(monkeypatch):
+    monkeypatch.delenv("ANALYZER_TIER0_MIN_STRENGTH", raising=False)
+
+
+class TestHeldOut:
+    def test_held_out_failures_are_not_in_the_calibration_set(self):
+        calibration_messages = {message for message, _ in CALIBRATION_FAILURES}
+        assert not calibration_messages & {message for message, _ in HELD_OUT_FAILURES}
+        # Both sides of the threshold are exercised
+        threshold = strength_threshold()
+        assert {strength(message) >= threshold for message, _ in HELD_OUT_FAILURES} == {True, False}
+
+    def test_above_threshold_matches_answer_locally_and_correctly(self):
+        threshold = strength_threshold()
+        answered = [(analyze_deterministically("results.spec.ts", message), label)
+                    for message, label in HELD_OUT_FAILURES if strength(message) >= threshold]
+
+        assert answered and all(fields is not None for fields, _ in answered)
+        precision = sum(fields["pattern"] == label for fields, label in answered) / len(answered)
+        assert precision >= TARGET_PRECISION
+
+    def test_below_threshold_matches_escalate(self):
+        threshold = strength_threshold()
+        escalated = [message for message, _ in HELD_OUT_FAILURES if strength(message) < threshold]
+
+        assert len(escalated) >= 4
+        assert all(analyze_deterministically("results.spec.ts", message) is None for message in escalated)
+        # Every held-out mistake of the matcher is among them
+        wrong = [message for message, label in HELD_OUT_FAILURES
+                 if ErrorPatternMatcher.match_strength(message)[0] != label]
+        assert wrong and set(wrong) <= set(escalated)
+
+    @pytest.mark.parametrize("fold", [0, 1])
+    def test_threshold_from_half_the_set_holds_on_the_other_half(self, fold):
+        train, test = CALIBRATION_FAILURES[fold::2], CALIBRATION_FAILURES[1 - fold::2]
+        threshold = calibrate(train)["threshold"]
+
+        above = [ErrorPatternMatcher.match_strength(message)[0] == label
+                 for message, label in test if strength(message) >= threshold]
+        assert above and sum(above) / len(above) >= TARGET_PRECISION
+
+
+class TestAnalyzeTestFailure:
+    @pytest.fixture
+    def llm(self, fake_model):
+        return fake_model()
+
+    def test_held_out_strong_match_never_reaches_the_model(self, llm):
+        analysis = main.analyze_test_failure("results.spec.ts", HELD_OUT_FAILURES[2][0])
+        assert llm.prompts == [] and analysis.confidence_score >= 0.8
+
+    def test_held_out_ambiguous_match_reaches_the_model(self, llm):
+        analysis = main.analyze_test_failure("results.spec.ts", HELD_OUT_FAILURES[-2][0])
+        assert len(llm.prompts) == 1 and analysis.root_causes == ["Banner pushed the table down"]
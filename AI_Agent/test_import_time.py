@@ -0,0 +1,86 @@
+"""
+Import-time regression guard: `import main` and the --patterns-only CLI must
+stay free of LangChain, pydantic and NumPy so CI pre-triage starts fast
+
+Environment:
+    ANALYZER_IMPORT_BUDGET_MS=50    cumulative `-X importtime` budget for main
+    ANALYZER_CLI_BUDGET_MS=100      wall time of one --patterns-only run on top of
+                                    bare interpreter startup (site packages vary by host)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMPORT_BUDGET_MS = float(os.getenv("ANALYZER_IMPORT_BUDGET_MS", "50"))
+CLI_BUDGET_MS = float(os.getenv("ANALYZER_CLI_BUDGET_MS", "100"))
+
+HEAVY_MODULES = ["langchain", "langchain_core", "langchain_openai", "openai", "pydantic", "numpy"]
+CLI = ["main.py", "--patterns-only", "--test", "crypto.results.spec.ts",
+       "Timeout waiting for element with selector '.crypto-tab'"]
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=HERE, capture_output=True, text=True, check=True)
+
+
+def loaded_heavy_modules(code: str) -> list:
+    check = f"{code}\nimport sys, json\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    return json.loads(run_python("-c", check).stdout.strip().splitlines()[-1])
+
+
+def best_wall_ms(*args: str, runs: int = 3) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_python(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main_import_ms() -> float:
+    """Cumulative import time of main (microseconds in the -X importtime report)"""
+    report = run_python("-X", "importtime", "-c", "import main").stderr
+    for line in report.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace("|", ":", 2).split(":", 3))
+        if name == "main":
+            return int(cumulative) / 1000
+    raise AssertionError(f"main not in importtime report:\n{report}")
+
+
+class TestLazyImports:
+    def test_import_main_loads_no_heavy_dependencies(self):
+        assert loaded_heavy_modules("import main") == []
+
+    def test_patterns_only_run_loads_no_heavy_dependencies(self):
+        code = f"import sys, main\nmain.cli({CLI[1:]!r})"
+        assert loaded_heavy_modules(code) == []
+
+    def test_schema_is_still_importable_from_main(self):
+        assert loaded_heavy_modules("from main import RootCauseAnalysis") == ["pydantic"]
+
+
+class TestStartupBudget:
+    def test_main_import_time_within_budget(self):
+        elapsed = min(main_import_ms() for _ in range(3))
+        assert elapsed < IMPORT_BUDGET_MS, f"import main took {elapsed:.1f} ms (budget {IMPORT_BUDGET_MS} ms)"
+
+    def test_patterns_only_cli_within_budget(self):
+        assert "TIMEOUT" in run_python(*CLI).stdout
+        overhead = best_wall_ms(*CLI) - best_wall_ms("-c", "pass")
+        assert overhead < CLI_BUDGET_MS, f"CLI took {overhead:.0f} ms over startup (budget {CLI_BUDGET_MS} ms)"
+
+    def test_patterns_only_json_output(self):
+        triage = json.loads(run_python(*CLI, "--json").stdout)
+        assert triage["error_patterns"][0] == "TIMEOUT"
+        assert triage["context"]["module"] == "Crypto Platform"
+        assert triage["debugging_steps"][0].startswith("1.")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,111 @@
+"""
+Tests for multi-model routing: escalation reasons, answer selection and the escalation loop
+"""
+
+import json
+
+import pytest
+
+import main
+import model_router
+import similar_failures
+from model_router import ModelRouter
+
+# local_severity() rates this HIGH: gpt-4o-mini, then gpt-4o below 0.7 confidence
+TEST_NAME, ERROR = "auth.spec.ts", "Session cookie missing after login redirect"
+
+
+def answer(confidence: float, cause: str) -> str:
+    return json.dumps({"severity": "HIGH", "confidence_score": confidence, "root_causes": [cause],
+                       "affected_areas": ["auth"], "recommended_actions": ["Check the cookie domain"]})
+
+
+@pytest.fixture(autouse=True)
+def fresh_router(monkeypatch):
+    monkeypatch.setattr(model_router, "_router", ModelRouter())
+
+
+@pytest.fixture
+def ladder(fake_model):
+    """Install one scripted reply per model of the default ladder"""
+    def install(replies):
+        return {name: fake_model(name, replies=[reply]) for name, reply in replies.items()}
+    return install
+
+
+def analyze(events: list = None):
+    on_field = (lambda name, value: events.append((name, value))) if events is not None else None
+    return main.analyze_test_failure(TEST_NAME, ERROR, use_tier0=False, on_field=on_field)
+
+
+class TestEscalationReason:
+    def test_parse_failures_escalate(self):
+        router = ModelRouter()
+        assert router.escalation_reason("LOW", {"root_causes": ["x"], "confidence_score": 0.9}, "no_json") == "no_json"
+        assert router.escalation_reason("HIGH", {}, "incomplete_json") == "incomplete_json"
+        assert router.escalation_reason("HIGH", {"confidence_score": 0.9}, None) == "missing_root_causes"
+
+    def test_confidence_threshold_per_severity(self):
+        router = ModelRouter()
+        fields = {"root_causes": ["x"], "confidence_score": 0.6}
+        assert router.escalation_reason("HIGH", fields, None) == "low_confidence"
+        assert router.escalation_reason("MEDIUM", fields, None) is None
+        assert router.escalation_reason("LOW", dict(fields, confidence_score=0.0), None) is None
+        assert router.escalation_reason("HIGH", {"root_causes": ["x"]}, None) == "low_confidence"
+        # Unknown severities follow the MEDIUM rule; invalid fields alone do not escalate
+        assert router.escalation_reason("UNKNOWN", fields, "invalid_fields") is None
+
+    def test_policy_override_from_env(self, monkeypatch, tmp_path):
+        policy = tmp_path / "policy.json"
+        policy.write_text(json.dumps({"MEDIUM": {"models": ["gpt-4.1-mini"], "min_confidence": 0.9}}))
+        monkeypatch.setenv("ANALYZER_ROUTING_POLICY", str(policy))
+        router = ModelRouter.from_env()
+        assert router.models_for("MEDIUM") == ["gpt-4.1-mini"]
+        assert router.models_for("HIGH") == ["gpt-4o-mini", "gpt-4o"]
+        assert router.escalation_reason("MEDIUM", {"root_causes": ["x"], "confidence_score": 0.8}, None)
+
+
+    def test_better_answer(self):
+        parsed = {"root_causes": ["x"], "confidence_score": 0.6}
+        assert not ModelRouter.better_answer({"confidence_score": 0.3}, "no_json", parsed, None)
+        assert not ModelRouter.better_answer(dict(parsed, confidence_score=0.5), None, parsed, None)
+        assert ModelRouter.better_answer(dict(parsed, confidence_score=0.9), None, parsed, None)
+        assert ModelRouter.better_answer(parsed, None, parsed, None)
+        assert ModelRouter.better_answer(parsed, None, {"confidence_score": 0.3}, "no_json")
+
+
+class TestEscalationLoop:
+    def test_confident_answer_is_not_escalated(self, ladder):
+        models = ladder({"gpt-4o-mini": answer(0.9, "Cookie domain changed"), "gpt-4o": answer(0.95, "unused")})
+        assert analyze().root_causes == ["Cookie domain changed"]
+        assert (len(models["gpt-4o-mini"].prompts), len(models["gpt-4o"].prompts)) == (1, 0)
+
+    def test_low_confidence_escalates_to_the_stronger_model(self, ladder):
+        ladder({"gpt-4o-mini": answer(0.5, "Maybe the cookie"), "gpt-4o": answer(0.9, "SameSite=Strict on redirect")})
+        events = []
+        analysis = analyze(events)
+
+        assert analysis.root_causes == ["SameSite=Strict on redirect"] and analysis.confidence_score == 0.9
+        assert ("escalated_to", {"model": "gpt-4o", "reason": "low_confidence"}) in events
+        assert model_router.get_router().summary()["escalations"] == {"low_confidence": 1}
+
+    def test_unparseable_escalation_keeps_the_earlier_answer(self, ladder):
+        ladder({"gpt-4o-mini": answer(0.5, "Maybe the cookie"), "gpt-4o": "I could not decide."})
+        events = []
+        analysis = analyze(events)
+
+        assert analysis.root_causes == ["Maybe the cookie"] and analysis.confidence_score == 0.5
+        assert ("kept_answer", {"model": "gpt-4o-mini", "reason": "no_json"}) in events
+        # A parsed answer is indexed like any other
+        assert len(similar_failures.get_failure_index()) == 1
+
+    def test_less_confident_escalation_keeps_the_earlier_answer(self, ladder):
+        ladder({"gpt-4o-mini": answer(0.6, "Maybe the cookie"), "gpt-4o": answer(0.4, "No idea")})
+        events = []
+        assert analyze(events).root_causes == ["Maybe the cookie"]
+        assert ("kept_answer", {"model": "gpt-4o-mini", "reason": "lower_confidence"}) in events
+
+    def test_stronger_model_error_keeps_the_earlier_answer(self, ladder):
+        # No gpt-4o: creating it raises
+        ladder({"gpt-4o-mini": answer(0.5, "Maybe the cookie")})
+        assert analyze().root_causes == ["Maybe the cookie"]
@@ -0,0 +1,115 @@
+"""
+Tests for packed multi-failure prompts: adaptive pack size, per-item validation and solo re-runs
+"""
+
+import functools
+import json
+import re
+from typing import List, Sequence
+
+import pytest
+
+from packed_analyzer import PackedAnalyzer
+
+FIELDS = {"severity": "MEDIUM", "confidence_score": 0.8, "root_causes": ["Label renders from stale state"],
+          "affected_areas": ["dashboard"], "recommended_actions": ["Check the widget's data binding"]}
+
+SHORT_FAILURES = [{"test_name": "dashboard.spec.ts", "error": f"Widget {i} shows the wrong label"}
+                  for i in range(12)]
+
+
+def pack_reply(prompt: str, drop: Sequence[str] = (), corrupt: Sequence[str] = ()) -> str:
+    """Answer a packed prompt per [F<n>] id (dropping or corrupting some) and a solo prompt with one analysis"""
+    ids = re.findall(r"^\[(F\d+)\]", prompt, re.MULTILINE)
+    if not ids:
+        return json.dumps(FIELDS)
+    return json.dumps({"analyses": [{"id": i, **FIELDS, **({"severity": "SEVERE"} if i in corrupt else {})}
+                                    for i in ids if i not in drop]})
+
+
+@pytest.fixture
+def model(fake_model):
+    return fake_model(respond=pack_reply)
+
+
+def items(analyzer: PackedAnalyzer, failures: List[dict]) -> List[dict]:
+    return [analyzer.prepare(i, f) for i, f in enumerate(failures)]
+
+
+class TestPlanning:
+    def test_pack_size_adapts_to_the_token_budget(self):
+        small = PackedAnalyzer(token_budget=2000, max_pack_size=50)
+        large = PackedAnalyzer(token_budget=8000, max_pack_size=50)
+
+        small_packs = small.plan(items(small, SHORT_FAILURES))
+        large_packs = large.plan(items(large, SHORT_FAILURES))
+        assert len(small_packs) > len(large_packs) == 1
+        assert sum(len(p) for p in small_packs) == len(SHORT_FAILURES)
+
+    def test_max_pack_size_caps_packs(self):
+        analyzer = PackedAnalyzer(max_pack_size=5)
+        assert [len(p) for p in analyzer.plan(items(analyzer, SHORT_FAILURES))] == [5, 5, 2]
+
+    def test_long_failures_are_never_packed(self):
+        analyzer = PackedAnalyzer(item_tokens=100)
+        long_failure = {"test_name": "har.spec.ts", "error": "Status 500", "output": "at handler (api.ts:1:1)\n" * 400}
+        packs = analyzer.plan(items(analyzer, SHORT_FAILURES[:3] + [long_failure] + SHORT_FAILURES[3:5]))
+        assert [[item["id"] for item in pack] for pack in packs] == [["F4"], ["F1", "F2", "F3", "F5", "F6"]]
+
+
+class TestSplitResponse:
+    def test_items_are_validated_individually(self):
+        analyzer = PackedAnalyzer()
+        pack = items(analyzer, SHORT_FAILURES[:4])
+        answer = {"analyses": [
+            {"id": "F1", **FIELDS},
+            {"id": "F2", **FIELDS, "confidence_score": 7},
+            {"id": "F3", **FIELDS, "severity": "URGENT"},
+            {"id": "F1", **FIELDS, "severity": "LOW"},
+            {"id": "F9", **FIELDS},
+        ]}
+        results, rejected = analyzer.split_response(json.dumps(answer), pack)
+
+        assert list(results) == ["F1"]
+        assert results["F1"].severity == "MEDIUM"
+        assert results["F1"].error_message == SHORT_FAILURES[0]["error"]
+        assert set(rejected) == {"F2", "F3", "F4"}
+        assert rejected["F4"] == "missing"
+
+    def test_unparseable_answer_rejects_every_item(self):
+        analyzer = PackedAnalyzer()
+        _, rejected = analyzer.split_response("Sorry, I can't", items(analyzer, SHORT_FAILURES[:2]))
+        assert rejected == {"F1": "no_json", "F2": "no_json"}
+
+
+class TestPackedRun:
+    def test_one_request_answers_a_dozen_short_failures(self, model):
+        analyzer = PackedAnalyzer(use_tier0=False)
+        results = analyzer.run(SHORT_FAILURES)
+
+        assert len(model.prompts) == 1
+        assert [r.error_message for r in results] == [f["error"] for f in SHORT_FAILURES]
+        assert analyzer.stats["packed"] == 12 and analyzer.stats["reruns"] == 0
+        # Instructions are sent once, not once per failure
+        assert model.prompts[0].count("Provide the analyses") == 1
+
+    def test_only_rejected_items_are_rerun_alone(self, fake_model):
+        model = fake_model(respond=functools.partial(pack_reply, drop=["F3"], corrupt=["F5"]))
+        analyzer = PackedAnalyzer(use_tier0=False)
+        results = analyzer.run(SHORT_FAILURES[:6])
+
+        assert len(model.prompts) == 3
+        assert analyzer.stats["reruns"] == 2
+        assert "Widget 2" in model.prompts[1] + model.prompts[2]
+        assert all(r.severity == "MEDIUM" for r in results)
+
+    def test_confident_pattern_matches_are_answered_locally(self, model):
+        confident = {"test_name": "crypto.results.spec.ts",
+                     "error": "Timeout waiting for element with selector '.crypto-tab'"}
+        analyzer = PackedAnalyzer()
+        results = analyzer.run([confident] + SHORT_FAILURES[:3])
+
+        assert analyzer.stats["tier0"] == 1
+        assert len(model.prompts) == 1
+        assert "crypto-tab" not in model.prompts[0]
+        assert results[0].test_name == "crypto.results.spec.ts"
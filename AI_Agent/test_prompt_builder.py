@@ -0,0 +1,96 @@
+"""
+Tests for the token-budgeted prompt builder: the budget is a hard cap, frames are deduplicated and project frames win
+"""
+
+import re
+
+import pytest
+
+from prompt_builder import TokenCounter, build_failure_details, extract_sections, select_frames
+
+ERROR = "TimeoutError: locator.click: Timeout 30000ms exceeded.\nCall log:\n  - waiting for locator('#submit')"
+PROJECT_FRAME = "    at ResultsPage.submit (C:/dev/PPUpgrade/PPUpgradeTests/Pages/ResultsPage.ts:{}:13)"
+LIBRARY_FRAME = "    at Connection.sendMessageToServer (node_modules/playwright-core/lib/client/connection.js:{}:9)"
+
+
+class NewlineCounter(TokenCounter):
+    """The offline estimate, but newlines cost a token each as they do in cl100k"""
+
+    _WORD = re.compile(r"\w+|[^\w\s]|\n")
+
+    def __init__(self):
+        super().__init__()
+        self._encoding = None
+
+
+def playwright_output(lines: int = 4000) -> str:
+    stack = [LIBRARY_FRAME.format(100 + i) for i in range(30)] + [PROJECT_FRAME.format(40 + i) for i in range(3)]
+    body = [f"[chromium] › results.spec.ts:{i}:5 › step {i} passed in {i % 90}ms" for i in range(lines)]
+    return "\n".join(body[:lines // 2] + [ERROR, "Expected: 3", "Received: 0"] + stack * 20
+                     + body[lines // 2:] + ["  1 failed", "  41 passed (2.1m)"])
+
+
+@pytest.fixture(params=[TokenCounter, NewlineCounter], ids=["estimate", "newlines"])
+def counter(request):
+    return request.param()
+
+
+class TestBudget:
+    @pytest.mark.parametrize("budget", [200, 500, 1000, 3000])
+    def test_budget_is_never_exceeded(self, counter, budget):
+        error, output, report = build_failure_details(ERROR, playwright_output(), budget, counter)
+
+        assert counter.count(error) + counter.count(output) == report.kept_tokens <= budget
+        assert report.trimmed_tokens > 0 and report.original_tokens > budget
+
+    def test_separators_between_sections_are_counted(self):
+        counter = NewlineCounter()
+        _, output, report = build_failure_details(ERROR, playwright_output(), 3000, counter)
+
+        assert output.count("\n\n[") >= 3
+        assert sum(report.sections.values()) == report.kept_tokens <= 3000
+
+    def test_truncate_fits_even_when_the_ratio_misleads(self, counter):
+        # Short words first, long ones last: the average characters per token overshoots
+        text = " ".join(["a"] * 2000 + ["abcdefghijklmnopqrstuvwx"] * 500)
+        for max_tokens in (10, 100, 1000, 2999):
+            assert counter.count(counter.truncate(text, max_tokens)) <= max_tokens
+            assert counter.count(counter.truncate(text, max_tokens, keep_tail=True)) <= max_tokens
+        assert counter.truncate(text, 3) == ""
+
+    def test_small_inputs_pass_through(self, counter):
+        error, output, report = build_failure_details(ERROR, "1 failed", 3000, counter)
+        assert (error, output, report.trimmed_tokens) == (ERROR, "1 failed", 0)
+        assert build_failure_details(ERROR, None, 3000, counter)[1] == "No additional output"
+
+
+class TestFrames:
+    def test_duplicate_frames_are_removed(self):
+        sections = extract_sections(playwright_output(), max_frames=100)
+        frames = sections["stack"].splitlines()
+
+        assert len(frames) == len(set(frames)) == 33
+        assert sections["duplicate_frames"] == 33 * 19 and sections["dropped_frames"] == 0
+
+    def test_project_frames_are_kept_first(self):
+        sections = extract_sections(playwright_output(), max_frames=5)
+        frames = sections["stack"].splitlines()
+
+        assert len(frames) == 5 and sections["dropped_frames"] == 28
+        assert sum("PPUpgradeTests/" in frame for frame in frames) == 3
+        # Kept frames stay in stack order: the two outermost library frames, then the project ones
+        assert frames[:2] == [LIBRARY_FRAME.format(100).strip(), LIBRARY_FRAME.format(101).strip()]
+
+    def test_python_tracebacks_keep_the_innermost_frames(self):
+        frames = [f'  File "/usr/lib/python3/site-packages/lib.py", line {i}, in call' for i in range(6)]
+        frames.insert(1, '  File "PPUpgradeTests/Utilits/api.py", line 7, in fetch')
+        chosen = select_frames(frames, 3)
+        assert chosen == [frames[1], frames[5], frames[6]]
+
+    def test_trimmed_prompt_keeps_error_diff_and_project_stack(self):
+        _, output, report = build_failure_details(ERROR, playwright_output(), 600, TokenCounter())
+
+        assert output.startswith("[FIRST ERROR]\nTimeoutError")
+        assert "Expected: 3\nReceived: 0" in output
+        assert "PPUpgradeTests/Pages/ResultsPage.ts:40:13" in output
+        assert report.duplicate_frames == 33 * 19
@@ -0,0 +1,99 @@
+"""
+Tests for the prompt-cache-friendly layout: byte-stable prefix, per-failure suffix and cached-token reporting
+"""
+
+import json
+import time
+import urllib.request
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import main
+from batch_analyzer import BatchAnalyzer, OpenAIBatchClient, failure_fingerprint
+from fake_openai_server import CACHE_MIN_TOKENS, FakeOpenAIServer
+from model_router import ModelRouter, call_cost
+
+FAILURES = [
+    {"test_name": "accessibility.spec.ts", "error": "Color contrast ratio 3.5:1 does not meet AA standard of 4.5:1"},
+    {"test_name": "dashboard.spec.ts", "error": "Chart legend overlaps the table header"},
+    {"test_name": "auth.spec.ts", "error": "Session cookie missing after login redirect"},
+]
+
+
+def post_completion(server, body: dict) -> tuple:
+    request = urllib.request.Request(f"{server.base_url}/chat/completions", data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    started = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        usage = json.loads(response.read())["usage"]
+    return usage, time.perf_counter() - started
+
+
+def request_bodies(tmp_path) -> list:
+    analyzer = BatchAnalyzer(OpenAIBatchClient(base_url="http://unused", api_key="test"),
+                             state_path=str(tmp_path / "state.json"), use_tier0=False)
+    analyzer.add(FAILURES)
+    return [analyzer.request_line(failure_fingerprint(f["test_name"], f["error"]))["body"] for f in FAILURES]
+
+
+class TestLayout:
+    def test_prefix_is_byte_stable_and_long_enough_to_cache(self):
+        prefix = main.analysis_prefix()
+        assert main.analysis_prefix() is prefix
+        assert len(prefix) // 4 >= CACHE_MIN_TOKENS
+        assert main.ANALYSIS_FORMAT in prefix and "KNOWN ERROR PATTERNS" in prefix
+
+    def test_failure_data_only_in_the_suffix(self):
+        prompt, _ = main.build_analysis_prompt("dashboard.spec.ts", "Chart legend overlaps the table header")
+        assert "Chart legend" in prompt and "Chart legend" not in main.analysis_prefix()
+        assert main.ANALYSIS_FORMAT not in prompt
+
+    def test_batch_lines_share_the_system_prefix(self, tmp_path):
+        bodies = request_bodies(tmp_path)
+        assert {b["messages"][0]["content"] for b in bodies} == {main.analysis_prefix()}
+        assert len({b["messages"][1]["content"] for b in bodies}) == len(FAILURES)
+
+
+class TestCachedTokens:
+    def test_repeated_prefix_is_served_from_cache(self, tmp_path):
+        bodies = request_bodies(tmp_path)
+        with FakeOpenAIServer(prefill_latency=0.1) as server:
+            (first, first_s), *rest = [post_completion(server, body) for body in bodies]
+
+        assert first["prompt_tokens_details"]["cached_tokens"] == 0
+        for usage, elapsed in rest:
+            assert usage["prompt_tokens_details"]["cached_tokens"] / usage["prompt_tokens"] > 0.7
+            assert elapsed < first_s / 2
+
+    def test_failure_first_layout_never_hits_the_cache(self, tmp_path):
+        bodies = request_bodies(tmp_path)
+        with FakeOpenAIServer() as server:
+            usages = [post_completion(server, dict(b, messages=[
+                {"role": "user", "content": b["messages"][1]["content"] + b["messages"][0]["content"]}
+            ]))[0] for b in bodies]
+        assert all(u["prompt_tokens_details"]["cached_tokens"] == 0 for u in usages)
+
+    def test_cached_tokens_cost_less(self):
+        uncached = call_cost("gpt-4o-mini", {"input": 2000, "output": 0})
+        cached = call_cost("gpt-4o-mini", {"input": 2000, "cached": 1800, "output": 0})
+        assert cached < uncached * 0.6
+
+
+class TestReporting:
+    def test_token_usage_reads_cached_tokens_from_either_source(self):
+        streamed = AIMessage(content="", usage_metadata={
+            "input_tokens": 2000, "output_tokens": 100, "total_tokens": 2100,
+            "input_token_details": {"cache_read": 1536}})
+        invoked = AIMessage(content="", response_metadata={"token_usage": {
+            "prompt_tokens": 2000, "completion_tokens": 100, "prompt_tokens_details": {"cached_tokens": 1024}}})
+        assert main._token_usage(streamed) == {"input": 2000, "output": 100, "cached": 1536}
+        assert main._token_usage(invoked) == {"input": 2000, "output": 100, "cached": 1024}
+
+    def test_route_summary_reports_cached_ratio_and_first_token_latency(self):
+        router = ModelRouter()
+        router.record_call("gpt-4o-mini", "HIGH", 1.0, {"input": 2000, "cached": 0, "output": 100}, 1, 0.6)
+        router.record_call("gpt-4o-mini", "HIGH", 0.5, {"input": 2000, "cached": 1600, "output": 100}, 1, 0.2)
+        route = router.summary()["routes"]["gpt-4o-mini"]
+        assert route["cached_ratio"] == pytest.approx(0.4)
+        assert route["first_token_ms"] == pytest.approx(400)
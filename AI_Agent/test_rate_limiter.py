@@ -0,0 +1,149 @@
+"""
+Tests for the rate-limited request scheduler, against the fake OpenAI server
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fake_openai_server import FakeOpenAIApp, FakeOpenAIServer, estimate_request_tokens
+from rate_limiter import RequestScheduler, TokenBucket, is_retryable, retry_after
+
+
+def chat_call(base_url: str, prompt: str, max_tokens: int = 50):
+    """One chat completion over plain HTTP; HTTPError carries status and headers"""
+    body = {"model": "gpt-4o-mini", "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}]}
+    request = urllib.request.Request(f"{base_url}/chat/completions", data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def cost(prompt: str, max_tokens: int = 50) -> int:
+    return estimate_request_tokens([{"content": prompt}], max_tokens)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    def test_refills_at_rate_up_to_burst_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_minute=60, burst_seconds=5, clock=clock)
+        assert bucket.capacity == 5
+        bucket.take(5)
+        assert bucket.wait_time(1) == pytest.approx(1.0)
+        clock.now = 2.0
+        assert bucket.wait_time(2) == 0
+        clock.now = 100.0
+        bucket.wait_time(1)
+        assert bucket.tokens == 5
+
+    def test_oversized_request_waits_for_a_full_bucket_instead_of_forever(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_minute=600, burst_seconds=1, clock=clock)
+        bucket.take(10)
+        assert bucket.wait_time(1_000) == pytest.approx(1.0)
+
+
+class TestErrorClassification:
+    def test_429_and_5xx_retry_but_400_does_not(self):
+        def http_error(code, headers=None):
+            return urllib.error.HTTPError("http://x", code, "error", headers or {}, None)
+
+        assert is_retryable(http_error(429))
+        assert is_retryable(http_error(503))
+        assert not is_retryable(http_error(400))
+        assert is_retryable(ConnectionResetError())
+        assert retry_after(http_error(429, {"retry-after-ms": "250"})) == 0.25
+        assert retry_after(http_error(429, {"retry-after": "2"})) == 2.0
+
+
+class TestSchedulerAgainstFakeServer:
+    def test_paced_requests_never_hit_429(self):
+        prompt = "Timeout waiting for element '.crypto-tab'" * 10
+        with FakeOpenAIServer(rpm=1200, tpm=120_000, burst_seconds=0.5) as server:
+            # A slightly smaller burst than the server's leaves slack for network jitter
+            scheduler = RequestScheduler(rpm=1200, tpm=120_000, burst_seconds=0.4, max_concurrency=8)
+            started = time.monotonic()
+            futures = [scheduler.submit(lambda: chat_call(server.base_url, prompt), tokens=cost(prompt))
+                       for _ in range(40)]
+            results = [f.result(timeout=30) for f in futures]
+            elapsed = time.monotonic() - started
+            scheduler.shutdown()
+
+        assert len(results) == 40
+        assert server.app.stats["rate_limited"] == 0
+        # The token limit binds: (40 x 153 - 800 burst) tokens at 2000/s is ~2.7s
+        assert 2.0 < elapsed < 4.0
+
+    def test_429s_from_an_overly_optimistic_client_are_retried_to_success(self):
+        prompt = "API Response validation failed: Status 500"
+        with FakeOpenAIServer(rpm=600, burst_seconds=0.5) as server:
+            scheduler = RequestScheduler(rpm=60_000, tpm=10_000_000, max_concurrency=16,
+                                         base_delay=0.05, max_delay=0.5, seed=1)
+            futures = [scheduler.submit(lambda: chat_call(server.base_url, prompt), tokens=cost(prompt))
+                       for _ in range(20)]
+            results = [f.result(timeout=30) for f in futures]
+            scheduler.shutdown()
+
+        assert all(r["object"] == "chat.completion" for r in results)
+        assert server.app.stats["rate_limited"] > 0
+        assert scheduler.stats["rate_limited"] == server.app.stats["rate_limited"]
+        assert scheduler.stats["failed"] == 0
+
+    def test_server_errors_are_retried_with_backoff(self):
+        with FakeOpenAIServer(error_rate=0.4, seed=3) as server:
+            scheduler = RequestScheduler(max_concurrency=4, base_delay=0.01, max_delay=0.05, max_retries=10)
+            futures = [scheduler.submit(lambda: chat_call(server.base_url, "x")) for _ in range(15)]
+            assert all(f.result(timeout=30)["choices"] for f in futures)
+            scheduler.shutdown()
+
+        assert server.app.stats["server_errors"] > 0
+        assert scheduler.stats["server_errors"] == server.app.stats["server_errors"]
+
+    def test_non_retryable_errors_fail_immediately(self):
+        with FakeOpenAIServer() as server:
+            scheduler = RequestScheduler()
+            future = scheduler.submit(lambda: urllib.request.urlopen(f"{server.base_url}/nope", data=b"{}"))
+            with pytest.raises(urllib.error.HTTPError):
+                future.result(timeout=10)
+            scheduler.shutdown()
+        assert scheduler.stats["retries"] == 0
+
+
+class TestPriority:
+    def test_critical_jobs_jump_the_queue(self):
+        order = []
+        gate = threading.Event()
+        scheduler = RequestScheduler(max_concurrency=1)
+        blocker = scheduler.submit(gate.wait)
+        time.sleep(0.05)  # the blocker occupies the only slot
+        futures = [scheduler.submit(lambda s=s: order.append(s), severity=s)
+                   for s in ("LOW", "MEDIUM", "CRITICAL", "HIGH", "CRITICAL")]
+        gate.set()
+        blocker.result(timeout=5)
+        for f in futures:
+            f.result(timeout=5)
+        scheduler.shutdown()
+        assert order == ["CRITICAL", "CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+
+class TestFakeServerLimits:
+    def test_exceeding_the_token_limit_returns_retry_after(self):
+        app = FakeOpenAIApp(rpm=6000, tpm=600, burst_seconds=1)
+        assert app.admit(8)[0] == 200
+        status, error, headers = app.admit(50)
+        assert status == 429
+        assert error["error"]["code"] == "rate_limit_exceeded"
+        assert int(headers["retry-after-ms"]) > 0
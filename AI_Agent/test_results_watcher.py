@@ -0,0 +1,190 @@
+"""
+Tests for watch mode: failure directory parsing, debouncing of partial writes and the worker pool
+"""
+
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+from results_watcher import (InotifySource, ResultsWatcher, failure_from_dir, is_complete, spec_for_dir)
+
+SPECS = ["crypto.results.spec.ts", "crypto.definitions.spec.ts", "har.spec.ts", "har-advanced.spec.ts",
+         "accessibility.spec.ts"]
+
+TRACE_ERROR = "Error: page.goto: net::ERR_NAME_NOT_RESOLVED at https://crypto-demo.testvaluation.com/"
+
+
+def trace_bytes(message: str = TRACE_ERROR) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        events = [{"type": "before", "callId": "pw:api@1"},
+                  {"type": "error", "message": f"{message}\nCall log:\n  \x1b[2m- navigating\x1b[22m\n"}]
+        archive.writestr("test.trace", "\n".join(json.dumps(e) for e in events))
+    return buffer.getvalue()
+
+
+def failure_dir(root, name: str = "Tests-har-API-Test-Crypto-Results-chromium") -> str:
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    return path
+
+
+def write(path: str, name: str, data: bytes = b"png"):
+    with open(os.path.join(path, name), "wb") as f:
+        f.write(data)
+
+
+def until(condition, timeout: float = 5.0) -> bool:
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= end:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def collector():
+    seen, lock = [], threading.Lock()
+
+    def analyze(failure):
+        with lock:
+            seen.append(failure)
+        return failure["error"]
+    return seen, analyze
+
+
+@pytest.fixture(params=["polling", "inotify"])
+def backend(request):
+    if request.param == "inotify":
+        try:
+            InotifySource(os.getcwd()).close()
+        except (OSError, AttributeError):
+            pytest.skip("inotify is not available")
+    return request.param
+
+
+def watcher(root, analyze, backend: str, **kwargs) -> ResultsWatcher:
+    kwargs.setdefault("debounce", 0.2)
+    return ResultsWatcher(str(root), analyze, poll_interval=0.05, use_inotify=backend == "inotify", **kwargs)
+
+
+class TestFailureDirs:
+    def test_spec_is_matched_at_name_boundaries_longest_first(self):
+        assert spec_for_dir("Tests-crypto-results-Results-page-visual-regression-chromium", SPECS) == \
+            "crypto.results.spec.ts"
+        assert spec_for_dir("Tests-har-advanced-HAR-replay-chromium", SPECS) == "har-advanced.spec.ts"
+        assert spec_for_dir("Tests-harness-smoke-chromium", SPECS) is None
+        assert spec_for_dir("Tests-accessibility-Web-Accessibility-Testing--9504b-chromium", SPECS) == \
+            "accessibility.spec.ts"
+
+    def test_error_comes_from_the_trace(self, tmp_path):
+        path = failure_dir(tmp_path)
+        write(path, "test-failed-1.png")
+        write(path, "trace.zip", trace_bytes())
+        failure = failure_from_dir(path, SPECS)
+
+        assert failure["test_name"] == "har.spec.ts"
+        assert failure["error"] == TRACE_ERROR
+        assert "\x1b" not in failure["output"] and "Call log" in failure["output"]
+
+    def test_error_context_wins_over_the_trace(self, tmp_path):
+        path = failure_dir(tmp_path)
+        write(path, "trace.zip", trace_bytes())
+        write(path, "error-context.md", b"# Test info\n\n- Name: API Test\n\n# Error details\n\n```\n"
+                                        b"Error: expect(received).toBe(expected)\n```\n\n# Page snapshot\n")
+        assert failure_from_dir(path, SPECS)["error"] == "Error: expect(received).toBe(expected)"
+
+    def test_screenshot_only_failures_still_get_a_record(self, tmp_path):
+        path = failure_dir(tmp_path)
+        write(path, "test-failed-1.png")
+        assert "test-failed-1.png" in failure_from_dir(path, SPECS)["error"]
+
+    def test_truncated_trace_is_not_complete(self, tmp_path):
+        path = failure_dir(tmp_path)
+        write(path, "trace.zip", trace_bytes()[:40])
+        assert not is_complete(path)
+        write(path, "trace.zip", trace_bytes())
+        assert is_complete(path)
+
+
+class TestWatcher:
+    def test_new_failures_are_analyzed_while_the_run_continues(self, tmp_path, backend):
+        seen, analyze = collector()
+        with watcher(tmp_path, analyze, backend) as w:
+            path = failure_dir(tmp_path)
+            write(path, "test-failed-1.png")
+            write(path, "trace.zip", trace_bytes())
+            assert until(lambda: path in w.results)
+            assert [f["error"] for f in seen] == [TRACE_ERROR]
+            assert w.results[path] == TRACE_ERROR
+
+    def test_partial_writes_are_debounced(self, tmp_path, backend):
+        seen, analyze = collector()
+        with watcher(tmp_path, analyze, backend, debounce=0.3) as w:
+            path = failure_dir(tmp_path)
+            write(path, "test-failed-1.png")
+            data = trace_bytes()
+            # The trace arrives in pieces, each well within the debounce period
+            for end in range(0, len(data), len(data) // 4):
+                write(path, "trace.zip", data[:end])
+                time.sleep(0.1)
+                assert seen == []
+            write(path, "trace.zip", data)
+            write(path, "video.webm", b"webm")
+            assert until(lambda: seen)
+            time.sleep(0.4)
+        assert len(seen) == 1 and seen[0]["error"] == TRACE_ERROR
+
+    def test_passing_test_directories_are_ignored(self, tmp_path, backend):
+        seen, analyze = collector()
+        with watcher(tmp_path, analyze, backend) as w:
+            write(failure_dir(tmp_path), "video.webm", b"webm")
+            time.sleep(0.4)
+            assert w.wait_idle(timeout=5)
+        assert seen == []
+
+    def test_worker_pool_analyzes_failures_concurrently(self, tmp_path):
+        def slow(failure):
+            time.sleep(0.3)
+            return failure["test_name"]
+
+        for i in range(4):
+            write(failure_dir(tmp_path, f"Tests-har-case-{i}-chromium"), "test-failed-1.png")
+        started = time.perf_counter()
+        with watcher(tmp_path, slow, "polling", debounce=0.05, max_workers=4) as w:
+            assert until(lambda: w.stats["analyzed"] == 4)
+        assert time.perf_counter() - started < 0.9
+        assert w.stats["analyzed"] == 4
+
+    def test_stop_flushes_failures_still_debouncing(self, tmp_path):
+        seen, analyze = collector()
+        w = watcher(tmp_path, analyze, "polling", debounce=30).start()
+        write(failure_dir(tmp_path), "test-failed-1.png")
+        time.sleep(0.2)
+        w.stop()
+        assert len(seen) == 1
+
+    def test_errors_are_counted_not_raised(self, tmp_path):
+        def broken(failure):
+            raise RuntimeError("model unavailable")
+
+        write(failure_dir(tmp_path), "test-failed-1.png")
+        with watcher(tmp_path, broken, "polling", debounce=0.05) as w:
+            assert until(lambda: w.stats["errors"])
+        assert w.stats == {"analyzed": 0, "errors": 1, "latency_s": 0.0}
+
+    def test_unreadable_failure_directories_are_counted_as_errors(self, tmp_path, capsys):
+        seen, analyze = collector()
+        path = failure_dir(tmp_path)
+        # Half-written screenshots: not images yet
+        write(path, "results-page-expected.png", b"\x89PNG")
+        write(path, "results-page-actual.png", b"\x89PNG")
+        with watcher(tmp_path, analyze, "polling", debounce=0.05) as w:
+            assert until(lambda: w.stats["errors"])
+        assert seen == [] and w.stats["analyzed"] == 0 and w.stats["errors"] == 1
+        assert f"❌ {os.path.basename(path)}" in capsys.readouterr().out
@@ -0,0 +1,128 @@
+"""
+Tests for the similar-failure index: ranking, the score cut-off, deduplication and persistence
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from similar_failures import FailureIndex, HashingEmbedder, format_similar_issue
+
+ANALYSIS = {"root_causes": ["Slow /api/results endpoint"], "recommended_actions": ["Raise the wait timeout"],
+            "severity": "HIGH"}
+
+FAILURES = [
+    ("results.spec.ts", "TimeoutError: locator.click: Timeout 30000ms exceeded waiting for #submit"),
+    ("auth.spec.ts", "Session cookie missing after login redirect"),
+    ("har.spec.ts", "API Response validation failed: Status 500 from /api/crypto/results"),
+    ("dashboard.spec.ts", "expect(received).toHaveText(expected) Widget 3 shows the wrong label"),
+]
+
+
+class CountingEmbedder(HashingEmbedder):
+    """The hashing vectorizer, counting how many texts it embedded"""
+
+    def __init__(self, name: str = "hashing-v1"):
+        super().__init__()
+        self.name = name
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+def filled(path=None, embedder=None) -> FailureIndex:
+    index = FailureIndex(path, embedder=embedder or HashingEmbedder())
+    for test_name, error in FAILURES:
+        index.add(test_name, error, ANALYSIS)
+    return index
+
+
+class TestSearch:
+    def test_most_similar_failure_ranks_first(self):
+        index = filled()
+        found = index.search("results.spec.ts", "TimeoutError: locator.click: Timeout 45000ms exceeded waiting for #submit",
+                             k=3, min_score=0.0)
+        assert found[0]["test_name"] == "results.spec.ts" and found[0]["score"] > 0.9
+        assert [n["score"] for n in found] == sorted((n["score"] for n in found), reverse=True)
+        assert len(found) == 3
+
+    def test_min_score_drops_unrelated_failures(self):
+        index = filled()
+        assert index.search("billing.spec.ts", "Invoice PDF has 3 pages instead of 2") == []
+        found = index.search("har.spec.ts", "API Response validation failed: Status 502 from /api/crypto/results")
+        assert [n["test_name"] for n in found] == ["har.spec.ts"]
+        assert found[0]["root_cause"] == "Slow /api/results endpoint" and found[0]["fix"] == "Raise the wait timeout"
+
+    def test_empty_index_and_k_beyond_size(self):
+        assert FailureIndex(None, embedder=HashingEmbedder()).search("a.spec.ts", "error") == []
+        assert len(filled().search(*FAILURES[1], k=50, min_score=-1.0)) == len(FAILURES)
+
+    def test_format_similar_issue(self):
+        neighbor = dict(filled().search(*FAILURES[1])[0])
+        assert format_similar_issue(neighbor) == ("auth.spec.ts: Session cookie missing after login redirect "
+                                                  "(similarity 1.00) - cause: Slow /api/results endpoint "
+                                                  "- fix: Raise the wait timeout")
+
+
+class TestAdd:
+    def test_same_failure_is_indexed_once(self):
+        index = filled()
+        assert index.add(*FAILURES[0], ANALYSIS) is None
+        assert len(index) == len(FAILURES) and len(index.entries) == len(FAILURES)
+
+    def test_concurrent_adds_are_indexed_once(self, tmp_path):
+        index = FailureIndex(str(tmp_path), embedder=HashingEmbedder())
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            added = list(pool.map(lambda i: index.add(*FAILURES[i % 2], ANALYSIS), range(64)))
+
+        assert sum(entry is not None for entry in added) == 2 and len(index) == 2
+        with open(tmp_path / "entries.jsonl") as f:
+            assert len(f.readlines()) == 2
+
+    def test_index_grows_past_its_capacity(self):
+        index = FailureIndex(None, embedder=HashingEmbedder())
+        for i in range(200):
+            index.add(f"t{i}.spec.ts", f"Element #{i} not visible", {})
+        assert len(index) == 200
+        assert index.search("t150.spec.ts", "Element #150 not visible")[0]["test_name"] == "t150.spec.ts"
+
+
+class TestPersistence:
+    def test_round_trip_without_re_embedding(self, tmp_path):
+        index = filled(str(tmp_path))
+        index.save()
+        expected = index.search(*FAILURES[2])
+
+        embedder = CountingEmbedder()
+        reloaded = FailureIndex(str(tmp_path), embedder=embedder)
+        assert embedder.embedded == 0 and len(reloaded) == len(FAILURES)
+        assert reloaded.search(*FAILURES[2]) == expected
+        assert reloaded.add(*FAILURES[2], ANALYSIS) is None
+        with open(tmp_path / "vectors.json") as f:
+            assert json.load(f) == {"embedder": "hashing-v1", "count": len(FAILURES)}
+
+    def test_entries_added_after_the_snapshot_are_re_embedded(self, tmp_path):
+        index = filled(str(tmp_path))
+        index.save()
+        index.add("billing.spec.ts", "Invoice total is 0.00", ANALYSIS)
+
+        embedder = CountingEmbedder()
+        reloaded = FailureIndex(str(tmp_path), embedder=embedder)
+        assert embedder.embedded == 1 and len(reloaded) == len(FAILURES) + 1
+        assert reloaded.search("billing.spec.ts", "Invoice total is 0.00")[0]["test_name"] == "billing.spec.ts"
+
+    def test_snapshot_of_another_embedder_is_ignored(self, tmp_path):
+        filled(str(tmp_path)).save()
+        embedder = CountingEmbedder(name="hashing-v2")
+        reloaded = FailureIndex(str(tmp_path), embedder=embedder)
+
+        assert embedder.embedded == len(FAILURES)
+        assert np.allclose(reloaded._vectors[:len(reloaded)], HashingEmbedder().embed(
+            [FailureIndex.entry_text(*failure) for failure in FAILURES]))
+        # Re-embedded vectors replace the stale snapshot
+        reloaded.save()
+        with open(tmp_path / "vectors.json") as f:
+            assert json.load(f)["embedder"] == "hashing-v2"
@@ -0,0 +1,215 @@
+"""
+Tests for the perceptual-hash index: hashes, BK-tree queries, baseline groups and triaged-change lookups
+"""
+
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import main
+import snapshot_index
+from snapshot_index import BaselineIndex, BKTree, ChangeIndex, format_known_change, group_changes, hamming
+from visual_diff import dhash, diff_images, phash
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "PPUpgradeTests", "Tests")
+ANALYSIS = {"severity": "HIGH", "confidence_score": 0.85, "root_causes": ["Submit button no longer rendered"],
+            "affected_areas": ["results"], "recommended_actions": ["Restore the button's visibility rule"]}
+
+
+def without_button(image: np.ndarray) -> np.ndarray:
+    broken = image.copy()
+    broken[200:236, 1100:1240] = 250
+    return broken
+
+
+@pytest.fixture(scope="module")
+def changed_text(make_page):
+    text = make_page(seed=21)[400:520, 40:600]
+
+    def change(image: np.ndarray) -> np.ndarray:
+        broken = image.copy()
+        broken[400:520, 40:600] = text
+        return broken
+    return change
+
+
+@pytest.fixture(scope="module")
+def chromium(make_page):
+    return make_page()
+
+
+@pytest.fixture(scope="module")
+def firefox(chromium, antialias):
+    # The same page as another browser renders it
+    return antialias(chromium, seed=5)
+
+
+class TestHashes:
+    def test_same_page_is_close_and_other_pages_are_far(self, chromium, firefox):
+        assert hamming(phash(chromium), phash(firefox)) <= 4
+        assert hamming(phash(chromium), phash(chromium[::2, ::2].copy())) <= 4
+        assert hamming(phash(chromium), phash(255 - chromium)) > snapshot_index.BASELINE_DISTANCE
+
+    def test_any_size_hashes_to_64_bits(self, chromium, make_page):
+        for image in (make_page(height=9000), chromium[:1, :1], chromium[50:53, 1000:1005]):
+            assert 0 <= dhash(image) < 2 ** 64 and 0 <= phash(image) < 2 ** 64
+
+
+class TestBKTree:
+    def test_search_equals_brute_force(self):
+        rng = random.Random(3)
+        keys = [rng.getrandbits(64) for _ in range(2000)]
+        # Clusters of near-identical hashes, as baselines of one page are
+        keys += [key ^ (1 << rng.randrange(64)) for key in keys[:200]]
+        tree = BKTree()
+        for i, key in enumerate(keys):
+            tree.add(key, i)
+        assert len(tree) == len(keys)
+        for query in keys[:20] + [rng.getrandbits(64) for _ in range(5)]:
+            for radius in (0, 3, 8):
+                found = tree.search(query, radius)
+                expected = sorted(i for i, key in enumerate(keys) if hamming(key, query) <= radius)
+                assert sorted(i for _, i in found) == expected
+                assert [d for d, _ in found] == sorted(d for d, _ in found)
+
+    def test_small_radius_visits_a_fraction_of_the_tree(self, monkeypatch):
+        rng = random.Random(4)
+        tree = BKTree()
+        for i in range(5000):
+            tree.add(rng.getrandbits(64), i)
+        calls = []
+        monkeypatch.setattr(snapshot_index, "hamming", lambda a, b: calls.append(1) or (a ^ b).bit_count())
+        tree.search(rng.getrandbits(64), 2)
+        assert len(calls) < 500
+
+
+class TestBaselines:
+    def test_browser_copies_are_grouped(self, tmp_path, chromium, firefox, antialias):
+        image = pytest.importorskip("PIL.Image")
+        snapshots = tmp_path / "Tests" / "visual.spec.ts-snapshots"
+        snapshots.mkdir(parents=True)
+        other = 255 - chromium
+        for name, pixels in (("results-chromium-win32", chromium), ("results-firefox-win32", firefox),
+                             ("login-chromium-win32", other), ("login-webkit-win32", antialias(other, seed=9))):
+            image.fromarray(pixels).save(snapshots / f"{name}.png")
+        index = BaselineIndex.from_tests_dir(str(tmp_path / "Tests"))
+
+        groups = [[os.path.basename(path) for path in group] for group in index.near_duplicates()]
+        assert sorted(groups) == [["login-chromium-win32.png", "login-webkit-win32.png"],
+                                  ["results-chromium-win32.png", "results-firefox-win32.png"]]
+        # A test-failed screenshot finds its page
+        assert os.path.basename(index.similar(without_button(chromium))[0][1]) == "results-chromium-win32.png"
+
+    @pytest.mark.skipif(not os.path.isdir(BASELINES), reason="PPUpgrade baselines not checked out")
+    def test_repository_baselines(self):
+        pytest.importorskip("PIL")
+        groups = [{os.path.basename(path) for path in group}
+                  for group in BaselineIndex.from_tests_dir(BASELINES).near_duplicates()]
+        assert {"01-login-page-chromium-win32.png", "01-login-page-webkit-win32.png",
+                "auth-login-page-firefox-win32.png"} <= groups[0]
+        assert {"02-results-page-loaded-chromium-win32.png", "02-results-page-loaded-firefox-win32.png"} in groups
+
+
+class TestChangeIndex:
+    def test_same_change_on_another_browser_and_page(self, chromium, firefox, make_page, screenshot_error):
+        index = ChangeIndex(path=None)
+        triaged = diff_images(chromium, without_button(chromium), name="results-chromium-win32")
+        index.add("visual.spec.ts", [triaged], ANALYSIS)
+
+        for baseline in (firefox, make_page(seed=11)):
+            found = index.lookup("visual.spec.ts", screenshot_error, [diff_images(baseline, without_button(baseline))])
+            assert found["root_causes"] == ANALYSIS["root_causes"] and found["severity"] == "HIGH"
+            assert found["similar_issues"][0].startswith("Same visual change as visual.spec.ts (results-chromium")
+
+    def test_other_changes_are_not_matched(self, chromium, changed_text, screenshot_error):
+        index = ChangeIndex(path=None)
+        index.add("visual.spec.ts", [diff_images(chromium, without_button(chromium))], ANALYSIS)
+        other = diff_images(chromium, changed_text(chromium))
+
+        assert index.find(other) == []
+        assert index.lookup("visual.spec.ts", screenshot_error, [other]) is None
+        # Every real change of a failure must be known
+        both = [diff_images(chromium, without_button(chromium)), other]
+        assert index.lookup("visual.spec.ts", screenshot_error, both) is None
+
+    def test_unrelated_flat_color_changes_are_not_matched(self, chromium, make_page, screenshot_error):
+        # A red button turned blue on one page, a grey footer turned green on another
+        button, footer = chromium.copy(), make_page(seed=30)
+        button[200:236, 1100:1240] = (200, 30, 30)
+        footer[684:716, 0:1280] = (128, 128, 128)
+        recolored_button, recolored_footer = button.copy(), footer.copy()
+        recolored_button[200:236, 1100:1240] = (30, 30, 200)
+        recolored_footer[684:716, 0:1280] = (40, 160, 60)
+        index = ChangeIndex(path=None)
+        rebrand = diff_images(button, recolored_button)
+        banner = diff_images(footer, recolored_footer)
+
+        # Both regions are one color on both sides: their dHashes are empty
+        assert snapshot_index.hamming(int(rebrand.change_hash, 16), int(banner.change_hash, 16)) <= 4
+        assert index.add("checkout.spec.ts", [rebrand], dict(ANALYSIS, severity="CRITICAL")) == []
+        assert index.lookup("footer.spec.ts", screenshot_error, [banner]) is None
+
+    def test_hash_matches_need_the_same_region_colors(self, chromium):
+        index = ChangeIndex(path=None)
+        index.add("visual.spec.ts", [diff_images(chromium, without_button(chromium))], ANALYSIS)
+        # A green button with the same label goes missing: same hashes, other change
+        green = chromium.copy()
+        green[(green == (30, 110, 220)).all(axis=2)] = (30, 200, 60)
+        diff = diff_images(green, without_button(green))
+
+        assert diff.change_hash == index.find(diff_images(chromium, without_button(chromium)))[0]["change_hash"]
+        assert index.find(diff) == []
+
+    def test_concurrent_adds_are_recorded_once(self, tmp_path, chromium):
+        path = str(tmp_path / "visual_changes.jsonl")
+        index = ChangeIndex(path)
+        diff = diff_images(chromium, without_button(chromium), name="results-chromium-win32")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            added = list(pool.map(lambda _: index.add("visual.spec.ts", [diff], ANALYSIS), range(32)))
+        assert sum(len(entries) for entries in added) == 1
+        with open(path) as f:
+            assert len(f.readlines()) == 1
+
+    def test_persisted_and_deduplicated(self, tmp_path, chromium):
+        path = str(tmp_path / "visual_changes.jsonl")
+        diff = diff_images(chromium, without_button(chromium), name="results-chromium-win32")
+        assert len(ChangeIndex(path).add("visual.spec.ts", [diff.to_dict()], ANALYSIS)) == 1
+
+        reloaded = ChangeIndex(path)
+        assert reloaded.add("visual.spec.ts", [diff], ANALYSIS) == []
+        found = reloaded.find(diff)
+        assert len(reloaded) == 1 and found[0]["distance"] == 0
+        assert format_known_change(found[0]) == ("Same visual change as visual.spec.ts (results-chromium-win32), "
+                                                 "0 hash bits apart - cause: Submit button no longer rendered")
+        with open(path) as f:
+            assert json.loads(f.readline())["kind"] == "missing_element"
+
+    def test_run_failures_grouped_by_change(self, chromium, firefox, changed_text, antialias):
+        failures = [("results-chromium", diff_images(chromium, without_button(chromium))),
+                    ("results-chromium-text", diff_images(chromium, changed_text(chromium))),
+                    ("results-firefox", diff_images(firefox, without_button(firefox))),
+                    ("results-webkit-noise", diff_images(chromium, antialias(chromium)))]
+        assert group_changes(failures) == [[0, 2]]
+
+
+class TestAnalysis:
+    @pytest.fixture(autouse=True)
+    def isolated(self, monkeypatch):
+        monkeypatch.setattr(snapshot_index, "_index", ChangeIndex(path=None))
+
+    def test_second_browser_is_a_lookup(self, monkeypatch, fake_model, chromium, firefox, screenshot_error):
+        llm = fake_model()
+        first = main.analyze_test_failure("visual.spec.ts", screenshot_error, use_tier0=False,
+                                          visual_diffs=[diff_images(chromium, without_button(chromium))])
+        assert len(llm.prompts) == 1 and len(snapshot_index.get_change_index()) == 1
+
+        monkeypatch.setattr(main, "create_test_analyzer_agent",
+                            lambda model="gpt-4o-mini": pytest.fail("a triaged change must not reach the model"))
+        second = main.analyze_test_failure("visual.spec.ts", screenshot_error, use_tier0=False,
+                                           visual_diffs=[diff_images(firefox, without_button(firefox)).to_dict()])
+        assert second.root_causes == first.root_causes
+        assert second.similar_issues[0].startswith("Same visual change as visual.spec.ts")
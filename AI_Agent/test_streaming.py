@@ -0,0 +1,172 @@
+"""
+Tests for streamed analyses: field/item callbacks across retried calls and the CLI printer
+"""
+
+import json
+from typing import List
+
+import pytest
+
+import main
+import model_router
+import rate_limiter
+from analysis_schema import RootCauseAnalysis
+from model_router import ModelRouter
+from rate_limiter import RequestScheduler
+from structured_output import IncrementalJSONParser
+
+TEST_NAME, ERROR = "dashboard.spec.ts", "Widget 3 shows the wrong label"
+
+
+def answer(*causes: str, confidence: float = 0.9) -> str:
+    return json.dumps({"severity": "MEDIUM", "confidence_score": confidence, "root_causes": list(causes),
+                       "affected_areas": ["dashboard"], "recommended_actions": ["Fix the widget label"]})
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(model_router, "_router", ModelRouter())
+    scheduler = RequestScheduler(max_concurrency=2, base_delay=0.01, max_delay=0.02)
+    monkeypatch.setattr(rate_limiter, "_scheduler", scheduler)
+    yield
+    scheduler.shutdown(wait=False)
+
+
+@pytest.fixture
+def flaky(fake_model):
+    """Stream replies in 12-character chunks, dropping the connection of the calls in drops"""
+    def install(replies: List[str], drops: dict):
+        return fake_model(replies=replies, drops=drops, chunk_size=12)
+    return install
+
+
+def record(events: list):
+    return {"on_field": lambda name, value: events.append((name, value)),
+            "on_item": lambda name, index, value: events.append((name, index, value))}
+
+
+class TestRetriedStreams:
+    def test_retry_does_not_repeat_delivered_events(self, flaky):
+        reply = answer("Label key renamed", "Stale translation bundle")
+        llm = flaky([reply], {0: reply.index("Stale")})
+        events = []
+        analysis = main.analyze_test_failure(TEST_NAME, ERROR, use_tier0=False, **record(events))
+
+        assert len(llm.prompts) == 2 and analysis.root_causes == ["Label key renamed", "Stale translation bundle"]
+        assert [e for e in events if e[0] == "root_causes" and len(e) == 3] == [
+            ("root_causes", 0, "Label key renamed"), ("root_causes", 1, "Stale translation bundle")]
+        assert sum(e[0] == "severity" for e in events) == 1
+        assert not any(e[0] == "stream_reset" for e in events)
+
+    def test_retry_with_another_answer_resets_the_stream(self, flaky):
+        first, second = answer("Label key renamed", "x"), answer("Widget config not loaded")
+        flaky([first, second], {0: first.index('"x"')})
+        events = []
+        main.analyze_test_failure(TEST_NAME, ERROR, use_tier0=False, **record(events))
+
+        reset = events.index(("stream_reset", {"attempt": 2}))
+        assert ("root_causes", 0, "Label key renamed") in events[:reset]
+        assert [e for e in events[reset:] if e[0] == "root_causes" and len(e) == 3] == [
+            ("root_causes", 0, "Widget config not loaded")]
+
+    def test_printer_shows_a_retried_answer_once(self, flaky, capsys):
+        reply = answer("Label key renamed", "Stale translation bundle")
+        flaky([reply], {0: reply.index("Stale")})
+        main.analyze_and_print_streaming(TEST_NAME, ERROR)
+
+        out = capsys.readouterr().out
+        assert out.count("Label key renamed") == 1 and out.count("🚨 Severity") == 1
+        assert "Retried" not in out
+
+
+class TestAttemptCallbacks:
+    def test_shorter_retry_resets_at_the_end(self):
+        events = []
+        callbacks = main._AttemptCallbacks(**record(events))
+        callbacks.start_attempt()
+        callbacks.on_field("severity", "HIGH")
+        callbacks.on_item("root_causes", 0, "a")
+        callbacks.start_attempt()
+        callbacks.on_field("severity", "HIGH")
+        callbacks.finish()
+
+        assert events == [("severity", "HIGH"), ("root_causes", 0, "a"),
+                          ("stream_reset", {"attempt": 2}), ("severity", "HIGH")]
+
+
+def full_analysis(**fields) -> RootCauseAnalysis:
+    return RootCauseAnalysis(test_name=TEST_NAME, error_message=ERROR, **{**json.loads(answer(
+        "Label key renamed", "Stale translation bundle")), "similar_issues": ["dashboard.spec.ts: same label"],
+        **fields})
+
+
+def stream_into(printer: main.StreamingAnalysisPrinter, text: str) -> IncrementalJSONParser:
+    parser = IncrementalJSONParser(RootCauseAnalysis, on_field=printer.on_field, on_item=printer.on_item)
+    parser.feed(text)
+    return parser
+
+
+class TestPrinter:
+    def test_streamed_render_matches_print_analysis(self, capsys):
+        analysis = full_analysis()
+        main.print_analysis(analysis)
+        expected = capsys.readouterr().out
+
+        printer = main.StreamingAnalysisPrinter(TEST_NAME, ERROR)
+        reply = answer("Label key renamed", "Stale translation bundle")
+        parser = IncrementalJSONParser(RootCauseAnalysis, on_field=printer.on_field, on_item=printer.on_item)
+        for start in range(0, len(reply), 7):
+            parser.feed(reply[start:start + 7])
+        printer.finish(analysis)
+        assert capsys.readouterr().out == expected
+
+    def test_each_part_is_printed_as_soon_as_it_is_parsed(self, capsys):
+        printer = main.StreamingAnalysisPrinter(TEST_NAME, ERROR)
+        capsys.readouterr()
+        reply = answer("Label key renamed", "Stale translation bundle")
+        parser = IncrementalJSONParser(RootCauseAnalysis, on_field=printer.on_field, on_item=printer.on_item)
+
+        parser.feed(reply[:reply.index("confidence")])
+        assert capsys.readouterr().out == "\n🚨 Severity: MEDIUM\n"
+        parser.feed(reply[:reply.index("Stale")][len(parser.text):])
+        assert capsys.readouterr().out == "📊 Confidence: 90%\n\n🎯 Root Causes:\n   1. Label key renamed\n"
+        parser.feed(reply[len(parser.text):reply.index("affected")])
+        assert capsys.readouterr().out == "   2. Stale translation bundle\n"
+
+    def test_finish_prints_only_what_the_stream_missed(self, capsys):
+        printer = main.StreamingAnalysisPrinter(TEST_NAME, ERROR)
+        reply = answer("Label key renamed", "Stale translation bundle")
+        # Cut off after the first root cause; the validated result has the fallback values
+        stream_into(printer, reply[:reply.index("Stale")])
+        printer.finish(full_analysis(root_causes=["Unable to determine"], recommended_actions=[]))
+        out = capsys.readouterr().out
+
+        assert out.count("🚨 Severity") == 1 and out.count("📊 Confidence") == 1
+        assert out.count("🎯 Root Causes:") == 2 and "   1. Unable to determine" in out
+        assert out.index("Label key renamed") < out.index("Unable to determine")
+        assert "\n📍 Affected Areas:\n   • dashboard\n" in out
+        assert "\n✅ Recommended Actions:\n\n🔗 Similar Issues:\n   • dashboard.spec.ts: same label\n" in out
+        assert out.endswith("="*80 + "\n\n")
+
+    def test_complete_stream_is_not_repeated(self, capsys):
+        printer = main.StreamingAnalysisPrinter(TEST_NAME, ERROR)
+        stream_into(printer, answer("Label key renamed", "Stale translation bundle"))
+        printer.finish(full_analysis(similar_issues=None))
+        out = capsys.readouterr().out
+
+        assert out.count("Label key renamed") == 1 and out.count("Fix the widget label") == 1
+        assert "Similar Issues" not in out
+
+    def test_escalation_and_kept_answer_restart_the_sections(self, capsys):
+        printer = main.StreamingAnalysisPrinter(TEST_NAME, ERROR)
+        stream_into(printer, answer("Maybe the label", confidence=0.3))
+        printer.on_field("escalated_to", {"model": "gpt-4o", "reason": "low_confidence"})
+        stream_into(printer, answer("No idea", confidence=0.1))
+        printer.on_field("kept_answer", {"model": "gpt-4o-mini", "reason": "lower_confidence"})
+        printer.finish(full_analysis(root_causes=["Maybe the label"], confidence_score=0.3))
+        out = capsys.readouterr().out
+
+        escalated, kept = out.index("⤴️  Escalating to gpt-4o (low confidence)"), out.index("↩️  Keeping")
+        assert out.count("Maybe the label") == 2 and out.rindex("Maybe the label") > kept
+        assert escalated < out.index("No idea") < kept
+        assert out[kept:].count("🚨 Severity: MEDIUM") == 1 and "📊 Confidence: 30%" in out[kept:]
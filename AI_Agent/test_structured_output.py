@@ -0,0 +1,114 @@
+"""
+Tests for the incremental JSON parser: chunk boundaries anywhere, escapes and unicode, array items and callback order
+"""
+
+import json
+
+import pytest
+
+from main import RootCauseAnalysis
+from structured_output import IncrementalJSONParser
+
+ANSWER = {
+    "severity": "HIGH",
+    "confidence_score": 0.82,
+    "root_causes": ["Selector \"#submit\" renamed to {submit-btn}, see [PR 12]",
+                    "Path C:\\Tests\\results.spec.ts uses a stale fixture",
+                    "Libellé « Résultats » → 結果 🚀"],
+    "affected_areas": [],
+    "recommended_actions": ["Update the locator", "Re-record the \\\"golden\\\" HAR"],
+}
+# \u escapes, including a surrogate pair, as a model may emit them
+ESCAPED = json.dumps(ANSWER, ensure_ascii=True, indent=2)
+RAW = "```json\n" + json.dumps(ANSWER, ensure_ascii=False) + "\n```"
+
+
+def parse(chunks, model=RootCauseAnalysis):
+    events = []
+    parser = IncrementalJSONParser(model, on_field=lambda name, value: events.append(("field", name, value)),
+                                   on_item=lambda name, index, value: events.append(("item", name, index, value)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser, events
+
+
+class TestChunkBoundaries:
+    @pytest.mark.parametrize("text", [ESCAPED, RAW], ids=["escaped", "raw_unicode"])
+    def test_every_split_point_gives_the_same_fields(self, text):
+        _, expected = parse([text])
+        for cut in range(1, len(text)):
+            parser, events = parse([text[:cut], text[cut:]])
+            assert parser.complete and parser.fields == ANSWER and events == expected, f"split at {cut}"
+
+    def test_one_character_at_a_time(self):
+        parser, events = parse(list(ESCAPED))
+        assert parser.fields == ANSWER and not parser.errors
+        assert events == parse([ESCAPED])[1]
+
+    def test_chunk_ending_on_a_backslash(self):
+        text = '{"root_causes": ["a \\"quoted\\" ], value"], "severity": "LOW"}'
+        cut = text.index("\\") + 1
+        parser, _ = parse([text[:cut], text[cut:]])
+        assert parser.fields == {"root_causes": ['a "quoted" ], value'], "severity": "LOW"}
+
+    def test_preamble_and_trailing_text_are_ignored(self):
+        parser, _ = parse(["Here is the analysis:\n", '{"severity": "LOW"}', "\nThe JSON above {is final}."])
+        assert parser.complete and parser.fields == {"severity": "LOW"}
+        assert parser.feed('{"severity": "HIGH"}') == []
+
+
+class TestItems:
+    def test_items_of_each_array_in_order(self):
+        parser, events = parse([ESCAPED])
+        items = [event[1:] for event in events if event[0] == "item"]
+
+        assert items == [("root_causes", i, cause) for i, cause in enumerate(ANSWER["root_causes"])] + [
+            ("recommended_actions", i, action) for i, action in enumerate(ANSWER["recommended_actions"])]
+        assert parser.items == {"root_causes": ANSWER["root_causes"],
+                                "recommended_actions": ANSWER["recommended_actions"]}
+
+    def test_nested_items_are_whole_values(self):
+        text = '{"steps": [{"a": [1, 2], "b": "x,]"}, [3, {"c": 4}], "y", 5]}'
+        parser, events = parse([text], model=None)
+        assert [event[3] for event in events if event[0] == "item"] == [{"a": [1, 2], "b": "x,]"},
+                                                                         [3, {"c": 4}], "y", 5]
+        assert parser.fields == json.loads(text)
+
+    def test_cut_off_array_keeps_its_streamed_items(self):
+        parser, events = parse([ESCAPED[:ESCAPED.index("Path")]])
+        assert not parser.complete and parser.started
+        assert parser.items == {"root_causes": [ANSWER["root_causes"][0]]}
+        assert [event[1] for event in events if event[0] == "field"] == ["severity", "confidence_score"]
+
+
+class TestCallbackOrder:
+    def test_fields_in_document_order_after_their_items(self):
+        _, events = parse([ESCAPED])
+        order = [(event[0], event[1]) for event in events]
+
+        assert [name for kind, name in order if kind == "field"] == list(ANSWER)
+        # A list's items all come before the list itself
+        for name in ("root_causes", "recommended_actions"):
+            field_at = order.index(("field", name))
+            assert all(i < field_at for i, entry in enumerate(order) if entry == ("item", name))
+            assert all(entry[1] != name for entry in order[field_at + 1:])
+
+    def test_feed_returns_what_each_chunk_completed(self):
+        parser = IncrementalJSONParser(RootCauseAnalysis)
+        assert parser.feed('{"severity": "HIGH", "confidence') == [("severity", "HIGH")]
+        assert parser.feed('_score": 0.5') == []
+        assert parser.feed("}") == [("confidence_score", 0.5)]
+
+
+class TestValidation:
+    def test_invalid_values_are_reported_not_delivered(self):
+        parser, events = parse(['{"confidence_score": 1.5, "root_causes": "one cause", "severity": "LOW", '
+                                '"extra": [1, 2]}'])
+        assert parser.fields == {"severity": "LOW", "extra": [1, 2]}
+        assert set(parser.errors) == {"confidence_score", "root_causes"}
+        assert ("field", "confidence_score", 1.5) not in events
+
+    def test_malformed_value(self):
+        parser, _ = parse(['{"severity": HIGH, "confidence_score": 0.4}'])
+        assert parser.complete and parser.fields == {"confidence_score": 0.4}
+        assert parser.errors["severity"].startswith("invalid JSON")
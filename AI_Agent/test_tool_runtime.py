@@ -0,0 +1,170 @@
+"""
+Tests for tool execution: memoized, concurrent tool calls, the tool-calling loop and the answer tool
+"""
+
+import json
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+
+import main
+import tool_runtime
+from analysis_schema import ANSWER_FIELDS, AnalysisAnswer
+from tool_runtime import ToolCache, ToolRunner
+
+ANALYSIS = json.dumps({"severity": "HIGH", "confidence_score": 0.9, "root_causes": ["Slow backend"],
+                       "affected_areas": ["results"], "recommended_actions": ["Check API latency"]})
+
+
+def tool_call(name: str, call_id: str, **args) -> dict:
+    return {"name": name, "args": args, "id": call_id}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = ToolCache()
+    monkeypatch.setattr(tool_runtime, "_tool_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def tools():
+    return [StructuredTool.from_function(func=func, name=func.__name__, description=func.__name__)
+            for func in (main.analyze_error_pattern, main.get_test_context, main.suggest_debugging_steps)]
+
+
+class TestToolCache:
+    def test_same_call_runs_once(self, fresh_cache):
+        calls = []
+
+        def context(test_name, verbose=False):
+            calls.append(test_name)
+            return {"test_name": test_name}
+
+        assert fresh_cache.call("ctx", context, {"test_name": "a", "verbose": True}) == ({"test_name": "a"}, False)
+        assert fresh_cache.call("ctx", context, {"verbose": True, "test_name": "a"}) == ({"test_name": "a"}, True)
+        fresh_cache.call("ctx", context, {"test_name": "b"})
+        assert calls == ["a", "b"]
+        assert (fresh_cache.hits, fresh_cache.misses) == (1, 2)
+
+    def test_identical_calls_in_flight_share_one_execution(self, fresh_cache):
+        calls = []
+
+        def slow(x):
+            calls.append(x)
+            time.sleep(0.1)
+            return x * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fresh_cache.call("slow", slow, {"x": 2})[0]))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert calls == [2]
+        assert results == [4] * 4
+
+    def test_errors_are_not_memoized(self, fresh_cache):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("first call fails")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            fresh_cache.call("flaky", flaky, {})
+        assert fresh_cache.call("flaky", flaky, {}) == ("ok", False)
+
+
+class TestToolRunner:
+    def test_independent_calls_run_concurrently_in_request_order(self):
+        def slow(key):
+            time.sleep(0.2)
+            return {"key": key}
+
+        runner = ToolRunner({"slow": slow})
+        start = time.perf_counter()
+        messages = runner.run([tool_call("slow", f"c{i}", key=str(i)) for i in range(4)])
+
+        assert time.perf_counter() - start < 0.5
+        assert [m["tool_call_id"] for m in messages] == ["c0", "c1", "c2", "c3"]
+        assert json.loads(messages[3]["content"]) == {"key": "3"}
+
+    def test_unknown_tools_and_errors_are_reported_to_the_model(self):
+        def broken():
+            raise ValueError("no database")
+
+        messages = ToolRunner({"broken": broken}).run([tool_call("broken", "c1"), tool_call("missing", "c2")])
+        assert "ValueError: no database" in messages[0]["content"]
+        assert "Unknown tool" in messages[1]["content"]
+
+
+class TestToolLoop:
+    def test_deterministic_results_are_inlined_in_the_first_prompt(self, fresh_cache):
+        results = main.precompute_tool_results("crypto.results.spec.ts", "Timeout waiting for '.crypto-tab'")
+        prompt, _ = main.build_analysis_prompt("crypto.results.spec.ts", "Timeout waiting for '.crypto-tab'",
+                                               tool_results=results)
+
+        assert "TOOL RESULTS" in prompt
+        assert 'suggest_debugging_steps(test_type="FUNCTIONAL", error_pattern="TIMEOUT")' in prompt
+        main.precompute_tool_results("crypto.results.spec.ts", "Timeout waiting for '.crypto-tab'")
+        assert fresh_cache.hits == 3
+
+    def test_requested_tools_run_and_the_model_answers_next_turn(self, chat_model, tools, fresh_cache):
+        llm = chat_model(replies=[
+            AIMessage(content="", tool_calls=[
+                tool_call("get_test_context", "c1", test_name="auth.spec.ts"),
+                tool_call("suggest_debugging_steps", "c2", test_type="API", error_pattern="ASSERTION"),
+            ]),
+            AIMessage(content=ANALYSIS),
+        ])
+        fields, fallback, _, turns = main._stream_model_analysis(llm, "Analyze this", "HIGH",
+                                                                 tools=tools, system_prompt="You analyze tests")
+
+        assert (fields["severity"], fallback, turns) == ("HIGH", None, 2)
+        second_turn = llm.received[1]
+        tool_messages = [m for m in second_turn if isinstance(m, ToolMessage)]
+        assert [m.tool_call_id for m in tool_messages] == ["c1", "c2"]
+        assert json.loads(tool_messages[0].content)["module"] == "Authentication"
+        assert fresh_cache.misses == 2
+
+    def test_direct_answer_takes_one_turn(self, chat_model, tools):
+        llm = chat_model(replies=[AIMessage(content=ANALYSIS)])
+        fields, fallback, _, turns = main._stream_model_analysis(llm, "Analyze this", "HIGH", tools=tools)
+        assert (fallback, turns) == (None, 1)
+
+    def test_last_turn_is_sent_without_tools(self, chat_model, tools):
+        again = AIMessage(content="", tool_calls=[tool_call("get_test_context", "c1", test_name="har.spec.ts")])
+        llm = chat_model(replies=[again, AIMessage(content=ANALYSIS)])
+        _, fallback, _, turns = main._stream_model_analysis(llm, "Analyze this", "HIGH", tools=tools, max_turns=2)
+
+        assert (fallback, turns) == (None, 2)
+        assert llm.bound == [[tool.name for tool in tools], None]
+
+
+class TestAnswerTool:
+    def test_model_is_asked_only_for_the_answer_fields(self):
+        schema = AnalysisAnswer.model_json_schema()
+        assert list(schema["properties"]) == list(ANSWER_FIELDS) == schema["required"]
+        assert main.ANSWER_TOOL == AnalysisAnswer.__name__
+
+    def test_tools_mode_binds_the_answer_tool(self, chat_model, tools):
+        llm = chat_model()
+        main.bind_structured_output(llm, mode="tools")
+        main.bind_structured_output(llm, mode="tools", tools=tools)
+        assert llm.bound == [["AnalysisAnswer"], [tool.name for tool in tools] + ["AnalysisAnswer"]]
+
+    def test_answer_tool_call_becomes_the_analysis(self, monkeypatch, fake_model):
+        monkeypatch.setenv("ANALYZER_OUTPUT_MODE", "tools")
+        fake_model(replies=[AIMessage(content="", tool_calls=[tool_call("AnalysisAnswer", "c1",
+                                                                         **json.loads(ANALYSIS))])])
+        analysis = main.analyze_test_failure("dashboard.spec.ts", "Widget 3 shows the wrong label", use_tier0=False)
+
+        assert (analysis.test_name, analysis.error_message) == ("dashboard.spec.ts", "Widget 3 shows the wrong label")
+        assert (analysis.severity, analysis.root_causes) == ("HIGH", ["Slow backend"])
@@ -0,0 +1,195 @@
+"""
+Tests for the trace.zip extractor: the summary it builds and that it streams only the event logs
+"""
+
+import io
+import json
+import time
+import tracemalloc
+import zipfile
+
+import pytest
+
+import trace_extractor
+from trace_extractor import extract_trace
+
+STACK = [{"file": "C:\\Users\\dev\\PPUpgrade\\PPUpgradeTests\\Tests\\crypto.results.spec.ts", "line": 42,
+          "column": 16}]
+
+
+def runner_events(actions: int = 3) -> list:
+    events = [{"type": "before", "callId": "hook@1", "startTime": 0, "apiName": "Before Hooks", "params": {}}]
+    for i in range(actions):
+        events += [{"type": "before", "callId": f"pw:api@{i + 2}", "startTime": i * 100.0, "apiName": "locator.click",
+                    "params": {"selector": f"#button-{i}"}, "stack": STACK},
+                   {"type": "after", "callId": f"pw:api@{i + 2}", "endTime": i * 100.0 + 20}]
+    events += [
+        {"type": "before", "callId": "expect@99", "startTime": 1000.0, "apiName": "expect.toBeVisible",
+         "params": {"selector": ".crypto-tab-definitions"}, "stack": STACK},
+        {"type": "after", "callId": "expect@99", "endTime": 31000.0,
+         "error": {"message": "Error: \x1b[2mexpect(locator).toBeVisible()\x1b[22m\nTimeout 30000ms exceeded"}},
+        {"type": "error", "message": "Error: \x1b[2mexpect(locator).toBeVisible()\x1b[22m\nTimeout 30000ms exceeded",
+         "stack": STACK},
+    ]
+    return events
+
+
+BROWSER_EVENTS = [
+    {"type": "context-options", "options": {"viewport": {"width": 1280}}},
+    {"type": "frame-snapshot", "snapshot": {"html": [["DIV", {}, "x" * 5000]]}},
+    {"type": "console", "messageType": "error", "text": "Failed to load resource: 500"},
+    {"type": "console", "messageType": "log", "text": "rendered"},
+    {"type": "console", "messageType": "error", "text": "Failed to load resource: 500"},
+    {"type": "event", "class": "BrowserContext", "method": "pageError",
+     "params": {"error": {"error": {"message": "TypeError: Cannot read properties of undefined (reading 'rates')"}}}},
+]
+
+
+def network_entry(url: str, status: int, elapsed: float, failure: str = None) -> dict:
+    response = {"status": status}
+    if failure:
+        response["_failureText"] = failure
+    return {"type": "resource-snapshot",
+            "snapshot": {"time": elapsed, "request": {"method": "GET", "url": url}, "response": response}}
+
+
+NETWORK = [
+    network_entry("https://app/api/crypto/results", 500, 120),
+    network_entry("https://app/api/crypto/rates", 200, 4200),
+    network_entry("https://app/static/app.js", 200, 15),
+    network_entry("https://cdn/font.woff2", -1, -1, "net::ERR_ABORTED"),
+]
+
+
+def ndjson(events: list) -> bytes:
+    return "\n".join(json.dumps(e) for e in events).encode() + b"\n"
+
+
+def make_trace(path, runner=None, browser=None, network=None, resources: bytes = b"", extra: dict = None) -> str:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("test.trace", runner if runner is not None else ndjson(runner_events()))
+        archive.writestr("0-trace.trace", browser if browser is not None else ndjson(BROWSER_EVENTS))
+        archive.writestr("0-trace.network", network if network is not None else ndjson(NETWORK))
+        if resources:
+            archive.writestr("resources/page@1.jpeg", resources)
+        for name, data in (extra or {}).items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+class TestSummary:
+    def test_failing_action_error_and_location(self, tmp_path):
+        summary = extract_trace(make_trace(tmp_path / "trace.zip"))
+
+        assert summary.failing_action == ("expect.toBeVisible(selector=.crypto-tab-definitions) failed after "
+                                          "30000 ms: Error: expect(locator).toBeVisible()")
+        assert summary.error.startswith("Error: expect(locator).toBeVisible()\nTimeout 30000ms")
+        assert summary.error_location == "crypto.results.spec.ts:42:16"
+
+    def test_only_the_last_actions_are_kept(self, tmp_path):
+        summary = extract_trace(make_trace(tmp_path / "trace.zip", runner=ndjson(runner_events(actions=50))),
+                                last_actions=4)
+        assert summary.last_actions == [
+            "locator.click(selector=#button-47) (20 ms)",
+            "locator.click(selector=#button-48) (20 ms)",
+            "locator.click(selector=#button-49) (20 ms)",
+            "expect.toBeVisible(selector=.crypto-tab-definitions) (30000 ms) FAILED",
+        ]
+
+    def test_console_errors_and_page_errors_once_each(self, tmp_path):
+        summary = extract_trace(make_trace(tmp_path / "trace.zip"))
+        assert summary.console_errors == [
+            "Failed to load resource: 500",
+            "Uncaught TypeError: Cannot read properties of undefined (reading 'rates')",
+        ]
+
+    def test_failed_and_slow_network_calls_slowest_first(self, tmp_path):
+        summary = extract_trace(make_trace(tmp_path / "trace.zip"), slow_ms=1000)
+        assert summary.network == [
+            "GET https://app/api/crypto/rates -> 200 (4200 ms)",
+            "GET https://app/api/crypto/results -> 500 (120 ms)",
+            "GET https://cdn/font.woff2 -> net::ERR_ABORTED",
+        ]
+
+    def test_text_is_compact_test_output(self, tmp_path):
+        text = extract_trace(make_trace(tmp_path / "trace.zip")).to_text()
+        assert text.splitlines()[0].startswith("FAILING ACTION: expect.toBeVisible")
+        assert "CONSOLE ERRORS:" in text and "NETWORK:" in text
+        assert "\x1b" not in text and len(text) < 2000
+
+    def test_unfinished_action_is_reported(self, tmp_path):
+        events = runner_events(actions=1)[:-3] + [
+            {"type": "before", "callId": "pw:api@7", "startTime": 10.0, "apiName": "page.waitForSelector",
+             "params": {"selector": ".crypto-tab"}}]
+        summary = extract_trace(make_trace(tmp_path / "trace.zip", runner=ndjson(events)))
+        assert summary.last_actions[-1] == "page.waitForSelector(selector=.crypto-tab) (did not finish)"
+
+    def test_browser_actions_are_used_without_a_runner_trace(self, tmp_path):
+        path = tmp_path / "trace.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("0-trace.trace", ndjson([
+                {"type": "before", "callId": "call@1", "startTime": 0, "apiName": "page.goto",
+                 "params": {"url": "https://app/"}},
+                {"type": "after", "callId": "call@1", "endTime": 50.0,
+                 "error": {"message": "net::ERR_NAME_NOT_RESOLVED"}},
+            ]))
+        summary = extract_trace(str(path))
+        assert summary.failing_action == "page.goto(url=https://app/) failed after 50 ms: net::ERR_NAME_NOT_RESOLVED"
+        assert summary.error == "net::ERR_NAME_NOT_RESOLVED"
+
+    @pytest.mark.parametrize("data", [b"", b"PK\x03\x04 not really a zip"])
+    def test_unreadable_traces_give_an_empty_summary(self, tmp_path, data):
+        path = tmp_path / "trace.zip"
+        path.write_bytes(data)
+        assert extract_trace(str(path)).to_text() == ""
+
+
+class TestStreaming:
+    def test_resources_are_never_opened(self, tmp_path, monkeypatch):
+        opened = []
+        original = zipfile.ZipFile.open
+
+        def recording_open(self, name, *args, **kwargs):
+            opened.append(name)
+            return original(self, name, *args, **kwargs)
+
+        path = make_trace(tmp_path / "trace.zip", resources=b"\xff" * 100_000, extra={"0-trace.stacks": b"{}"})
+        monkeypatch.setattr(zipfile.ZipFile, "open", recording_open)
+        extract_trace(path)
+        assert sorted(opened) == ["0-trace.network", "0-trace.trace", "test.trace"]
+
+    def test_lines_split_across_chunks(self, monkeypatch):
+        monkeypatch.setattr(trace_extractor, "READ_CHUNK_BYTES", 7)
+        data = ndjson(NETWORK)
+        lines = [line for line, _ in trace_extractor._lines(io.BytesIO(data))]
+        assert lines == data.splitlines()
+
+    def test_oversized_lines_keep_name_and_stack_only(self, tmp_path):
+        script = "function axeFunction(window) {" + "var x = 1;" * 500_000 + "}"
+        events = runner_events(actions=0)[:1] + [
+            {"type": "before", "callId": "pw:api@5", "startTime": 0.0, "apiName": "page.evaluate",
+             "params": {"expression": script}, "stack": STACK},
+            {"type": "after", "callId": "pw:api@5", "endTime": 145.0, "error": {"message": "Error: axe failed"}},
+        ]
+        path = make_trace(tmp_path / "trace.zip", runner=ndjson(events))
+
+        tracemalloc.start()
+        summary = extract_trace(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert summary.failing_action == "page.evaluate failed after 145 ms: Error: axe failed"
+        assert summary.error_location == "crypto.results.spec.ts:42:16"
+        # The 5 MB line is never held whole
+        assert peak < 2_000_000
+
+    def test_large_traces_process_in_milliseconds(self, tmp_path):
+        snapshots = ndjson([{"type": "frame-snapshot", "snapshot": {"html": "x" * 20_000}}] * 200)
+        path = make_trace(tmp_path / "trace.zip", runner=ndjson(runner_events(actions=500)),
+                          browser=ndjson(BROWSER_EVENTS) + snapshots, resources=b"\x00" * 20_000_000)
+        extract_trace(path)
+        started = time.perf_counter()
+        for _ in range(20):
+            summary = extract_trace(path)
+        assert (time.perf_counter() - started) / 20 < 0.05
+        assert summary.events_read < 1100
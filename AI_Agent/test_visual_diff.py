@@ -0,0 +1,160 @@
+"""
+Tests for the screenshot diff stage: classification, bounding boxes, the noise short-circuit and throughput
+"""
+
+import json
+import time
+
+import numpy as np
+import pytest
+
+import main
+import snapshot_index
+from results_watcher import failure_from_dir, patterns_only_analyze
+from snapshot_index import ChangeIndex
+from visual_diff import (CONTENT_CHANGE, FULL_PAGE_CHANGE, IDENTICAL, LAYOUT_SHIFT, MISSING_ELEMENT, NOISE,
+                         VisualDiff, analyze_visual_noise, diff_images, screenshot_pairs)
+
+
+@pytest.fixture(scope="module")
+def expected(make_page):
+    return make_page()
+
+
+class TestClassification:
+    def test_identical_screenshots(self, expected):
+        diff = diff_images(expected, expected.copy())
+        assert (diff.kind, diff.changed_ratio, diff.is_noise) == (IDENTICAL, 0.0, True)
+
+    def test_anti_aliasing_is_noise(self, expected, antialias):
+        diff = diff_images(expected, antialias(expected))
+        assert diff.changed_ratio > 0
+        assert diff.kind == NOISE and diff.is_noise and not diff.boxes
+
+    def test_inserted_banner_is_a_layout_shift(self, expected):
+        actual = expected.copy()
+        actual[300:] = expected[276:696]
+        actual[300:324] = (255, 240, 200)
+        diff = diff_images(expected, actual)
+
+        assert diff.kind == LAYOUT_SHIFT and diff.shift == (0, 24)
+        assert diff.boxes[0]["y"] <= 300 and "content moved down 24 px" in diff.to_text()
+
+    def test_sideways_shift(self, expected):
+        actual = expected.copy()
+        actual[400:600, 56:] = expected[400:600, :-56]
+        assert diff_images(expected, actual).shift == (56, 0)
+
+    def test_missing_button(self, expected):
+        actual = expected.copy()
+        actual[200:236, 1100:1240] = 250
+        diff = diff_images(expected, actual)
+
+        assert diff.kind == MISSING_ELEMENT
+        box = diff.boxes[0]
+        assert (box["x"], box["y"], box["note"]) == (1096, 200, "missing in actual")
+        assert box["x"] + box["width"] >= 1240 and box["y"] + box["height"] >= 236
+
+    def test_changed_text_gets_one_box_per_region(self, expected, make_page):
+        actual = expected.copy()
+        actual[96:108, 40:400] = make_page(seed=8)[96:108, 40:400]
+        actual[600:612, 600:900] = make_page(seed=9)[600:612, 600:900]
+        diff = diff_images(expected, actual)
+
+        assert diff.kind == CONTENT_CHANGE and not any(box["note"] for box in diff.boxes)
+        # Boxes stay on the two changed lines (a wide gap between glyphs may split one)
+        assert {box["y"] // 100 for box in diff.boxes} == {0, 6}
+        assert min(box["x"] for box in diff.boxes if box["y"] > 500) >= 592
+
+    def test_different_page_is_a_full_page_change(self, expected):
+        other = 255 - expected
+        assert diff_images(expected, other).kind == FULL_PAGE_CHANGE
+        assert diff_images(expected, expected[:, :1000].copy()).kind == FULL_PAGE_CHANGE
+
+    def test_taller_full_page_screenshot(self, make_page):
+        expected = make_page(height=2400)
+        actual = np.concatenate([expected[:1200], np.full((40, 1280, 3), 250, np.uint8), expected[1200:]])
+        diff = diff_images(expected, actual)
+
+        assert diff.kind == LAYOUT_SHIFT and diff.shift == (0, 40)
+        assert "size 1280x2400 -> 1280x2440" in diff.to_text()
+
+    def test_sizes_that_are_not_tile_multiples(self, make_page):
+        button = make_page()[90:121, 30:117].copy()
+        changed = button.copy()
+        changed[5:9, 80:87] = 0
+        assert diff_images(button, changed).kind == CONTENT_CHANGE
+        assert diff_images(button[:1, :1], button[:1, :1].copy()).kind == IDENTICAL
+
+    def test_real_changes_carry_perceptual_hashes(self, expected, antialias):
+        actual = expected.copy()
+        actual[200:236, 1100:1240] = 250
+        diff = diff_images(expected, actual)
+        assert len(diff.page_hash) == 16 and len(diff.change_hash) == 32
+        assert diff_images(expected, antialias(expected)).change_hash is None
+
+    def test_dict_round_trip(self, expected, antialias):
+        diff = diff_images(expected, antialias(expected), name="02-results-page-loaded-chromium-win32")
+        assert VisualDiff.from_dict(json.loads(json.dumps(diff.to_dict()))) == diff
+
+
+class TestThroughput:
+    def test_hundreds_of_localized_diffs_per_second(self, expected, antialias):
+        pairs = []
+        noisy = antialias(expected)
+        for i in range(20):
+            actual = expected.copy()
+            actual[100 + i * 20:120 + i * 20, 200:400] = 250
+            if i % 2:
+                actual[400:520] = noisy[400:520]
+            pairs.append(actual)
+        diff_images(expected, pairs[0])
+        started = time.perf_counter()
+        for actual in pairs:
+            diff_images(expected, actual)
+        # ~5 ms on one core; generous for shared CI runners
+        assert (time.perf_counter() - started) / len(pairs) < 0.03
+
+
+class TestAnalysis:
+    @pytest.fixture(autouse=True)
+    def isolated(self, monkeypatch):
+        monkeypatch.setattr(snapshot_index, "_index", ChangeIndex(path=None))
+
+    def test_noise_is_answered_without_the_model(self, monkeypatch, expected, antialias, screenshot_error):
+        monkeypatch.setattr(main, "create_test_analyzer_agent",
+                            lambda model="gpt-4o-mini": pytest.fail("noise must not reach the model"))
+        diff = diff_images(expected, antialias(expected), name="02-results-page-loaded-chromium-win32")
+        analysis = main.analyze_test_failure("visual.spec.ts", screenshot_error, visual_diffs=[diff.to_dict()])
+
+        assert analysis.severity == "LOW"
+        assert analysis.root_causes[0].startswith("Rendering noise only")
+        assert "win32" in analysis.root_causes[1]
+
+    def test_real_changes_reach_the_model_with_their_boxes(self, fake_model, expected, antialias, screenshot_error):
+        llm = fake_model()
+        actual = expected.copy()
+        actual[200:236, 1100:1240] = 250
+        diffs = [diff_images(expected, actual), diff_images(expected, antialias(expected))]
+        assert analyze_visual_noise("visual.spec.ts", screenshot_error, diffs) is None
+
+        analysis = main.analyze_test_failure("visual.spec.ts", screenshot_error, visual_diffs=diffs, use_tier0=False)
+        assert analysis.root_causes == ["Banner pushed the table down"]
+        assert "VISUAL DIFF: missing_element" in llm.prompts[0]
+        assert "changed region x=1096 y=200" in llm.prompts[0]
+
+
+class TestResultDirectories:
+    def test_failure_dir_pairs_and_patterns_only_short_circuit(self, tmp_path, expected, antialias):
+        image = pytest.importorskip("PIL.Image")
+        result_dir = tmp_path / "Tests-visual-Results-page-chromium"
+        result_dir.mkdir()
+        image.fromarray(expected).save(result_dir / "results-page-expected.png")
+        image.fromarray(antialias(expected)).save(result_dir / "results-page-actual.png")
+        image.fromarray(expected).save(result_dir / "results-page-diff.png")
+
+        assert [name for name, _, _ in screenshot_pairs(str(result_dir))] == ["results-page"]
+        failure = failure_from_dir(str(result_dir), ["visual.spec.ts"])
+        assert failure["test_name"] == "visual.spec.ts"
+        assert [d["kind"] for d in failure["visual_diffs"]] == [NOISE]
+        assert patterns_only_analyze(failure).severity == "LOW"
@@ -0,0 +1,110 @@
+"""
+Tool Execution
+Runs the tool calls the model requests during an analysis. The analyzer's
+tools are pure functions of their arguments, so every (tool, args) result is
+memoized for the whole process (a batch of failures shares one cache, and
+identical calls already in flight wait for the first one). Independent calls
+requested in one model turn run concurrently.
+
+Usage:
+    runner = ToolRunner({"get_test_context": get_test_context})
+    messages = runner.run(response.tool_calls)   # [{"tool_call_id", "name", "content"}]
+"""
+
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from analyzer_telemetry import get_telemetry
+
+
+def call_key(name: str, args: Dict) -> Tuple[str, str]:
+    """Memo key of one tool call: the tool name and its arguments in canonical JSON"""
+    return name, json.dumps(args, sort_keys=True, default=str)
+
+
+class ToolCache:
+    """Thread-safe memo of tool results keyed by (tool, args)"""
+
+    def __init__(self):
+        self._results: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, name: str, func: Callable, args: Dict) -> Tuple[Any, bool]:
+        """Result of func(**args) and whether it came from the cache"""
+        key = call_key(name, args)
+        with self._lock:
+            future = self._results.get(key)
+            hit = future is not None
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+                future = self._results[key] = Future()
+        get_telemetry().incr("analyzer_tool_calls_total", tool=name, cache="hit" if hit else "miss")
+        if hit:
+            return future.result(), True
+
+        try:
+            future.set_result(func(**args))
+        except Exception as e:
+            # Errors are not memoized: drop the entry so the next call retries
+            with self._lock:
+                del self._results[key]
+            future.set_exception(e)
+            raise
+        return future.result(), False
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+
+
+class ToolRunner:
+    """Executes the tool calls of one model turn, concurrently and through the cache"""
+
+    def __init__(self, tools: Dict[str, Callable], cache: Optional[ToolCache] = None, max_workers: int = 8):
+        self.tools = tools
+        self.cache = cache or get_tool_cache()
+        self.max_workers = max_workers
+
+    def _execute(self, call: Dict) -> Dict:
+        name = call["name"]
+        func = self.tools.get(name)
+        if func is None:
+            content = json.dumps({"error": f"Unknown tool '{name}'"})
+        else:
+            try:
+                result, _ = self.cache.call(name, func, call.get("args") or {})
+                content = result if isinstance(result, str) else json.dumps(result)
+            except Exception as e:
+                # The model gets the error and can answer without this tool
+                content = json.dumps({"error": f"{type(e).__name__}: {e}"})
+        return {"tool_call_id": call.get("id"), "name": name, "content": content}
+
+    def run(self, tool_calls: List[Dict]) -> List[Dict]:
+        """Tool message fields for each call, in the order the calls were requested"""
+        if len(tool_calls) <= 1:
+            return [self._execute(call) for call in tool_calls]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tool_calls))) as pool:
+            return list(pool.map(self._execute, tool_calls))
+
+
+_tool_cache: Optional[ToolCache] = None
+_tool_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolCache:
+    """Process-wide tool memo shared by every analysis"""
+    global _tool_cache
+    with _tool_cache_lock:
+        if _tool_cache is None:
+            _tool_cache = ToolCache()
+        return _tool_cache
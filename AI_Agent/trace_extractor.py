@@ -0,0 +1,268 @@
+"""
+Playwright Trace Extractor
+Turns a failure's trace.zip into a compact test_output for the analyzer: the
+failing action, the last N actions, console and page errors and failed or
+slow network calls.
+
+Only the zip's central directory and the event logs are read: test.trace
+(test runner steps and errors), <n>-trace.trace (browser actions, console)
+and <n>-trace.network (HAR entries). They are streamed line by line through
+the zip decompressor, so neither the archive nor a whole member is held in
+memory, and resources/ (screenshots, DOM snapshots, bodies) is never opened.
+Lines of event types that are never used (DOM snapshots, screencast frames)
+are skipped before JSON parsing.
+
+Usage:
+    summary = extract_trace("test-results/<test>/trace.zip")
+    analyze_test_failure(test_name, summary.error, test_output=summary.to_text())
+"""
+
+import json
+import re
+import zipfile
+import zlib
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_LAST_ACTIONS = 8
+DEFAULT_SLOW_MS = 1000.0
+MAX_LISTED = 10
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+_TYPE = re.compile(rb'"type"\s*:\s*"([^"]+)"')
+# Large per-line payloads that never contribute to a summary
+SKIPPED_TYPES = {b"frame-snapshot", b"screencast-frame", b"resource-snapshot-content", b"context-options"}
+# Longer lines (evaluate() calls carrying a whole script) are not parsed: their
+# type, call id, timing, name and stack are read from the line's head and tail
+MAX_PARSED_LINE = 64 * 1024
+LINE_HEAD_BYTES = 2048
+LINE_TAIL_BYTES = 4096
+READ_CHUNK_BYTES = 256 * 1024
+_FIELD = re.compile(rb'"(type|callId|apiName|method|class|startTime|endTime)"\s*:\s*("(?:[^"\\]|\\.)*"|[-0-9.eE]+)')
+_STACK = re.compile(rb'"stack"\s*:\s*(\[[^\[\]]*\])\s*}\s*$')
+# Runner steps that are user-visible actions (hooks and fixtures are not)
+ACTION_CALL_PREFIXES = ("pw:api@", "expect@", "test.step@", "call@")
+
+
+@dataclass
+class TraceSummary:
+    """What a trace says about a failure, small enough for a prompt"""
+
+    error: Optional[str] = None
+    error_location: Optional[str] = None
+    failing_action: Optional[str] = None
+    last_actions: List[str] = field(default_factory=list)
+    console_errors: List[str] = field(default_factory=list)
+    network: List[str] = field(default_factory=list)
+    events_read: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def to_text(self) -> str:
+        lines = []
+        if self.failing_action:
+            lines.append(f"FAILING ACTION: {self.failing_action}")
+        if self.error:
+            lines.append(f"ERROR: {self.error}")
+        if self.error_location:
+            lines.append(f"    at {self.error_location}")
+        for title, items in (("LAST ACTIONS", self.last_actions), ("CONSOLE ERRORS", self.console_errors),
+                             ("NETWORK", self.network)):
+            if items:
+                lines.append(f"{title}:")
+                lines.extend(f"  - {item}" for item in items)
+        return "\n".join(lines)
+
+
+def _lines(stream: IO[bytes]) -> Iterator[Tuple[bytes, bool]]:
+    """
+    (line, oversized) for each line of a member, read in large chunks. A line
+    longer than MAX_PARSED_LINE is never held whole: only its head and tail
+    are kept, joined.
+    """
+    line, oversized = b"", False
+    for chunk in iter(lambda: stream.read(READ_CHUNK_BYTES), b""):
+        pieces = chunk.split(b"\n")
+        for i, piece in enumerate(pieces):
+            if oversized:
+                line = line[:LINE_HEAD_BYTES] + (line[LINE_HEAD_BYTES:] + piece)[-LINE_TAIL_BYTES:]
+            else:
+                line += piece
+                if len(line) > MAX_PARSED_LINE:
+                    line, oversized = line[:LINE_HEAD_BYTES] + line[-LINE_TAIL_BYTES:], True
+            if i < len(pieces) - 1:
+                if line:
+                    yield line, oversized
+                line, oversized = b"", False
+    if line:
+        yield line, oversized
+
+
+def _head_event(line: bytes) -> Dict:
+    """The fields of an oversized event line that a summary needs, without parsing its payload"""
+    event = {}
+    for key, value in _FIELD.findall(line[:LINE_HEAD_BYTES]):
+        event.setdefault(key.decode(), json.loads(value))
+    stack = _STACK.search(line[-LINE_TAIL_BYTES:])
+    if stack:
+        try:
+            event["stack"] = json.loads(stack.group(1))
+        except ValueError:
+            pass
+    return event
+
+
+def _events(archive: zipfile.ZipFile, name: str, skip: frozenset = frozenset()) -> Iterator[Dict]:
+    """JSON events of one NDJSON member, decompressed as they are read"""
+    with archive.open(name) as stream:
+        for line, oversized in _lines(stream):
+            # The type is near the start of the line; skip heavy events unparsed
+            match = _TYPE.search(line, 0, 64)
+            if match and (match.group(1) in SKIPPED_TYPES or match.group(1) in skip):
+                continue
+            if oversized:
+                yield _head_event(line)
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _clean(message: str, limit: int = 500) -> str:
+    text = _ANSI.sub("", message).strip()
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def _describe(before: Dict) -> str:
+    """apiName with its most telling parameter: page.goto(url=...), locator.click(selector=...)"""
+    params = before.get("params") or {}
+    for key in ("url", "selector", "expression", "text", "value", "key"):
+        if key in params:
+            value = " ".join(str(params[key]).split())
+            value = value if len(value) <= 80 else value[:80] + "…"
+            return f"{before.get('apiName') or before.get('method')}({key}={value})"
+    return str(before.get("apiName") or f"{before.get('class', '')}.{before.get('method', '')}")
+
+
+def _location(stack: List[Dict]) -> Optional[str]:
+    for frame in stack or []:
+        if frame.get("file"):
+            # Traces recorded on Windows carry backslash paths
+            file_name = re.split(r"[/\\]", frame["file"])[-1]
+            return f"{file_name}:{frame.get('line')}:{frame.get('column')}"
+    return None
+
+
+class _ActionLog:
+    """Open actions by callId plus the last N finished ones; the first to fail is kept"""
+
+    def __init__(self, keep: int):
+        self.open: Dict[str, Dict] = {}
+        self.finished = deque(maxlen=keep)
+        self.failing: Optional[str] = None
+        self.failing_location: Optional[str] = None
+
+    def before(self, event: Dict):
+        if str(event.get("callId", "")).startswith(ACTION_CALL_PREFIXES):
+            self.open[event["callId"]] = event
+
+    def after(self, event: Dict):
+        before = self.open.pop(event.get("callId"), None)
+        if before is None:
+            return
+        duration = event.get("endTime", 0) - before.get("startTime", 0)
+        entry = f"{_describe(before)} ({duration:.0f} ms)"
+        if event.get("error"):
+            entry += " FAILED"
+            if self.failing is None:
+                message = _clean(event["error"].get("message", "")).splitlines()
+                self.failing = f"{_describe(before)} failed after {duration:.0f} ms" + (
+                    f": {message[0]}" if message else "")
+                self.failing_location = _location(before.get("stack"))
+        self.finished.append(entry)
+
+    def still_running(self) -> List[str]:
+        # Actions without an "after" were cut off by the test timeout
+        return [f"{_describe(before)} (did not finish)" for before in self.open.values()]
+
+
+def extract_trace(path: str,
+                  last_actions: int = DEFAULT_LAST_ACTIONS,
+                  slow_ms: float = DEFAULT_SLOW_MS) -> TraceSummary:
+    """
+    Summarize a Playwright trace.zip. Unreadable or truncated archives give an
+    empty summary rather than an error, since a trace is optional context.
+    """
+    summary = TraceSummary()
+    try:
+        archive = zipfile.ZipFile(path)
+    except (OSError, zipfile.BadZipFile):
+        return summary
+    with archive:
+        names = [info.filename for info in archive.infolist() if "/" not in info.filename]
+        runner_actions = _ActionLog(last_actions)
+        browser_actions = _ActionLog(last_actions)
+        console, network = [], []
+        try:
+            if "test.trace" in names:
+                for event in _events(archive, "test.trace"):
+                    summary.events_read += 1
+                    kind = event.get("type")
+                    if kind == "before":
+                        runner_actions.before(event)
+                    elif kind == "after":
+                        runner_actions.after(event)
+                    elif kind == "error" and summary.error is None:
+                        summary.error = _clean(event.get("message", ""))
+                        summary.error_location = _location(event.get("stack"))
+
+            # The runner's steps already list the actions when test.trace exists
+            browser_skip = frozenset((b"before", b"after", b"log")) if runner_actions.finished else frozenset()
+            for name in (n for n in names if n.endswith("-trace.trace")):
+                for event in _events(archive, name, browser_skip):
+                    summary.events_read += 1
+                    kind = event.get("type")
+                    if kind == "before":
+                        browser_actions.before(event)
+                    elif kind == "after":
+                        browser_actions.after(event)
+                    elif kind == "console" and event.get("messageType") == "error":
+                        console.append(_clean(event.get("text", ""), 300))
+                    elif kind == "event":
+                        params = event.get("params") or {}
+                        if event.get("method") == "pageError":
+                            error = (params.get("error") or {}).get("error") or {}
+                            console.append("Uncaught " + _clean(error.get("message", ""), 300))
+                        elif (event.get("method") == "__create__" and params.get("type") == "ConsoleMessage"
+                              and (params.get("initializer") or {}).get("type") == "error"):
+                            console.append(_clean(params["initializer"].get("text", ""), 300))
+
+            for name in (n for n in names if n.endswith("-trace.network")):
+                for event in _events(archive, name):
+                    summary.events_read += 1
+                    entry = event.get("snapshot") or {}
+                    request, response = entry.get("request") or {}, entry.get("response") or {}
+                    elapsed = entry.get("time") or -1
+                    failure = response.get("_failureText")
+                    status = response.get("status", -1)
+                    if failure or status >= 400 or elapsed >= slow_ms:
+                        network.append((elapsed, f"{request.get('method', 'GET')} {request.get('url', '?')[:200]} "
+                                                  f"-> {failure or status}"
+                                                  + (f" ({elapsed:.0f} ms)" if elapsed >= 0 else "")))
+        except (OSError, EOFError, zipfile.BadZipFile, zlib.error):
+            # Truncated member: keep what was read up to the damage
+            pass
+
+    actions = runner_actions if runner_actions.finished or runner_actions.open else browser_actions
+    summary.failing_action = runner_actions.failing or browser_actions.failing
+    if summary.error_location is None:
+        summary.error_location = runner_actions.failing_location or browser_actions.failing_location
+    if summary.error is None and summary.failing_action:
+        summary.error = summary.failing_action.split(": ", 1)[-1]
+    summary.last_actions = (list(actions.finished) + actions.still_running())[-last_actions:]
+    summary.console_errors = list(dict.fromkeys(console))[:MAX_LISTED]
+    summary.network = [text for _, text in sorted(network, key=lambda item: -item[0])][:MAX_LISTED]
+    return summary
@@ -0,0 +1,547 @@
+"""
+Visual Diff
+Pre-classifies screenshot assertion failures (toHaveScreenshot: the
+<name>-expected.png / <name>-actual.png pairs Playwright writes next to the
+failure) before any LLM call, as anti-aliasing noise, a layout shift, a
+missing element, a full-page change or a localized content change, with the
+bounding boxes of what changed.
+
+Everything is vectorized NumPy on uint8 arrays: a per-pixel change mask,
+reduced to 8x8 tiles, then an SSIM score and an anti-aliasing test computed
+only for the tiles that changed. Layout shifts are looked for first, by
+correlating row and column intensity profiles, so moved content is
+recognized without per-tile work and no image is shifted and re-compared
+pixel by pixel more than once. PNG decoding uses Pillow.
+
+A failure whose diffs are all noise is answered locally (analyze_visual_noise)
+and never reaches the model; other diffs add their to_text(), bounding boxes
+included, to the analysis input.
+
+Usage:
+    diff = compare_screenshots("results-expected.png", "results-actual.png")
+    diff.kind, diff.boxes
+    python visual_diff.py expected.png actual.png
+"""
+
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from glob import escape, glob
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+IDENTICAL = "identical"
+NOISE = "anti_aliasing_noise"
+LAYOUT_SHIFT = "layout_shift"
+MISSING_ELEMENT = "missing_element"
+FULL_PAGE_CHANGE = "full_page_change"
+CONTENT_CHANGE = "content_change"
+
+TILE = 8
+# Largest per-channel difference that is not a change at all (PNG/color management jitter)
+PIXEL_THRESHOLD = 24
+# A changed tile is noise while its structure is intact and few of its pixels moved:
+# anti-aliased glyph and border edges rendered a little differently
+NOISE_SSIM = 0.85
+NOISE_TILE_FRACTION = 0.35
+# More of the page than this changed (or a structure score this low): the whole page differs
+FULL_PAGE_TILES = 0.5
+FULL_PAGE_SSIM = 0.4
+MAX_SHIFT = 200
+# Changes touching more tiles than this are tested for a layout shift before per-tile analysis
+SHIFT_FIRST_TILES = 0.1
+# A shift that leaves this share of the change unexplained is not a layout shift
+SHIFT_RESIDUAL = 0.25
+# Anti-aliasing blends neighbouring colors: a changed pixel is noise while one side's value stays within
+# this much of the range of the other side's 3x3 neighbourhood
+AA_TOLERANCE = 8
+# Intensity standard deviation of an empty (background-only) region
+FLAT_STD = 3.0
+MAX_BOXES = 8
+
+# Perceptual hashes are HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 8
+
+# SSIM stabilizers for 8-bit images
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+# Shift candidates (as offsets + MAX_SHIFT) in order of increasing distance
+_SMALLEST_FIRST = np.argsort(np.abs(np.arange(-MAX_SHIFT, MAX_SHIFT + 1)), kind="stable")
+# Orthonormal DCT-II matrix for pHash's 32x32 thumbnails
+_DCT = np.cos(np.pi * np.outer(np.arange(4 * HASH_SIZE), 2 * np.arange(4 * HASH_SIZE) + 1) / (8 * HASH_SIZE))
+_DCT[0] /= np.sqrt(2)
+_DCT = (_DCT * np.sqrt(2 / (4 * HASH_SIZE))).astype(np.float32)
+
+
+@dataclass
+class VisualDiff:
+    """How an actual screenshot differs from its baseline"""
+
+    kind: str
+    changed_ratio: float = 0.0
+    # Mean SSIM over all tiles; not computed when a layout shift explains the change
+    ssim: Optional[float] = 1.0
+    boxes: List[Dict] = field(default_factory=list)
+    shift: Optional[Tuple[int, int]] = None
+    expected_size: Tuple[int, int] = (0, 0)
+    actual_size: Tuple[int, int] = (0, 0)
+    name: Optional[str] = None
+    # Hex perceptual hashes (see visual_fingerprint), for finding the same change elsewhere
+    page_hash: Optional[str] = None
+    change_hash: Optional[str] = None
+    # Mean RGB of the changed region, baseline then actual
+    change_colors: Optional[List[List[int]]] = None
+
+    @property
+    def is_noise(self) -> bool:
+        return self.kind in (IDENTICAL, NOISE)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "VisualDiff":
+        data = dict(data)
+        for key in ("shift", "expected_size", "actual_size"):
+            if data.get(key) is not None:
+                data[key] = tuple(data[key])
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+    def to_text(self) -> str:
+        title = f"VISUAL DIFF ({self.name})" if self.name else "VISUAL DIFF"
+        line = f"{title}: {self.kind}, {self.changed_ratio:.2%} of pixels changed"
+        if self.ssim is not None:
+            line += f", SSIM {self.ssim:.3f}"
+        if self.shift:
+            dx, dy = self.shift
+            moves = [f"{'down' if dy > 0 else 'up'} {abs(dy)} px" if dy else "",
+                     f"{'right' if dx > 0 else 'left'} {abs(dx)} px" if dx else ""]
+            line += f", content moved {' and '.join(m for m in moves if m)}"
+        if self.expected_size != self.actual_size:
+            line += (f", size {self.expected_size[0]}x{self.expected_size[1]} -> "
+                     f"{self.actual_size[0]}x{self.actual_size[1]}")
+        lines = [line]
+        for box in self.boxes:
+            note = f" ({box['note']})" if box.get("note") else ""
+            lines.append(f"  - changed region x={box['x']} y={box['y']} {box['width']}x{box['height']}, "
+                         f"{box['changed_pixels']} px{note}")
+        return "\n".join(lines)
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def load_image(path: str) -> np.ndarray:
+    """RGB uint8 array of a PNG (alpha dropped: Playwright screenshots are opaque)"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def screenshot_pairs(path: str) -> List[Tuple[str, str, str]]:
+    """(snapshot name, expected png, actual png) for each failed screenshot assertion in a result directory"""
+    pairs = []
+    for actual in sorted(glob(os.path.join(escape(path), "*-actual.png"))):
+        name = os.path.basename(actual)[:-len("-actual.png")]
+        expected = os.path.join(path, f"{name}-expected.png")
+        if os.path.exists(expected):
+            pairs.append((name, expected, actual))
+    return pairs
+
+
+# ============================================================================
+# DIFF
+# ============================================================================
+
+def _change_mask(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Pixels where any channel differs by more than PIXEL_THRESHOLD (uint8 throughout, no overflow)"""
+    channels = np.maximum(expected, actual) - np.minimum(expected, actual)
+    return np.maximum(np.maximum(channels[..., 0], channels[..., 1]), channels[..., 2]) > PIXEL_THRESHOLD
+
+
+def _tile_counts(mask: np.ndarray) -> np.ndarray:
+    """Changed pixels per TILE x TILE tile of a mask whose sides are multiples of TILE"""
+    rows, cols = mask.shape[0] // TILE, mask.shape[1] // TILE
+    # Rows first: summing a middle axis keeps the inner loop contiguous
+    per_row = mask.view(np.uint8).reshape(rows, TILE, mask.shape[1]).sum(axis=1, dtype=np.uint8)
+    return per_row.reshape(rows, cols, TILE).sum(axis=2, dtype=np.int32)
+
+
+def _luma(pixels: np.ndarray) -> np.ndarray:
+    """BT.601 luma of uint8 RGB pixels, in integer arithmetic"""
+    rgb = pixels.astype(np.uint16)
+    return ((77 * rgb[..., 0] + 150 * rgb[..., 1] + 29 * rgb[..., 2]) >> 8).astype(np.float32)
+
+
+def _patches(image: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """(n, TILE+2, TILE+2) luma of the given tiles with a one-pixel border, clamped at the image edge"""
+    # Luma of the band of tile rows involved only, edge-padded to whole tiles plus the border
+    top, bottom = int(rows.min()), int(rows.max()) + 1
+    band = image[max(top * TILE - 1, 0):min(bottom * TILE + 1, image.shape[0])]
+    above = 1 if top == 0 else 0
+    below = (bottom - top) * TILE + 2 - above - len(band)
+    luma = np.pad(_luma(band), ((above, below), (1, -image.shape[1] % TILE + 1)), mode="edge")
+    # Overlapping (TILE+2)-pixel windows every TILE pixels, as a view; only the selected ones are copied
+    step_y, step_x = luma.strides
+    windows = np.lib.stride_tricks.as_strided(
+        luma, shape=(bottom - top, (luma.shape[1] - 2) // TILE, TILE + 2, TILE + 2),
+        strides=(TILE * step_y, TILE * step_x, step_y, step_x), writeable=False)
+    return windows[rows - top, cols]
+
+
+def _neighbourhood(plane: np.ndarray, combine) -> np.ndarray:
+    """combine (np.minimum, np.maximum, np.logical_or) over the 3x3 neighbourhood of the inner cells of (..., h, w)"""
+    # Separable: across each row, then down the columns (four ufunc calls instead of eight)
+    w = plane.shape[-1]
+    across = combine(combine(plane[..., :w - 2], plane[..., 1:w - 1]), plane[..., 2:])
+    h = plane.shape[-2]
+    return combine(combine(across[..., :h - 2, :], across[..., 1:h - 1, :]), across[..., 2:, :])
+
+
+def _blended(gray_e: np.ndarray, gray_a: np.ndarray) -> np.ndarray:
+    """
+    (n, TILE, TILE) pixels whose value on one side lies within the range of
+    the other side's 3x3 neighbourhood: what an anti-aliased edge looks like
+    """
+    low_e, high_e = _neighbourhood(gray_e, np.minimum) - AA_TOLERANCE, _neighbourhood(gray_e, np.maximum) + AA_TOLERANCE
+    low_a, high_a = _neighbourhood(gray_a, np.minimum) - AA_TOLERANCE, _neighbourhood(gray_a, np.maximum) + AA_TOLERANCE
+    inner_e, inner_a = gray_e[:, 1:-1, 1:-1], gray_a[:, 1:-1, 1:-1]
+    return ((low_e <= inner_a) & (inner_a <= high_e)) | ((low_a <= inner_e) & (inner_e <= high_a))
+
+
+def _ssim(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """SSIM of n pairs of windows, (n, ...) float32"""
+    x, y = expected.reshape(len(expected), -1), actual.reshape(len(actual), -1)
+    mx, my = x.mean(axis=1), y.mean(axis=1)
+    vx, vy = x.var(axis=1), y.var(axis=1)
+    cxy = (x * y).mean(axis=1) - mx * my
+    return ((2 * mx * my + _C1) * (2 * cxy + _C2)) / ((mx ** 2 + my ** 2 + _C1) * (vx + vy + _C2))
+
+
+def _components(mask: np.ndarray) -> np.ndarray:
+    """
+    Label of the 8-connected component of each cell of a tile mask (-1
+    outside it): runs of cells in each row, joined (union-find) with the runs
+    of the row above that touch them
+    """
+    labels = np.full(mask.shape, -1, dtype=np.int32)
+    parent: List[int] = []
+    runs: List[Tuple[int, int, int, int]] = []
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    previous: List[Tuple[int, int, int]] = []
+    for row in range(mask.shape[0]):
+        cols = np.flatnonzero(mask[row])
+        current = []
+        if len(cols):
+            breaks = np.flatnonzero(np.diff(cols) > 1)
+            for first, last in zip(np.concatenate(([0], breaks + 1)), np.concatenate((breaks, [len(cols) - 1]))):
+                run = len(parent)
+                parent.append(run)
+                c0, c1 = int(cols[first]), int(cols[last])
+                for above, p0, p1 in previous:
+                    if p0 <= c1 + 1 and c0 <= p1 + 1:
+                        parent[find(above)] = find(run)
+                current.append((run, c0, c1))
+                runs.append((run, row, c0, c1))
+        previous = current
+    for run, row, c0, c1 in runs:
+        labels[row, c0:c1 + 1] = find(run)
+    return labels
+
+
+def _best_offset(expected: np.ndarray, actual: np.ndarray, start: int, end: int) -> int:
+    """
+    Offset d (|d| <= MAX_SHIFT) for which the profile actual[start+d:end+d]
+    best matches expected[start:end]: mean squared error over the overlap,
+    from one matrix-vector product and prefix sums
+    """
+    band = expected[start:end].astype(np.float64)
+    length = len(band)
+    offsets = np.arange(-MAX_SHIFT, MAX_SHIFT + 1)
+    # Part of the band that overlaps actual at each offset
+    lo = np.clip(-(start + offsets), 0, length)
+    hi = np.clip(len(actual) - start - offsets, lo, length)
+    overlap = hi - lo
+
+    padded = np.zeros(length + 2 * MAX_SHIFT)
+    first = start - MAX_SHIFT
+    inside = slice(max(first, 0), min(end + MAX_SHIFT, len(actual)))
+    padded[inside.start - first:inside.stop - first] = actual[inside]
+    cross = np.lib.stride_tricks.sliding_window_view(padded, length) @ band
+    actual_energy = np.concatenate(([0.0], np.cumsum(padded ** 2)))
+    band_energy = np.concatenate(([0.0], np.cumsum(band ** 2)))
+    error = (band_energy[hi] - band_energy[lo] + actual_energy[length:] - actual_energy[:-length] - 2 * cross)
+    error = error / np.maximum(overlap, 1)
+    # Offsets that leave most of the band outside the image prove nothing
+    error[overlap < length / 2] = np.inf
+    # Ties (flat profiles) go to the smallest move
+    return int(_SMALLEST_FIRST[np.argmin(error[_SMALLEST_FIRST])]) - MAX_SHIFT
+
+
+def _row_profile(region: np.ndarray) -> np.ndarray:
+    """Mean intensity of each row of an (h, w, 3) region (rows are contiguous: one flat sum each)"""
+    return region.reshape(len(region), -1).sum(axis=1, dtype=np.uint32) / np.float32(region[0].size)
+
+
+def _column_profile(region: np.ndarray) -> np.ndarray:
+    """Mean intensity of each column of an (h, w, 3) region"""
+    return region.sum(axis=0, dtype=np.uint32).sum(axis=1) / np.float32(len(region) * 3)
+
+
+def _layout_shift(expected: np.ndarray, actual: np.ndarray, mask: np.ndarray,
+                  region: Tuple[int, int, int, int], changed: int) -> Optional[Tuple[int, int]]:
+    """(dx, dy) that explains nearly all of the change in region (y0, y1, x0, x1), if any"""
+    y0, y1, x0, x1 = region
+    dy = _best_offset(_row_profile(expected[:, x0:x1]), _row_profile(actual[:, x0:x1]), y0, y1)
+    dx = _best_offset(_column_profile(expected[y0:y1]), _column_profile(actual[y0:y1]), x0, x1)
+    if not dx and not dy:
+        return None
+    # Verify once at full resolution, over the part of the region that stays inside both images
+    height, width = expected.shape[:2]
+    ey0, ey1 = max(y0, -dy), min(y1, height - dy)
+    ex0, ex1 = max(x0, -dx), min(x1, width - dx)
+    if ey1 <= ey0 or ex1 <= ex0:
+        return None
+    # The compared part of actual must hold most of the change: on flat
+    # areas any offset that looks away from the change would match
+    covered = mask[max(y0, ey0 + dy):min(y1, ey1 + dy), max(x0, ex0 + dx):min(x1, ex1 + dx)]
+    if np.count_nonzero(covered) * 2 < changed:
+        return None
+    moved = expected[ey0:ey1, ex0:ex1], actual[ey0 + dy:ey1 + dy, ex0 + dx:ex1 + dx]
+    residual = int(np.count_nonzero(_change_mask(*moved)))
+    return (dx, dy) if residual <= SHIFT_RESIDUAL * changed else None
+
+
+def diff_images(expected: np.ndarray, actual: np.ndarray, name: Optional[str] = None) -> VisualDiff:
+    """Classify how actual (H, W, 3 uint8) differs from expected; real changes get their perceptual hashes"""
+    diff = _classify(expected, actual, name)
+    if not diff.is_noise:
+        diff.page_hash, diff.change_hash, diff.change_colors = visual_fingerprint(expected, actual, diff.boxes)
+    return diff
+
+
+def _classify(expected: np.ndarray, actual: np.ndarray, name: Optional[str]) -> VisualDiff:
+    expected_size = (int(expected.shape[1]), int(expected.shape[0]))
+    actual_size = (int(actual.shape[1]), int(actual.shape[0]))
+    diff = VisualDiff(IDENTICAL, expected_size=expected_size, actual_size=actual_size, name=name)
+    if expected_size[0] != actual_size[0]:
+        # A different viewport width reflows everything
+        diff.kind, diff.changed_ratio, diff.ssim = FULL_PAGE_CHANGE, 1.0, 0.0
+        return diff
+
+    # Taller or shorter full-page screenshots are compared over their common height
+    height, width = min(expected.shape[0], actual.shape[0]), expected.shape[1]
+    expected, actual = expected[:height], actual[:height]
+    mask = _change_mask(expected, actual)
+    changed = int(np.count_nonzero(mask))
+    diff.changed_ratio = changed / mask.size
+    if not changed:
+        diff.kind = IDENTICAL if expected_size == actual_size else LAYOUT_SHIFT
+        return diff
+
+    mask = np.pad(mask, ((0, -height % TILE), (0, -width % TILE)))
+    tile_changed = _tile_counts(mask)
+    rows, cols = np.nonzero(tile_changed)
+
+    # Large changes are checked for moved content first, from intensity
+    # profiles alone, so a shifted page half never goes through per-tile work
+    if len(rows) > SHIFT_FIRST_TILES * tile_changed.size or expected_size != actual_size:
+        diff.shift = _layout_shift(expected, actual, mask, _region(rows, cols, height, width), changed)
+        if diff.shift:
+            diff.kind, diff.ssim = LAYOUT_SHIFT, None
+            diff.boxes = [_box(rows, cols, tile_changed, expected, actual)]
+            return diff
+
+    # Structure (SSIM) and anti-aliasing only for the tiles that changed, on bordered patches
+    gray_e, gray_a = _patches(expected, rows, cols), _patches(actual, rows, cols)
+    ssim = _ssim(gray_e, gray_a)
+    changed_pixels = mask[(rows[:, None] * TILE + np.arange(TILE))[:, :, None],
+                          (cols[:, None] * TILE + np.arange(TILE))[:, None, :]]
+    blended = ~(changed_pixels & ~_blended(gray_e, gray_a)).any(axis=(1, 2))
+    noise = blended & (ssim >= NOISE_SSIM) & (tile_changed[rows, cols] <= NOISE_TILE_FRACTION * TILE * TILE)
+    diff.ssim = float(1 - (1 - ssim).sum() / tile_changed.size)
+
+    significant = np.zeros(tile_changed.shape, dtype=bool)
+    significant[rows[~noise], cols[~noise]] = True
+    if not significant.any():
+        diff.kind = NOISE if expected_size == actual_size else LAYOUT_SHIFT
+        return diff
+
+    rows, cols = np.nonzero(significant)
+    if significant.mean() > FULL_PAGE_TILES or diff.ssim < FULL_PAGE_SSIM:
+        diff.kind = FULL_PAGE_CHANGE
+        diff.boxes = [_box(rows, cols, tile_changed, expected, actual)]
+        return diff
+    diff.shift = _layout_shift(expected, actual, mask, _region(rows, cols, height, width),
+                               int(tile_changed[significant].sum()))
+    if diff.shift or expected_size != actual_size:
+        # Moved content, or a page that grew or shrank without one offset explaining it
+        diff.kind = LAYOUT_SHIFT
+        diff.boxes = [_box(rows, cols, tile_changed, expected, actual)]
+        return diff
+
+    # Changed tiles a tile apart belong to the same region
+    grown = _neighbourhood(np.pad(significant, 1), np.logical_or)
+    _, component = np.unique(_components(grown)[rows, cols], return_inverse=True)
+    sizes = np.bincount(component, weights=tile_changed[rows, cols])
+    boxes = [_box(rows[component == i], cols[component == i], tile_changed, expected, actual)
+             for i in np.argsort(-sizes, kind="stable")[:MAX_BOXES]]
+    diff.boxes = boxes
+    missing = sum(box["changed_pixels"] for box in boxes if box["note"])
+    diff.kind = MISSING_ELEMENT if missing * 2 > sum(box["changed_pixels"] for box in boxes) else CONTENT_CHANGE
+    return diff
+
+
+def _region(rows: np.ndarray, cols: np.ndarray, height: int, width: int) -> Tuple[int, int, int, int]:
+    """(y0, y1, x0, x1) pixel bounds of a set of tiles"""
+    return (int(rows.min()) * TILE, min(int(rows.max() + 1) * TILE, height),
+            int(cols.min()) * TILE, min(int(cols.max() + 1) * TILE, width))
+
+
+def _box(rows: np.ndarray, cols: np.ndarray, tile_changed: np.ndarray,
+         expected: np.ndarray, actual: np.ndarray) -> Dict:
+    """Pixel bounding box of a set of tiles, noting an element that is only on one side"""
+    y0, y1 = int(rows.min()) * TILE, min(int(rows.max() + 1) * TILE, expected.shape[0])
+    x0, x1 = int(cols.min()) * TILE, min(int(cols.max() + 1) * TILE, expected.shape[1])
+    # Flatness from a sample of the box: large boxes (moved page halves) are megapixels
+    step = max(1, int(((y1 - y0) * (x1 - x0) / 65536) ** 0.5))
+    std_e = float(_luma(expected[y0:y1:step, x0:x1:step]).std())
+    std_a = float(_luma(actual[y0:y1:step, x0:x1:step]).std())
+    note = None
+    if std_a <= FLAT_STD < std_e:
+        note = "missing in actual"
+    elif std_e <= FLAT_STD < std_a:
+        note = "new in actual"
+    return {"x": x0, "y": y0, "width": x1 - x0, "height": y1 - y0,
+            "changed_pixels": int(tile_changed[rows, cols].sum()), "note": note}
+
+
+def compare_screenshots(expected_path: str, actual_path: str, name: Optional[str] = None) -> VisualDiff:
+    return diff_images(load_image(expected_path), load_image(actual_path), name)
+
+
+def diff_result_dir(path: str) -> List[VisualDiff]:
+    """VisualDiff of every failed screenshot assertion in a Playwright result directory"""
+    return [compare_screenshots(expected, actual, name) for name, expected, actual in screenshot_pairs(path)]
+
+
+# ============================================================================
+# PERCEPTUAL HASHES
+# ============================================================================
+
+def _shrink(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """(height, width) float32 luma of an (H, W, 3) image by area averaging, from a strided sample"""
+    # About four samples per output cell each way is enough; tall pages are never read in full
+    sample = image[::max(1, len(image) // (height * 4)), ::max(1, image.shape[1] // (width * 4))]
+    gray = _luma(sample)
+    for axis, size in ((0, height), (1, width)):
+        edges = np.arange(size + 1) * gray.shape[axis] // size
+        # Images smaller than the hash repeat their pixels (reduceat of an empty span is that pixel)
+        counts = np.maximum(np.diff(edges), 1).astype(np.float32)
+        gray = np.add.reduceat(gray, edges[:-1], axis=axis) / (counts[:, None] if axis == 0 else counts)
+    return gray
+
+
+def _bits(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(image: np.ndarray) -> int:
+    """64-bit difference hash: is each of 8x8 cells brighter than its right neighbour"""
+    gray = _shrink(image, HASH_SIZE, HASH_SIZE + 1)
+    return _bits(gray[:, 1:] > gray[:, :-1])
+
+
+def phash(image: np.ndarray) -> int:
+    """64-bit DCT hash: the 8x8 lowest frequencies of a 32x32 thumbnail against their median"""
+    low = (_DCT @ _shrink(image, 4 * HASH_SIZE, 4 * HASH_SIZE) @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits(low > np.median(low))
+
+
+def visual_fingerprint(expected: np.ndarray, actual: np.ndarray,
+                       boxes: List[Dict]) -> Tuple[str, str, List[List[int]]]:
+    """
+    (page_hash, change_hash, change_colors): pHash of the baseline page, and
+    dHash and mean RGB of the changed region (union of boxes, whole page
+    without boxes) on the baseline then on the actual side
+    """
+    page_hash = f"{phash(expected):016x}"
+    if boxes:
+        y0, x0 = min(b["y"] for b in boxes), min(b["x"] for b in boxes)
+        y1, x1 = max(b["y"] + b["height"] for b in boxes), max(b["x"] + b["width"] for b in boxes)
+        expected, actual = expected[y0:y1, x0:x1], actual[y0:y1, x0:x1]
+    colors = []
+    for region in (expected, actual):
+        # A sample is enough for a mean; moved page halves are megapixels
+        step = max(1, int((region.shape[0] * region.shape[1] / 65536) ** 0.5))
+        colors.append([int(round(c)) for c in region[::step, ::step].reshape(-1, 3).mean(axis=0)])
+    return page_hash, f"{dhash(expected):016x}{dhash(actual):016x}", colors
+
+
+# ============================================================================
+# LOCAL ANSWER FOR NOISE
+# ============================================================================
+
+def as_visual_diffs(diffs: List) -> List[VisualDiff]:
+    """VisualDiff objects from VisualDiff or to_dict() items (failure records travel as JSON)"""
+    return [d if isinstance(d, VisualDiff) else VisualDiff.from_dict(d) for d in diffs]
+
+
+def analyze_visual_noise(test_name: str, error_message: str, diffs: List) -> Optional[Dict]:
+    """
+    RootCauseAnalysis fields for a screenshot failure whose diffs are all
+    rendering noise, or None when any of them changed for real
+    """
+    diffs = as_visual_diffs(diffs)
+    if not diffs or not all(d.is_noise for d in diffs):
+        return None
+    changed = max(d.changed_ratio for d in diffs)
+    ssim = min((d.ssim for d in diffs if d.ssim is not None), default=1.0)
+    platform = re.search(r"-(win32|linux|darwin)$", diffs[0].name or "")
+    return {
+        "test_name": test_name,
+        "error_message": error_message,
+        "root_causes": [
+            f"Rendering noise only: anti-aliasing or font smoothing differences ({changed:.2%} of pixels, "
+            f"structure unchanged, SSIM {ssim:.3f})",
+            "Screenshot taken on a different OS, browser build or GPU than the baseline"
+            + (f" (baseline platform: {platform.group(1)})" if platform else ""),
+        ],
+        "severity": "LOW",
+        "affected_areas": ["Visual regression baselines"],
+        "recommended_actions": [
+            "Re-run the test; no application change is indicated",
+            "Generate baselines on the same OS image CI runs on (npx playwright test --update-snapshots)",
+            "Allow this level of noise with toHaveScreenshot({ maxDiffPixelRatio }) or a higher threshold",
+        ],
+        "similar_issues": None,
+        "confidence_score": 0.9,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 1 and os.path.isdir(argv[0]):
+        diffs = diff_result_dir(argv[0])
+    elif len(argv) == 2:
+        diffs = [compare_screenshots(argv[0], argv[1])]
+    else:
+        print("Usage: python visual_diff.py <expected.png> <actual.png> | <test-results dir>")
+        return 2
+    for diff in diffs:
+        print(diff.to_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,9 @@ import pytest
 import requests
 import json
 from typing import Dict, List, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from petstore_client import PooledSession, ResponseCache, resolve_base_url
 
 # ============================================================================
 # CONFIGURATION & FIXTURES
@@ -16,8 +18,8 @@ from dataclasses import dataclass
 
 @dataclass
 class APIConfig:
-    """API configuration for different environments"""
-    base_url: str = "https://petstore.swagger.io/v2"
+    """API configuration for different environments (PETSTORE_BASE_URL overrides base_url)"""
+    base_url: str = field(default_factory=resolve_base_url)
     timeout: int = 30
     headers: Dict[str, str] = None
     
@@ -35,12 +37,17 @@ def api_config():
     return APIConfig()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def session(api_config):
-    """Fixture providing requests session with base URL and headers"""
-    sess = requests.Session()
-    sess.headers.update(api_config.headers)
-    sess.timeout = api_config.timeout
+    """
+    Fixture providing one pooled session per test process (per xdist worker)
+
+    Keep-alive connections are reused across tests and api_config.timeout is
+    applied to every request. --petstore-cache (PETSTORE_CACHE=1) adds the
+    read-through GET cache.
+    """
+    sess = PooledSession(timeout=api_config.timeout, headers=api_config.headers,
+                         cache=ResponseCache.from_env(), report=True)
     yield sess
     sess.close()
 
@@ -52,10 +59,10 @@ def base_url(api_config):
 
 
 @pytest.fixture
-def pet_data():
-    """Fixture providing sample pet data"""
+def pet_data(pet_ids):
+    """Fixture providing sample pet data (ID namespaced per xdist worker)"""
     return {
-        "id": 10001,
+        "id": pet_ids.pet_id(10001),
         "name": "Test Dog",
         "status": "available",
         "photoUrls": ["https://example.com/photo.jpg"]
@@ -63,18 +70,24 @@ def pet_data():
 
 
 @pytest.fixture
-def cleanup_pet(session, base_url):
+def cleanup_pet(session, base_url, cleanup_registry):
     """Fixture to clean up test pet after test"""
     pet_ids = []
     
     yield pet_ids
     
-    # Cleanup: delete all created pets
+    # Cleanup: delete all created pets; failures are retried at worker shutdown.
+    # A 404 means the test already deleted the pet.
     for pet_id in pet_ids:
         try:
-            session.delete(f"{base_url}/pet/{pet_id}")
+            response = session.delete(f"{base_url}/pet/{pet_id}")
         except Exception as e:
             print(f"Cleanup failed for pet {pet_id}: {e}")
+            cleanup_registry.register(base_url, pet_id)
+            continue
+        if not response.ok and response.status_code != 404:
+            print(f"Cleanup failed for pet {pet_id}: HTTP {response.status_code}")
+            cleanup_registry.register(base_url, pet_id)
 
 
 # ============================================================================
@@ -128,12 +141,12 @@ class TestPetStoreCreateOperations:
         assert isinstance(created_pet["photoUrls"], list)
         assert len(created_pet["photoUrls"]) > 0
     
-    def test_create_multiple_pets_data_driven(self, session, base_url, cleanup_pet):
+    def test_create_multiple_pets_data_driven(self, session, base_url, cleanup_pet, pet_ids):
         """Test: Data-driven test with multiple pet scenarios"""
         test_pets = [
-            {"id": 20001, "name": "Puppy", "status": "available", "photoUrls": ["url1"]},
-            {"id": 20002, "name": "Kitten", "status": "sold", "photoUrls": ["url2"]},
-            {"id": 20003, "name": "Parrot", "status": "pending", "photoUrls": ["url3"]},
+            {"id": pet_ids.pet_id(20001), "name": "Puppy", "status": "available", "photoUrls": ["url1"]},
+            {"id": pet_ids.pet_id(20002), "name": "Kitten", "status": "sold", "photoUrls": ["url2"]},
+            {"id": pet_ids.pet_id(20003), "name": "Parrot", "status": "pending", "photoUrls": ["url3"]},
         ]
         
         for pet_data in test_pets:
@@ -172,16 +185,18 @@ class TestPetStoreUpdateOperations:
 class TestPetStoreDeleteOperations:
     """Test DELETE operations for removing pets"""
     
-    def test_delete_pet_successful(self, session, base_url, pet_data):
+    def test_delete_pet_successful(self, session, base_url, pet_data, cleanup_registry):
         """Test: Delete pet and validate 200 response"""
         # Create pet first
         create_response = session.post(f"{base_url}/pet", json=pet_data)
         assert create_response.status_code == 200
         pet_id = create_response.json()["id"]
+        cleanup_registry.register(base_url, pet_id)
         
         # Delete pet
         delete_response = session.delete(f"{base_url}/pet/{pet_id}")
         assert delete_response.status_code == 200
+        cleanup_registry.discard(base_url, pet_id)
         
         # Verify deletion (should return 404)
         get_response = session.get(f"{base_url}/pet/{pet_id}")
@@ -276,10 +291,10 @@ class TestBoundaryValues:
         pets = response.json()
         assert isinstance(pets, list)
     
-    def test_create_pet_empty_name(self, session, base_url, cleanup_pet):
+    def test_create_pet_empty_name(self, session, base_url, cleanup_pet, pet_ids):
         """Test: Creating pet with empty name"""
         pet_data = {
-            "id": 30001,
+            "id": pet_ids.pet_id(30001),
             "name": "",  # Empty name - boundary case
             "status": "available",
             "photoUrls": ["url"]
@@ -298,11 +313,11 @@ class TestBoundaryValues:
 class TestIntegrationScenarios:
     """Test complete user scenarios combining multiple operations"""
     
-    def test_complete_pet_lifecycle(self, session, base_url, cleanup_pet):
+    def test_complete_pet_lifecycle(self, session, base_url, cleanup_pet, pet_ids):
         """Test: Complete CRUD lifecycle - Create, Read, Update, Delete"""
         # Step 1: Create pet
         pet_data = {
-            "id": 40001,
+            "id": pet_ids.pet_id(40001),
             "name": "Lifecycle Pet",
             "status": "available",
             "photoUrls": ["url1"]
@@ -336,23 +351,23 @@ class TestIntegrationScenarios:
         deleted_check = session.get(f"{base_url}/pet/{pet_id}")
         assert deleted_check.status_code == 404
     
-    def test_concurrent_pet_operations(self, session, base_url, cleanup_pet):
+    def test_concurrent_pet_operations(self, session, base_url, cleanup_pet, pet_ids):
         """Test: Multiple pet operations in sequence"""
-        pet_ids = []
+        created_ids = []
         
         # Create multiple pets
         for i in range(3):
             pet_data = {
-                "id": 50000 + i,
+                "id": pet_ids.pet_id(50000 + i),
                 "name": f"Concurrent Pet {i}",
                 "status": "available",
                 "photoUrls": ["url"]
             }
             resp = session.post(f"{base_url}/pet", json=pet_data)
             assert resp.status_code == 200
-            pet_ids.append(resp.json()["id"])
+            created_ids.append(resp.json()["id"])
         
-        cleanup_pet.extend(pet_ids)
+        cleanup_pet.extend(created_ids)
         
         # Query all available pets
         query_resp = session.get(f"{base_url}/pet/findByStatus", params={"status": "available"})
@@ -0,0 +1,88 @@
+"""
+Behave environment hooks
+Step tracing and per-scenario setup/cleanup; the steps themselves live in
+petstore_steps.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from petstore_context import APIContext, shared_session  # noqa: E402
+from step_trace import StepTracer  # noqa: E402
+
+
+# ============================================================================
+# CONTEXT INITIALIZATION
+# ============================================================================
+
+def before_all(context):
+    """
+    Enable step tracing when a trace file is requested.
+
+    behave -D trace=behave_trace.json (or PETSTORE_TRACE=...) writes Chrome
+    trace events for every feature, scenario, step and HTTP request.
+    """
+    trace_path = context.config.userdata.get("trace") or os.getenv("PETSTORE_TRACE")
+    context.tracer = StepTracer() if trace_path else None
+    context.trace_path = trace_path
+    if context.tracer:
+        shared_session().listeners.append(context.tracer.record_request)
+
+
+def after_all(context):
+    """Write the trace file and print the slowest steps and scenarios"""
+    tracer = getattr(context, 'tracer', None)
+    if not tracer:
+        return
+    shared_session().listeners.remove(tracer.record_request)
+    tracer.write(context.trace_path)
+    print(tracer.format_summary())
+    print(f"✓ Step trace written to {context.trace_path}")
+
+
+def before_feature(context, feature):
+    if getattr(context, 'tracer', None):
+        context.tracer.begin("feature", feature.name)
+
+
+def after_feature(context, feature):
+    if getattr(context, 'tracer', None):
+        context.tracer.end("feature", feature.name, status=_status_name(feature.status))
+
+
+def before_step(context, step):
+    if getattr(context, 'tracer', None):
+        context.tracer.begin("step", f"{step.keyword} {step.name}")
+
+
+def after_step(context, step):
+    if getattr(context, 'tracer', None):
+        context.tracer.end("step", f"{step.keyword} {step.name}", status=_status_name(step.status))
+
+
+def _status_name(status):
+    return getattr(status, "name", str(status))
+
+
+def before_scenario(context, scenario):
+    """Initialize test context before each scenario"""
+    if getattr(context, 'tracer', None):
+        context.tracer.begin("scenario", scenario.name)
+    context.api = APIContext()
+    context.pet_data = {}
+    context.created_pets = []
+
+
+def after_scenario(context, scenario):
+    """Cleanup after each scenario"""
+    if hasattr(context, 'fault_proxy'):
+        # Clean up through the real backend, not through injected faults
+        context.api.base_url = context.fault_proxy.upstream_url
+        context.fault_proxy.stop()
+        del context.fault_proxy
+    if hasattr(context, 'api'):
+        context.api.cleanup_pets()
+    if getattr(context, 'tracer', None):
+        context.tracer.end("scenario", scenario.name, status=_status_name(scenario.status))
@@ -224,3 +224,32 @@ Feature: Petstore API - Complete Workflow Scenarios
     And I delete one of the pets
     Then I should have 2 pets remaining
     And the updated pet should reflect the changes
+
+---
+
+Feature: Petstore API - Resilience Under Injected Faults
+
+  Background:
+    Given the Petstore API is available
+    And the base URL is "https://petstore.swagger.io/v2"
+    And the API is behind a fault proxy
+
+  Scenario Outline: Error responses are surfaced to the client
+    Given requests to "/pet/findByStatus" fail with status <status_code>
+    When I send a GET request to "/pet/findByStatus" with status "available"
+    Then the response code should be <status_code>
+    And the response should contain an error message
+
+    Examples:
+      | status_code |
+      | 401         |
+      | 403         |
+      | 429         |
+      | 500         |
+      | 503         |
+
+  Scenario: Slow backend is reflected in response time
+    Given requests to "/store/inventory" are delayed by 200 milliseconds
+    When I send a GET request to "/store/inventory"
+    Then the response code should be 200
+    And the response time should be at least 200 milliseconds
@@ -0,0 +1,93 @@
+"""
+Part C: BDD Implementation with Behave
+Scenario state shared by the step definitions and the environment hooks:
+the pooled session and the per-scenario APIContext. This module defines no
+steps, so environment.py can import it without registering them twice.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Shared Petstore helpers live one level up, next to the pytest conftest
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from petstore_client import PooledSession, ResponseCache, resolve_base_url
+
+# ============================================================================
+# CONTEXT HELPERS
+# ============================================================================
+
+_shared_session = None
+
+
+def shared_session():
+    """
+    Return the pooled session shared by every scenario in this run.
+
+    Set PETSTORE_CACHE=1 to enable the read-through GET cache: repeated
+    availability probes and pet lookups are then served locally until a
+    write to the same pet (or the TTL) invalidates them.
+    """
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = PooledSession(timeout=30, cache=ResponseCache.from_env())
+    return _shared_session
+
+
+class APIContext:
+    """Helper class to manage API state during test execution"""
+    
+    def __init__(self, session=None):
+        self.session = session or shared_session()
+        self.base_url = resolve_base_url()
+        self.response = None
+        self.response_time = 0
+        self.request_log = []
+        self.status_code = None
+        self.pet_ids_to_cleanup = []
+        self.headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+    
+    def make_request(self, method, endpoint, data=None, params=None):
+        """Make HTTP request and track timing (monotonic, kept for every request)"""
+        url = f"{self.base_url}{endpoint}"
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            if method.upper() == 'GET':
+                self.response = self.session.get(url, params=params, headers=self.headers)
+            elif method.upper() == 'POST':
+                self.response = self.session.post(url, json=data, headers=self.headers)
+            elif method.upper() == 'PUT':
+                self.response = self.session.put(url, json=data, headers=self.headers)
+            elif method.upper() == 'DELETE':
+                self.response = self.session.delete(url, headers=self.headers)
+            
+            self.response_time = (time.perf_counter_ns() - start_ns) / 1e6  # milliseconds
+            self.status_code = self.response.status_code
+            self.request_log.append({
+                "method": method.upper(),
+                "endpoint": endpoint,
+                "status": self.status_code,
+                "response_time_ms": self.response_time,
+            })
+        except Exception as e:
+            print(f"Request failed: {e}")
+            raise
+    
+    def cleanup_pets(self):
+        """Delete all created pets"""
+        for pet_id in self.pet_ids_to_cleanup:
+            try:
+                self.make_request('DELETE', f'/pet/{pet_id}')
+            except Exception as e:
+                print(f"Cleanup failed for pet {pet_id}: {e}")
+    
+    def get_json_response(self):
+        """Safely get JSON response"""
+        try:
+            return self.response.json()
+        except:
+            return self.response.text
@@ -5,82 +5,15 @@ Includes proper request handling, response validation, and error handling
 """
 
 from behave import given, when, then, step
-import requests
 import json
 from typing import Dict, List, Any
-import time
-
-# ============================================================================
-# CONTEXT HELPERS
-# ============================================================================
-
-class APIContext:
-    """Helper class to manage API state during test execution"""
-    
-    def __init__(self):
-        self.base_url = "https://petstore.swagger.io/v2"
-        self.response = None
-        self.response_time = 0
-        self.status_code = None
-        self.pet_ids_to_cleanup = []
-        self.headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-    
-    def make_request(self, method, endpoint, data=None):
-        """Make HTTP request and track timing"""
-        url = f"{self.base_url}{endpoint}"
-        start_time = time.time()
-        
-        try:
-            if method.upper() == 'GET':
-                self.response = requests.get(url, headers=self.headers)
-            elif method.upper() == 'POST':
-                self.response = requests.post(url, json=data, headers=self.headers)
-            elif method.upper() == 'PUT':
-                self.response = requests.put(url, json=data, headers=self.headers)
-            elif method.upper() == 'DELETE':
-                self.response = requests.delete(url, headers=self.headers)
-            
-            self.response_time = (time.time() - start_time) * 1000  # milliseconds
-            self.status_code = self.response.status_code
-        except Exception as e:
-            print(f"Request failed: {e}")
-            raise
-    
-    def cleanup_pets(self):
-        """Delete all created pets"""
-        for pet_id in self.pet_ids_to_cleanup:
-            try:
-                self.make_request('DELETE', f'/pet/{pet_id}')
-            except Exception as e:
-                print(f"Cleanup failed for pet {pet_id}: {e}")
-    
-    def get_json_response(self):
-        """Safely get JSON response"""
-        try:
-            return self.response.json()
-        except:
-            return self.response.text
-
-
-# ============================================================================
-# CONTEXT INITIALIZATION
-# ============================================================================
-
-def before_scenario(context, scenario):
-    """Initialize test context before each scenario"""
-    context.api = APIContext()
-    context.pet_data = {}
-    context.created_pets = []
-
-
-def after_scenario(context, scenario):
-    """Cleanup after each scenario"""
-    if hasattr(context, 'api'):
-        context.api.cleanup_pets()
+import sys
+from pathlib import Path
 
+# Shared Petstore helpers live one level up, next to the pytest conftest
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fault_proxy import FaultProxy, constant
+from petstore_client import resolve_base_url
 
 # ============================================================================
 # GIVEN STEPS - Setup and Preconditions
@@ -90,10 +23,10 @@ def after_scenario(context, scenario):
 def step_api_available(context):
     """Verify API is available"""
     try:
-        response = requests.get(f"{context.api.base_url}/pet/findByStatus", 
-                               params={"status": "available"},
-                               headers=context.api.headers,
-                               timeout=10)
+        response = context.api.session.get(f"{context.api.base_url}/pet/findByStatus", 
+                                           params={"status": "available"},
+                                           headers=context.api.headers,
+                                           timeout=10)
         assert response.status_code in [200, 400], "API not available"
         print(f"✓ API is available (status: {response.status_code})")
     except Exception as e:
@@ -102,9 +35,45 @@ def step_api_available(context):
 
 @given('the base URL is "{base_url}"')
 def step_set_base_url(context, base_url):
-    """Set the base URL for API calls"""
-    context.api.base_url = base_url
-    print(f"✓ Base URL set to: {base_url}")
+    """Set the base URL for API calls (PETSTORE_BASE_URL and "offline" are honored)"""
+    context.api.base_url = resolve_base_url(base_url)
+    print(f"✓ Base URL set to: {context.api.base_url}")
+
+
+@given('the API is behind a fault proxy')
+def step_api_behind_fault_proxy(context):
+    """Route all further requests through a local fault injection proxy"""
+    context.fault_proxy = FaultProxy(context.api.base_url).start()
+    context.api.base_url = context.fault_proxy.base_url
+    print(f"✓ Fault proxy in front of {context.fault_proxy.upstream_url}")
+
+
+@given('requests to "{route}" fail with status {status_code:d}')
+def step_inject_status(context, route, status_code):
+    """Answer every matching request with an error status"""
+    context.fault_proxy.fail(route, status_code)
+    print(f"✓ {route} will fail with {status_code}")
+
+
+@given('requests to "{route}" fail with status {status_code:d} at a rate of {rate:g}')
+def step_inject_status_rate(context, route, status_code, rate):
+    """Answer a fraction of matching requests with an error status"""
+    context.fault_proxy.fail(route, status_code, rate=rate)
+    print(f"✓ {route} will fail with {status_code} at rate {rate}")
+
+
+@given('requests to "{route}" are delayed by {ms:d} milliseconds')
+def step_inject_latency(context, route, ms):
+    """Add fixed latency to matching requests"""
+    context.fault_proxy.delay(route, constant(ms))
+    print(f"✓ {route} delayed by {ms}ms")
+
+
+@given('connections to "{route}" are reset')
+def step_inject_reset(context, route):
+    """Reset the TCP connection for matching requests"""
+    context.fault_proxy.reset(route)
+    print(f"✓ {route} connections will be reset")
 
 
 @given('I want to retrieve pets with status "{status}"')
@@ -272,27 +241,21 @@ def step_pet_statuses_exist(context):
 # WHEN STEPS - Actions
 # ============================================================================
 
-@when('I send a GET request to "{endpoint}"')
-def step_send_get_request(context, endpoint):
-    """Send GET request to endpoint"""
-    context.api.make_request('GET', endpoint)
-    print(f"✓ GET {endpoint} - Status: {context.api.status_code} (Response time: {context.api.response_time:.2f}ms)")
-
-
 @when('I send a GET request to "{endpoint}" with status "{status}"')
 def step_send_get_request_with_status(context, endpoint, status):
     """Send GET request with status parameter"""
-    url = f"{context.api.base_url}{endpoint}"
-    params = {"status": status}
-    
-    start_time = time.time()
-    context.api.response = requests.get(url, params=params, headers=context.api.headers)
-    context.api.response_time = (time.time() - start_time) * 1000
-    context.api.status_code = context.api.response.status_code
+    context.api.make_request('GET', endpoint, params={"status": status})
     
     print(f"✓ GET {endpoint}?status={status} - Status: {context.api.status_code}")
 
 
+@when('I send a GET request to "{endpoint}"')
+def step_send_get_request(context, endpoint):
+    """Send GET request to endpoint"""
+    context.api.make_request('GET', endpoint)
+    print(f"✓ GET {endpoint} - Status: {context.api.status_code} (Response time: {context.api.response_time:.2f}ms)")
+
+
 @when('I send a POST request to "{endpoint}" with the pet data')
 def step_send_post_request_with_pet(context, endpoint):
     """Send POST request with pet data"""
@@ -479,6 +442,14 @@ def step_assert_response_time(context, ms):
     print(f"✓ Response time {context.api.response_time:.2f}ms < {ms}ms")
 
 
+@then('the response time should be at least {ms:d} milliseconds')
+def step_assert_min_response_time(context, ms):
+    """Assert injected latency is visible to the client"""
+    assert context.api.response_time >= ms, \
+        f"Response time {context.api.response_time:.2f}ms is below {ms}ms"
+    print(f"✓ Response time {context.api.response_time:.2f}ms >= {ms}ms")
+
+
 @then('the response should contain an error message')
 def step_assert_error_message(context):
     """Assert response contains error message"""
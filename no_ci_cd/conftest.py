@@ -0,0 +1,182 @@
+"""
+Shared pytest configuration for the Petstore suites
+Connection pool reporting, per-worker isolation and longest-first scheduling
+for parallel runs under pytest-xdist (pytest -n 4)
+"""
+
+import os
+
+import pytest
+
+from fault_proxy import FaultProxy
+from petstore_client import OFFLINE_BASE_URL, PooledSession, resolve_base_url
+from petstore_stub_server import stop_shared_stub_server
+from petstore_workers import CleanupRegistry, DurationHistory, PetIdNamespace
+
+pytest_plugins = ["pytester"]
+
+POOL_STATS_KEY = "petstore_pool_stats"
+CLEANUP_KEY = "petstore_cleanup"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--longest-first",
+        action="store_true",
+        default=False,
+        help="Run tests in order of historical duration, longest first "
+             "(always on when distributing with pytest-xdist)",
+    )
+    parser.addoption(
+        "--petstore-offline",
+        action="store_true",
+        default=False,
+        help="Run against the localhost Petstore stub instead of petstore.swagger.io "
+             "(same as PETSTORE_BASE_URL=offline)",
+    )
+    parser.addoption(
+        "--petstore-cache",
+        action="store_true",
+        default=False,
+        help="Serve repeated GETs from the read-through response cache "
+             "(same as PETSTORE_CACHE=1)",
+    )
+
+
+def _is_xdist_worker(config) -> bool:
+    return hasattr(config, "workerinput")
+
+
+def _is_distributed(config) -> bool:
+    return bool(getattr(config.option, "numprocesses", None)) or _is_xdist_worker(config)
+
+
+class DurationRecorder:
+    """Plugin recording test durations; under xdist, worker reports reach the controller"""
+
+    def __init__(self, config):
+        self.config = config
+        self.history = DurationHistory.load(getattr(config, "cache", None))
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        """Schedule the longest tests first so xdist workers finish together"""
+        if config.getoption("--longest-first") or _is_distributed(config):
+            items[:] = self.history.longest_first(items)
+
+    def pytest_runtest_logreport(self, report):
+        if not _is_xdist_worker(self.config):
+            self.history.record(report.nodeid, report.duration)
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        if not _is_xdist_worker(self.config):
+            self.history.save(getattr(self.config, "cache", None))
+
+
+def pytest_configure(config):
+    """Set up the offline stub, duration-based scheduling and worker pool stat collection"""
+    if config.getoption("--petstore-offline"):
+        # Each process (every xdist worker included) starts its own stub lazily
+        os.environ["PETSTORE_BASE_URL"] = OFFLINE_BASE_URL
+    if config.getoption("--petstore-cache"):
+        os.environ["PETSTORE_CACHE"] = "1"
+    config._petstore_worker_pool_stats = []
+    config._petstore_cleanup = []
+    config.pluginmanager.register(DurationRecorder(config), "petstore-durations")
+
+
+def pytest_unconfigure(config):
+    stop_shared_stub_server()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """On xdist workers, hand this worker's pool statistics and cleanup summary to the controller"""
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None:
+        workeroutput[POOL_STATS_KEY] = PooledSession.all_pool_stats()
+        workeroutput[CLEANUP_KEY] = session.config._petstore_cleanup
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """xdist controller hook: receive pool statistics and cleanup summaries from a finished worker"""
+    workeroutput = getattr(node, "workeroutput", {})
+    node.config._petstore_worker_pool_stats.extend(workeroutput.get(POOL_STATS_KEY, []))
+    node.config._petstore_cleanup.extend(workeroutput.get(CLEANUP_KEY, []))
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    """Print keep-alive effectiveness for every pooled session and what end-of-run cleanup left behind"""
+    _report_pool_stats(terminalreporter, config)
+    _report_cleanup(terminalreporter, config)
+
+
+def _report_pool_stats(terminalreporter, config):
+    stats = config._petstore_worker_pool_stats or PooledSession.all_pool_stats()
+    stats = [s for s in stats if s["requests"]]
+    if not stats:
+        return
+
+    terminalreporter.section("petstore connection pools")
+    for entry in sorted(stats, key=lambda s: s["worker"]):
+        terminalreporter.write_line(
+            f"{entry['worker']}: {entry['requests']} requests, "
+            f"{entry['connections_opened']} connections opened, "
+            f"{entry['connections_reused']} reused, {entry['errors']} errors"
+        )
+        if entry.get("cache"):
+            cache = entry["cache"]
+            terminalreporter.write_line(
+                f"{entry['worker']} cache: {cache['hits']} hits, {cache['coalesced']} coalesced, "
+                f"{cache['misses']} misses, {cache['invalidations']} invalidations"
+            )
+
+
+def _report_cleanup(terminalreporter, config):
+    summaries = [s for s in config._petstore_cleanup if s["deleted"] or s["failed"]]
+    if not summaries:
+        return
+
+    terminalreporter.section("petstore cleanup")
+    for entry in sorted(summaries, key=lambda s: s["worker"]):
+        terminalreporter.write_line(
+            f"{entry['worker']}: {entry['deleted']} leftover pets deleted, "
+            f"{entry['failed']} could not be deleted",
+            red=bool(entry["failed"]),
+        )
+        for error in entry.get("errors", []):
+            terminalreporter.write_line(f"    pet {error['pet_id']} at {error['base_url']}: {error['error']}")
+
+
+# ============================================================================
+# PER-WORKER FIXTURES
+# ============================================================================
+
+@pytest.fixture(scope="session")
+def pet_ids():
+    """Fixture providing this worker's pet ID namespace"""
+    return PetIdNamespace()
+
+
+@pytest.fixture(scope="session")
+def cleanup_registry(pytestconfig):
+    """Fixture providing this worker's cleanup registry, drained at session end for the terminal summary"""
+    registry = CleanupRegistry()
+    yield registry
+    pytestconfig._petstore_cleanup.append(dict(registry.drain(), worker=registry.worker_id))
+
+
+@pytest.fixture(scope="session")
+def fault_proxy_server():
+    """Fixture providing one fault injection proxy in front of the configured base URL"""
+    proxy = FaultProxy(resolve_base_url()).start()
+    yield proxy
+    proxy.stop()
+
+
+@pytest.fixture
+def fault_proxy(fault_proxy_server):
+    """Fixture providing the fault proxy with a fresh, reseeded rule set per test"""
+    fault_proxy_server.rules.clear()
+    fault_proxy_server.rules.reseed(0)
+    yield fault_proxy_server
+    fault_proxy_server.rules.clear()
@@ -0,0 +1,356 @@
+"""
+Fault and Latency Injection Proxy
+Local reverse proxy that sits in front of any Petstore base URL and injects
+latency distributions, bandwidth limits, connection resets and error status
+codes per route, driven by a rule engine scriptable from pytest and behave
+
+Usage:
+    with FaultProxy("https://petstore.swagger.io/v2") as proxy:
+        proxy.rules.add(FaultRule("/pet/findByStatus", status_code=503, status_rate=0.2))
+        proxy.rules.add(FaultRule("/pet/*", latency=lognormal(median_ms=80, sigma=1.0)))
+        requests.get(f"{proxy.base_url}/pet/findByStatus", params={"status": "available"})
+"""
+
+import fnmatch
+import http.client
+import json
+import math
+import queue
+import random
+import re
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+# A latency distribution draws one delay in seconds from a seeded RNG
+LatencyDistribution = Callable[[random.Random], float]
+
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "content-length", "host",
+}
+
+# How a pooled keep-alive connection the upstream closed while idle fails on reuse
+STALE_CONNECTION_ERRORS = (ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+STATUS_MESSAGES = {
+    401: "Unauthorized",
+    403: "Forbidden",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+# ============================================================================
+# LATENCY DISTRIBUTIONS
+# ============================================================================
+
+def constant(ms: float) -> LatencyDistribution:
+    """Always delay by ms milliseconds"""
+    return lambda rng: ms / 1000
+
+
+def uniform(low_ms: float, high_ms: float) -> LatencyDistribution:
+    """Delay uniformly between low_ms and high_ms"""
+    return lambda rng: rng.uniform(low_ms, high_ms) / 1000
+
+
+def normal(mean_ms: float, stdev_ms: float) -> LatencyDistribution:
+    """Normally distributed delay, clipped at zero"""
+    return lambda rng: max(rng.gauss(mean_ms, stdev_ms), 0.0) / 1000
+
+
+def lognormal(median_ms: float, sigma: float) -> LatencyDistribution:
+    """Right-skewed delay typical of real services; sigma controls the tail"""
+    return lambda rng: rng.lognormvariate(math.log(median_ms), sigma) / 1000
+
+
+def pareto(scale_ms: float, alpha: float) -> LatencyDistribution:
+    """Heavy-tailed delay: most calls near scale_ms, rare calls far slower"""
+    return lambda rng: scale_ms * rng.paretovariate(alpha) / 1000
+
+
+def tail(base: LatencyDistribution, slow: LatencyDistribution, slow_rate: float) -> LatencyDistribution:
+    """Mix two distributions: slow_rate of calls draw from slow (e.g. p99 spikes)"""
+    return lambda rng: slow(rng) if rng.random() < slow_rate else base(rng)
+
+
+# ============================================================================
+# RULE ENGINE
+# ============================================================================
+
+@dataclass(eq=False)
+class FaultRule:
+    """
+    One fault injection rule.
+
+    route is a glob ("/pet/*") or, when it starts with "^", a regex, matched
+    against the path relative to the upstream base URL. Rates are
+    probabilities per matching request; times limits how many requests the
+    rule applies to before it expires.
+    """
+
+    route: str = "*"
+    methods: Optional[Set[str]] = None
+    latency: Optional[LatencyDistribution] = None
+    bandwidth_bps: Optional[int] = None
+    reset_rate: float = 0.0
+    status_code: Optional[int] = None
+    status_rate: float = 1.0
+    headers: Dict[str, str] = field(default_factory=dict)
+    times: Optional[int] = None
+    name: Optional[str] = None
+    hits: int = 0
+
+    def __post_init__(self):
+        if self.methods is not None:
+            self.methods = {m.upper() for m in self.methods}
+        self.name = self.name or f"{','.join(sorted(self.methods or ['*']))} {self.route}"
+        self._regex = re.compile(self.route) if self.route.startswith("^") else None
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method.upper() not in self.methods:
+            return False
+        if self._regex is not None:
+            return bool(self._regex.search(path))
+        return fnmatch.fnmatchcase(path, self.route)
+
+
+class RuleEngine:
+    """Thread-safe ordered rule set; the first matching live rule applies"""
+
+    def __init__(self, seed: int = 0):
+        self._lock = threading.Lock()
+        self._rules: List[FaultRule] = []
+        self._rng = random.Random(seed)
+        self.requests_seen = 0
+
+    def add(self, rule: FaultRule) -> FaultRule:
+        with self._lock:
+            self._rules.append(rule)
+        return rule
+
+    def remove(self, rule: FaultRule):
+        with self._lock:
+            if rule in self._rules:
+                self._rules.remove(rule)
+
+    def clear(self):
+        with self._lock:
+            self._rules.clear()
+            self.requests_seen = 0
+
+    def reseed(self, seed: int):
+        with self._lock:
+            self._rng.seed(seed)
+
+    def decide(self, method: str, path: str) -> Dict:
+        """Pick the rule for a request and roll its dice once, under the lock"""
+        with self._lock:
+            self.requests_seen += 1
+            for rule in self._rules:
+                if rule.times is not None and rule.hits >= rule.times:
+                    continue
+                if not rule.matches(method, path):
+                    continue
+                rule.hits += 1
+                return {
+                    "rule": rule,
+                    "delay": rule.latency(self._rng) if rule.latency else 0.0,
+                    "reset": rule.reset_rate > 0 and self._rng.random() < rule.reset_rate,
+                    "status": rule.status_code
+                    if rule.status_code and self._rng.random() < rule.status_rate else None,
+                }
+            return {"rule": None, "delay": 0.0, "reset": False, "status": None}
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit counts per rule name"""
+        with self._lock:
+            return {rule.name: rule.hits for rule in self._rules}
+
+
+# ============================================================================
+# PROXY SERVER
+# ============================================================================
+
+class _ProxyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FaultProxy/1.0"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _handle(self):
+        proxy: "FaultProxy" = self.server.proxy
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        url = urlsplit(self.path)
+        relative = url.path[len(proxy.upstream_prefix):] if url.path.startswith(proxy.upstream_prefix) else url.path
+        decision = proxy.rules.decide(self.command, relative or "/")
+        rule = decision["rule"]
+
+        if decision["delay"] > 0:
+            time.sleep(decision["delay"])
+
+        if decision["reset"]:
+            # SO_LINGER with a zero timeout makes close() send RST instead of FIN
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            self.close_connection = True
+            self.connection.close()
+            return
+
+        if decision["status"]:
+            status = decision["status"]
+            payload = json.dumps({
+                "code": status,
+                "type": "error",
+                "message": STATUS_MESSAGES.get(status, "Injected fault"),
+            }).encode()
+            self._send(status, {"Content-Type": "application/json", **rule.headers}, payload, rule)
+            return
+
+        try:
+            status, headers, payload = proxy.forward(self.command, self.path, self.headers, body)
+        except (OSError, http.client.HTTPException) as e:
+            status, headers = 502, {"Content-Type": "application/json"}
+            payload = json.dumps({"code": 502, "type": "error", "message": f"Upstream error: {e}"}).encode()
+        if rule is not None:
+            headers.update(rule.headers)
+        self._send(status, headers, payload, rule)
+
+    def _send(self, status: int, headers: Dict[str, str], payload: bytes, rule: Optional[FaultRule]):
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+
+        bandwidth = rule.bandwidth_bps if rule is not None else None
+        if not bandwidth:
+            self.wfile.write(payload)
+            return
+        # Throttle in ~50ms slices so the transfer rate stays near bandwidth_bps
+        chunk = max(1, bandwidth // 20)
+        for start in range(0, len(payload), chunk):
+            piece = payload[start:start + chunk]
+            self.wfile.write(piece)
+            time.sleep(len(piece) / bandwidth)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FaultProxy:
+    """Reverse proxy on localhost forwarding to upstream_url through a RuleEngine"""
+
+    def __init__(self, upstream_url: str, host: str = "127.0.0.1", port: int = 0,
+                 seed: int = 0, upstream_timeout: float = 30):
+        upstream = urlsplit(upstream_url)
+        self.upstream_url = upstream_url.rstrip("/")
+        self.upstream_scheme = upstream.scheme
+        self.upstream_host = upstream.hostname
+        self.upstream_port = upstream.port or (443 if upstream.scheme == "https" else 80)
+        self.upstream_prefix = upstream.path.rstrip("/")
+        self.upstream_timeout = upstream_timeout
+        self.rules = RuleEngine(seed=seed)
+
+        self._upstream_pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._httpd = ThreadingHTTPServer((host, port), _ProxyRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.proxy = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Drop-in replacement for the upstream base URL"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{self.upstream_prefix}"
+
+    def _connect(self) -> http.client.HTTPConnection:
+        conn_cls = http.client.HTTPSConnection if self.upstream_scheme == "https" else http.client.HTTPConnection
+        return conn_cls(self.upstream_host, self.upstream_port, timeout=self.upstream_timeout)
+
+    def forward(self, method: str, path: str, headers, body: bytes):
+        """
+        Send one request upstream, reusing pooled keep-alive connections. A
+        pooled connection the upstream has since closed is retried once on a
+        fresh connection instead of surfacing as a 502
+        """
+        try:
+            conn, reused = self._upstream_pool.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(), False
+
+        forward_headers = {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        while True:
+            try:
+                conn.request(method, path, body=body or None, headers=forward_headers)
+                response = conn.getresponse()
+                payload = response.read()
+                break
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                conn, reused = self._connect(), False
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._upstream_pool.put(conn)
+        return response.status, dict(response.getheaders()), payload
+
+    # Scripting helpers shared by pytest fixtures and behave steps
+
+    def fail(self, route: str, status_code: int, rate: float = 1.0, **kwargs) -> FaultRule:
+        """Answer matching requests with status_code at the given rate"""
+        return self.rules.add(FaultRule(route, status_code=status_code, status_rate=rate, **kwargs))
+
+    def delay(self, route: str, latency: LatencyDistribution, **kwargs) -> FaultRule:
+        """Delay matching requests by a latency distribution"""
+        return self.rules.add(FaultRule(route, latency=latency, **kwargs))
+
+    def reset(self, route: str, rate: float = 1.0, **kwargs) -> FaultRule:
+        """Reset the connection for matching requests at the given rate"""
+        return self.rules.add(FaultRule(route, reset_rate=rate, **kwargs))
+
+    def throttle(self, route: str, bandwidth_bps: int, **kwargs) -> FaultRule:
+        """Limit response bandwidth for matching requests"""
+        return self.rules.add(FaultRule(route, bandwidth_bps=bandwidth_bps, **kwargs))
+
+    def start(self) -> "FaultProxy":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        while not self._upstream_pool.empty():
+            self._upstream_pool.get_nowait().close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
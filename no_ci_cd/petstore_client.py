@@ -0,0 +1,436 @@
+"""
+Shared Petstore HTTP Client
+Pooled, thread-safe requests session reused by the pytest and behave suites,
+with an opt-in read-through response cache (PETSTORE_CACHE=1)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import PreparedRequest
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_BASE_URL = "https://petstore.swagger.io/v2"
+
+# Selects the localhost stand-in from petstore_stub_server
+OFFLINE_BASE_URL = "offline"
+
+
+def resolve_base_url(base_url: str = DEFAULT_BASE_URL) -> str:
+    """
+    Resolve the Petstore base URL for this run.
+
+    PETSTORE_BASE_URL overrides the given URL, and the value "offline" starts
+    (or reuses) the in-process stub server and returns its address.
+    """
+    base_url = os.getenv("PETSTORE_BASE_URL") or base_url
+    if base_url == OFFLINE_BASE_URL:
+        from petstore_stub_server import shared_stub_server
+        return shared_stub_server().base_url
+    return base_url
+
+
+def current_worker_id() -> str:
+    """Return the pytest-xdist worker id ("master" when not distributed)"""
+    return os.getenv("PYTEST_XDIST_WORKER", "master")
+
+
+class _Flight:
+    """One in-progress GET that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Optional[requests.Response] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Opt-in read-through cache for idempotent Petstore GETs.
+
+    - Per-route TTLs keyed by route template ("/pet/{id}", "/pet/findByStatus")
+    - Single-flight: concurrent identical GETs share one network request
+    - Any POST/PUT/DELETE touching a pet invalidates that pet's entries and
+      every collection view (findByStatus, inventory) derived from it
+    Only 200 and 404 responses are cached; errors always go to the network.
+    """
+
+    DEFAULT_TTLS = {
+        "/pet/findByStatus": 5.0,
+        "/store/inventory": 5.0,
+        "/pet/{id}": 30.0,
+    }
+    CACHEABLE_STATUSES = (200, 404)
+
+    def __init__(self,
+                 ttls: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttls = dict(self.DEFAULT_TTLS if ttls is None else ttls)
+        self.clock = clock
+        self._routes = [
+            (re.compile(re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(template)) + "$"), template)
+            # Literal routes first so "/pet/findByStatus" never matches "/pet/{id}"
+            for template in sorted(self.ttls, key=lambda t: "{" in t)
+        ]
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, requests.Response, Set[str]]] = {}
+        self._inflight: Dict[str, _Flight] = {}
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Return a cache when PETSTORE_CACHE is enabled, else None"""
+        if os.getenv("PETSTORE_CACHE", "").lower() in ("1", "true", "yes"):
+            return cls()
+        return None
+
+    def match_route(self, path: str) -> Tuple[Optional[str], Set[str]]:
+        """Return (route template, resource tags) for a request path"""
+        for pattern, template in self._routes:
+            match = pattern.search(path)
+            if match:
+                pet_id = match.groupdict().get("id")
+                return template, {f"pet:{pet_id}"} if pet_id is not None else {"pets"}
+        return None, set()
+
+    def fetch(self, key: str, path: str, send: Callable[[], requests.Response]) -> requests.Response:
+        """Serve key from cache, join an identical in-flight request, or send"""
+        route, tags = self.match_route(path)
+        if route is None:
+            return send()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.stats["hits"] += 1
+                return entry[1]
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = self._inflight[key] = _Flight()
+                self.stats["misses"] += 1
+                generation = self._generation
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = send()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                # A write that landed mid-flight makes this response unsafe to keep
+                response = flight.response
+                if (response is not None and generation == self._generation
+                        and response.status_code in self.CACHEABLE_STATUSES):
+                    self._entries[key] = (self.clock() + self.ttls[route], response, tags)
+            flight.done.set()
+        return flight.response
+
+    def invalidate_for_write(self, path: str, body: Optional[dict] = None):
+        """Drop entries a write to path (with optional JSON body) can affect"""
+        _, tags = self.match_route(path)
+        pet_id = body.get("id") if isinstance(body, dict) else None
+        if pet_id is not None:
+            tags = {f"pet:{pet_id}"}
+        with self._lock:
+            self._generation += 1
+            self.stats["invalidations"] += 1
+            if not tags or tags == {"pets"}:
+                # Unknown target (e.g. POST /pet without an id): drop everything
+                self._entries.clear()
+                return
+            tags = tags | {"pets"}
+            for key in [k for k, (_, _, entry_tags) in self._entries.items() if entry_tags & tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+# ============================================================================
+# REQUEST PHASE TIMING
+# ============================================================================
+
+# Phase timings of the request currently being sent on this thread. urllib3
+# opens connections on the calling thread, so the connection classes below
+# can attribute connect/TLS time to the request that triggered them.
+_phase_timing = threading.local()
+
+
+def _record_phase(phase: str, duration_ns: int):
+    timing = getattr(_phase_timing, "timing", None)
+    if timing is not None:
+        timing[phase] += duration_ns
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        # DNS lookup and TCP connect both happen inside create_connection()
+        start = time.perf_counter_ns()
+        try:
+            return super()._new_conn()
+        finally:
+            _record_phase("connect_ns", time.perf_counter_ns() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = time.perf_counter_ns()
+        try:
+            return super()._new_conn()
+        finally:
+            _record_phase("connect_ns", time.perf_counter_ns() - start)
+
+    def connect(self):
+        timing = getattr(_phase_timing, "timing", None)
+        connect_before = timing["connect_ns"] if timing is not None else 0
+        start = time.perf_counter_ns()
+        try:
+            super().connect()
+        finally:
+            if timing is not None:
+                # Whatever connect() spent beyond the TCP connect is the TLS handshake
+                elapsed = time.perf_counter_ns() - start
+                timing["tls_ns"] += max(elapsed - (timing["connect_ns"] - connect_before), 0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report connect and TLS handshake time"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with a bounded keep-alive pool and an enforced default timeout.
+
+    requests ignores a `timeout` attribute on Session, so every request made
+    through this class gets `timeout=self.timeout` unless the caller passes one.
+    The underlying urllib3 pool is thread-safe; headers are set once at
+    construction and never mutated afterwards, so the session can be shared
+    by worker threads.
+
+    Callables in `listeners` receive one timing dict per request (see
+    `_notify`), used by the behave step tracer.
+
+    Only sessions created with report=True (the suite's shared session)
+    appear in `all_pool_stats()` and the end-of-run pool report; throwaway
+    sessions are not kept alive for it.
+    """
+
+    # Sessions created with report=True, used for end-of-run pool reporting
+    _reported: List["PooledSession"] = []
+    _reported_lock = threading.Lock()
+
+    def __init__(self,
+                 timeout: float = 30,
+                 headers: Optional[Dict[str, str]] = None,
+                 pool_connections: int = 4,
+                 pool_maxsize: int = 16,
+                 worker_id: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None,
+                 report: bool = False):
+        super().__init__()
+        self.timeout = timeout
+        self.cache = cache
+        self.worker_id = worker_id or current_worker_id()
+        self.listeners: List[Callable[[Dict], None]] = []
+        if headers:
+            self.headers.update(headers)
+
+        # pool_block=True caps open sockets at pool_maxsize per host instead of
+        # opening (and discarding) overflow connections under concurrency
+        adapter = _TimedHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self._request_count = 0
+        self._error_count = 0
+        self._final_stats: Optional[Dict] = None
+
+        if report:
+            with PooledSession._reported_lock:
+                PooledSession._reported.append(self)
+
+    def request(self, method, url, **kwargs):
+        """Send a request, applying the session timeout when none is given"""
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        timing = {"connect_ns": 0, "tls_ns": 0, "network": False}
+        _phase_timing.timing = timing
+        start = time.perf_counter_ns()
+        response = None
+        try:
+            response = self._dispatch(method, url, **kwargs)
+            return response
+        finally:
+            _phase_timing.timing = None
+            if self.listeners:
+                self._notify(method, url, start, time.perf_counter_ns(), timing, response)
+
+    def _dispatch(self, method, url, **kwargs):
+        if self.cache is None:
+            return self._send(method, url, **kwargs)
+
+        prepared = PreparedRequest()
+        prepared.prepare_url(url, kwargs.get("params"))
+        path = prepared.path_url.split("?", 1)[0]
+
+        if method.upper() == "GET":
+            return self.cache.fetch(prepared.url, path, lambda: self._send(method, url, **kwargs))
+
+        body = kwargs.get("json")
+        if body is None and kwargs.get("data"):
+            try:
+                body = json.loads(kwargs["data"])
+            except (TypeError, ValueError):
+                body = None
+        try:
+            return self._send(method, url, **kwargs)
+        finally:
+            if method.upper() not in ("HEAD", "OPTIONS"):
+                self.cache.invalidate_for_write(path, body)
+
+    def _send(self, method, url, **kwargs):
+        with self._stats_lock:
+            self._request_count += 1
+        timing = getattr(_phase_timing, "timing", None)
+        if timing is not None:
+            timing["network"] = True
+        try:
+            return super().request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._stats_lock:
+                self._error_count += 1
+            raise
+
+    def _notify(self, method: str, url: str, start_ns: int, end_ns: int,
+                timing: Dict, response: Optional[requests.Response]):
+        """
+        Report one request to the listeners.
+
+        Times are time.perf_counter_ns() values. response.elapsed runs from
+        sending until the headers are parsed, so TTFB is elapsed minus the
+        connect/TLS time and download is the rest of the call. Requests served
+        from the cache (or coalesced onto another thread's fetch) have no
+        network phases.
+        """
+        total_ns = end_ns - start_ns
+        connect_ns, tls_ns = timing["connect_ns"], timing["tls_ns"]
+        ttfb_ns = download_ns = 0
+        if response is not None and timing["network"]:
+            elapsed_ns = int(response.elapsed.total_seconds() * 1e9)
+            ttfb_ns = max(elapsed_ns - connect_ns - tls_ns, 0)
+            download_ns = max(total_ns - elapsed_ns, 0)
+        event = {
+            "method": method.upper(),
+            "url": url,
+            "status": response.status_code if response is not None else None,
+            "start_ns": start_ns,
+            "total_ns": total_ns,
+            "connect_ns": connect_ns,
+            "tls_ns": tls_ns,
+            "ttfb_ns": ttfb_ns,
+            "download_ns": download_ns,
+            "cached": response is not None and not timing["network"],
+            "thread": threading.get_ident(),
+        }
+        for listener in list(self.listeners):
+            listener(event)
+
+    def pool_stats(self) -> Dict:
+        """
+        Return connection pool statistics for this session.
+
+        Both connection counts come from urllib3's per-pool counters:
+        `connections_opened` counts sockets it actually created, and
+        `connections_reused` the requests it sent over an already open one,
+        i.e. those that skipped a TCP/TLS handshake thanks to keep-alive.
+        Requests answered by the response cache never reach a pool.
+        """
+        if self._final_stats is not None:
+            return self._final_stats
+
+        hosts = {}
+        # The same adapter is mounted for http:// and https://; count it once
+        adapters = {id(a): a for a in self.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                entry = hosts.setdefault(host, {"opened": 0, "requests": 0, "reused": 0, "idle": 0})
+                entry["opened"] += pool.num_connections
+                entry["requests"] += pool.num_requests
+                entry["reused"] += max(pool.num_requests - pool.num_connections, 0)
+                entry["idle"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        opened = sum(h["opened"] for h in hosts.values())
+        reused = sum(h["reused"] for h in hosts.values())
+        with self._stats_lock:
+            request_count = self._request_count
+            error_count = self._error_count
+
+        return {
+            "worker": self.worker_id,
+            "requests": request_count,
+            "errors": error_count,
+            "connections_opened": opened,
+            "connections_reused": reused,
+            "hosts": hosts,
+            "cache": dict(self.cache.stats) if self.cache is not None else None,
+        }
+
+    def close(self):
+        """Close pooled connections, keeping a final stats snapshot for reporting"""
+        if self._final_stats is None:
+            self._final_stats = self.pool_stats()
+        super().close()
+
+    @classmethod
+    def all_pool_stats(cls) -> List[Dict]:
+        """Return pool statistics for every session of this process created with report=True"""
+        with cls._reported_lock:
+            sessions = list(cls._reported)
+        return [s.pool_stats() for s in sessions]
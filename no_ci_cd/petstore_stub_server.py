@@ -0,0 +1,282 @@
+"""
+Offline Petstore Stand-in Server
+Deterministic localhost implementation of the Petstore endpoints the suites use:
+/pet, /pet/{id}, /pet/findByStatus and /store/inventory
+
+Usage:
+    with PetstoreStubServer() as server:
+        requests.get(f"{server.base_url}/pet/findByStatus", params={"status": "available"})
+
+or point the suites at it without code changes:
+    pytest --petstore-offline
+    PETSTORE_BASE_URL=offline behave
+"""
+
+import itertools
+import json
+import os
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+API_PREFIX = "/v2"
+
+# Status codes and bodies mirror https://petstore.swagger.io/v2
+PET_NOT_FOUND = {"code": 1, "type": "error", "message": "Pet not found"}
+BAD_INPUT = {"code": 400, "type": "unknown", "message": "bad input"}
+SERVER_ERROR = {"code": 500, "type": "unknown", "message": "something bad happened"}
+
+Latency = Union[float, Callable[[random.Random], float]]
+
+
+class PetStore:
+    """
+    Indexed in-memory pet storage.
+
+    Pets live in a dict keyed by id, plus a secondary index of status ->
+    ids (dicts used as insertion-ordered sets), so findByStatus costs
+    O(result) and inventory costs O(number of statuses).
+    """
+
+    def __init__(self, first_generated_id: int = 9_000_000_000):
+        self._lock = threading.RLock()
+        self._pets: Dict[int, dict] = {}
+        self._by_status: Dict[str, Dict[int, None]] = {}
+        self._ids = itertools.count(first_generated_id)
+
+    def upsert(self, pet: dict) -> dict:
+        """Create or replace a pet; a missing or zero id gets a generated one"""
+        with self._lock:
+            pet = dict(pet)
+            if not pet.get("id"):
+                pet["id"] = next(self._ids)
+            pet_id = pet["id"]
+
+            previous = self._pets.get(pet_id)
+            if previous is not None:
+                self._unindex(pet_id, previous.get("status"))
+            self._pets[pet_id] = pet
+            self._by_status.setdefault(pet.get("status"), {})[pet_id] = None
+            return dict(pet)
+
+    def get(self, pet_id: int) -> Optional[dict]:
+        with self._lock:
+            pet = self._pets.get(pet_id)
+            return dict(pet) if pet is not None else None
+
+    def delete(self, pet_id: int) -> bool:
+        with self._lock:
+            pet = self._pets.pop(pet_id, None)
+            if pet is None:
+                return False
+            self._unindex(pet_id, pet.get("status"))
+            return True
+
+    def find_by_status(self, statuses: Iterable[str]) -> List[dict]:
+        with self._lock:
+            return [
+                dict(self._pets[pet_id])
+                for status in dict.fromkeys(statuses)
+                for pet_id in self._by_status.get(status, {})
+            ]
+
+    def inventory(self) -> Dict[str, int]:
+        with self._lock:
+            return {str(status): len(ids) for status, ids in self._by_status.items() if ids}
+
+    def clear(self):
+        with self._lock:
+            self._pets.clear()
+            self._by_status.clear()
+
+    def __len__(self):
+        return len(self._pets)
+
+    def _unindex(self, pet_id: int, status):
+        ids = self._by_status.get(status)
+        if ids is not None:
+            ids.pop(pet_id, None)
+            if not ids:
+                del self._by_status[status]
+
+
+class PetstoreApp:
+    """Routes requests to a PetStore; independent of the HTTP transport"""
+
+    def __init__(self,
+                 store: Optional[PetStore] = None,
+                 latency: Latency = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = 0):
+        self.store = store or PetStore()
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def handle(self, method: str, path: str, query: str = "", body: bytes = b"") -> Tuple[int, Optional[object]]:
+        """Return (status_code, json_payload) for one request"""
+        with self._rng_lock:
+            delay = self.latency(self._rng) if callable(self.latency) else self.latency
+            inject_error = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if inject_error:
+            return 500, SERVER_ERROR
+
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        path = path.rstrip("/")
+
+        if path == "/pet" and method in ("POST", "PUT"):
+            try:
+                pet = json.loads(body or b"null")
+            except ValueError:
+                return 400, BAD_INPUT
+            if not isinstance(pet, dict) or not isinstance(pet.get("id", 0), int):
+                return 400, BAD_INPUT
+            return 200, self.store.upsert(pet)
+
+        if path == "/pet/findByStatus" and method == "GET":
+            values = parse_qs(query).get("status", [])
+            statuses = [s for value in values for s in value.split(",") if s]
+            return 200, self.store.find_by_status(statuses)
+
+        if path == "/store/inventory" and method == "GET":
+            return 200, self.store.inventory()
+
+        if path.startswith("/pet/"):
+            try:
+                pet_id = int(path[len("/pet/"):])
+            except ValueError:
+                return 404, {"code": 404, "type": "unknown", "message": "java.lang.NumberFormatException"}
+
+            if method == "GET":
+                pet = self.store.get(pet_id)
+                return (200, pet) if pet is not None else (404, PET_NOT_FOUND)
+            if method == "DELETE":
+                if self.store.delete(pet_id):
+                    return 200, {"code": 200, "type": "unknown", "message": str(pet_id)}
+                return 404, None
+
+        known_route = path in ("/pet", "/pet/findByStatus", "/store/inventory")
+        return (405 if known_route else 404), None
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse sockets
+    server_version = "PetstoreStub/1.0"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without TCP_NODELAY every
+        # keep-alive response stalls ~40ms on Nagle + delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        status, payload = self.server.app.handle(self.command, url.path, url.query, body)
+
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PetstoreStubServer:
+    """Runs a PetstoreApp on a localhost port in a background thread"""
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: Latency = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = 0):
+        self.app = PetstoreApp(latency=latency, error_rate=error_rate, seed=seed)
+        self._httpd = ThreadingHTTPServer((host, port), _StubRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.app = self.app
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def store(self) -> PetStore:
+        return self.app.store
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "PetstoreStubServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+_shared_server: Optional[PetstoreStubServer] = None
+_shared_server_lock = threading.Lock()
+
+
+def shared_stub_server() -> PetstoreStubServer:
+    """
+    Return the process-wide stub server, starting it on first use.
+
+    PETSTORE_STUB_LATENCY_MS, PETSTORE_STUB_ERROR_RATE and PETSTORE_STUB_SEED
+    configure fault injection for runs selected with PETSTORE_BASE_URL=offline.
+    """
+    global _shared_server
+    with _shared_server_lock:
+        if _shared_server is None:
+            _shared_server = PetstoreStubServer(
+                latency=float(os.getenv("PETSTORE_STUB_LATENCY_MS", "0")) / 1000,
+                error_rate=float(os.getenv("PETSTORE_STUB_ERROR_RATE", "0")),
+                seed=int(os.getenv("PETSTORE_STUB_SEED", "0")),
+            ).start()
+        return _shared_server
+
+
+def stop_shared_stub_server():
+    """Stop the process-wide stub server if one was started"""
+    global _shared_server
+    with _shared_server_lock:
+        if _shared_server is not None:
+            _shared_server.stop()
+            _shared_server = None
+
+
+if __name__ == "__main__":
+    server = PetstoreStubServer(port=int(os.getenv("PETSTORE_STUB_PORT", "8080")))
+    print(f"✓ Petstore stub listening on {server.base_url}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
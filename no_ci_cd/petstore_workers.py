@@ -0,0 +1,146 @@
+"""
+Parallel Execution Support for the Petstore Suites
+Per-worker pet ID namespaces, cleanup registries and duration-based scheduling
+"""
+
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from petstore_client import PooledSession, current_worker_id
+
+# Each xdist worker gets its own block of pet IDs. Suite IDs stay below 1M,
+# so worker N maps base ID 10001 to N * 1_000_000 + 10001.
+WORKER_ID_STRIDE = 1_000_000
+
+DURATIONS_CACHE_KEY = "petstore/durations"
+
+
+def worker_index(worker_id: Optional[str] = None) -> int:
+    """Map an xdist worker id ("gw0", "gw1", ...) to its index; "master" is 0"""
+    worker_id = worker_id or current_worker_id()
+    match = re.fullmatch(r"gw(\d+)", worker_id)
+    return int(match.group(1)) if match else 0
+
+
+class PetIdNamespace:
+    """Translates the suites' fixed pet IDs into a range owned by one worker"""
+
+    def __init__(self, worker_id: Optional[str] = None, stride: int = WORKER_ID_STRIDE):
+        self.worker_id = worker_id or current_worker_id()
+        self.offset = worker_index(self.worker_id) * stride
+        self.stride = stride
+
+    def pet_id(self, base_id: int) -> int:
+        """Return this worker's copy of base_id"""
+        if not 0 <= base_id < self.stride:
+            raise ValueError(f"Pet ID {base_id} is outside the namespaced range [0, {self.stride})")
+        return self.offset + base_id
+
+    def pet_ids(self, base_ids: Iterable[int]) -> List[int]:
+        """Translate several base IDs at once"""
+        return [self.pet_id(base_id) for base_id in base_ids]
+
+
+class CleanupRegistry:
+    """
+    Thread-safe record of pets a worker created but has not deleted yet.
+
+    Tests register what they create; whatever is still registered when the
+    worker finishes is deleted in one pass over a pooled session.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or current_worker_id()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[int, None]] = defaultdict(dict)
+
+    def register(self, base_url: str, pet_id: int):
+        """Remember a created pet for end-of-run cleanup"""
+        with self._lock:
+            self._pending[base_url][pet_id] = None
+
+    def discard(self, base_url: str, pet_id: int):
+        """Forget a pet that the test already deleted"""
+        with self._lock:
+            self._pending.get(base_url, {}).pop(pet_id, None)
+
+    def pending(self) -> List[Tuple[str, int]]:
+        """Return (base_url, pet_id) pairs still awaiting cleanup"""
+        with self._lock:
+            return [(url, pet_id) for url, ids in self._pending.items() for pet_id in ids]
+
+    def drain(self, timeout: float = 10) -> Dict[str, Any]:
+        """
+        Delete every pending pet.
+
+        Returns counts of deleted and failed pets, and under "errors" the
+        pet ID, base URL and reason of each failure for the caller to report.
+        A pet that is already gone (404) counts as deleted.
+        """
+        with self._lock:
+            pending = {url: list(ids) for url, ids in self._pending.items()}
+            self._pending.clear()
+
+        summary = {"deleted": 0, "failed": 0, "errors": []}
+        if not pending:
+            return summary
+
+        session = PooledSession(timeout=timeout, worker_id=self.worker_id)
+        try:
+            for base_url, pet_ids in pending.items():
+                for pet_id in pet_ids:
+                    try:
+                        response = session.delete(f"{base_url}/pet/{pet_id}")
+                        error = None if response.ok or response.status_code == 404 else f"HTTP {response.status_code}"
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                    if error is None:
+                        summary["deleted"] += 1
+                    else:
+                        summary["failed"] += 1
+                        summary["errors"].append({"pet_id": pet_id, "base_url": base_url, "error": error})
+        finally:
+            session.close()
+        return summary
+
+
+class DurationHistory:
+    """Historical test durations used to schedule the longest tests first"""
+
+    def __init__(self, durations: Optional[Dict[str, float]] = None):
+        self.durations: Dict[str, float] = dict(durations or {})
+        self._observed: Dict[str, float] = defaultdict(float)
+
+    @classmethod
+    def load(cls, cache) -> "DurationHistory":
+        """Load durations from the pytest cache (config.cache)"""
+        return cls(cache.get(DURATIONS_CACHE_KEY, {}) if cache is not None else {})
+
+    def record(self, nodeid: str, seconds: float):
+        """Accumulate one setup/call/teardown phase of a test from this run"""
+        self._observed[nodeid] += seconds
+
+    def save(self, cache):
+        """Merge this run's durations into the pytest cache"""
+        if cache is None or not self._observed:
+            return
+        merged = dict(self.durations)
+        merged.update(self._observed)
+        cache.set(DURATIONS_CACHE_KEY, merged)
+
+    def longest_first(self, items: List) -> List:
+        """
+        Order items by historical duration, longest first (LPT scheduling).
+
+        Unknown tests are treated as longest so they are measured early, and
+        ties keep collection order, so every xdist worker computes the same
+        order from the same cache.
+        """
+        unknown = max(self.durations.values(), default=0.0) + 1.0
+        positions = {item.nodeid: i for i, item in enumerate(items)}
+        return sorted(
+            items,
+            key=lambda item: (-self.durations.get(item.nodeid, unknown), positions[item.nodeid]),
+        )
@@ -0,0 +1,146 @@
+"""
+Step Timing Trace for the Behave Suite
+Records features, scenarios, steps and the HTTP requests made inside them as
+Chrome trace events (load the file in chrome://tracing or ui.perfetto.dev)
+and summarizes the slowest steps and scenarios
+
+Usage:
+    PETSTORE_TRACE=behave_trace.json behave
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# Sub-spans drawn under each HTTP request, in the order they happen
+REQUEST_PHASES = ("connect", "tls", "ttfb", "download")
+
+
+class StepTracer:
+    """
+    Collects monotonic (perf_counter_ns) spans as Chrome trace events.
+
+    Spans on the same thread nest by time, so a flame view shows
+    feature > scenario > step > request > connect/tls/ttfb/download.
+    """
+
+    def __init__(self, process_name: str = "behave"):
+        self.process_name = process_name
+        self.pid = os.getpid()
+        self._origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._events: List[Dict] = []
+        self._open: Dict[tuple, int] = {}
+        self._durations: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+
+    def _us(self, ns: int) -> float:
+        return (ns - self._origin_ns) / 1000
+
+    def begin(self, category: str, name: str):
+        """Start a span; end() with the same category and name closes it"""
+        key = (category, name, threading.get_ident())
+        with self._lock:
+            self._open[key] = time.perf_counter_ns()
+
+    def end(self, category: str, name: str, **args) -> Optional[int]:
+        """Close a span and return its duration in ns (None if it was never begun)"""
+        end_ns = time.perf_counter_ns()
+        key = (category, name, threading.get_ident())
+        with self._lock:
+            start_ns = self._open.pop(key, None)
+        if start_ns is None:
+            return None
+        self.complete(category, name, start_ns, end_ns - start_ns, **args)
+        return end_ns - start_ns
+
+    def complete(self, category: str, name: str, start_ns: int, duration_ns: int,
+                 thread: Optional[int] = None, **args):
+        """Add a finished span ("X" event) with perf_counter_ns timestamps"""
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._us(start_ns),
+            "dur": duration_ns / 1000,
+            "pid": self.pid,
+            "tid": thread or threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._durations[category][name].append(duration_ns)
+
+    def record_request(self, timing: Dict):
+        """PooledSession listener: one span per request plus its phases"""
+        name = f"{timing['method']} {urlsplit(timing['url']).path}"
+        thread = timing["thread"]
+        self.complete("http", name, timing["start_ns"], timing["total_ns"], thread=thread,
+                      status=timing["status"], cached=timing["cached"], url=timing["url"])
+
+        offset = timing["start_ns"]
+        for phase in REQUEST_PHASES:
+            duration = timing[f"{phase}_ns"]
+            if duration:
+                self.complete("http.phase", phase, offset, duration, thread=thread)
+                offset += duration
+
+    def summary(self, top: int = 10) -> Dict[str, List[Dict]]:
+        """Return the slowest steps and scenarios plus totals per request phase"""
+        with self._lock:
+            durations = {cat: dict(names) for cat, names in self._durations.items()}
+
+        def slowest(category: str) -> List[Dict]:
+            rows = [
+                {"name": name, "count": len(values), "total_ms": sum(values) / 1e6,
+                 "max_ms": max(values) / 1e6}
+                for name, values in durations.get(category, {}).items()
+            ]
+            return sorted(rows, key=lambda r: r["total_ms"], reverse=True)[:top]
+
+        phases = durations.get("http.phase", {})
+        return {
+            "steps": slowest("step"),
+            "scenarios": slowest("scenario"),
+            "requests": slowest("http"),
+            "phases": [
+                {"name": phase, "count": len(phases.get(phase, [])),
+                 "total_ms": sum(phases.get(phase, [])) / 1e6}
+                for phase in REQUEST_PHASES
+            ],
+        }
+
+    def format_summary(self, top: int = 10) -> str:
+        summary = self.summary(top)
+        lines = []
+        for title, key in (("Slowest scenarios", "scenarios"), ("Slowest steps", "steps"),
+                           ("Slowest requests", "requests")):
+            if not summary[key]:
+                continue
+            lines.append(f"{title}:")
+            for row in summary[key]:
+                lines.append(f"  {row['total_ms']:9.1f} ms  x{row['count']:<4} "
+                             f"(max {row['max_ms']:.1f} ms)  {row['name']}")
+        phase_line = ", ".join(f"{p['name']} {p['total_ms']:.1f} ms" for p in summary["phases"])
+        lines.append(f"HTTP time by phase: {phase_line}")
+        return "\n".join(lines)
+
+    def write(self, path: str, top: int = 10):
+        """Write the trace as Chrome trace-event JSON, summary under otherData"""
+        with self._lock:
+            events = list(self._events)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid,
+                     "args": {"name": self.process_name}}]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "traceEvents": metadata + sorted(events, key=lambda e: e["ts"]),
+                "displayTimeUnit": "ms",
+                "otherData": {"summary": self.summary(top)},
+            }, f)
@@ -0,0 +1,206 @@
+"""
+Tests for the pooled Petstore client and its read-through cache
+"""
+
+import threading
+
+import pytest
+
+from petstore_client import PooledSession, ResponseCache
+from petstore_stub_server import PetstoreStubServer
+
+
+@pytest.fixture
+def stub():
+    with PetstoreStubServer() as server:
+        yield server
+
+
+@pytest.fixture
+def cached_session():
+    now = {"t": 0.0}
+    cache = ResponseCache(clock=lambda: now["t"])
+    session = PooledSession(timeout=5, cache=cache)
+    session.now = now
+    yield session
+    session.close()
+
+
+class TestResponseCache:
+    """Read-through caching must never change what the suites observe"""
+
+    def test_repeated_get_is_served_from_cache(self, stub, cached_session):
+        for _ in range(3):
+            assert cached_session.get(f"{stub.base_url}/pet/findByStatus",
+                                      params={"status": "available"}).status_code == 200
+        assert cached_session.cache.stats["hits"] == 2
+        assert cached_session.pool_stats()["requests"] == 1
+
+    def test_ttl_expiry_refetches(self, stub, cached_session):
+        url = f"{stub.base_url}/store/inventory"
+        cached_session.get(url)
+        cached_session.now["t"] = ResponseCache.DEFAULT_TTLS["/store/inventory"] + 1
+        cached_session.get(url)
+        assert cached_session.cache.stats["misses"] == 2
+
+    def test_write_invalidates_pet_and_collections(self, stub, cached_session):
+        pet = {"id": 11, "name": "Rex", "status": "available", "photoUrls": []}
+        assert cached_session.get(f"{stub.base_url}/pet/11").status_code == 404
+        listing = cached_session.get(f"{stub.base_url}/pet/findByStatus", params={"status": "available"})
+        assert listing.json() == []
+
+        cached_session.post(f"{stub.base_url}/pet", json=pet)
+
+        assert cached_session.get(f"{stub.base_url}/pet/11").json()["name"] == "Rex"
+        listing = cached_session.get(f"{stub.base_url}/pet/findByStatus", params={"status": "available"})
+        assert [p["id"] for p in listing.json()] == [11]
+
+        cached_session.delete(f"{stub.base_url}/pet/11")
+        assert cached_session.get(f"{stub.base_url}/pet/11").status_code == 404
+
+    def test_server_errors_are_not_cached(self, cached_session):
+        with PetstoreStubServer(error_rate=1.0) as failing:
+            cached_session.get(f"{failing.base_url}/store/inventory")
+            cached_session.get(f"{failing.base_url}/store/inventory")
+        assert cached_session.cache.stats["hits"] == 0
+
+    def test_concurrent_identical_gets_are_coalesced(self):
+        with PetstoreStubServer(latency=0.2) as slow:
+            session = PooledSession(timeout=5, cache=ResponseCache())
+            barrier = threading.Barrier(5)
+            results = []
+
+            def fetch():
+                barrier.wait()
+                results.append(session.get(f"{slow.base_url}/pet/findByStatus",
+                                           params={"status": "sold"}).status_code)
+
+            threads = [threading.Thread(target=fetch) for _ in range(5)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            session.close()
+
+        assert results == [200] * 5
+        assert session.pool_stats()["requests"] == 1
+        assert session.cache.stats["coalesced"] == 4
+
+
+def test_session_applies_default_timeout(stub):
+    """requests ignores Session.timeout; PooledSession must not"""
+    session = PooledSession(timeout=0.05)
+    stub.app.latency = 0.3
+    try:
+        with pytest.raises(Exception) as excinfo:
+            session.get(f"{stub.base_url}/store/inventory")
+        assert "timed out" in str(excinfo.value).lower()
+    finally:
+        stub.app.latency = 0.0
+        session.close()
+
+
+class TestPoolStats:
+    """Connection counts come from urllib3's own per-pool counters"""
+
+    def test_keep_alive_reuses_one_connection(self, stub):
+        session = PooledSession(timeout=5)
+        try:
+            for _ in range(5):
+                session.get(f"{stub.base_url}/store/inventory")
+            stats = session.pool_stats()
+        finally:
+            session.close()
+
+        assert (stats["requests"], stats["connections_opened"], stats["connections_reused"]) == (5, 1, 4)
+        (host,) = stats["hosts"].values()
+        assert (host["requests"], host["opened"], host["reused"], host["idle"]) == (5, 1, 4, 1)
+
+    def test_concurrent_requests_open_at_most_the_pool_size(self, stub):
+        session = PooledSession(timeout=5, pool_maxsize=4)
+        stub.app.latency = 0.02
+
+        def fetch(_):
+            for _ in range(5):
+                session.get(f"{stub.base_url}/store/inventory")
+        try:
+            threads = [threading.Thread(target=fetch, args=(i,)) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            stats = session.pool_stats()
+        finally:
+            stub.app.latency = 0.0
+            session.close()
+
+        assert stats["requests"] == 40 and 1 <= stats["connections_opened"] <= 4
+        assert stats["connections_reused"] == 40 - stats["connections_opened"]
+
+    def test_cache_hits_are_not_counted_as_reuse(self, stub, cached_session):
+        for _ in range(3):
+            cached_session.get(f"{stub.base_url}/store/inventory")
+        stats = cached_session.pool_stats()
+        assert (stats["requests"], stats["connections_opened"], stats["connections_reused"]) == (1, 1, 0)
+        assert stats["cache"]["hits"] == 2
+
+    def test_hosts_are_counted_separately(self, stub):
+        session = PooledSession(timeout=5)
+        with PetstoreStubServer() as other:
+            try:
+                for server in (stub, other, other):
+                    session.get(f"{server.base_url}/store/inventory")
+                stats = session.pool_stats()
+            finally:
+                session.close()
+
+        assert {h["requests"] for h in stats["hosts"].values()} == {1, 2}
+        assert (stats["connections_opened"], stats["connections_reused"]) == (2, 1)
+
+    def test_closed_session_keeps_its_final_stats(self, stub):
+        session = PooledSession(timeout=5)
+        session.get(f"{stub.base_url}/store/inventory")
+        before = session.pool_stats()
+        session.close()
+        assert session.pool_stats() == before
+
+    def test_only_reported_sessions_are_listed(self, stub, monkeypatch):
+        monkeypatch.setattr(PooledSession, "_reported", [])
+        reported = PooledSession(timeout=5, worker_id="gw3", report=True)
+        throwaway = PooledSession(timeout=5, worker_id="gw4")
+        try:
+            for session in (reported, throwaway):
+                session.get(f"{stub.base_url}/store/inventory")
+            assert [s["worker"] for s in PooledSession.all_pool_stats()] == ["gw3"]
+        finally:
+            reported.close()
+            throwaway.close()
+
+
+class TestRequestTiming:
+    """Listeners get per-request phase timings"""
+
+    def test_connect_time_only_on_new_connections(self, stub):
+        events = []
+        session = PooledSession(timeout=5)
+        session.listeners.append(events.append)
+        try:
+            session.get(f"{stub.base_url}/store/inventory")
+            session.get(f"{stub.base_url}/store/inventory")
+        finally:
+            session.close()
+
+        first, second = events
+        assert first["connect_ns"] > 0 and second["connect_ns"] == 0
+        for event in events:
+            assert event["status"] == 200 and not event["cached"]
+            assert event["connect_ns"] + event["ttfb_ns"] + event["download_ns"] <= event["total_ns"]
+
+    def test_cache_hits_have_no_network_phases(self, stub, cached_session):
+        events = []
+        cached_session.listeners.append(events.append)
+        for _ in range(2):
+            cached_session.get(f"{stub.base_url}/store/inventory")
+
+        assert [e["cached"] for e in events] == [False, True]
+        assert events[1]["ttfb_ns"] == events[1]["connect_ns"] == 0
@@ -0,0 +1,70 @@
+"""
+Tests for the offline Petstore stand-in
+"""
+
+import requests
+
+from petstore_stub_server import PetStore, PetstoreApp, PetstoreStubServer
+
+
+class TestPetStoreIndex:
+    """Secondary status index stays consistent with the primary store"""
+
+    def test_status_change_moves_pet_between_indexes(self):
+        store = PetStore()
+        store.upsert({"id": 1, "name": "Rex", "status": "available"})
+        store.upsert({"id": 1, "name": "Rex", "status": "sold"})
+
+        assert store.find_by_status(["available"]) == []
+        assert [p["id"] for p in store.find_by_status(["sold"])] == [1]
+        assert store.inventory() == {"sold": 1}
+
+    def test_delete_removes_pet_from_index(self):
+        store = PetStore()
+        store.upsert({"id": 1, "name": "Rex", "status": "available"})
+        assert store.delete(1)
+        assert not store.delete(1)
+        assert store.find_by_status(["available"]) == []
+        assert store.inventory() == {}
+
+    def test_missing_id_is_generated(self):
+        store = PetStore(first_generated_id=500)
+        assert store.upsert({"name": "No Id", "status": "pending"})["id"] == 500
+        assert store.upsert({"id": 0, "name": "Zero", "status": "pending"})["id"] == 501
+
+
+class TestPetstoreApp:
+    """Routing and fault injection without a socket"""
+
+    def test_find_by_status_accepts_comma_separated_values(self):
+        app = PetstoreApp()
+        app.store.upsert({"id": 1, "name": "A", "status": "available"})
+        app.store.upsert({"id": 2, "name": "B", "status": "sold"})
+
+        status, pets = app.handle("GET", "/v2/pet/findByStatus", "status=available,sold")
+        assert status == 200
+        assert sorted(p["id"] for p in pets) == [1, 2]
+
+    def test_error_rate_is_deterministic_for_a_seed(self):
+        def codes(seed):
+            app = PetstoreApp(error_rate=0.5, seed=seed)
+            return [app.handle("GET", "/v2/store/inventory")[0] for _ in range(20)]
+
+        assert codes(7) == codes(7)
+        assert 500 in codes(7) and 200 in codes(7)
+
+    def test_unknown_pet_returns_swagger_error_body(self):
+        status, body = PetstoreApp().handle("GET", "/v2/pet/42")
+        assert status == 404
+        assert body["message"] == "Pet not found"
+
+
+def test_server_round_trip():
+    """The HTTP wrapper serves the same API over localhost"""
+    with PetstoreStubServer() as server:
+        pet = {"id": 7, "name": "Stub Dog", "status": "available", "photoUrls": ["url"]}
+        assert requests.post(f"{server.base_url}/pet", json=pet).json() == pet
+        assert requests.get(f"{server.base_url}/pet/7").json()["name"] == "Stub Dog"
+        assert requests.get(f"{server.base_url}/store/inventory").json() == {"available": 1}
+        assert requests.delete(f"{server.base_url}/pet/7").status_code == 200
+        assert requests.delete(f"{server.base_url}/pet/7").status_code == 404
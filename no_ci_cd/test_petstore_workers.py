@@ -0,0 +1,144 @@
+"""
+Tests for parallel execution support: per-worker pet IDs, the cleanup registry and duration-based scheduling
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from petstore_stub_server import PetstoreStubServer
+from petstore_workers import (DURATIONS_CACHE_KEY, WORKER_ID_STRIDE, CleanupRegistry, DurationHistory,
+                              PetIdNamespace, worker_index)
+
+
+@pytest.fixture
+def stub():
+    with PetstoreStubServer() as server:
+        yield server
+
+
+class DictCache:
+    """The get/set subset of config.cache"""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def get(self, key, default):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def items(*nodeids):
+    return [SimpleNamespace(nodeid=nodeid) for nodeid in nodeids]
+
+
+class TestPetIdNamespace:
+    @pytest.mark.parametrize("worker_id, index", [("master", 0), ("gw0", 0), ("gw1", 1), ("gw12", 12)])
+    def test_worker_index(self, worker_id, index):
+        assert worker_index(worker_id) == index
+
+    def test_each_worker_owns_one_stride(self):
+        assert PetIdNamespace("gw0").pet_id(10001) == 10001
+        assert PetIdNamespace("gw3").pet_id(10001) == 3 * WORKER_ID_STRIDE + 10001
+        assert PetIdNamespace("gw2", stride=100).pet_ids([0, 99]) == [200, 299]
+
+    def test_workers_never_share_an_id(self):
+        base_ids = [0, 1, 10001, 80002, WORKER_ID_STRIDE - 1]
+        ids = [PetIdNamespace(f"gw{n}").pet_ids(base_ids) for n in range(8)]
+        flat = [pet_id for worker_ids in ids for pet_id in worker_ids]
+        assert len(set(flat)) == len(flat)
+
+    @pytest.mark.parametrize("base_id", [-1, WORKER_ID_STRIDE, WORKER_ID_STRIDE + 10001])
+    def test_ids_outside_the_stride_are_rejected(self, base_id):
+        # Otherwise gw0's copy would be gw1's copy of another ID
+        with pytest.raises(ValueError, match="outside the namespaced range"):
+            PetIdNamespace("gw0").pet_id(base_id)
+
+
+class TestCleanupRegistry:
+    def test_register_and_discard(self):
+        registry = CleanupRegistry("gw1")
+        registry.register("http://a", 1)
+        registry.register("http://a", 2)
+        registry.register("http://a", 1)
+        registry.register("http://b", 1)
+        registry.discard("http://a", 2)
+        registry.discard("http://c", 5)
+        assert registry.pending() == [("http://a", 1), ("http://b", 1)]
+
+    def test_concurrent_registration_keeps_every_pet(self):
+        registry = CleanupRegistry("gw0")
+
+        def register(start):
+            for pet_id in range(start, start + 100):
+                registry.register("http://a", pet_id)
+
+        threads = [threading.Thread(target=register, args=(n * 100,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(registry.pending()) == 800
+
+    def test_drain_deletes_pending_pets_and_empties_the_registry(self, stub):
+        pet = {"id": 10001, "name": "Leftover", "status": "available", "photoUrls": []}
+        assert requests.post(f"{stub.base_url}/pet", json=pet).status_code == 200
+        registry = CleanupRegistry("gw0")
+        registry.register(stub.base_url, 10001)
+        # Already gone: counts as deleted
+        registry.register(stub.base_url, 10002)
+
+        assert registry.drain() == {"deleted": 2, "failed": 0, "errors": []}
+        assert requests.get(f"{stub.base_url}/pet/10001").status_code == 404
+        assert registry.pending() == []
+        assert registry.drain() == {"deleted": 0, "failed": 0, "errors": []}
+
+    def test_drain_reports_failures_and_continues(self, fault_proxy):
+        fault_proxy.fail("/pet/1", 500, methods={"DELETE"})
+        registry = CleanupRegistry("gw0")
+        registry.register("http://127.0.0.1:9", 3)
+        registry.register(fault_proxy.base_url, 1)
+        registry.register(fault_proxy.base_url, 2)
+
+        summary = registry.drain(timeout=2)
+        assert (summary["deleted"], summary["failed"]) == (1, 2)
+        errors = {error["pet_id"]: error for error in summary["errors"]}
+        assert errors[1] == {"pet_id": 1, "base_url": fault_proxy.base_url, "error": "HTTP 500"}
+        assert errors[3]["error"].startswith("ConnectionError: ")
+        assert registry.pending() == []
+
+
+class TestDurationHistory:
+    def test_longest_first(self):
+        history = DurationHistory({"a": 1.0, "b": 5.0, "c": 3.0})
+        assert [item.nodeid for item in history.longest_first(items("a", "b", "c"))] == ["b", "c", "a"]
+
+    def test_unknown_tests_run_first_and_ties_keep_collection_order(self):
+        history = DurationHistory({"a": 2.0, "b": 2.0, "c": 9.0})
+        ordered = history.longest_first(items("new1", "b", "a", "c", "new2"))
+        assert [item.nodeid for item in ordered] == ["new1", "new2", "c", "b", "a"]
+
+    def test_empty_history_keeps_collection_order(self):
+        assert [item.nodeid for item in DurationHistory().longest_first(items("z", "y", "x"))] == ["z", "y", "x"]
+
+    def test_phases_accumulate_and_merge_into_the_cache(self):
+        cache = DictCache({DURATIONS_CACHE_KEY: {"a": 4.0, "b": 1.0}})
+        history = DurationHistory.load(cache)
+        for phase in (0.5, 2.0, 0.5):
+            history.record("b", phase)
+        history.record("c", 0.25)
+        history.save(cache)
+
+        assert cache.values[DURATIONS_CACHE_KEY] == {"a": 4.0, "b": 3.0, "c": 0.25}
+        assert [item.nodeid for item in DurationHistory.load(cache).longest_first(items("c", "b", "a"))] == [
+            "a", "b", "c"]
+
+    def test_without_a_cache(self):
+        history = DurationHistory.load(None)
+        history.record("a", 1.0)
+        history.save(None)
+        assert history.durations == {}
@@ -0,0 +1,100 @@
+"""
+Tests for the end-of-run terminal report: the session fixture's pool statistics and the cleanup of leftover pets
+"""
+
+import os
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PART_B = os.path.join(HERE, "Part_B_Framework_Migration")
+
+
+@pytest.fixture
+def suite(pytester, monkeypatch):
+    """A pytester directory using the real conftest, offline against the stub"""
+    with open(os.path.join(HERE, "conftest.py")) as f:
+        pytester.makeconftest(f.read())
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([HERE, PART_B]))
+    monkeypatch.delenv("PETSTORE_BASE_URL", raising=False)
+    return pytester
+
+
+SESSION_TESTS = """
+from petstore_client import PooledSession
+from petstore_pytest_tests import api_config, session
+
+SEEN = []
+
+
+def test_first(session, api_config):
+    SEEN.append(session)
+    assert session.timeout == api_config.timeout
+    session.get(f"{api_config.base_url}/store/inventory")
+
+
+def test_second(session, api_config):
+    assert SEEN == [session]
+    session.get(f"{api_config.base_url}/store/inventory")
+    # A throwaway session is not part of the report
+    other = PooledSession(timeout=5)
+    other.get(f"{api_config.base_url}/store/inventory")
+    other.close()
+"""
+
+
+def test_session_fixture_is_shared_and_its_pool_reported(suite):
+    suite.makepyfile(test_session=SESSION_TESTS)
+    result = suite.runpytest_subprocess("--petstore-offline", "-p", "no:cacheprovider")
+
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(["*petstore connection pools*"])
+    assert [line for line in result.outlines if line.startswith("master:")] == [
+        "master: 2 requests, 1 connections opened, 1 reused, 0 errors"]
+
+
+CLEANUP_TESTS = """
+from petstore_pytest_tests import api_config
+
+
+def test_leaves_pets_behind(cleanup_registry, api_config):
+    cleanup_registry.register(api_config.base_url, 10001)
+    # Nothing listens here, so this one cannot be deleted
+    cleanup_registry.register("http://127.0.0.1:9", 10002)
+"""
+
+
+def test_leftover_pets_are_reported_in_the_summary_not_the_test_output(suite):
+    suite.makepyfile(test_cleanup=CLEANUP_TESTS)
+    result = suite.runpytest_subprocess("--petstore-offline", "-p", "no:cacheprovider", "-s")
+
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*petstore cleanup*", "master: 1 leftover pets deleted, 1 could not be deleted",
+                                 "    pet 10002 at http://127.0.0.1:9: ConnectionError: *"])
+    assert not any("Worker cleanup" in line for line in result.outlines)
+
+
+FAILED_DELETE_TESTS = """
+import pytest
+
+from petstore_pytest_tests import api_config, cleanup_pet, session
+
+
+@pytest.fixture
+def base_url(fault_proxy):
+    fault_proxy.fail("/pet/*", 500, methods={"DELETE"}, times=1)
+    return fault_proxy.base_url
+
+
+def test_creates_two_pets(cleanup_pet):
+    cleanup_pet.extend([10003, 10004])
+"""
+
+
+def test_pets_whose_delete_fails_are_left_for_worker_cleanup(suite):
+    suite.makepyfile(test_failed_delete=FAILED_DELETE_TESTS)
+    result = suite.runpytest_subprocess("--petstore-offline", "-p", "no:cacheprovider")
+
+    result.assert_outcomes(passed=1)
+    # Only the pet answered with a 500 is retried; the other's 404 means it is gone
+    result.stdout.fnmatch_lines(["*petstore cleanup*", "master: 1 leftover pets deleted, 0 could not be deleted"])
@@ -0,0 +1,92 @@
+"""
+Tests for the behave step tracer
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from petstore_client import PooledSession
+from petstore_stub_server import PetstoreStubServer
+from step_trace import StepTracer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PART_C = os.path.join(HERE, "Part_C_BDD_Implementation")
+
+INVENTORY_FEATURE = """Feature: Store inventory
+  Scenario: Read the inventory
+    Given the Petstore API is available
+    When I send a GET request to "/store/inventory"
+    Then the response code should be 200
+"""
+
+
+def test_trace_file_nests_requests_under_steps(tmp_path):
+    tracer = StepTracer()
+    with PetstoreStubServer() as server:
+        session = PooledSession(timeout=5)
+        session.listeners.append(tracer.record_request)
+        try:
+            tracer.begin("scenario", "Inventory")
+            tracer.begin("step", "When I get the inventory")
+            session.get(f"{server.base_url}/store/inventory")
+            tracer.end("step", "When I get the inventory", status="passed")
+            tracer.end("scenario", "Inventory")
+        finally:
+            session.close()
+
+    path = tmp_path / "trace.json"
+    tracer.write(str(path))
+    events = {e["cat"]: e for e in json.loads(path.read_text())["traceEvents"] if e["ph"] == "X"}
+
+    step, request = events["step"], events["http"]
+    assert request["name"] == "GET /v2/store/inventory"
+    assert step["ts"] <= request["ts"]
+    assert request["ts"] + request["dur"] <= step["ts"] + step["dur"]
+    assert events["scenario"]["dur"] >= step["dur"]
+
+
+def test_summary_ranks_slowest_steps():
+    tracer = StepTracer()
+    tracer.complete("step", "fast", 0, 1_000_000)
+    tracer.complete("step", "slow", 0, 5_000_000)
+    tracer.complete("step", "fast", 0, 1_000_000)
+
+    steps = tracer.summary()["steps"]
+    assert [s["name"] for s in steps] == ["slow", "fast"]
+    assert steps[1]["count"] == 2 and steps[1]["total_ms"] == 2.0
+    assert tracer.end("step", "never begun") is None
+
+
+def test_behave_run_traces_features_scenarios_steps_and_requests(tmp_path):
+    """Run behave on the standard layout (steps/ next to environment.py) with tracing on"""
+    pytest.importorskip("behave")
+    features = tmp_path / "features"
+    (features / "steps").mkdir(parents=True)
+    shutil.copy(os.path.join(PART_C, "environment.py"), features)
+    shutil.copy(os.path.join(PART_C, "petstore_context.py"), features)
+    shutil.copy(os.path.join(PART_C, "petstore_steps.py"), features / "steps")
+    (features / "inventory.feature").write_text(INVENTORY_FEATURE)
+
+    trace = tmp_path / "trace.json"
+    env = dict(os.environ, PETSTORE_BASE_URL="offline", PYTHONPATH=HERE)
+    command = [sys.executable, "-m", "behave", str(features), "-D", f"trace={trace}", "--no-capture"]
+    run = subprocess.run(command, cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert run.returncode == 0, run.stdout + run.stderr
+
+    events = [e for e in json.loads(trace.read_text())["traceEvents"] if e["ph"] == "X"]
+    by_category = {}
+    for event in events:
+        by_category.setdefault(event["cat"], []).append(event)
+    assert [e["name"] for e in by_category["feature"]] == ["Store inventory"]
+    assert [e["name"] for e in by_category["scenario"]] == ["Read the inventory"]
+    assert [e["args"]["status"] for e in by_category["step"]] == ["passed"] * 3
+    # Each request is drawn inside the step that made it
+    when = next(e for e in by_category["step"] if e["name"].startswith("When"))
+    inventory = next(e for e in by_category["http"] if e["name"] == "GET /v2/store/inventory")
+    assert when["ts"] <= inventory["ts"] and inventory["ts"] + inventory["dur"] <= when["ts"] + when["dur"]
+    assert "Slowest steps" in run.stdout